@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.games.assets.models import Asset
 from api.games.assets.schemas import AssetCreateRequest, AssetResponse
+from api.games.revision import bump_game_revision
 from dependencies import get_db
 
 router = APIRouter()
@@ -32,6 +33,7 @@ async def create_asset(
     )
     db.add(asset)
     await db.flush()  # Flush to generate the UUID
+    await bump_game_revision(db, game_id)
 
     return AssetResponse(
         id=asset.id,
@@ -101,6 +103,7 @@ async def update_asset(
     asset.data = request.data
 
     await db.flush()
+    await bump_game_revision(db, game_id)
 
     return AssetResponse(
         id=asset.id,
@@ -124,5 +127,6 @@ async def delete_asset(
 
     # Delete from database
     await db.delete(asset)
+    await bump_game_revision(db, game_id)
 
     return {"id": asset.id}
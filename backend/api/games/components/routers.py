@@ -10,6 +10,7 @@ from api.games.components.schemas import (
     ComponentUpdateRequest,
     ComponentUpdateResponse,
 )
+from api.games.revision import bump_game_revision
 from dependencies import get_db
 
 router = APIRouter()
@@ -32,6 +33,7 @@ async def create_component(
     )
     db.add(component)
     await db.flush()  # Flush to generate the UUID
+    await bump_game_revision(db, game_id)
     return ComponentCreateResponse(
         id=component.id,
         game_id=component.game_id,
@@ -57,6 +59,7 @@ async def update_component(
     component.component_data = request.component_data
 
     await db.flush()
+    await bump_game_revision(db, game_id)
     return ComponentUpdateResponse(
         id=component.id,
         game_id=component.game_id,
@@ -75,4 +78,5 @@ async def delete_component(
     if component is None or component.game_id != game_id:
         raise HTTPException(status_code=404, detail="Component not found")
     await db.delete(component)
+    await bump_game_revision(db, game_id)
     return {"id": component.id}
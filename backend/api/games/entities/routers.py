@@ -12,6 +12,7 @@ from api.games.entities.schemas import (
     EntityUpdateRequest,
     EntityUpdateResponse,
 )
+from api.games.revision import bump_game_revision
 from dependencies import get_db
 
 router = APIRouter()
@@ -30,6 +31,7 @@ async def create_entity(
     )
     db.add(entity)
     await db.flush()
+    await bump_game_revision(db, game_id)
     await db.refresh(entity, attribute_names=["components"])
     return EntityCreateResponse(
         id=entity.id,
@@ -60,6 +62,7 @@ async def update_entity(
         entity.entity_data = request.entity_data
 
     await db.flush()
+    await bump_game_revision(db, game_id)
     return EntityUpdateResponse(
         id=entity.id,
         game_id=entity.game_id,
@@ -79,4 +82,5 @@ async def delete_entity(
     if entity is None or entity.game_id != game_id:
         raise HTTPException(status_code=404, detail="Entity not found")
     await db.delete(entity)
+    await bump_game_revision(db, game_id)
     return {"id": entity.id}
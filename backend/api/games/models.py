@@ -1,4 +1,4 @@
-from sqlalchemy import String
+from sqlalchemy import Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from core.models import UUIDMixin
@@ -12,6 +12,8 @@ class Game(UUIDMixin, Base):
 
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     game_data: Mapped[GameData] = mapped_column(PydanticType(GameData), nullable=False)
+    # Bumped on every write to the game or its children (see api.games.revision)
+    revision: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     scenes: Mapped[list["Scene"]] = relationship( # type: ignore
@@ -0,0 +1,22 @@
+import uuid
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.games.models import Game
+
+
+async def bump_game_revision(db: AsyncSession, game_id: uuid.UUID) -> None:
+    """
+    Increment a game's revision in the current transaction.
+
+    Every write to a game or its children calls this, so an unchanged revision means an unchanged game. The
+    increment is a single atomic UPDATE, so concurrent writers never hand out the same revision twice.
+    """
+    await db.execute(update(Game).where(Game.id == game_id).values(revision=Game.revision + 1))
+
+
+async def get_game_revision(db: AsyncSession, game_id: uuid.UUID) -> int | None:
+    """The game's current revision, or None if the game does not exist. Reads a single integer."""
+    result = await db.execute(select(Game.revision).where(Game.id == game_id))
+    return result.scalar_one_or_none()
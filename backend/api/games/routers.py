@@ -1,7 +1,7 @@
 import uuid
 
 from dependencies import get_db
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from fastapi.responses import Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -12,6 +12,7 @@ from api.games.assets.schemas import AssetResponse
 from api.games.entities.models import Entity
 from api.games.entities.schemas import EntityResponse
 from api.games.models import Game
+from api.games.revision import bump_game_revision, get_game_revision
 from api.games.scenes.models import Scene
 from api.games.scenes.schemas import SceneCreateResponse
 from api.games.schemas import (
@@ -20,12 +21,25 @@ from api.games.schemas import (
     GameDeleteResponse,
     GameGetResponse,
     GameListItem,
+    GameRevisionResponse,
     GameUpdateRequest,
     GameUpdateResponse,
 )
+from core.disconnect import ClientDisconnectedError, cancel_on_disconnect
+from core.etag import etag_matches, quote_etag, unquote_etag
 from core.rom.builder import RomBuilder, get_rom_builder
+from core.rom.cache import RomCache, RomHistory, get_rom_cache, get_rom_history
+from core.rom.executor import (
+    CompileExecutor,
+    CompileQueueFullError,
+    CompileTimeoutError,
+    get_compile_executor,
+)
+from core.rom.patch import ips_patch
+from core.rom.singleflight import SingleFlight, get_render_singleflight
+from core.rom.snapshot import GameSnapshot
 from core.rom.code_block_registry import CodeBlockRegistry
-from core.rom.rom import Rom
+from core.rom.rom import Rom, RomImage
 from core.schemas import (
     AssetType,
     NESColor,
@@ -101,7 +115,9 @@ async def list_games(
 
     games = result.scalars().all()
 
-    return [GameListItem(id=game.id, name=game.name, game_data=game.game_data) for game in games]
+    return [
+        GameListItem(id=game.id, name=game.name, game_data=game.game_data, revision=game.revision) for game in games
+    ]
 
 
 @router.post("", response_model=GameCreateResponse)
@@ -135,14 +151,34 @@ async def create_game(
 
     db.add(game)
     await db.flush()  # Flush to generate the UUID
-    return GameCreateResponse(id=game.id, name=game.name, game_data=game.game_data)
+    return GameCreateResponse(id=game.id, name=game.name, game_data=game.game_data, revision=game.revision)
+
 
+def game_etag(revision: int) -> str:
+    """The ETag of a game's full representation, which changes exactly when its revision does."""
+    return quote_etag(f"game-r{revision}")
 
-@router.get("/{game_id}", response_model=GameGetResponse)
+
+@router.get(
+    "/{game_id}",
+    response_model=GameGetResponse,
+    responses={304: {"description": "The game has not changed since the revision in If-None-Match"}},
+)
 async def get_game(
     game_id: uuid.UUID,
+    response: Response,
+    if_none_match: str | None = Header(None),
     db: AsyncSession = Depends(get_db),
 ):
+    # Answer conditional requests from the revision alone, without loading the game graph
+    if if_none_match:
+        revision = await get_game_revision(db, game_id)
+        if revision is None:
+            raise HTTPException(status_code=404, detail="Game not found")
+        etag = game_etag(revision)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
     # Query game with scenes, entities (with components), and assets eagerly loaded
     stmt = select(Game).where(Game.id == game_id).options(
         selectinload(Game.scenes),
@@ -155,6 +191,9 @@ async def get_game(
     if game is None:
         raise HTTPException(status_code=404, detail="Game not found")
 
+    # Tag the body with the revision it was actually loaded at
+    response.headers["ETag"] = game_etag(game.revision)
+
     # Convert scenes to response format
     scenes = [
         SceneCreateResponse(
@@ -188,6 +227,7 @@ async def get_game(
         id=game.id,
         name=game.name,
         game_data=game.game_data,
+        revision=game.revision,
         scenes=scenes,
         assets=assets,
         entities=entities
@@ -210,7 +250,24 @@ async def update_game(
         game.game_data = request.game_data
 
     await db.flush()
-    return GameUpdateResponse(id=game.id, name=game.name, game_data=game.game_data)
+    await bump_game_revision(db, game_id)
+    return GameUpdateResponse(id=game.id, name=game.name, game_data=game.game_data, revision=game.revision)
+
+
+@router.get("/{game_id}/revision", response_model=GameRevisionResponse)
+async def get_revision(
+    game_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    The game's revision, which changes on every write to the game or its children.
+
+    A single-integer read: poll this instead of the full game to detect changes.
+    """
+    revision = await get_game_revision(db, game_id)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return GameRevisionResponse(id=game_id, revision=revision)
 
 
 @router.delete("/{game_id}", response_model=GameDeleteResponse)
@@ -225,6 +282,66 @@ async def delete_game(
     return GameDeleteResponse(id=game.id)
 
 
+async def _render_rom(
+    game_id: uuid.UUID,
+    scene_id: uuid.UUID | None,
+    if_none_match: str | None,
+    request: Request,
+    rom_builder: RomBuilder,
+    rom_cache: RomCache,
+    compile_executor: CompileExecutor,
+    render_singleflight: SingleFlight,
+    db: AsyncSession,
+) -> tuple[str, RomImage | None, str]:
+    """
+    Find or build the ROM for the game's current state.
+
+    Returns (cache key, rom, cache status); rom is None if if_none_match already matches the key.
+    Raises HTTPException for build errors and ClientDisconnectedError if the client goes away.
+    """
+
+    async def load_snapshot() -> tuple[GameSnapshot, str]:
+        snapshot = await rom_builder.load_snapshot(game_id)
+        key = rom_cache.key_for(snapshot, initial_scene_name="main", scene_id=scene_id)
+        rom_cache.remember_revision(game_id, snapshot.revision, "main", key, scene_id=scene_id)
+        return snapshot, key
+
+    try:
+        snapshot = None
+        revision = await get_game_revision(db, game_id)
+        key = rom_cache.key_for_revision(game_id, revision, "main", scene_id) if revision is not None else None
+        if key is None:
+            snapshot, key = await load_snapshot()
+
+        if etag_matches(if_none_match, quote_etag(key)):
+            return key, None, "hit"
+
+        rom_bytes = rom_cache.get(key)
+        if rom_bytes is not None:
+            return key, rom_bytes, "hit"
+
+        if snapshot is None:
+            snapshot, key = await load_snapshot()
+
+        async def build() -> RomImage:
+            rom = await compile_executor.compile(snapshot, initial_scene_name="main", scene_id=scene_id)
+            rom_cache.put(key, rom)
+            return rom
+
+        rom_bytes, shared = await cancel_on_disconnect(
+            request, render_singleflight.do((game_id, snapshot.revision, scene_id), build)
+        )
+        return key, rom_bytes, "shared" if shared else "miss"
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Missing dependency: {str(e)}")
+    except CompileQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"}) from e
+    except CompileTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
+
+
 @router.post(
     "/{game_id}/render",
     response_class=Response,
@@ -237,25 +354,120 @@ async def delete_game(
 )
 async def render_game(
     game_id: uuid.UUID,
+    request: Request,
+    scene_id: uuid.UUID | None = Query(None),
+    if_none_match: str | None = Header(None),
     rom_builder: RomBuilder = Depends(get_rom_builder),
+    rom_cache: RomCache = Depends(get_rom_cache),
+    rom_history: RomHistory = Depends(get_rom_history),
+    compile_executor: CompileExecutor = Depends(get_compile_executor),
+    render_singleflight: SingleFlight = Depends(get_render_singleflight),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Renders a game into a NES ROM file.
 
     Returns the ROM data as application/octet-stream which can be
     loaded directly into a NES emulator.
-    """
 
+    ROMs are cached by a content hash of the game; the hash is returned as the ETag,
+    and a matching If-None-Match yields 304 without compiling anything. If the game's
+    revision has been rendered before, only the revision is read from the database.
+
+    Compilation runs on the compile executor, off the event loop. A full build queue yields 503,
+    a build that exceeds the timeout yields 504, and a client disconnect abandons the build.
+    Concurrent requests for the same game state share a single build.
+
+    Given a scene_id, renders a preview ROM that starts in that scene and links only what it reaches.
+    """
     try:
-        rom_bytes = await rom_builder.build(game_id=game_id, initial_scene_name="main")
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except KeyError as e:
-        raise HTTPException(status_code=400, detail=f"Missing dependency: {str(e)}")
+        key, rom_bytes, cache_status = await _render_rom(
+            game_id, scene_id, if_none_match, request, rom_builder, rom_cache, compile_executor, render_singleflight, db
+        )
+    except ClientDisconnectedError:
+        # Nobody is listening; 499 is the conventional "client closed request" status
+        return Response(status_code=499)
+
+    etag = quote_etag(key)
+    if rom_bytes is None:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    # Keep the ROM the client now holds, so its next update can be sent as a patch
+    rom_history.add(game_id, key, rom_bytes)
+
+    filename = f"game_{game_id}.nes" if scene_id is None else f"game_{game_id}_scene_{scene_id}.nes"
 
     # Return as binary data with appropriate content type
     return Response(
         content=rom_bytes,
         media_type="application/octet-stream",
-        headers={"Content-Disposition": f'attachment; filename="game_{game_id}.nes"'},
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "ETag": etag,
+            "X-Rom-Cache": cache_status,
+        },
+    )
+
+
+@router.post(
+    "/{game_id}/render/patch",
+    response_class=Response,
+    responses={
+        200: {
+            "content": {"application/x-ips-patch": {}},
+            "description": "IPS patch from the base ROM to the current ROM",
+        },
+        304: {"description": "The base ROM is already current"},
+        412: {"description": "The base ROM is not in the build history; render the full ROM instead"},
+    },
+)
+async def render_game_patch(
+    game_id: uuid.UUID,
+    request: Request,
+    base: str = Query(..., description="ETag of the ROM the client currently holds"),
+    scene_id: uuid.UUID | None = Query(None),
+    rom_builder: RomBuilder = Depends(get_rom_builder),
+    rom_cache: RomCache = Depends(get_rom_cache),
+    rom_history: RomHistory = Depends(get_rom_history),
+    compile_executor: CompileExecutor = Depends(get_compile_executor),
+    render_singleflight: SingleFlight = Depends(get_render_singleflight),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Renders a game and returns the difference to a ROM the client already has, as an IPS patch.
+
+    The base ROM is identified by the ETag /render returned for it, and must be one of the game's
+    last few builds. Most edits change a few bytes of scene or entity data, so the patch is usually
+    a few dozen bytes instead of the whole image. The new ROM's ETag is returned for the next patch.
+    An unknown base yields 412 before anything is built, and a base that is already current yields 304.
+    """
+    base_key = unquote_etag(base)
+    base_rom = rom_history.get(game_id, base_key)
+    if base_rom is None:
+        raise HTTPException(
+            status_code=412, detail=f"ROM {base_key} is not in the build history of game {game_id}."
+        )
+
+    try:
+        key, rom_bytes, cache_status = await _render_rom(
+            game_id, scene_id, quote_etag(base_key), request, rom_builder, rom_cache, compile_executor,
+            render_singleflight, db,
+        )
+    except ClientDisconnectedError:
+        return Response(status_code=499)
+
+    etag = quote_etag(key)
+    if rom_bytes is None:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    rom_history.add(game_id, key, rom_bytes)
+
+    return Response(
+        content=ips_patch(base_rom, rom_bytes),
+        media_type="application/x-ips-patch",
+        headers={
+            "ETag": etag,
+            "X-Rom-Base": quote_etag(base_key),
+            "X-Rom-Cache": cache_status,
+        },
     )
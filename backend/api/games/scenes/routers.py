@@ -3,6 +3,7 @@ import uuid
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from api.games.revision import bump_game_revision
 from api.games.scenes.models import Scene
 from api.games.scenes.schemas import (
     SceneCreateRequest,
@@ -25,6 +26,7 @@ async def create_scene(
     scene = Scene(name=request.name, game_id=game_id, scene_data=request.scene_data)
     db.add(scene)
     await db.flush()  # Flush to generate the UUID
+    await bump_game_revision(db, game_id)
     return SceneCreateResponse(id=scene.id, game_id=scene.game_id, name=scene.name, scene_data=scene.scene_data)
 
 
@@ -38,6 +40,7 @@ async def delete_scene(
     if scene is None or scene.game_id != game_id:
         raise HTTPException(status_code=404, detail="Scene not found")
     await db.delete(scene)
+    await bump_game_revision(db, game_id)
     return SceneDeleteResponse(id=scene.id)
 
 
@@ -59,6 +62,7 @@ async def update_scene(
         scene.scene_data = request.scene_data
 
     await db.flush()
+    await bump_game_revision(db, game_id)
 
     return SceneUpdateResponse(
         id=scene.id,
@@ -19,6 +19,7 @@ class GameCreateRequest(GameCommon):
 class GameCreateResponse(GameCommon):
     id: uuid.UUID
     game_data: GameData
+    revision: int
 
 
 class GameUpdateRequest(BaseModel):
@@ -29,20 +30,28 @@ class GameUpdateRequest(BaseModel):
 class GameUpdateResponse(GameCommon):
     id: uuid.UUID
     game_data: GameData
+    revision: int
 
 
 class GameListItem(GameCommon):
     id: uuid.UUID
     game_data: GameData
+    revision: int
 
 
 class GameGetResponse(GameCommon):
     id: uuid.UUID
     game_data: GameData
+    revision: int
     scenes: list[SceneCreateResponse]
     assets: list[AssetResponse]
     entities: list[EntityResponse]
 
 
+class GameRevisionResponse(BaseModel):
+    id: uuid.UUID
+    revision: int
+
+
 class GameDeleteResponse(BaseModel):
     id: uuid.UUID
@@ -0,0 +1 @@
+# ROM API module
@@ -0,0 +1,42 @@
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends
+
+from api.rom.schemas import (
+    CompileExecutorStatsResponse,
+    RomCacheStatsResponse,
+    RomHistoryStatsResponse,
+    RomLayoutCacheStatsResponse,
+    RomStatsResponse,
+    SingleFlightStatsResponse,
+)
+from core.rom.cache import (
+    RomCache,
+    RomHistory,
+    RomLayoutCache,
+    get_rom_cache,
+    get_rom_history,
+    get_rom_layout_cache,
+)
+from core.rom.executor import CompileExecutor, get_compile_executor
+from core.rom.singleflight import SingleFlight, get_render_singleflight
+
+router = APIRouter()
+
+
+@router.get("/stats", response_model=RomStatsResponse)
+async def get_rom_stats(
+    rom_cache: RomCache = Depends(get_rom_cache),
+    layout_cache: RomLayoutCache = Depends(get_rom_layout_cache),
+    rom_history: RomHistory = Depends(get_rom_history),
+    compile_executor: CompileExecutor = Depends(get_compile_executor),
+    render_singleflight: SingleFlight = Depends(get_render_singleflight),
+):
+    """Counters for the in-process ROM build pipeline."""
+    return RomStatsResponse(
+        cache=RomCacheStatsResponse(**asdict(rom_cache.stats())),
+        layouts=RomLayoutCacheStatsResponse(**asdict(layout_cache.stats())),
+        history=RomHistoryStatsResponse(**asdict(rom_history.stats())),
+        executor=CompileExecutorStatsResponse(**asdict(compile_executor.stats())),
+        singleflight=SingleFlightStatsResponse(**asdict(render_singleflight.stats())),
+    )
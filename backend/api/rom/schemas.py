@@ -0,0 +1,50 @@
+from pydantic import BaseModel
+
+
+class RomCacheStatsResponse(BaseModel):
+    entries: int
+    size_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class RomLayoutCacheStatsResponse(BaseModel):
+    entries: int
+    blocks_reused: int
+    blocks_rendered: int
+
+
+class RomHistoryStatsResponse(BaseModel):
+    games: int
+    entries: int
+    size_bytes: int
+    hits: int
+    misses: int
+
+
+class CompileExecutorStatsResponse(BaseModel):
+    kind: str
+    workers: int
+    max_queue: int
+    in_flight: int
+    submitted: int
+    completed: int
+    failed: int
+    rejected: int
+    timed_out: int
+    cancelled: int
+
+
+class SingleFlightStatsResponse(BaseModel):
+    in_flight: int
+    executed: int
+    deduplicated: int
+
+
+class RomStatsResponse(BaseModel):
+    cache: RomCacheStatsResponse
+    layouts: RomLayoutCacheStatsResponse
+    history: RomHistoryStatsResponse
+    executor: CompileExecutorStatsResponse
+    singleflight: SingleFlightStatsResponse
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -40,5 +42,35 @@ class Settings(BaseSettings):
     MINIO_SECURE: bool = False  # Use HTTPS
     MINIO_BUCKET: str = "assets"
 
+    # ROM build cache
+    ROM_CACHE_MAX_ENTRIES: int = 256
+    ROM_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    ROM_LAYOUT_CACHE_MAX_GAMES: int = 64  # games whose last layout is kept for incremental rebuilds
+    ROM_HISTORY_PER_GAME: int = 4  # recent builds per game that clients can request patches against
+    ROM_HISTORY_MAX_GAMES: int = 64
+
+    # ROM compile executor
+    ROM_COMPILE_EXECUTOR: Literal["thread", "process"] = "thread"
+    ROM_COMPILE_WORKERS: int = 2
+    ROM_COMPILE_MAX_QUEUE: int = 8  # builds waiting for a worker before new ones are rejected with 503
+    ROM_COMPILE_TIMEOUT_SECONDS: float = 10.0
+    # What a build does when its NMI's VBlank work can run past VBlank (worst case, from static cycle analysis)
+    ROM_VBLANK_CHECK: Literal["off", "warn", "error"] = "warn"
+    # Worst-case cycles flush_vram_queue may spend writing queued VRAM updates per VBlank
+    ROM_VRAM_FLUSH_CYCLES: int = 1200
+    # Store scenes packed (stored, RLE or LZ, whichever is smallest) and unpack them into RAM when loaded
+    ROM_SCENE_COMPRESSION: bool = False
+    # Cartridge board: "nrom" (16KB of PRG ROM) or "uxrom" (data packed into up to 15 switchable 16KB PRG banks)
+    ROM_MAPPER: Literal["nrom", "uxrom"] = "nrom"
+    # Build for CHR RAM instead of CHR ROM: scenes upload their packed tiles to pattern memory when loaded
+    ROM_CHR_RAM: bool = False
+    # How load_scene lays out entities in RAM: one record per entity, or one array per field (see EntityLayout)
+    ROM_ENTITY_LAYOUT: Literal["array_of_structs", "struct_of_arrays"] = "array_of_structs"
+
+    # Response compression (gzip, plus brotli if the "compression" extra is installed)
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # bytes; smaller responses are sent uncompressed
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+
 
 settings = Settings()
@@ -0,0 +1,145 @@
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.etag import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # optional: install the "compression" extra for br support
+    brotli = None
+
+DEFAULT_MEDIA_TYPES = ("application/json", "application/octet-stream")
+
+
+def available_encodings() -> tuple[str, ...]:
+    """Supported content codings, most preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str, available: tuple[str, ...]) -> str | None:
+    """
+    Pick the content coding to use for an Accept-Encoding header value, or None for identity.
+
+    Honors q-values (q=0 refuses a coding) and the * wildcard; ties are broken by the order of available.
+    """
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = qualities.get(coding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 5) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    # mtime=0 keeps the output deterministic for identical bodies
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Negotiated gzip/brotli compression of complete (non-streaming) responses.
+
+    - only compresses the given media types, and only bodies of at least minimum_size bytes
+    - adds Vary: Accept-Encoding to every response it could have compressed
+    - gives compressed representations their own strong ETag ("tag-gzip"), as RFC 9110 requires;
+      etag_matches() maps those back when evaluating If-None-Match
+    - a 304 repeats the ETag of the representation the client holds: the negotiated coding's tag when the
+      client's If-None-Match names it
+    - streaming responses pass through untouched
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        media_types: tuple[str, ...] = DEFAULT_MEDIA_TYPES,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.media_types = media_types
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""), available_encodings())
+        start_message: Message | None = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                if message["status"] == 304 and encoding is not None:
+                    self._encode_not_modified_etag(message, request_headers, encoding)
+                start_message = message
+                return
+
+            # First body message: decide now, with the whole body if it is not streamed
+            headers = MutableHeaders(scope=start_message)
+            media_type = headers.get("content-type", "").split(";")[0].strip()
+            eligible = media_type in self.media_types and "content-encoding" not in headers
+            if eligible:
+                headers.add_vary_header("Accept-Encoding")
+
+            body = message.get("body", b"")
+            if (
+                not eligible
+                or encoding is None
+                or message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or start_message["status"] in (204, 304)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            if "etag" in headers:
+                headers["ETag"] = encoded_etag(headers["etag"], encoding)
+            passthrough = True
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _encode_not_modified_etag(message: Message, request_headers: Headers, encoding: str) -> None:
+        headers = MutableHeaders(scope=message)
+        if "etag" not in headers:
+            return
+        etag = encoded_etag(headers["etag"], encoding)
+        if_none_match = request_headers.get("if-none-match", "")
+        if etag in (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")):
+            headers["ETag"] = etag
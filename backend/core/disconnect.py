@@ -0,0 +1,27 @@
+import asyncio
+from collections.abc import Awaitable
+from contextlib import suppress
+
+from fastapi import Request
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the client went away before the awaited work finished."""
+
+
+async def cancel_on_disconnect[T](request: Request, awaitable: Awaitable[T], poll_interval: float = 0.1) -> T:
+    """Await awaitable, cancelling it (and raising ClientDisconnectedError) if the client disconnects first."""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+                raise ClientDisconnectedError()
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
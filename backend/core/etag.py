@@ -0,0 +1,44 @@
+# Suffixes the compression middleware appends to the ETags of content-coded representations
+_ENCODING_SUFFIXES = ("-br", "-gzip")
+
+
+def quote_etag(tag: str) -> str:
+    """Format an opaque tag as a strong ETag header value."""
+    return f'"{tag}"'
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """The ETag of a content-coded representation: "tag" becomes "tag-gzip"."""
+    if not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _strip_encoding(etag: str) -> str:
+    for suffix in _ENCODING_SUFFIXES:
+        if etag.endswith(f'{suffix}"'):
+            return f'{etag[: -len(suffix) - 1]}"'
+    return etag
+
+
+def unquote_etag(etag: str) -> str:
+    """The opaque tag of an ETag header value, ignoring weakness and encoding suffixes; bare tags pass through."""
+    etag = etag.strip().removeprefix("W/")
+    if not etag.startswith('"'):
+        return etag
+    return _strip_encoding(etag).strip('"')
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an If-None-Match header value matches the given (quoted) ETag.
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match, so W/"x" matches "x". Tags of
+    compressed representations ("x-gzip") match the identity tag they were derived from.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (_strip_encoding(candidate.strip().removeprefix("W/")) for candidate in if_none_match.split(","))
+    return etag.removeprefix("W/") in candidates
@@ -2,8 +2,142 @@
 6502 Assembly builder with fluent interface.
 
 Provides a readable way to generate 6502 machine code without runtime assembly overhead.
+
+Operands may be literal ints or symbolic references to labels. Symbolic operands are encoded once as
+placeholders plus a relocation table, so a block's size is known without knowing any addresses, and
+placing the block at an address only patches the relocated bytes (see ObjectCode.link).
+
+Every instruction is recorded with its entry in the instruction table, so the cycle cost of the code can be
+analyzed statically (see core.rom.cycles); labels that start a loop carry the loop's iteration bound.
 """
 
+import enum
+from dataclasses import dataclass, field
+
+from core.rom.opcodes import OPCODES, Opcode
+
+
+class RelocationType(enum.Enum):
+    """
+    absolute: a 2-byte little-endian address
+    zeropage: a 1-byte address that must lie in the zero page
+    low: the low byte of an address (e.g. an immediate operand)
+    high: the high byte of an address (e.g. an immediate operand)
+    """
+
+    ABSOLUTE = "ABSOLUTE"
+    ZEROPAGE = "ZEROPAGE"
+    LOW = "LOW"
+    HIGH = "HIGH"
+
+    @property
+    def width(self) -> int:
+        return 2 if self == RelocationType.ABSOLUTE else 1
+
+
+@dataclass(frozen=True)
+class LabelRef:
+    """A symbolic address: the value of a label plus a constant offset."""
+
+    label: str
+    offset: int = 0
+
+    def __add__(self, offset: int) -> "LabelRef":
+        return LabelRef(self.label, self.offset + offset)
+
+
+@dataclass(frozen=True)
+class ByteRef:
+    """One byte (low or high) of a symbolic address, for use as an immediate operand."""
+
+    ref: LabelRef
+    type: RelocationType
+
+
+def lo(target: "str | LabelRef") -> ByteRef:
+    """The low byte of a label's address (#<label)."""
+    return ByteRef(_as_ref(target), RelocationType.LOW)
+
+
+def hi(target: "str | LabelRef") -> ByteRef:
+    """The high byte of a label's address (#>label)."""
+    return ByteRef(_as_ref(target), RelocationType.HIGH)
+
+
+def _as_ref(target: "str | LabelRef") -> LabelRef:
+    return LabelRef(target) if isinstance(target, str) else target
+
+
+type Address = int | str | LabelRef
+type Immediate = int | ByteRef
+type BranchTarget = int | str
+
+
+@dataclass(frozen=True)
+class Relocation:
+    """
+    A placeholder in object code to be patched at link time.
+
+    label is None for references to the block's own local labels; those resolve to start_offset + addend.
+    """
+
+    offset: int
+    type: RelocationType
+    label: str | None
+    addend: int = 0
+
+
+@dataclass(frozen=True)
+class Instruction:
+    """One assembled instruction: its offset in the code and its opcode (addressing mode and cycle cost)."""
+
+    offset: int
+    opcode: Opcode
+
+
+@dataclass(frozen=True)
+class ObjectCode:
+    """
+    Assembled, position-independent machine code: placeholder bytes plus the relocations that fill them.
+
+    instructions lists every instruction in order; loop_bounds maps the offset of each loop's first instruction
+    to the most times the loop body runs per pass through the code.
+    """
+
+    code: bytes
+    relocations: tuple[Relocation, ...] = ()
+    local_labels: dict[str, int] = field(default_factory=dict)
+    instructions: tuple[Instruction, ...] = ()
+    loop_bounds: dict[int, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.code)
+
+    @property
+    def external_labels(self) -> set[str]:
+        """Labels defined outside this object code that link() needs to resolve."""
+        return {r.label for r in self.relocations if r.label is not None}
+
+    def link(self, start_offset: int, names: dict[str, int]) -> bytes:
+        """Place the code at start_offset, patching every relocation. Raises KeyError on unknown labels."""
+        if not self.relocations:
+            return self.code
+        code = bytearray(self.code)
+        for relocation in self.relocations:
+            base = start_offset if relocation.label is None else names[relocation.label]
+            value = base + relocation.addend
+            if relocation.type == RelocationType.ABSOLUTE:
+                code[relocation.offset : relocation.offset + 2] = (value & 0xFFFF).to_bytes(2, "little")
+            elif relocation.type == RelocationType.ZEROPAGE:
+                if not 0 <= value <= 0xFF:
+                    raise ValueError(f"'{relocation.label}' (${value:04X}) is not a zero page address.")
+                code[relocation.offset] = value
+            elif relocation.type == RelocationType.LOW:
+                code[relocation.offset] = value & 0xFF
+            else:
+                code[relocation.offset] = (value >> 8) & 0xFF
+        return bytes(code)
+
 
 class Asm6502:
     """
@@ -16,397 +150,537 @@ class Asm6502:
         asm.ldx_imm(0xFF)  # LDX #$FF
         asm.txs()  # TXS
         code = asm.bytes()
+
+    Symbolic usage:
+        asm.label("loop")
+        asm.lda_ind_y("zp__src1")  # LDA (zp__src1),Y
+        asm.sta_zp(LabelRef("zp__src2") + 1)
+        asm.bne("loop")  # resolved locally when assembled
+        asm.jsr("load_scene")  # left as a relocation
+        obj = asm.assemble()
+        code = obj.link(start_offset=0xC000, names={...})
     """
 
     def __init__(self):
         self._code = bytearray()
+        self._labels: dict[str, int] = {}
+        self._fixups: list[tuple[int, RelocationType, LabelRef]] = []
+        self._branches: list[tuple[int, str]] = []
+        self._instructions: list[Instruction] = []
+        self._loop_bounds: dict[int, int] = {}
 
     def bytes(self) -> bytes:
-        """Return the generated machine code as bytes."""
+        """Return the generated machine code as bytes (symbolic operands are left as zero placeholders)."""
         return bytes(self._code)
 
     def __len__(self) -> int:
         """Return the current size of generated code."""
         return len(self._code)
 
+    # ===== Labels and Relocation =====
+
+    def label(self, name: str, max_iterations: int | None = None):
+        """
+        Define a local label at the current offset.
+
+        For a label that starts a loop, max_iterations bounds how many times the loop body runs each time the
+        code reaches it; cycle analysis needs a bound for every loop.
+        """
+        if name in self._labels:
+            raise ValueError(f"Label '{name}' is already defined.")
+        self._labels[name] = len(self._code)
+        if max_iterations is not None:
+            if max_iterations < 1:
+                raise ValueError(f"Loop '{name}' must run at least once.")
+            self._loop_bounds[len(self._code)] = max_iterations
+        return self
+
+    def assemble(self) -> ObjectCode:
+        """
+        Resolve local branches and return the object code with its relocation table.
+
+        References to labels defined with label() become block-relative relocations; all other
+        references are left for the linker.
+        """
+        code = bytearray(self._code)
+        for position, target in self._branches:
+            if target not in self._labels:
+                raise ValueError(f"Branch target '{target}' is not a local label.")
+            # Relative to the PC after the 2-byte branch instruction
+            distance = self._labels[target] - (position + 1)
+            if not -128 <= distance <= 127:
+                raise ValueError(f"Branch to '{target}' is out of range ({distance} bytes).")
+            code[position] = distance & 0xFF
+
+        relocations = []
+        for position, relocation_type, ref in self._fixups:
+            if ref.label in self._labels:
+                relocations.append(Relocation(position, relocation_type, None, self._labels[ref.label] + ref.offset))
+            else:
+                relocations.append(Relocation(position, relocation_type, ref.label, ref.offset))
+
+        return ObjectCode(
+            code=bytes(code),
+            relocations=tuple(relocations),
+            local_labels=dict(self._labels),
+            instructions=tuple(self._instructions),
+            loop_bounds=dict(self._loop_bounds),
+        )
+
+    def _emit(self, opcode: int):
+        self._instructions.append(Instruction(len(self._code), OPCODES[opcode]))
+        self._code.append(opcode)
+
+    def _emit_word(self, opcode: int, addr: Address):
+        self._emit(opcode)
+        if isinstance(addr, int):
+            self._code.extend([addr & 0xFF, (addr >> 8) & 0xFF])
+        else:
+            self._fixups.append((len(self._code), RelocationType.ABSOLUTE, _as_ref(addr)))
+            self._code.extend([0x00, 0x00])
+
+    def _emit_zp(self, opcode: int, addr: Address):
+        self._emit(opcode)
+        if isinstance(addr, int):
+            self._code.append(addr & 0xFF)
+        else:
+            self._fixups.append((len(self._code), RelocationType.ZEROPAGE, _as_ref(addr)))
+            self._code.append(0x00)
+
+    def _emit_imm(self, opcode: int, value: Immediate):
+        self._emit(opcode)
+        if isinstance(value, int):
+            self._code.append(value & 0xFF)
+        else:
+            self._fixups.append((len(self._code), value.type, value.ref))
+            self._code.append(0x00)
+
+    def _emit_branch(self, opcode: int, target: BranchTarget):
+        self._emit(opcode)
+        if isinstance(target, int):
+            self._code.append(target & 0xFF)
+        else:
+            self._branches.append((len(self._code), target))
+            self._code.append(0x00)
+
     # ===== Status Register Operations =====
 
     def sei(self):
         """SEI - Set Interrupt Disable (0x78)"""
-        self._code.append(0x78)
+        self._emit(0x78)
         return self
 
     def cli(self):
         """CLI - Clear Interrupt Disable (0x58)"""
-        self._code.append(0x58)
+        self._emit(0x58)
         return self
 
     def sed(self):
         """SED - Set Decimal Flag (0xF8)"""
-        self._code.append(0xF8)
+        self._emit(0xF8)
         return self
 
     def cld(self):
         """CLD - Clear Decimal Flag (0xD8)"""
-        self._code.append(0xD8)
+        self._emit(0xD8)
         return self
 
     def sec(self):
         """SEC - Set Carry Flag (0x38)"""
-        self._code.append(0x38)
+        self._emit(0x38)
         return self
 
     def clc(self):
         """CLC - Clear Carry Flag (0x18)"""
-        self._code.append(0x18)
+        self._emit(0x18)
         return self
 
     def clv(self):
         """CLV - Clear Overflow Flag (0xB8)"""
-        self._code.append(0xB8)
+        self._emit(0xB8)
         return self
 
     # ===== Load/Store Operations =====
 
-    def lda_imm(self, value: int):
+    def lda_imm(self, value: Immediate):
         """LDA #immediate (0xA9)"""
-        self._code.extend([0xA9, value & 0xFF])
+        self._emit_imm(0xA9, value)
         return self
 
-    def lda_zp(self, addr: int):
+    def lda_zp(self, addr: Address):
         """LDA zero page (0xA5)"""
-        self._code.extend([0xA5, addr & 0xFF])
+        self._emit_zp(0xA5, addr)
         return self
 
-    def lda_abs(self, addr: int):
+    def lda_abs(self, addr: Address):
         """LDA absolute (0xAD)"""
-        self._code.extend([0xAD, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0xAD, addr)
         return self
 
-    def lda_ind_y(self, zp_addr: int):
+    def lda_ind_y(self, zp_addr: Address):
         """LDA (zero page),Y (0xB1)"""
-        self._code.extend([0xB1, zp_addr & 0xFF])
+        self._emit_zp(0xB1, zp_addr)
         return self
 
-    def lda_abs_x(self, addr: int):
+    def lda_abs_x(self, addr: Address):
         """LDA absolute,X (0xBD)"""
-        self._code.extend([0xBD, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0xBD, addr)
+        return self
+
+    def lda_abs_y(self, addr: Address):
+        """LDA absolute,Y (0xB9)"""
+        self._emit_word(0xB9, addr)
         return self
 
-    def ldx_imm(self, value: int):
+    def ldx_imm(self, value: Immediate):
         """LDX #immediate (0xA2)"""
-        self._code.extend([0xA2, value & 0xFF])
+        self._emit_imm(0xA2, value)
         return self
 
-    def ldx_zp(self, addr: int):
+    def ldx_zp(self, addr: Address):
         """LDX zero page (0xA6)"""
-        self._code.extend([0xA6, addr & 0xFF])
+        self._emit_zp(0xA6, addr)
         return self
 
-    def ldx_abs(self, addr: int):
+    def ldx_abs(self, addr: Address):
         """LDX absolute (0xAE)"""
-        self._code.extend([0xAE, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0xAE, addr)
         return self
 
-    def ldy_imm(self, value: int):
+    def ldy_imm(self, value: Immediate):
         """LDY #immediate (0xA0)"""
-        self._code.extend([0xA0, value & 0xFF])
+        self._emit_imm(0xA0, value)
         return self
 
-    def ldy_zp(self, addr: int):
+    def ldy_zp(self, addr: Address):
         """LDY zero page (0xA4)"""
-        self._code.extend([0xA4, addr & 0xFF])
+        self._emit_zp(0xA4, addr)
         return self
 
-    def ldy_abs(self, addr: int):
+    def ldy_abs(self, addr: Address):
         """LDY absolute (0xAC)"""
-        self._code.extend([0xAC, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0xAC, addr)
         return self
 
-    def sta_zp(self, addr: int):
+    def ldy_abs_x(self, addr: Address):
+        """LDY absolute,X (0xBC)"""
+        self._emit_word(0xBC, addr)
+        return self
+
+    def sta_zp(self, addr: Address):
         """STA zero page (0x85)"""
-        self._code.extend([0x85, addr & 0xFF])
+        self._emit_zp(0x85, addr)
         return self
 
-    def sta_abs(self, addr: int):
+    def sta_abs(self, addr: Address):
         """STA absolute (0x8D)"""
-        self._code.extend([0x8D, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0x8D, addr)
         return self
 
-    def sta_ind_y(self, zp_addr: int):
+    def sta_ind_y(self, zp_addr: Address):
         """STA (zero page),Y (0x91)"""
-        self._code.extend([0x91, zp_addr & 0xFF])
+        self._emit_zp(0x91, zp_addr)
         return self
 
-    def sta_abs_x(self, addr: int):
+    def sta_abs_x(self, addr: Address):
         """STA absolute,X (0x9D)"""
-        self._code.extend([0x9D, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0x9D, addr)
         return self
 
-    def sta_abs_y(self, addr: int):
+    def sta_abs_y(self, addr: Address):
         """STA absolute,Y (0x99)"""
-        self._code.extend([0x99, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0x99, addr)
         return self
 
-    def stx_zp(self, addr: int):
+    def stx_zp(self, addr: Address):
         """STX zero page (0x86)"""
-        self._code.extend([0x86, addr & 0xFF])
+        self._emit_zp(0x86, addr)
         return self
 
-    def stx_abs(self, addr: int):
+    def stx_abs(self, addr: Address):
         """STX absolute (0x8E)"""
-        self._code.extend([0x8E, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0x8E, addr)
         return self
 
-    def sty_zp(self, addr: int):
+    def sty_zp(self, addr: Address):
         """STY zero page (0x84)"""
-        self._code.extend([0x84, addr & 0xFF])
+        self._emit_zp(0x84, addr)
         return self
 
-    def sty_abs(self, addr: int):
+    def sty_abs(self, addr: Address):
         """STY absolute (0x8C)"""
-        self._code.extend([0x8C, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0x8C, addr)
         return self
 
     # ===== Register Transfer =====
 
     def tax(self):
         """TAX - Transfer A to X (0xAA)"""
-        self._code.append(0xAA)
+        self._emit(0xAA)
         return self
 
     def tay(self):
         """TAY - Transfer A to Y (0xA8)"""
-        self._code.append(0xA8)
+        self._emit(0xA8)
         return self
 
     def txa(self):
         """TXA - Transfer X to A (0x8A)"""
-        self._code.append(0x8A)
+        self._emit(0x8A)
         return self
 
     def tya(self):
         """TYA - Transfer Y to A (0x98)"""
-        self._code.append(0x98)
+        self._emit(0x98)
         return self
 
     def txs(self):
         """TXS - Transfer X to Stack Pointer (0x9A)"""
-        self._code.append(0x9A)
+        self._emit(0x9A)
         return self
 
     def tsx(self):
         """TSX - Transfer Stack Pointer to X (0xBA)"""
-        self._code.append(0xBA)
+        self._emit(0xBA)
         return self
 
     # ===== Stack Operations =====
 
     def pha(self):
         """PHA - Push Accumulator (0x48)"""
-        self._code.append(0x48)
+        self._emit(0x48)
         return self
 
     def php(self):
         """PHP - Push Processor Status (0x08)"""
-        self._code.append(0x08)
+        self._emit(0x08)
         return self
 
     def pla(self):
         """PLA - Pull Accumulator (0x68)"""
-        self._code.append(0x68)
+        self._emit(0x68)
         return self
 
     def plp(self):
         """PLP - Pull Processor Status (0x28)"""
-        self._code.append(0x28)
+        self._emit(0x28)
         return self
 
     # ===== Increment/Decrement =====
 
-    def inc_zp(self, addr: int):
+    def inc_zp(self, addr: Address):
         """INC zero page (0xE6)"""
-        self._code.extend([0xE6, addr & 0xFF])
+        self._emit_zp(0xE6, addr)
         return self
 
-    def inc_abs(self, addr: int):
+    def inc_abs(self, addr: Address):
         """INC absolute (0xEE)"""
-        self._code.extend([0xEE, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0xEE, addr)
         return self
 
     def inx(self):
         """INX - Increment X (0xE8)"""
-        self._code.append(0xE8)
+        self._emit(0xE8)
         return self
 
     def iny(self):
         """INY - Increment Y (0xC8)"""
-        self._code.append(0xC8)
+        self._emit(0xC8)
         return self
 
-    def dec_zp(self, addr: int):
+    def dec_zp(self, addr: Address):
         """DEC zero page (0xC6)"""
-        self._code.extend([0xC6, addr & 0xFF])
+        self._emit_zp(0xC6, addr)
         return self
 
-    def dec_abs(self, addr: int):
+    def dec_abs(self, addr: Address):
         """DEC absolute (0xCE)"""
-        self._code.extend([0xCE, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0xCE, addr)
         return self
 
     def dex(self):
         """DEX - Decrement X (0xCA)"""
-        self._code.append(0xCA)
+        self._emit(0xCA)
         return self
 
     def dey(self):
         """DEY - Decrement Y (0x88)"""
-        self._code.append(0x88)
+        self._emit(0x88)
         return self
 
     # ===== Branching =====
 
-    def bne(self, offset: int):
+    def bne(self, target: BranchTarget):
         """BNE - Branch if Not Equal (0xD0)"""
-        self._code.extend([0xD0, offset & 0xFF])
+        self._emit_branch(0xD0, target)
         return self
 
-    def beq(self, offset: int):
+    def beq(self, target: BranchTarget):
         """BEQ - Branch if Equal (0xF0)"""
-        self._code.extend([0xF0, offset & 0xFF])
+        self._emit_branch(0xF0, target)
         return self
 
-    def bpl(self, offset: int):
+    def bpl(self, target: BranchTarget):
         """BPL - Branch if Plus (0x10)"""
-        self._code.extend([0x10, offset & 0xFF])
+        self._emit_branch(0x10, target)
         return self
 
-    def bmi(self, offset: int):
+    def bmi(self, target: BranchTarget):
         """BMI - Branch if Minus (0x30)"""
-        self._code.extend([0x30, offset & 0xFF])
+        self._emit_branch(0x30, target)
         return self
 
-    def bcc(self, offset: int):
+    def bcc(self, target: BranchTarget):
         """BCC - Branch if Carry Clear (0x90)"""
-        self._code.extend([0x90, offset & 0xFF])
+        self._emit_branch(0x90, target)
         return self
 
-    def bcs(self, offset: int):
+    def bcs(self, target: BranchTarget):
         """BCS - Branch if Carry Set (0xB0)"""
-        self._code.extend([0xB0, offset & 0xFF])
+        self._emit_branch(0xB0, target)
         return self
 
-    def bvc(self, offset: int):
+    def bvc(self, target: BranchTarget):
         """BVC - Branch if Overflow Clear (0x50)"""
-        self._code.extend([0x50, offset & 0xFF])
+        self._emit_branch(0x50, target)
         return self
 
-    def bvs(self, offset: int):
+    def bvs(self, target: BranchTarget):
         """BVS - Branch if Overflow Set (0x70)"""
-        self._code.extend([0x70, offset & 0xFF])
+        self._emit_branch(0x70, target)
         return self
 
     # ===== Jumps and Calls =====
 
-    def jmp_abs(self, addr: int):
+    def jmp_abs(self, addr: Address):
         """JMP absolute (0x4C)"""
-        self._code.extend([0x4C, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0x4C, addr)
         return self
 
-    def jmp_ind(self, addr: int):
+    def jmp_ind(self, addr: Address):
         """JMP indirect (0x6C)"""
-        self._code.extend([0x6C, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0x6C, addr)
         return self
 
-    def jsr(self, addr: int):
+    def jsr(self, addr: Address):
         """JSR - Jump to Subroutine (0x20)"""
-        self._code.extend([0x20, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0x20, addr)
         return self
 
     def rts(self):
         """RTS - Return from Subroutine (0x60)"""
-        self._code.append(0x60)
+        self._emit(0x60)
         return self
 
     def rti(self):
         """RTI - Return from Interrupt (0x40)"""
-        self._code.append(0x40)
+        self._emit(0x40)
         return self
 
     # ===== Bitwise Operations =====
 
-    def and_imm(self, value: int):
+    def and_imm(self, value: Immediate):
         """AND #immediate (0x29)"""
-        self._code.extend([0x29, value & 0xFF])
+        self._emit_imm(0x29, value)
         return self
 
-    def ora_imm(self, value: int):
+    def ora_imm(self, value: Immediate):
         """ORA #immediate (0x09)"""
-        self._code.extend([0x09, value & 0xFF])
+        self._emit_imm(0x09, value)
         return self
 
-    def ora_zp(self, addr: int):
+    def ora_zp(self, addr: Address):
         """ORA zero page (0x05)"""
-        self._code.extend([0x05, addr & 0xFF])
+        self._emit_zp(0x05, addr)
         return self
 
-    def eor_imm(self, value: int):
+    def eor_imm(self, value: Immediate):
         """EOR #immediate (0x49)"""
-        self._code.extend([0x49, value & 0xFF])
+        self._emit_imm(0x49, value)
         return self
 
-    def bit_zp(self, addr: int):
+    def bit_zp(self, addr: Address):
         """BIT zero page (0x24)"""
-        self._code.extend([0x24, addr & 0xFF])
+        self._emit_zp(0x24, addr)
         return self
 
-    def bit_abs(self, addr: int):
+    def bit_abs(self, addr: Address):
         """BIT absolute (0x2C)"""
-        self._code.extend([0x2C, addr & 0xFF, (addr >> 8) & 0xFF])
+        self._emit_word(0x2C, addr)
+        return self
+
+    # ===== Shifts =====
+
+    def asl(self):
+        """ASL A - Arithmetic Shift Left the accumulator (0x0A)"""
+        self._emit(0x0A)
         return self
 
     # ===== Arithmetic =====
 
-    def adc_imm(self, value: int):
+    def adc_imm(self, value: Immediate):
         """ADC #immediate (0x69)"""
-        self._code.extend([0x69, value & 0xFF])
+        self._emit_imm(0x69, value)
+        return self
+
+    def adc_zp(self, addr: Address):
+        """ADC zero page (0x65)"""
+        self._emit_zp(0x65, addr)
+        return self
+
+    def sbc_zp(self, addr: Address):
+        """SBC zero page (0xE5)"""
+        self._emit_zp(0xE5, addr)
         return self
 
     # ===== Comparison =====
 
-    def cmp_imm(self, value: int):
+    def cmp_imm(self, value: Immediate):
         """CMP #immediate (0xC9)"""
-        self._code.extend([0xC9, value & 0xFF])
+        self._emit_imm(0xC9, value)
         return self
 
-    def cpx_imm(self, value: int):
+    def cmp_zp(self, addr: Address):
+        """CMP zero page (0xC5)"""
+        self._emit_zp(0xC5, addr)
+        return self
+
+    def cpx_imm(self, value: Immediate):
         """CPX #immediate (0xE0)"""
-        self._code.extend([0xE0, value & 0xFF])
+        self._emit_imm(0xE0, value)
+        return self
+
+    def cpx_zp(self, addr: Address):
+        """CPX zero page (0xE4)"""
+        self._emit_zp(0xE4, addr)
         return self
 
-    def cpy_imm(self, value: int):
+    def cpy_imm(self, value: Immediate):
         """CPY #immediate (0xC0)"""
-        self._code.extend([0xC0, value & 0xFF])
+        self._emit_imm(0xC0, value)
+        return self
+
+    def cpy_zp(self, addr: Address):
+        """CPY zero page (0xC4)"""
+        self._emit_zp(0xC4, addr)
         return self
 
     # ===== Miscellaneous =====
 
     def nop(self):
         """NOP - No Operation (0xEA)"""
-        self._code.append(0xEA)
+        self._emit(0xEA)
         return self
 
     def brk(self):
         """BRK - Break (0x00)"""
-        self._code.append(0x00)
+        self._emit(0x00)
         return self
 
     # ===== Helper: Infinite Loop =====
 
     def loop_forever(self):
-        """Generate an infinite loop: JMP to current address"""
-        # We need to know the current offset to jump to it
-        # This will be a relative jump to itself: JMP current_addr
-        # The caller needs to provide the actual address
-        # For now, emit a placeholder that needs to be fixed up
-        return self
+        """Generate an infinite loop: JMP to its own address."""
+        name = f"__loop_forever_{len(self._code)}"
+        self.label(name)
+        return self.jmp_abs(name)
@@ -0,0 +1,135 @@
+"""
+Cartridge mappers and the packing of data blocks into switchable PRG banks.
+
+NROM has one 16KB PRG bank at $C000 and no bank switching. UxROM keeps its last 16KB bank fixed at $C000 and
+maps any bank at $8000-$BFFF: the fixed bank holds the code (RESET, NMI, subroutines) and the data that code reads
+directly, and everything else is packed into the switchable banks, so a game is limited by the mapper's bank count
+instead of by one bank.
+
+A data block may be banked when no code reads it without first mapping its bank in (see
+CodeBlock.switched_dependencies and switch_bank). Data blocks that point at each other must be mapped together, so
+a scene is packed into one bank with the data only it uses; data that several scenes share stays in the fixed bank.
+"""
+
+import enum
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from core.rom.code_block import CodeBlock, CodeBlockType
+
+BANK_SIZE = 0x4000
+SWITCHABLE_BANK_START = 0x8000
+# UOROM: a 4-bit bank register, 256KB of PRG ROM
+MAX_UXROM_BANKS = 16
+
+
+class Mapper(enum.Enum):
+    """
+    nrom: mapper 0, one 16KB PRG bank at $C000
+    uxrom: mapper 2, switchable 16KB PRG banks at $8000 and the last bank fixed at $C000
+    """
+
+    NROM = "nrom"
+    UXROM = "uxrom"
+
+    @property
+    def ines_number(self) -> int:
+        return {Mapper.NROM: 0, Mapper.UXROM: 2}[self]
+
+
+def bank_label(label: str) -> str:
+    """The name a UxROM render exports for the number of the PRG bank that holds a data block."""
+    return f"{label}__bank"
+
+
+@dataclass
+class BankLayout:
+    """
+    Which switchable bank every banked data block was packed into.
+
+    banks holds the labels of each switchable bank in ROM order; the fixed bank is the last bank of the image,
+    bank_count - 1. bank_of maps each banked label to its bank.
+    """
+
+    banks: list[list[str]] = field(default_factory=list)
+    bank_of: dict[str, int] = field(default_factory=dict)
+    bank_count: int = 2
+
+    @property
+    def fixed_bank(self) -> int:
+        return self.bank_count - 1
+
+
+def pack_banks(code_blocks: Iterable[CodeBlock], max_banks: int = MAX_UXROM_BANKS) -> BankLayout:
+    """
+    Pack the bankable data blocks into switchable banks, first fit by decreasing group size.
+
+    A group is a data block that no other data points at (a scene) with the data only it reaches; a group larger
+    than a bank, or more groups than max_banks - 1 banks hold, raise ValueError. Sizes are the blocks' size, which
+    must not be less than what they render to. The bank count is rounded up to a power of two, as on real boards.
+    """
+    blocks = {block.label: block for block in code_blocks}
+    data = [label for label, block in blocks.items() if block.type == CodeBlockType.DATA]
+    data_labels = set(data)
+
+    # Data that code reads without switching banks stays in the fixed bank, and so does all the data it points at
+    pinned: set[str] = set()
+    stack = [
+        dependency
+        for block in blocks.values()
+        if block.type != CodeBlockType.DATA
+        for dependency in block.dependencies
+        if dependency in data_labels and dependency not in block.switched_dependencies
+    ]
+    while stack:
+        label = stack.pop()
+        if label not in pinned:
+            pinned.add(label)
+            stack.extend(dependency for dependency in blocks[label].dependencies if dependency in data_labels)
+
+    # Every other data block belongs to the data reached from the blocks no other data points at (the scenes); data
+    # reached from several of them is shared and also stays in the fixed bank, where every bank can point at it
+    candidates = [label for label in data if label not in pinned]
+    referenced = {dependency for label in candidates for dependency in blocks[label].dependencies}
+    owners: dict[str, list[str]] = {}
+    for root in (label for label in candidates if label not in referenced):
+        stack, seen = [root], set()
+        while stack:
+            label = stack.pop()
+            if label in seen or label in pinned:
+                continue
+            seen.add(label)
+            owners.setdefault(label, []).append(root)
+            stack.extend(dependency for dependency in blocks[label].dependencies if dependency in data_labels)
+    groups: dict[str, list[str]] = {}
+    for label in candidates:
+        if len(owners.get(label, ())) == 1:
+            groups.setdefault(owners[label][0], []).append(label)
+        else:
+            pinned.add(label)
+
+    layout = BankLayout()
+    free: list[int] = []
+    sized = [(sum(blocks[label].size for label in group), group) for group in groups.values()]
+    # Stable sort: groups of equal size keep the order they were added in
+    for size, group in sorted(sized, key=lambda item: -item[0]):
+        if size > BANK_SIZE:
+            raise ValueError(f"Data group of '{group[0]}' is {size - BANK_SIZE} bytes larger than a PRG bank.")
+        bank = next((i for i, room in enumerate(free) if room >= size), None)
+        if bank is None:
+            if len(free) == max_banks - 1:
+                raise ValueError(f"PRG ROM overflow: banked data needs more than {max_banks - 1} switchable banks.")
+            bank = len(free)
+            free.append(BANK_SIZE)
+            layout.banks.append([])
+        free[bank] -= size
+        for label in group:
+            layout.bank_of[label] = bank
+
+    # Keep the dependency order within every bank
+    for label in candidates:
+        if label in layout.bank_of:
+            layout.banks[layout.bank_of[label]].append(label)
+    while layout.bank_count < len(layout.banks) + 1:
+        layout.bank_count *= 2
+    return layout
@@ -1,25 +1,35 @@
 import logging
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Literal
 
 from api.games.assets.models import Asset
-from api.games.entities.models import Entity
+from core.rom.cache import RomLayoutCache, get_rom_layout_cache
 from core.rom.label_registry import LabelRegistry
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from api.games.models import Game
 from api.games.scenes.models import Scene
+from core.rom.banks import Mapper
 from core.rom.code_block import CodeBlock
+from core.rom.compression import PackedChrData, PackedData, PackedDataReport, packed_data_reports
 from core.rom.data import EntityData, SceneData
+from core.rom.entity_ram import EntityLayout
 from core.rom.preamble import PreambleCodeBlock
 from core.rom.code_block_registry import CodeBlockRegistry
-from core.rom.rom import Rom, get_empty_rom
+from core.rom.cycles import VBLANK_CYCLES, VBlankOverrunError
+from core.rom.runtime import option_runtime_libraries
+from core.rom.resolver import resolve_dependencies
+from core.rom.rom import Rom, RomCycleReport, get_empty_rom
+from core.rom.snapshot import GameSnapshot, SceneSnapshot
+from core.rom.snapshot_query import decode_game_snapshot, game_snapshot_query
+from config import settings
 from dependencies import get_db
 
 logger = logging.getLogger(__name__)
 
+type VBlankCheck = Literal["off", "warn", "error"]
+
 
 @dataclass
 class RomBuilder:
@@ -34,50 +44,103 @@ class RomBuilder:
     The builder
     - populates a label registry (uuid -> label)
     - populates a code block registry (*root* label -> code block) (which depends on the label registry)
-    - populates the rom by adding code blocks and their dependencies in recursive depth-first order
-    - invokes the rom to render the final binary
+    - populates the rom by adding code blocks and their dependencies in depth-first topological order, visiting
+      each block once
+    - invokes the rom to render the final binary, incrementally against the game's previous layout if a
+      layout cache is given
+    - checks the render's worst-case cycles: with vblank_check "warn" or "error", NMI work that can run past
+      VBlank is logged or fails the build with VBlankOverrunError
+    - with scene_compression, stores each scene packed (see PackedData) and has the preamble unpack the initial
+      scene into RAM; compression_report then holds each scene's raw and packed sizes and unpack cycles. Scenes
+      too large for the unpack buffer are stored as they are and load_scene reads them from ROM
+    - on a rom with a banked mapper (UxROM), has the preamble map in the initial scene's PRG bank, so that scenes
+      and their data can be packed into switchable banks
+    - on a rom with CHR RAM, has each scene upload the tiles of the sprite sets its entities use when it is loaded,
+      packed (see PackedChrData), so the game's tiles are limited by PRG space rather than by one CHR ROM
+    - links load_scene and render_entities built for entity_layout (see EntityLayout)
     """
 
     db: AsyncSession
     rom: Rom
     label_registry: LabelRegistry
     code_block_registry: CodeBlockRegistry
+    layout_cache: RomLayoutCache | None = None
+    vblank_check: VBlankCheck = "warn"
+    scene_compression: bool = False
+    entity_layout: EntityLayout = EntityLayout.ARRAY_OF_STRUCTS
+    compression_report: list[PackedDataReport] = field(default_factory=list, init=False)
+    _resolved: set[str] = field(default_factory=set, init=False, repr=False)
+
+    async def build(
+        self, game_id: uuid.UUID, initial_scene_name: str = "main", scene_id: uuid.UUID | None = None
+    ) -> memoryview:
+        snapshot = await self.load_snapshot(game_id)
+        return self.compile(snapshot, initial_scene_name=initial_scene_name, scene_id=scene_id)
+
+    async def load_snapshot(self, game_id: uuid.UUID) -> GameSnapshot:
+        """Load the game graph as a normalized snapshot, in a single round trip that bypasses the ORM."""
+        result = await self.db.execute(game_snapshot_query(game_id))
+        document = result.scalar_one_or_none()
+
+        if document is None or not document["scenes"]:
+            raise ValueError(f"Game with ID {game_id} not found or has no scenes.")
 
-    async def build(self, game_id: uuid.UUID, initial_scene_name: str = "main") -> bytes:
-        game = await self.db.get(
-            Game,
-            game_id,
-            options=[
-                selectinload(Game.scenes),
-                selectinload(Game.assets),
-                selectinload(Game.entities),
-                selectinload(Game.entities).selectinload(Entity.components),
-            ],
-        )
+        return decode_game_snapshot(document)
 
-        if game is None or not game.scenes:
-            raise ValueError(f"Game with ID {game_id} not found or has no scenes.")
+    def compile(
+        self, game: GameSnapshot, initial_scene_name: str = "main", scene_id: uuid.UUID | None = None
+    ) -> memoryview:
+        """
+        Compile a snapshot into a ROM image. Does not touch the database.
 
-        # Pre-populate the registries
+        Given a scene_id, builds a preview instead: that scene is the entry point and only the blocks it reaches are
+        linked, so the build tracks the size of one scene rather than the whole game.
+        """
+        # Pre-populate the registries. Registering is cheap; only blocks reached from a root are linked.
         self.label_registry.add_game(game)
         self.code_block_registry.add_game(game)
 
-        # Add all the scenes and their dependencies. (The sum of their referenced objects
-        # is the sum of the game.)
+        if scene_id is None:
+            # Add all the scenes and their dependencies. (The sum of their referenced objects
+            # is the sum of the game.)
+            scenes = game.scenes
+        else:
+            scenes = [scene for scene in game.scenes if scene.id == scene_id]
+            if not scenes:
+                raise ValueError(f"Game has no scene with ID {scene_id}.")
+
+        option_library = option_runtime_libraries.get((self.rom.chr_ram, self.entity_layout))
+        if option_library is not None:
+            for code_block in option_library.code_blocks.values():
+                self.code_block_registry.add_code_block(code_block)
+
         main_label = None
-        for scene in game.scenes:
+        main_packed = False
+        for scene in scenes:
             scene_label = self.label_registry.get_scene_label(scene.id)
             print(f"Adding scene '{scene.name}' with label '{scene_label}' to ROM.")
-            if scene.name == initial_scene_name:
+            scene_block = SceneData.from_model(scene=scene, registry=self.label_registry)
+            if self.rom.chr_ram:
+                scene_block.chr_uploads = self._chr_uploads(game, scene)
+            packed = self.scene_compression and PackedData.fits(scene_block)
+            if packed:
+                scene_block = PackedData.wrap(scene_block)
+            elif self.scene_compression:
+                logger.info(f"Scene '{scene.name}' is {scene_block.size} bytes, too large to unpack: stored as is")
+            if scene_id is not None or scene.name == initial_scene_name:
                 print(f"  -> This is the initial scene.")
                 main_label = scene_label
-            scene_block = SceneData.from_model(scene=scene, registry=self.label_registry)
+                main_packed = packed
             self._add(self.rom, scene_block)
 
         if main_label is None:
             raise ValueError(f"Game must have a scene named '{initial_scene_name}'.")
 
-        preamble = PreambleCodeBlock(main_scene_label=main_label)
+        preamble = PreambleCodeBlock(
+            main_scene_label=main_label,
+            unpack_scene=main_packed,
+            switch_scene_bank=self.rom.mapper != Mapper.NROM,
+        )
         self._add(self.rom, preamble)
 
         # Always add the handlers (they will conditionally call their dependencies)
@@ -91,31 +154,92 @@ class RomBuilder:
         # (e.g., sprite sets are added when entities reference them)
         # No need to add them unconditionally here
 
-        return self.rom.render()
+        if self.layout_cache is None:
+            rom_image = self.rom.render()
+        else:
+            rom_image = self.rom.render(previous_layout=self.layout_cache.get(game.id, scene_id))
+            self.layout_cache.put(game.id, self.rom.layout, scene_id)
+
+        chr_layout = self.rom.layout.chr
+        if chr_layout.bytes_saved:
+            logger.info(f"CHR deduplication saved {chr_layout.bytes_saved} bytes: {len(chr_layout.tiles)} unique tiles")
+        layout = self.rom.layout
+        if layout.data_bytes_saved:
+            logger.info(
+                f"Data deduplication saved {layout.data_bytes_saved} PRG bytes: "
+                f"{len(layout.data_aliases)} blocks share identical data"
+            )
+        if layout.banks is not None:
+            logger.info(
+                f"Packed {len(layout.banks.bank_of)} data blocks into {len(layout.banks.banks)} switchable PRG banks "
+                f"of {layout.banks.bank_count}"
+            )
+        if self.rom.chr_ram:
+            uploads = [record for record in layout.records.values() if isinstance(record.block, PackedChrData)]
+            logger.info(
+                f"CHR RAM: {len(layout.chr.remaps)} CHR blocks in scene uploads packed from "
+                f"{sum(record.block.inner.size for record in uploads)} to "
+                f"{sum(len(record.rendered.code) for record in uploads)} bytes"
+            )
+        if self.scene_compression:
+            self.compression_report = packed_data_reports(rom_image, layout)
+            for report in self.compression_report:
+                logger.info(
+                    f"Scene '{report.label}' packed with {report.method.name.lower()}: {report.raw_size} -> "
+                    f"{report.packed_size} bytes, unpacks in {report.unpack_cycles} cycles"
+                )
+
+        self._check_vblank(self.rom.layout.cycles)
+        return rom_image
+
+    def _chr_uploads(self, game: GameSnapshot, scene: SceneSnapshot) -> list[str]:
+        """Register and list the packed CHR uploads of a scene: the test tile, then its entities' sprite sets."""
+        entities = {entity.id: entity for entity in game.entities}
+        chr_labels = ["chr__test_tile"]
+        for entity_id in scene.scene_data.entities:
+            if spriteset := entities[entity_id].entity_data.spriteset:
+                chr_label = self.label_registry.get_asset_label(spriteset)
+                if chr_label not in chr_labels:
+                    chr_labels.append(chr_label)
+        uploads = [PackedChrData.wrap(self.code_block_registry[chr_label]) for chr_label in chr_labels]
+        for upload in uploads:
+            self.code_block_registry.add_code_block(upload)
+        return [upload.label for upload in uploads]
+
+    def _check_vblank(self, report: RomCycleReport) -> None:
+        if self.vblank_check == "off" or not report.vblank_overrun:
+            return
+        message = (
+            f"NMI work can take {report.vblank_cycles} cycles before its VBlank code is done, "
+            f"but VBlank lasts {VBLANK_CYCLES} cycles."
+        )
+        if self.vblank_check == "error":
+            raise VBlankOverrunError(message)
+        logger.warning(message)
 
     def _add(self, rom: Rom, code_block: CodeBlock):
         """
-        First add all dependencies, recursively depth-first. Then add the code block itself.
-        Adding a code block idempotently does nothing if it is already present.
+        First add all dependencies not added yet, depth-first. Then add the code block itself.
+        Adding a code block that was already added does nothing.
         """
-        # Add required dependencies (fail if missing)
-        for dependency_name in code_block.dependencies:
-            dependency = self.code_block_registry[dependency_name]
-            self._add(rom, dependency)
-
-        # Add optional dependencies (skip if missing)
-        for dependency_name in code_block.optional_dependencies:
-            if dependency_name in self.code_block_registry:
-                dependency = self.code_block_registry[dependency_name]
-                self._add(rom, dependency)
-
-        rom.add(code_block)
-        self.code_block_registry.add_code_block(code_block)
+        for block in resolve_dependencies(code_block, self.code_block_registry, self._resolved):
+            rom.add(block)
+            self.code_block_registry.add_code_block(block)
 
 
 def get_rom_builder(
     db: AsyncSession = Depends(get_db),
+    layout_cache: RomLayoutCache = Depends(get_rom_layout_cache),
 ) -> RomBuilder:
     label_registry = LabelRegistry()
     code_block_registry = CodeBlockRegistry(label_registry=label_registry)
-    return RomBuilder(db=db, rom=Rom(), label_registry=label_registry, code_block_registry=code_block_registry)
+    return RomBuilder(
+        db=db,
+        rom=Rom(mapper=Mapper(settings.ROM_MAPPER), chr_ram=settings.ROM_CHR_RAM),
+        label_registry=label_registry,
+        code_block_registry=code_block_registry,
+        layout_cache=layout_cache,
+        vblank_check=settings.ROM_VBLANK_CHECK,
+        scene_compression=settings.ROM_SCENE_COMPRESSION,
+        entity_layout=EntityLayout(settings.ROM_ENTITY_LAYOUT),
+    )
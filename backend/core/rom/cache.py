@@ -0,0 +1,256 @@
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from config import settings
+from core.rom.rom import COMPILER_VERSION, RomImage, RomLayout
+from core.rom.snapshot import GameSnapshot
+
+
+def build_options() -> str:
+    """The settings that change what a build of the same snapshot produces, as key material."""
+    return (
+        f"mapper={settings.ROM_MAPPER}:chr_ram={settings.ROM_CHR_RAM}:entity_layout={settings.ROM_ENTITY_LAYOUT}:"
+        f"scene_compression={settings.ROM_SCENE_COMPRESSION}:vram_flush_cycles={settings.ROM_VRAM_FLUSH_CYCLES}"
+    )
+
+
+@dataclass
+class RomCacheStats:
+    entries: int
+    size_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class RomCache:
+    """
+    A content-addressed, size-bounded LRU cache of rendered ROM images.
+
+    Keys are derived from the normalized game snapshot plus the compiler version and the build options (see
+    build_options), so any change to the game, the compiler or the ROM settings produces a new key. The key
+    doubles as the ROM's ETag.
+
+    Keys also cover the entry point: the initial scene name, or the scene id of a single-scene preview build.
+
+    The cache also remembers which key each (game, revision, entry point, build options) resolved to, so a request
+    for an unchanged game can find its ROM after reading just the revision, without loading the game graph.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, RomImage] = OrderedDict()
+        self._keys_by_revision: OrderedDict[tuple[uuid.UUID, int, str, uuid.UUID | None, str], str] = OrderedDict()
+        self._size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(snapshot: GameSnapshot, initial_scene_name: str, scene_id: uuid.UUID | None = None) -> str:
+        entry = initial_scene_name if scene_id is None else f"scene:{scene_id}"
+        material = f"{COMPILER_VERSION}:{build_options()}:{entry}:{snapshot.fingerprint()}"
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def key_for_revision(
+        self, game_id: uuid.UUID, revision: int, initial_scene_name: str, scene_id: uuid.UUID | None = None
+    ) -> str | None:
+        """The key a game revision was last seen to produce with the current build options, if it is remembered."""
+        revision_key = (game_id, revision, initial_scene_name, scene_id, build_options())
+        key = self._keys_by_revision.get(revision_key)
+        if key is not None:
+            self._keys_by_revision.move_to_end(revision_key)
+        return key
+
+    def remember_revision(
+        self, game_id: uuid.UUID, revision: int, initial_scene_name: str, key: str, scene_id: uuid.UUID | None = None
+    ) -> None:
+        revision_key = (game_id, revision, initial_scene_name, scene_id, build_options())
+        self._keys_by_revision[revision_key] = key
+        self._keys_by_revision.move_to_end(revision_key)
+        while len(self._keys_by_revision) > self.max_entries:
+            self._keys_by_revision.popitem(last=False)
+
+    def get(self, key: str) -> RomImage | None:
+        rom = self._entries.get(key)
+        if rom is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return rom
+
+    def put(self, key: str, rom: RomImage) -> None:
+        if len(rom) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._size_bytes -= len(self._entries.pop(key))
+        self._entries[key] = rom
+        self._size_bytes += len(rom)
+        while len(self._entries) > self.max_entries or self._size_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size_bytes -= len(evicted)
+            self.evictions += 1
+
+    def get_or_build(self, key: str, build: Callable[[], RomImage]) -> tuple[RomImage, bool]:
+        """Return (rom, hit), invoking build() and caching its result on a miss."""
+        rom = self.get(key)
+        if rom is not None:
+            return rom, True
+        rom = build()
+        self.put(key, rom)
+        return rom, False
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys_by_revision.clear()
+        self._size_bytes = 0
+
+    def stats(self) -> RomCacheStats:
+        return RomCacheStats(
+            entries=len(self._entries),
+            size_bytes=self._size_bytes,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
+
+
+@dataclass
+class RomLayoutCacheStats:
+    entries: int
+    blocks_reused: int
+    blocks_rendered: int
+
+
+class RomLayoutCache:
+    """
+    The layout of each game's most recent render, kept so the next render of that game can be incremental.
+
+    Full builds and each scene's preview builds place blocks differently, so they are kept apart.
+
+    Bounded by the number of games (LRU). Layouts are only ever a hint: Rom.render re-validates every block.
+    Builds run on compile worker threads, so access is locked.
+    """
+
+    def __init__(self, max_games: int):
+        self.max_games = max_games
+        self._layouts: OrderedDict[tuple[uuid.UUID, uuid.UUID | None], RomLayout] = OrderedDict()
+        self._lock = threading.Lock()
+        self.blocks_reused = 0
+        self.blocks_rendered = 0
+
+    def get(self, game_id: uuid.UUID, scene_id: uuid.UUID | None = None) -> RomLayout | None:
+        with self._lock:
+            layout = self._layouts.get((game_id, scene_id))
+            if layout is not None:
+                self._layouts.move_to_end((game_id, scene_id))
+            return layout
+
+    def put(self, game_id: uuid.UUID, layout: RomLayout, scene_id: uuid.UUID | None = None) -> None:
+        with self._lock:
+            self._layouts[(game_id, scene_id)] = layout
+            self._layouts.move_to_end((game_id, scene_id))
+            self.blocks_reused += layout.blocks_reused
+            self.blocks_rendered += layout.blocks_rendered
+            while len(self._layouts) > self.max_games:
+                self._layouts.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._layouts)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._layouts.clear()
+
+    def stats(self) -> RomLayoutCacheStats:
+        return RomLayoutCacheStats(
+            entries=len(self._layouts),
+            blocks_reused=self.blocks_reused,
+            blocks_rendered=self.blocks_rendered,
+        )
+
+
+@dataclass
+class RomHistoryStats:
+    games: int
+    entries: int
+    size_bytes: int
+    hits: int
+    misses: int
+
+
+class RomHistory:
+    """
+    The last few ROM images built for each game, by cache key, so a client's current ROM can be diffed against.
+
+    Unlike the ROM cache, entries of one game are only displaced by newer builds of that same game, or when the
+    whole game falls out of the max_games most recently built. Images are immutable, so an image held in both
+    places is stored once. Builds are kept by cache key, which covers the build options, so builds of the same
+    revision with different ROM settings are told apart.
+    """
+
+    def __init__(self, max_per_game: int, max_games: int):
+        self.max_per_game = max_per_game
+        self.max_games = max_games
+        self._builds: OrderedDict[uuid.UUID, OrderedDict[str, RomImage]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, game_id: uuid.UUID, key: str, rom: RomImage) -> None:
+        builds = self._builds.setdefault(game_id, OrderedDict())
+        self._builds.move_to_end(game_id)
+        builds[key] = rom
+        builds.move_to_end(key)
+        while len(builds) > self.max_per_game:
+            builds.popitem(last=False)
+        while len(self._builds) > self.max_games:
+            self._builds.popitem(last=False)
+
+    def get(self, game_id: uuid.UUID, key: str) -> RomImage | None:
+        rom = self._builds.get(game_id, {}).get(key)
+        if rom is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return rom
+
+    def clear(self) -> None:
+        self._builds.clear()
+
+    def stats(self) -> RomHistoryStats:
+        return RomHistoryStats(
+            games=len(self._builds),
+            entries=sum(len(builds) for builds in self._builds.values()),
+            size_bytes=sum(len(rom) for builds in self._builds.values() for rom in builds.values()),
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+
+rom_cache = RomCache(max_entries=settings.ROM_CACHE_MAX_ENTRIES, max_bytes=settings.ROM_CACHE_MAX_BYTES)
+rom_layout_cache = RomLayoutCache(max_games=settings.ROM_LAYOUT_CACHE_MAX_GAMES)
+rom_history = RomHistory(max_per_game=settings.ROM_HISTORY_PER_GAME, max_games=settings.ROM_HISTORY_MAX_GAMES)
+
+
+def get_rom_cache() -> RomCache:
+    return rom_cache
+
+
+def get_rom_layout_cache() -> RomLayoutCache:
+    return rom_layout_cache
+
+
+def get_rom_history() -> RomHistory:
+    return rom_history
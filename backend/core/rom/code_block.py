@@ -1,9 +1,12 @@
 import enum
 from abc import abstractmethod
 from dataclasses import dataclass
+from typing import ClassVar
 import uuid
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+
+from core.rom.asm import Asm6502, ObjectCode
 
 
 class CodeBlockType(enum.Enum):
@@ -30,15 +33,20 @@ class CodeBlockType(enum.Enum):
 class RenderedCodeBlock:
     """
     Given a fixed start offset, the literal code plus a mapping of exported names to absolute addresses.
+
+    Blocks assembled with Asm6502 also keep the object code the bytes were linked from, for cycle analysis.
     """
 
     code: bytes
     exported_labels: dict[str, int]
+    object_code: ObjectCode | None = None
 
 
 class CodeBlock(BaseModel):
     label: str
     type: CodeBlockType
+    # Set on data blocks whose rendered bytes never depend on start_offset: the ROM stores identical ones once
+    position_independent: ClassVar[bool] = False
 
     @property
     @abstractmethod
@@ -55,6 +63,45 @@ class CodeBlock(BaseModel):
         """Optional dependencies that are added if available but don't cause failure if missing."""
         return []
 
+    @property
+    def switched_dependencies(self) -> list[str]:
+        """Dependencies the block only reads after mapping in their PRG bank (see switch_bank): they may be banked."""
+        return []
+
     @abstractmethod
     def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
         pass
+
+
+class AssembledCodeBlock(CodeBlock):
+    """
+    A code block generated with Asm6502.
+
+    The code is assembled once per set of present optional dependencies, with symbolic operands left as
+    relocations. size reads the length of that object code, and render() only links it at an address.
+    """
+
+    _object_code_cache: dict[frozenset[str], ObjectCode] = PrivateAttr(default_factory=dict)
+
+    @abstractmethod
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
+        """Emit the block's code. optional holds the optional dependencies that will be linked in."""
+        pass
+
+    def object_code(self, optional: frozenset[str] | None = None) -> ObjectCode:
+        """The assembled object code (worst case: all optional dependencies present)."""
+        if optional is None:
+            optional = frozenset(self.optional_dependencies)
+        if optional not in self._object_code_cache:
+            self._object_code_cache[optional] = self._build_code(optional).assemble()
+        return self._object_code_cache[optional]
+
+    @property
+    def size(self) -> int:
+        return len(self.object_code())
+
+    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
+        optional = frozenset(label for label in self.optional_dependencies if label in names)
+        object_code = self.object_code(optional)
+        code = object_code.link(start_offset, names)
+        return RenderedCodeBlock(code=code, exported_labels={self.label: start_offset}, object_code=object_code)
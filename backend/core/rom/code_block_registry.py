@@ -4,31 +4,11 @@ from api.games.models import Game
 from core.rom.code_block import CodeBlock, CodeBlockType
 from core.rom.data import EntityData, PaletteData, SpriteSetCHRData
 from core.rom.label_registry import LabelRegistry
-from core.rom.subroutines import (
-    LoadSceneSubroutine,
-    RenderEntitiesSubroutine,
-    RenderSpritesBlock,
-    UpdateHandler,
-    VBlankHandler,
-)
-from core.rom.zero_page import ZeroPageSource1, ZeroPageSource2, ZeroPageEntityRAM, ZeroPageSpriteRAM
+from core.rom.runtime import runtime_library
 from core.schemas import AssetType
 
-DEFAULT_REGISTRY = {
-    # Zero page
-    "zp__src1": ZeroPageSource1(),
-    "zp__src2": ZeroPageSource2(),
-    "zp__entity_ram_page": ZeroPageEntityRAM(),
-    "zp__sprite_ram_page": ZeroPageSpriteRAM(),
-    # Subroutines
-    "load_scene": LoadSceneSubroutine(),
-    "render_entities": RenderEntitiesSubroutine(),
-    # VBlank code blocks
-    "render_sprites": RenderSpritesBlock(),
-    # Handlers (always included)
-    "vblank_handler": VBlankHandler(),
-    "update_handler": UpdateHandler(),
-}
+# The built-in runtime, assembled once per process (see core.rom.runtime)
+DEFAULT_REGISTRY = runtime_library.code_blocks
 
 
 class CodeBlockRegistry:
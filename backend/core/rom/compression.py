@@ -0,0 +1,302 @@
+"""
+Compressed data blocks and the formats unpack_data decodes on the cartridge.
+
+A packed stream starts with a method byte:
+  stored: a length byte, then that many bytes
+  rle:    tokens until a 0 byte; 1-127 is a literal run of that many bytes, 128-255 repeats the next byte
+          (token - 126) times
+  lz:     tokens until a 0 byte; 1-127 is a literal run of that many bytes, 128-255 copies (token - 125) bytes
+          from an offset in the output, given by the next byte
+
+Data unpacks into one RAM page and unpack_data reads streams of at most one page, so data may be at most
+MAX_UNPACKED_SIZE bytes and only pack() streams (never longer than storing) are guaranteed to unpack on the
+cartridge. PackedData keeps whichever method gives the smallest stream for its data, and packed_data_reports
+measures what unpacking each stream costs.
+
+On ROMs with CHR RAM, PackedChrData stores a CHR block's tiles as an rle stream of any length, which upload_chr
+writes straight to pattern memory.
+"""
+
+import enum
+from dataclasses import dataclass
+from typing import ClassVar
+
+from core.rom.code_block import CodeBlock, CodeBlockType, RenderedCodeBlock
+from core.rom.cpu import Cpu6502
+from core.rom.rom import CHR_TILE_SIZE, INES_HEADER_SIZE, PRG_ROM_START, RomImage, RomLayout
+from core.rom.runner import NesBus, PpuStub
+
+UNPACK_BUFFER_PAGE = 0x05  # $0500-$05FF
+# unpack_data indexes the stream with Y: stored data plus its method and length bytes must fit in 256 bytes
+MAX_UNPACKED_SIZE = 254
+
+_MAX_LITERAL = 127
+_MIN_RUN = 3
+_MAX_RUN = 129
+_MIN_MATCH = 3
+_MAX_MATCH = 130
+
+
+class PackMethod(enum.IntEnum):
+    """The method byte a packed stream starts with."""
+
+    STORED = 0
+    RLE = 1
+    LZ = 2
+
+
+class _Tokens:
+    """Collects tokens, merging consecutive literal bytes into literal runs."""
+
+    def __init__(self):
+        self.stream = bytearray()
+        self.literals = bytearray()
+
+    def literal(self, value: int) -> None:
+        self.literals.append(value)
+        if len(self.literals) == _MAX_LITERAL:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.literals:
+            self.stream.append(len(self.literals))
+            self.stream += self.literals
+            self.literals.clear()
+
+    def end(self) -> bytes:
+        self.flush()
+        self.stream.append(0)
+        return bytes(self.stream)
+
+
+def _check_size(data: bytes) -> None:
+    if len(data) > MAX_UNPACKED_SIZE:
+        raise ValueError(f"Packed data unpacks to at most {MAX_UNPACKED_SIZE} bytes, got {len(data)}.")
+
+
+def rle_compress(data: bytes) -> bytes:
+    """Encode data as an rle stream (without the method byte). Runs shorter than 3 bytes stay literals."""
+    _check_size(data)
+    return _rle_tokens(data)
+
+
+def _rle_tokens(data: bytes) -> bytes:
+    tokens = _Tokens()
+    i = 0
+    while i < len(data):
+        run = 1
+        while i + run < len(data) and run < _MAX_RUN and data[i + run] == data[i]:
+            run += 1
+        if run >= _MIN_RUN:
+            tokens.flush()
+            tokens.stream += bytes([0x80 | (run - _MIN_RUN + 1), data[i]])
+            i += run
+        else:
+            tokens.literal(data[i])
+            i += 1
+    return tokens.end()
+
+
+def lz_compress(data: bytes) -> bytes:
+    """
+    Encode data as an lz stream (without the method byte), greedily taking the longest earlier match.
+
+    A match may overlap the bytes it produces, so it also covers runs.
+    """
+    _check_size(data)
+    tokens = _Tokens()
+    i = 0
+    while i < len(data):
+        best_length, best_offset = 0, 0
+        for offset in range(i):
+            length = 0
+            while i + length < len(data) and length < _MAX_MATCH and data[offset + length] == data[i + length]:
+                length += 1
+            if length > best_length:
+                best_length, best_offset = length, offset
+        if best_length >= _MIN_MATCH:
+            tokens.flush()
+            tokens.stream += bytes([0x80 | (best_length - _MIN_MATCH), best_offset])
+            i += best_length
+        else:
+            tokens.literal(data[i])
+            i += 1
+    return tokens.end()
+
+
+def pack(data: bytes) -> bytes:
+    """The smallest packed stream of data; on a tie the method that is cheaper to unpack."""
+    _check_size(data)
+    candidates = [
+        bytes([PackMethod.STORED, len(data)]) + data,
+        bytes([PackMethod.RLE]) + rle_compress(data),
+        bytes([PackMethod.LZ]) + lz_compress(data),
+    ]
+    return min(candidates, key=len)
+
+
+def unpack(stream: bytes) -> bytes:
+    """Decode a packed stream, as unpack_data does on the cartridge."""
+    method, position = stream[0], 1
+    if method == PackMethod.STORED:
+        return bytes(stream[2 : 2 + stream[1]])
+
+    output = bytearray()
+    while token := stream[position]:
+        position += 1
+        if token < 0x80:
+            output += stream[position : position + token]
+            position += token
+        elif method == PackMethod.RLE:
+            output += bytes([stream[position]]) * (token - 0x80 + _MIN_RUN - 1)
+            position += 1
+        else:
+            offset = stream[position]
+            position += 1
+            for i in range(token - 0x80 + _MIN_MATCH):
+                output.append(output[offset + i])
+    return bytes(output)
+
+
+class PackedData(CodeBlock):
+    """
+    A packed data code block.
+
+    - wraps a position-independent data block and stores it packed under the wrapped block's label
+    - code that reads the data calls unpack_data first, which unpacks it into RAM ($0500) and points zp__src1 at it
+    - the data must fit the unpack buffer: render raises ValueError for more than MAX_UNPACKED_SIZE bytes, so
+      callers check fits() and store larger blocks as they are
+    """
+
+    type: CodeBlockType = CodeBlockType.DATA
+    inner: CodeBlock
+    position_independent: ClassVar[bool] = True
+
+    @classmethod
+    def wrap(cls, block: CodeBlock) -> "PackedData":
+        if not block.position_independent:
+            raise ValueError(f"Code block '{block.label}' depends on its address and cannot be packed.")
+        return cls(label=block.label, inner=block)
+
+    @staticmethod
+    def fits(block: CodeBlock) -> bool:
+        """Whether a block is small enough to unpack into the unpack buffer."""
+        return block.size <= MAX_UNPACKED_SIZE
+
+    @property
+    def dependencies(self) -> list[str]:
+        return [*self.inner.dependencies, "unpack_data"]
+
+    @property
+    def size(self) -> int:
+        # Storing never takes more than the method and length bytes
+        return self.inner.size + 2
+
+    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
+        data = self.inner.render(start_offset, names).code
+        if len(data) > MAX_UNPACKED_SIZE:
+            raise ValueError(
+                f"Code block '{self.label}' is {len(data)} bytes; packed data unpacks to at most "
+                f"{MAX_UNPACKED_SIZE} bytes."
+            )
+        return RenderedCodeBlock(code=pack(bytes(data)), exported_labels={self.label: start_offset})
+
+
+def chr_upload_label(label: str) -> str:
+    """The label of the PackedChrData block that uploads the tiles of CHR block label."""
+    return f"{label}__upload"
+
+
+class PackedChrData(CodeBlock):
+    """
+    A packed CHR upload code block, for ROMs with CHR RAM.
+
+    - wraps a CHR block and stores its tiles rle packed in PRG ROM, after the PPU address of the block's first tile
+      in pattern memory (2 bytes, high byte first)
+    - load_scene passes it to upload_chr, which writes the tiles through PPUDATA. lz is not used: its matches copy
+      from the unpacked output, and pattern memory cannot be read back while it is being written
+    """
+
+    type: CodeBlockType = CodeBlockType.DATA
+    inner: CodeBlock
+    position_independent: ClassVar[bool] = True
+
+    @classmethod
+    def wrap(cls, block: CodeBlock) -> "PackedChrData":
+        if block.type != CodeBlockType.CHR:
+            raise ValueError(f"Code block '{block.label}' is not CHR data.")
+        return cls(label=chr_upload_label(block.label), inner=block)
+
+    @property
+    def dependencies(self) -> list[str]:
+        return [self.inner.label, "upload_chr"]
+
+    @property
+    def size(self) -> int:
+        # The address, literal runs of at most 127 bytes (a run token always saves a byte) and the end token
+        return 2 + self.inner.size + self.inner.size // _MAX_LITERAL + 2
+
+    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
+        address = names[self.inner.label] * CHR_TILE_SIZE
+        data = bytes(self.inner.render(0, names).code)
+        code = address.to_bytes(2, "big") + _rle_tokens(data)
+        return RenderedCodeBlock(code=code, exported_labels={self.label: start_offset})
+
+
+@dataclass
+class PackedDataReport:
+    """What packing saved on one packed data block, and the cycles unpack_data took to unpack it."""
+
+    label: str
+    method: PackMethod
+    raw_size: int
+    packed_size: int
+    unpack_cycles: int
+
+
+def packed_data_reports(rom: RomImage, layout: RomLayout) -> list[PackedDataReport]:
+    """
+    Report every PackedData block of a render, in ROM order.
+
+    The cycles are measured by running the render's unpack_data on the built-in 6502 core, from the JSR's target to
+    its RTS inclusive.
+    """
+    rom = bytes(rom)
+    prg_rom = rom[INES_HEADER_SIZE : INES_HEADER_SIZE + rom[4] * 0x4000]
+    mapper = (rom[6] >> 4) | (rom[7] & 0xF0)
+    reports = []
+    for label, record in layout.records.items():
+        if not isinstance(record.block, PackedData):
+            continue
+        stream = bytes(record.rendered.code)
+        address = layout.data_aliases.get(label, record.start_offset)
+        bank = layout.banks.bank_of.get(label, 0) if layout.banks is not None else 0
+        cycles = _unpack_cycles(NesBus(prg_rom, PpuStub(), mapper=mapper), bank, layout, address)
+        reports.append(
+            PackedDataReport(
+                label=label,
+                method=PackMethod(stream[0]),
+                raw_size=len(unpack(stream)),
+                packed_size=len(stream),
+                unpack_cycles=cycles,
+            )
+        )
+    return reports
+
+
+def _unpack_cycles(bus: NesBus, bank: int, layout: RomLayout, address: int) -> int:
+    bus.switch_bank(bank)
+    cpu = Cpu6502(bus)
+    src1 = layout.zero_page.addresses["zp__src1"]
+    bus.ram[src1 : src1 + 2] = address.to_bytes(2, "little")
+    # Call unpack_data from a JSR placed at the top of RAM, so that the return lands at a known address
+    caller = 0x07FD
+    bus.ram[caller : caller + 3] = bytes([0x20]) + layout.records["unpack_data"].start_offset.to_bytes(2, "little")
+    cpu.pc = caller
+    cpu.step()
+    cycles = 0
+    while cpu.pc != caller + 3:
+        if cpu.pc < PRG_ROM_START:
+            raise RuntimeError(f"unpack_data left PRG ROM at ${cpu.pc:04X}.")
+        cycles += cpu.step()
+    return cycles
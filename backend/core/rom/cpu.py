@@ -0,0 +1,471 @@
+"""
+A table-dispatched 6502 core (the NES 2A03 variant: no decimal mode), for running generated code headlessly.
+
+Instruction-accurate, not cycle-accurate: each step executes one whole instruction and returns its cycle cost,
+including page-crossing and branch penalties.
+"""
+
+from collections.abc import Callable
+from typing import Protocol
+
+from core.rom.opcodes import OPCODES, AddressingMode
+
+NMI_VECTOR = 0xFFFA
+RESET_VECTOR = 0xFFFC
+IRQ_VECTOR = 0xFFFE
+
+STACK_PAGE = 0x0100
+INTERRUPT_CYCLES = 7
+
+
+class Bus(Protocol):
+    def read(self, address: int) -> int: ...
+
+    def write(self, address: int, value: int) -> None: ...
+
+
+class UnknownOpcodeError(Exception):
+    """Raised when the CPU fetches an opcode outside the official instruction set."""
+
+
+class Cpu6502:
+    """
+    6502 registers and flags plus a 256-entry dispatch table of (operation, addressing mode, cycles, page penalty).
+
+    - step() executes one instruction and returns the cycles it took
+    - nmi() services a non-maskable interrupt and returns its cycles
+    - idle is set when the last instruction was a jump to itself, i.e. the CPU waits for an interrupt
+    """
+
+    def __init__(self, bus: Bus):
+        self.bus = bus
+        # Bound once: memory access is the hottest path
+        self._read = bus.read
+        self._write = bus.write
+        self.a = 0
+        self.x = 0
+        self.y = 0
+        self.sp = 0xFD
+        self.pc = 0
+        # Flags are kept unpacked; status() packs them into the P register
+        self.c = 0
+        self.z = 0
+        self.i = 1
+        self.d = 0
+        self.v = 0
+        self.n = 0
+        self.idle = False
+        self.opcode = 0
+        self.instructions = 0
+        self._crossed = False
+        self._table = self._build_table()
+
+    def _build_table(self) -> list[tuple[Callable[[int | None], int], Callable[[], int | None], int, bool] | None]:
+        modes = {
+            AddressingMode.IMPLIED: self._implied,
+            AddressingMode.ACCUMULATOR: self._implied,
+            AddressingMode.IMMEDIATE: self._immediate,
+            AddressingMode.ZEROPAGE: self._zeropage,
+            AddressingMode.ZEROPAGE_X: self._zeropage_x,
+            AddressingMode.ZEROPAGE_Y: self._zeropage_y,
+            AddressingMode.ABSOLUTE: self._absolute,
+            AddressingMode.ABSOLUTE_X: self._absolute_x,
+            AddressingMode.ABSOLUTE_Y: self._absolute_y,
+            AddressingMode.INDIRECT: self._indirect,
+            AddressingMode.INDEXED_INDIRECT: self._indexed_indirect,
+            AddressingMode.INDIRECT_INDEXED: self._indirect_indexed,
+            AddressingMode.RELATIVE: self._relative,
+        }
+        table: list = [None] * 256
+        for opcode in OPCODES.values():
+            operation = getattr(self, f"_op_{opcode.mnemonic.lower()}")
+            table[opcode.opcode] = (operation, modes[opcode.mode], opcode.cycles, opcode.page_penalty)
+        return table
+
+    # ===== Execution =====
+
+    def reset(self) -> None:
+        self.sp = 0xFD
+        self.i = 1
+        self.idle = False
+        self.pc = self._read_word(RESET_VECTOR)
+
+    def step(self) -> int:
+        """Execute one instruction and return its cycle count."""
+        pc = self.pc
+        opcode = self._read(pc)
+        entry = self._table[opcode]
+        if entry is None:
+            raise UnknownOpcodeError(f"Unknown opcode ${opcode:02X} at ${pc:04X}.")
+        operation, mode, cycles, page_penalty = entry
+        self.opcode = opcode
+        self.pc = (pc + 1) & 0xFFFF
+        self._crossed = False
+        cycles += operation(mode())
+        self.instructions += 1
+        self.idle = opcode == 0x4C and self.pc == pc
+        return cycles + (page_penalty and self._crossed)
+
+    def nmi(self) -> int:
+        """Service a non-maskable interrupt and return its cycle count."""
+        self._interrupt(NMI_VECTOR, brk=False)
+        return INTERRUPT_CYCLES
+
+    def _interrupt(self, vector: int, brk: bool) -> None:
+        self._push(self.pc >> 8)
+        self._push(self.pc & 0xFF)
+        self._push(self.status(brk=brk))
+        self.i = 1
+        self.idle = False
+        self.pc = self._read_word(vector)
+
+    def status(self, brk: bool = False) -> int:
+        """The packed P register (bit 5 always set; bit 4 only as pushed by BRK/PHP)."""
+        return self.n << 7 | self.v << 6 | 0x20 | brk << 4 | self.d << 3 | self.i << 2 | self.z << 1 | self.c
+
+    def _set_status(self, value: int) -> None:
+        self.n = value >> 7 & 1
+        self.v = value >> 6 & 1
+        self.d = value >> 3 & 1
+        self.i = value >> 2 & 1
+        self.z = value >> 1 & 1
+        self.c = value & 1
+
+    # ===== Memory helpers =====
+
+    def _read_word(self, address: int) -> int:
+        return self._read(address) | self._read((address + 1) & 0xFFFF) << 8
+
+    def _read_zp_word(self, address: int) -> int:
+        return self._read(address) | self._read((address + 1) & 0xFF) << 8
+
+    def _push(self, value: int) -> None:
+        self._write(STACK_PAGE | self.sp, value)
+        self.sp = (self.sp - 1) & 0xFF
+
+    def _pull(self) -> int:
+        self.sp = (self.sp + 1) & 0xFF
+        return self._read(STACK_PAGE | self.sp)
+
+    def _set_nz(self, value: int) -> int:
+        self.z = value == 0
+        self.n = value >> 7
+        return value
+
+    # ===== Addressing modes: return the effective address (None for implied/accumulator) =====
+
+    def _implied(self) -> None:
+        return None
+
+    def _immediate(self) -> int:
+        address = self.pc
+        self.pc = (address + 1) & 0xFFFF
+        return address
+
+    def _zeropage(self) -> int:
+        address = self._read(self.pc)
+        self.pc = (self.pc + 1) & 0xFFFF
+        return address
+
+    def _zeropage_x(self) -> int:
+        return (self._zeropage() + self.x) & 0xFF
+
+    def _zeropage_y(self) -> int:
+        return (self._zeropage() + self.y) & 0xFF
+
+    def _absolute(self) -> int:
+        address = self._read_word(self.pc)
+        self.pc = (self.pc + 2) & 0xFFFF
+        return address
+
+    def _absolute_x(self) -> int:
+        base = self._absolute()
+        address = (base + self.x) & 0xFFFF
+        self._crossed = (base ^ address) > 0xFF
+        return address
+
+    def _absolute_y(self) -> int:
+        base = self._absolute()
+        address = (base + self.y) & 0xFFFF
+        self._crossed = (base ^ address) > 0xFF
+        return address
+
+    def _indirect(self) -> int:
+        pointer = self._absolute()
+        # The 6502 does not carry into the high byte when the pointer sits at the end of a page
+        high = (pointer & 0xFF00) | ((pointer + 1) & 0xFF)
+        return self._read(pointer) | self._read(high) << 8
+
+    def _indexed_indirect(self) -> int:
+        return self._read_zp_word((self._zeropage() + self.x) & 0xFF)
+
+    def _indirect_indexed(self) -> int:
+        base = self._read_zp_word(self._zeropage())
+        address = (base + self.y) & 0xFFFF
+        self._crossed = (base ^ address) > 0xFF
+        return address
+
+    def _relative(self) -> int:
+        offset = self._read(self.pc)
+        self.pc = (self.pc + 1) & 0xFFFF
+        return (self.pc + offset - (offset & 0x80) * 2) & 0xFFFF
+
+    # ===== Operations: return extra cycles (branches only) =====
+
+    def _branch(self, condition: bool, target: int) -> int:
+        if not condition:
+            return 0
+        extra = 1 + ((self.pc ^ target) > 0xFF)
+        self.pc = target
+        return extra
+
+    def _compare(self, register: int, address: int) -> int:
+        value = self._read(address)
+        self.c = register >= value
+        self._set_nz((register - value) & 0xFF)
+        return 0
+
+    def _add(self, value: int) -> None:
+        total = self.a + value + self.c
+        self.v = ((self.a ^ total) & (value ^ total) & 0x80) != 0
+        self.c = total > 0xFF
+        self.a = self._set_nz(total & 0xFF)
+
+    def _modify(self, address: int | None, operation: Callable[[int], int]) -> int:
+        if address is None:
+            self.a = self._set_nz(operation(self.a))
+        else:
+            self._write(address, self._set_nz(operation(self._read(address))))
+        return 0
+
+    def _op_lda(self, address: int) -> int:
+        self.a = self._set_nz(self._read(address))
+        return 0
+
+    def _op_ldx(self, address: int) -> int:
+        self.x = self._set_nz(self._read(address))
+        return 0
+
+    def _op_ldy(self, address: int) -> int:
+        self.y = self._set_nz(self._read(address))
+        return 0
+
+    def _op_sta(self, address: int) -> int:
+        self._write(address, self.a)
+        return 0
+
+    def _op_stx(self, address: int) -> int:
+        self._write(address, self.x)
+        return 0
+
+    def _op_sty(self, address: int) -> int:
+        self._write(address, self.y)
+        return 0
+
+    def _op_ora(self, address: int) -> int:
+        self.a = self._set_nz(self.a | self._read(address))
+        return 0
+
+    def _op_and(self, address: int) -> int:
+        self.a = self._set_nz(self.a & self._read(address))
+        return 0
+
+    def _op_eor(self, address: int) -> int:
+        self.a = self._set_nz(self.a ^ self._read(address))
+        return 0
+
+    def _op_adc(self, address: int) -> int:
+        self._add(self._read(address))
+        return 0
+
+    def _op_sbc(self, address: int) -> int:
+        self._add(self._read(address) ^ 0xFF)
+        return 0
+
+    def _op_cmp(self, address: int) -> int:
+        return self._compare(self.a, address)
+
+    def _op_cpx(self, address: int) -> int:
+        return self._compare(self.x, address)
+
+    def _op_cpy(self, address: int) -> int:
+        return self._compare(self.y, address)
+
+    def _op_bit(self, address: int) -> int:
+        value = self._read(address)
+        self.z = (self.a & value) == 0
+        self.n = value >> 7 & 1
+        self.v = value >> 6 & 1
+        return 0
+
+    def _op_asl(self, address: int | None) -> int:
+        def asl(value: int) -> int:
+            self.c = value >> 7
+            return (value << 1) & 0xFF
+
+        return self._modify(address, asl)
+
+    def _op_lsr(self, address: int | None) -> int:
+        def lsr(value: int) -> int:
+            self.c = value & 1
+            return value >> 1
+
+        return self._modify(address, lsr)
+
+    def _op_rol(self, address: int | None) -> int:
+        def rol(value: int) -> int:
+            carry, self.c = self.c, value >> 7
+            return (value << 1 | carry) & 0xFF
+
+        return self._modify(address, rol)
+
+    def _op_ror(self, address: int | None) -> int:
+        def ror(value: int) -> int:
+            carry, self.c = self.c, value & 1
+            return value >> 1 | carry << 7
+
+        return self._modify(address, ror)
+
+    def _op_inc(self, address: int) -> int:
+        return self._modify(address, lambda value: (value + 1) & 0xFF)
+
+    def _op_dec(self, address: int) -> int:
+        return self._modify(address, lambda value: (value - 1) & 0xFF)
+
+    def _op_inx(self, address: None) -> int:
+        self.x = self._set_nz((self.x + 1) & 0xFF)
+        return 0
+
+    def _op_iny(self, address: None) -> int:
+        self.y = self._set_nz((self.y + 1) & 0xFF)
+        return 0
+
+    def _op_dex(self, address: None) -> int:
+        self.x = self._set_nz((self.x - 1) & 0xFF)
+        return 0
+
+    def _op_dey(self, address: None) -> int:
+        self.y = self._set_nz((self.y - 1) & 0xFF)
+        return 0
+
+    def _op_tax(self, address: None) -> int:
+        self.x = self._set_nz(self.a)
+        return 0
+
+    def _op_tay(self, address: None) -> int:
+        self.y = self._set_nz(self.a)
+        return 0
+
+    def _op_txa(self, address: None) -> int:
+        self.a = self._set_nz(self.x)
+        return 0
+
+    def _op_tya(self, address: None) -> int:
+        self.a = self._set_nz(self.y)
+        return 0
+
+    def _op_tsx(self, address: None) -> int:
+        self.x = self._set_nz(self.sp)
+        return 0
+
+    def _op_txs(self, address: None) -> int:
+        self.sp = self.x
+        return 0
+
+    def _op_pha(self, address: None) -> int:
+        self._push(self.a)
+        return 0
+
+    def _op_php(self, address: None) -> int:
+        self._push(self.status(brk=True))
+        return 0
+
+    def _op_pla(self, address: None) -> int:
+        self.a = self._set_nz(self._pull())
+        return 0
+
+    def _op_plp(self, address: None) -> int:
+        self._set_status(self._pull())
+        return 0
+
+    def _op_jmp(self, address: int) -> int:
+        self.pc = address
+        return 0
+
+    def _op_jsr(self, address: int) -> int:
+        return_address = (self.pc - 1) & 0xFFFF
+        self._push(return_address >> 8)
+        self._push(return_address & 0xFF)
+        self.pc = address
+        return 0
+
+    def _op_rts(self, address: None) -> int:
+        low = self._pull()
+        self.pc = ((self._pull() << 8 | low) + 1) & 0xFFFF
+        return 0
+
+    def _op_rti(self, address: None) -> int:
+        self._set_status(self._pull())
+        low = self._pull()
+        self.pc = self._pull() << 8 | low
+        return 0
+
+    def _op_brk(self, address: None) -> int:
+        self.pc = (self.pc + 1) & 0xFFFF
+        self._interrupt(IRQ_VECTOR, brk=True)
+        return 0
+
+    def _op_bpl(self, target: int) -> int:
+        return self._branch(not self.n, target)
+
+    def _op_bmi(self, target: int) -> int:
+        return self._branch(self.n, target)
+
+    def _op_bvc(self, target: int) -> int:
+        return self._branch(not self.v, target)
+
+    def _op_bvs(self, target: int) -> int:
+        return self._branch(self.v, target)
+
+    def _op_bcc(self, target: int) -> int:
+        return self._branch(not self.c, target)
+
+    def _op_bcs(self, target: int) -> int:
+        return self._branch(self.c, target)
+
+    def _op_bne(self, target: int) -> int:
+        return self._branch(not self.z, target)
+
+    def _op_beq(self, target: int) -> int:
+        return self._branch(self.z, target)
+
+    def _op_clc(self, address: None) -> int:
+        self.c = 0
+        return 0
+
+    def _op_sec(self, address: None) -> int:
+        self.c = 1
+        return 0
+
+    def _op_cli(self, address: None) -> int:
+        self.i = 0
+        return 0
+
+    def _op_sei(self, address: None) -> int:
+        self.i = 1
+        return 0
+
+    def _op_clv(self, address: None) -> int:
+        self.v = 0
+        return 0
+
+    def _op_cld(self, address: None) -> int:
+        self.d = 0
+        return 0
+
+    def _op_sed(self, address: None) -> int:
+        self.d = 1
+        return 0
+
+    def _op_nop(self, address: None) -> int:
+        return 0
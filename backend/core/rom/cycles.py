@@ -0,0 +1,167 @@
+"""
+Static worst-case cycle counts for assembled code.
+
+The analysis runs on linked code (ObjectCode instructions plus the bytes they were linked to), so branch
+page-crossing penalties are exact; indexed reads are assumed to cross a page unless their base is page-aligned.
+Forward branches take the costlier side, every loop must carry an iteration bound (see Asm6502.label), subroutine
+calls add the cost of the callee and a jump to itself (Asm6502.loop_forever) ends the code, as the CPU is then
+idle until the next interrupt.
+"""
+
+from collections.abc import Callable
+
+from core.rom.asm import ObjectCode
+from core.rom.opcodes import AddressingMode, Opcode
+
+# NTSC timing: 262 scanlines of 341 PPU dots, 3 dots per CPU cycle
+CYCLES_PER_FRAME = 29781
+# VBlank lasts from the NMI (scanline 241) to the pre-render line (scanline 261): 20 scanlines
+VBLANK_CYCLES = 2273
+OAM_DMA_CYCLES = 513
+# Pushing PC and P and fetching the NMI vector
+NMI_CYCLES = 7
+
+OAM_DMA = 0x4014
+
+_STORES = ("STA", "STX", "STY")
+_RETURNS = ("RTS", "RTI", "BRK")
+_ABSOLUTE_INDEXED = (AddressingMode.ABSOLUTE_X, AddressingMode.ABSOLUTE_Y)
+
+
+class CycleAnalysisError(ValueError):
+    """Raised when code cannot be bounded statically, e.g. a loop without an iteration bound."""
+
+
+class VBlankOverrunError(ValueError):
+    """Raised when the NMI's VBlank work can run past the end of VBlank."""
+
+
+class _Analysis:
+    def __init__(self, object_code: ObjectCode, code: bytes, start_offset: int, callee_cycles: Callable[[int], int]):
+        self.code = code
+        self.start_offset = start_offset
+        self.callee_cycles = callee_cycles
+        self.opcodes: dict[int, Opcode] = {i.offset: i.opcode for i in object_code.instructions}
+        self.offsets = [i.offset for i in object_code.instructions]
+        self.loop_bounds = object_code.loop_bounds
+        # Loop header offset -> offset of the last instruction that jumps back to it
+        self.loops: dict[int, int] = {}
+        for offset in self.offsets:
+            target = self._local_target(offset)
+            if target is not None and target <= offset:
+                self.loops[target] = max(self.loops.get(target, offset), offset)
+
+    def _word(self, offset: int) -> int:
+        return int.from_bytes(self.code[offset + 1 : offset + 3], "little")
+
+    def _branch_target(self, offset: int) -> int:
+        distance = self.code[offset + 1]
+        return offset + 2 + (distance - 0x100 if distance & 0x80 else distance)
+
+    def _local_target(self, offset: int) -> int | None:
+        """The offset a branch or JMP goes to, if it stays within the code (jumps to themselves excluded)."""
+        opcode = self.opcodes[offset]
+        if opcode.mode == AddressingMode.RELATIVE:
+            return self._branch_target(offset)
+        if opcode.mnemonic == "JMP" and opcode.mode == AddressingMode.ABSOLUTE:
+            target = self._word(offset) - self.start_offset
+            if target != offset and 0 <= target < len(self.code):
+                return target
+        return None
+
+    def cycles(self) -> int:
+        exits, end, _ = self._walk(0, self.offsets[-1] if self.offsets else -1, header=None)
+        return max(end or 0, exits.get(len(self.code), 0))
+
+    def _walk(self, first: int, last: int, header: int | None) -> tuple[dict[int, int], int | None, int | None]:
+        """
+        Longest paths through the instructions at offsets first..last, starting at first.
+
+        Inner loops are collapsed into their bounded cost. Returns the worst cost of reaching each target outside
+        the range, of ending the code (return, tail call or idle loop), and, when the range is the body of the
+        loop at header, of one pass that jumps back to the header.
+        """
+        reached = {first: 0}
+        exits: dict[int, int] = {}
+        end: int | None = None
+        back: int | None = None
+
+        def reach(source: int, target: int, cost: int) -> None:
+            nonlocal back
+            if target == header:
+                back = max(back or 0, cost)
+            elif first <= target <= source:
+                raise CycleAnalysisError(f"Jump at +{source} to +{target} is not the end of a bounded loop.")
+            elif first < target <= last:
+                reached[target] = max(reached.get(target, 0), cost)
+            else:
+                exits[target] = max(exits.get(target, 0), cost)
+
+        skip_to = first
+        for offset in self.offsets:
+            if offset < skip_to or offset > last or offset not in reached:
+                continue
+            cost = reached[offset]
+
+            if offset in self.loops and offset != header:
+                bound = self.loop_bounds.get(offset)
+                if bound is None:
+                    raise CycleAnalysisError(f"Loop at +{offset} has no iteration bound.")
+                loop_exits, loop_end, loop_back = self._walk(offset, self.loops[offset], header=offset)
+                # Every pass but the last jumps back to the header; the last one leaves the loop
+                repeated = cost + (bound - 1) * (loop_back or 0)
+                for target, exit_cost in loop_exits.items():
+                    reach(offset, target, repeated + exit_cost)
+                if loop_end is not None:
+                    end = max(end or 0, repeated + loop_end)
+                skip_to = self.loops[offset] + 1
+                continue
+
+            opcode = self.opcodes[offset]
+            cycles = opcode.cycles
+            if opcode.page_penalty and not (opcode.mode in _ABSOLUTE_INDEXED and self.code[offset + 1] == 0):
+                # An 8-bit index cannot carry a page-aligned base into the next page
+                cycles += 1
+            next_offset = offset + opcode.size
+
+            if opcode.mode == AddressingMode.RELATIVE:
+                target = self._branch_target(offset)
+                # A taken branch costs one more cycle, and another one if it lands on a different page
+                page_crossed = (self.start_offset + next_offset) >> 8 != (self.start_offset + target) >> 8
+                reach(offset, next_offset, cost + cycles)
+                reach(offset, target, cost + cycles + 1 + page_crossed)
+            elif opcode.mnemonic == "JMP":
+                if opcode.mode == AddressingMode.INDIRECT:
+                    raise CycleAnalysisError(f"Indirect jump at +{offset} cannot be followed.")
+                target = self._local_target(offset)
+                if target is not None:
+                    reach(offset, target, cost + cycles)
+                elif self._word(offset) == self.start_offset + offset:
+                    end = max(end or 0, cost + cycles)
+                else:
+                    end = max(end or 0, cost + cycles + self.callee_cycles(self._word(offset)))
+            elif opcode.mnemonic == "JSR":
+                reach(offset, next_offset, cost + cycles + self.callee_cycles(self._word(offset)))
+            elif opcode.mnemonic in _RETURNS:
+                end = max(end or 0, cost + cycles)
+            else:
+                dma = opcode.mnemonic in _STORES and opcode.mode == AddressingMode.ABSOLUTE
+                if dma and self._word(offset) == OAM_DMA:
+                    # The CPU is stalled while the DMA copies, one more cycle if it starts on an odd cycle
+                    cycles += OAM_DMA_CYCLES + 1
+                reach(offset, next_offset, cost + cycles)
+
+        return exits, end, back
+
+
+def worst_case_cycles(
+    object_code: ObjectCode, code: bytes, start_offset: int, callee_cycles: Callable[[int], int]
+) -> int:
+    """
+    The most cycles the code can take from its first instruction until it returns, falls through its end or
+    reaches an idle loop.
+
+    code is the object code linked at start_offset; callee_cycles gives the worst case of the subroutine at an
+    address (for JSR and tail calls). Raises CycleAnalysisError for unbounded loops and indirect jumps.
+    """
+    return _Analysis(object_code, code, start_offset, callee_cycles).cycles()
@@ -1,11 +1,21 @@
-from typing import Self
+from typing import ClassVar, Self
 import uuid
 from api.games.entities.models import Entity
 from api.games.scenes.models import Scene
 from core.rom.label_registry import LabelRegistry
 
+from core.rom.banks import MAX_UXROM_BANKS
 from core.rom.code_block import CodeBlock, CodeBlockType, RenderedCodeBlock
-from core.schemas import NESColor, NESEntity, NESPaletteAssetData, NESSpriteSetAssetData, NESPaletteData
+from core.rom.entity_ram import EntityField
+from core.rom.rom import TEST_TILE
+from core.schemas import (
+    ENTITY_SIZE_BYTES,
+    NESColor,
+    NESEntity,
+    NESPaletteAssetData,
+    NESSpriteSetAssetData,
+    NESPaletteData,
+)
 
 
 class AddressData(CodeBlock):
@@ -15,6 +25,7 @@ class AddressData(CodeBlock):
     - used to store 2-byte values
     """
     referenced_value_name: str
+    position_independent: ClassVar[bool] = True
 
     @classmethod
     def from_name(cls, name: str, referenced_value_name: str, registry: LabelRegistry) -> Self:
@@ -40,6 +51,50 @@ class AddressData(CodeBlock):
         return RenderedCodeBlock(code=code, exported_labels={self.label: start_offset})
 
 
+class BankTableData(CodeBlock):
+    """
+    The built-in bank table data code block.
+
+    - byte n holds n, for every UxROM bank: switch_bank writes bank n to entry n, so that the ROM byte under the
+      write agrees with the value written (UxROM boards have bus conflicts)
+    """
+    label: str = "bank_table"
+    type: CodeBlockType = CodeBlockType.DATA
+
+    @property
+    def dependencies(self) -> list[str]:
+        return []
+
+    @property
+    def size(self) -> int:
+        return MAX_UXROM_BANKS
+
+    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
+        return RenderedCodeBlock(code=bytes(range(MAX_UXROM_BANKS)), exported_labels={self.label: start_offset})
+
+
+class TestTileCHRData(CodeBlock):
+    """
+    The built-in test tile CHR data code block.
+
+    - contains the test pattern tile that the background shows; CHR ROM always starts with it, so this block is
+      only linked on ROMs with CHR RAM, where every scene uploads it (see PackedChrData)
+    """
+    label: str = "chr__test_tile"
+    type: CodeBlockType = CodeBlockType.CHR
+
+    @property
+    def dependencies(self) -> list[str]:
+        return []
+
+    @property
+    def size(self) -> int:
+        return len(TEST_TILE)
+
+    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
+        return RenderedCodeBlock(code=TEST_TILE, exported_labels={})
+
+
 class PaletteData(CodeBlock):
     """
     A palette data code block.
@@ -48,6 +103,7 @@ class PaletteData(CodeBlock):
     - can be from a component (legacy) or an asset
     """
     palette_data: NESPaletteAssetData
+    position_independent: ClassVar[bool] = True
 
     @classmethod
     def from_model(cls, id: uuid.UUID, palette_data: NESPaletteAssetData, registry: LabelRegistry) -> Self:
@@ -85,6 +141,8 @@ class SceneData(CodeBlock):
     background_palette: str | None
     sprite_palette: str | None
     entity_labels: list[str] = []
+    chr_uploads: list[str] = []
+    position_independent: ClassVar[bool] = True
 
     @classmethod
     def from_model(cls, scene: Scene, registry: LabelRegistry) -> Self:
@@ -105,6 +163,8 @@ class SceneData(CodeBlock):
             dependencies.append(self.background_palette)
         if (self.sprite_palette is not None):
             dependencies.append(self.sprite_palette)
+        # Uploads first, so that the test tile every scene uploads is the first CHR block laid out
+        dependencies.extend(self.chr_uploads)
         dependencies.extend(self.entity_labels)
         return dependencies
 
@@ -117,8 +177,10 @@ class SceneData(CodeBlock):
         - 2 bytes for sprite palette address
         - 2 bytes per entity address
         - 2 bytes for null terminator (0x0000)
+        - with CHR RAM, 2 bytes per packed tile upload address (see PackedChrData) and a null terminator
         """
-        return 1 + 2 + 2 + (len(self.entity_labels) * 2) + 2
+        uploads_size = len(self.chr_uploads) * 2 + 2 if self.chr_uploads else 0
+        return 1 + 2 + 2 + (len(self.entity_labels) * 2) + 2 + uploads_size
 
     def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
         code = bytearray()
@@ -146,6 +208,12 @@ class SceneData(CodeBlock):
         # Null terminator (0x0000)
         code.extend((0).to_bytes(2, "little"))
 
+        # Packed tile upload addresses (null-terminated array), only on ROMs with CHR RAM
+        if self.chr_uploads:
+            for upload_label in self.chr_uploads:
+                code.extend(names[upload_label].to_bytes(2, "little"))
+            code.extend((0).to_bytes(2, "little"))
+
         return RenderedCodeBlock(code=bytes(code), exported_labels={self.label: start_offset})
 
 
@@ -158,6 +226,7 @@ class EntityData(CodeBlock):
     entity_data: NESEntity
     spriteset_label: str | None = None
     palette_index: int = 0
+    position_independent: ClassVar[bool] = True
 
     @classmethod
     def from_model(cls, entity: Entity, registry: LabelRegistry) -> Self:
@@ -188,25 +257,26 @@ class EntityData(CodeBlock):
     @property
     def size(self) -> int:
         """Entity is 4 bytes: x position + y position + spriteset idx + palette idx."""
-        return 4
+        return ENTITY_SIZE_BYTES
 
     def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
-        code = bytearray()
+        # The ROM record is the same for every entity RAM layout: load_scene reads it field by field
+        code = bytearray(ENTITY_SIZE_BYTES)
 
         # X position (byte)
-        code.append(self.entity_data.x & 0xFF)
+        code[EntityField.X] = self.entity_data.x & 0xFF
 
         # Y position (byte)
-        code.append(self.entity_data.y & 0xFF)
+        code[EntityField.Y] = self.entity_data.y & 0xFF
 
         # Sprite set index
         # The spriteset label in names dict contains the CHR tile index
         # (background pattern is at index 0, entity sprites start at index 1+)
         spriteset_index = names.get(self.spriteset_label, 0) if self.spriteset_label else 0
-        code.append(spriteset_index & 0xFF)
+        code[EntityField.SPRITESET] = spriteset_index & 0xFF
 
         # Palette index
-        code.append(self.palette_index & 0xFF)
+        code[EntityField.PALETTE] = self.palette_index & 0xFF
 
         return RenderedCodeBlock(code=bytes(code), exported_labels={self.label: start_offset})
 
@@ -215,7 +285,8 @@ class SpriteSetCHRData(CodeBlock):
     A CHR-ROM data block for sprite sets.
 
     - contains CHR tile data for sprites
-    - exports a name that references the starting CHR index
+    - the ROM lays its tiles out in CHR ROM, storing tiles shared with other blocks once, and exports the CHR
+      index of each (see ChrLayout)
     """
     sprite_set_data: NESSpriteSetAssetData
 
@@ -238,8 +309,6 @@ class SpriteSetCHRData(CodeBlock):
 
     def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
         # Render the actual CHR data
-        # The exported name references the CHR tile index (start_offset / 16)
-        # Each CHR tile is 16 bytes (8 bytes per bitplane)
+        # Each CHR tile is 16 bytes (8 bytes per bitplane); the tile indices are exported by the ROM
         code = self.sprite_set_data.chr_data
-        chr_tile_index = start_offset // 16
-        return RenderedCodeBlock(code=code, exported_labels={self.label: chr_tile_index})
+        return RenderedCodeBlock(code=code, exported_labels={})
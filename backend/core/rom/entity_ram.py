@@ -0,0 +1,51 @@
+"""
+Where entities live in RAM once load_scene has copied them there.
+
+Entity RAM is the page at $0200-$02FF: MAX_N_SCENE_ENTITIES entities of ENTITY_SIZE_BYTES fields each. In ROM an
+entity is always one record of its fields in EntityField order (see EntityData); in RAM they are laid out as
+either an array of those records or one array per field.
+"""
+
+import enum
+
+from core.schemas import ENTITY_SIZE_BYTES, MAX_N_SCENE_ENTITIES
+
+ENTITY_RAM_PAGE = 0x02  # $0200-$02FF
+ENTITY_RAM = ENTITY_RAM_PAGE * 256
+
+
+class EntityField(enum.IntEnum):
+    """The fields of an entity, by offset in its ROM record."""
+
+    X = 0
+    Y = 1
+    SPRITESET = 2
+    PALETTE = 3
+
+
+class EntityLayout(enum.Enum):
+    """
+    array_of_structs: one 4-byte record per entity; entity i's field f is at $0200 + 4 * i + f
+    struct_of_arrays: one 64-byte array per field; entity i's field f is at $0200 + 64 * f + i
+
+    With structs the entity index advances by 4 per entity, the same stride as OAM entries, so one index
+    register can address an entity and its sprite. With arrays it advances by 1 (a single INX) and code that
+    only needs some fields touches only their arrays.
+
+    Builds use the layout of the ROM_ENTITY_LAYOUT setting (array_of_structs by default); RomBuilder links
+    load_scene and render_entities built for it from the runtime library's option libraries.
+    """
+
+    ARRAY_OF_STRUCTS = "array_of_structs"
+    STRUCT_OF_ARRAYS = "struct_of_arrays"
+
+    @property
+    def stride(self) -> int:
+        """How far the index into entity RAM advances from one entity to the next."""
+        return ENTITY_SIZE_BYTES if self == EntityLayout.ARRAY_OF_STRUCTS else 1
+
+    def address(self, field: EntityField) -> int:
+        """The address of a field of entity 0; add the entity index times stride for the others."""
+        if self == EntityLayout.ARRAY_OF_STRUCTS:
+            return ENTITY_RAM + field
+        return ENTITY_RAM + MAX_N_SCENE_ENTITIES * field
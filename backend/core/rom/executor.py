@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import multiprocessing
+import uuid
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Literal
+
+from config import settings
+from core.rom.banks import Mapper
+from core.rom.builder import RomBuilder
+from core.rom.cache import rom_layout_cache
+from core.rom.code_block_registry import CodeBlockRegistry
+from core.rom.entity_ram import EntityLayout
+from core.rom.label_registry import LabelRegistry
+from core.rom.rom import Rom, RomImage
+from core.rom.snapshot import GameSnapshot
+
+logger = logging.getLogger(__name__)
+
+type CompileExecutorKind = Literal["thread", "process"]
+
+
+class CompileQueueFullError(Exception):
+    """Raised when a build is submitted while every worker is busy and the queue is full."""
+
+
+class CompileTimeoutError(Exception):
+    """Raised when a build does not finish within the executor's timeout."""
+
+
+def compile_game(
+    snapshot: GameSnapshot, initial_scene_name: str = "main", scene_id: uuid.UUID | None = None
+) -> memoryview:
+    """
+    Compile a snapshot into a ROM image with fresh registries.
+
+    A pure function of its (picklable) arguments, so it can run in a worker thread or process. Incremental
+    layouts are kept in the layout cache of whichever process runs it.
+    """
+    label_registry = LabelRegistry()
+    code_block_registry = CodeBlockRegistry(label_registry=label_registry)
+    builder = RomBuilder(
+        db=None,
+        rom=Rom(mapper=Mapper(settings.ROM_MAPPER), chr_ram=settings.ROM_CHR_RAM),
+        label_registry=label_registry,
+        code_block_registry=code_block_registry,
+        layout_cache=rom_layout_cache,
+        vblank_check=settings.ROM_VBLANK_CHECK,
+        scene_compression=settings.ROM_SCENE_COMPRESSION,
+        entity_layout=EntityLayout(settings.ROM_ENTITY_LAYOUT),
+    )
+    return builder.compile(snapshot, initial_scene_name=initial_scene_name, scene_id=scene_id)
+
+
+def _compile_game_to_bytes(
+    snapshot: GameSnapshot, initial_scene_name: str = "main", scene_id: uuid.UUID | None = None
+) -> bytes:
+    # A memoryview cannot be pickled back from a worker process; this is the one copy a process pool needs
+    return bytes(compile_game(snapshot, initial_scene_name, scene_id))
+
+
+def _warm_worker() -> None:
+    # Importing this module in the worker assembles the runtime library once, before the first build arrives
+    import core.rom.runtime  # noqa: F401
+
+
+@dataclass
+class CompileExecutorStats:
+    kind: str
+    workers: int
+    max_queue: int
+    in_flight: int
+    submitted: int
+    completed: int
+    failed: int
+    rejected: int
+    timed_out: int
+    cancelled: int
+
+
+class CompileExecutor:
+    """
+    Runs ROM compilation off the event loop, in a thread or process pool.
+
+    - at most workers + max_queue builds are admitted at once; further submissions fail fast with
+      CompileQueueFullError so render load cannot pile up behind CRUD traffic
+    - builds wait for an idle worker before they are submitted, so timeout_seconds bounds the build itself and
+      not its time in the queue
+    - cancelling the awaiting coroutine (e.g. because the client disconnected) drops a build that has not
+      started yet. A build that is already running, or that timed out, cannot be stopped: it keeps its worker and
+      its slot until it actually finishes, so abandoned builds still count against the admission bound
+    """
+
+    def __init__(self, kind: CompileExecutorKind, workers: int, max_queue: int, timeout_seconds: float):
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout_seconds = timeout_seconds
+        self._pool: Executor | None = None
+        self._idle_workers = asyncio.Semaphore(workers)
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                # spawn rather than fork: forking a process with a running event loop and open db connections is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker,
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rom-compile")
+        return self._pool
+
+    async def compile(
+        self, snapshot: GameSnapshot, initial_scene_name: str = "main", scene_id: uuid.UUID | None = None
+    ) -> RomImage:
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise CompileQueueFullError(f"ROM compile queue is full ({self.in_flight} builds in flight).")
+
+        self.in_flight += 1
+        self.submitted += 1
+        try:
+            await self._idle_workers.acquire()
+        except asyncio.CancelledError:
+            self.in_flight -= 1
+            self.cancelled += 1
+            raise
+
+        loop = asyncio.get_running_loop()
+        target = _compile_game_to_bytes if self.kind == "process" else compile_game
+        future = self._get_pool().submit(target, snapshot, initial_scene_name, scene_id)
+        # Added before anything awaits the future, so the slot is released before a finished build is returned
+        future.add_done_callback(self._release_when_done(loop))
+        try:
+            rom = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout_seconds)
+        except TimeoutError:
+            self.timed_out += 1
+            raise CompileTimeoutError(f"ROM compile did not finish within {self.timeout_seconds} seconds.") from None
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+
+        self.completed += 1
+        return rom
+
+    def _release_when_done(self, loop: asyncio.AbstractEventLoop) -> Callable[[Future], None]:
+        """A done-callback for a build's future, which runs in a pool thread: releases its worker and slot."""
+
+        def release(_future: Future) -> None:
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                # The event loop is closed, so nothing waits for the worker any more
+                self._release()
+
+        return release
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._idle_workers.release()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> CompileExecutorStats:
+        return CompileExecutorStats(
+            kind=self.kind,
+            workers=self.workers,
+            max_queue=self.max_queue,
+            in_flight=self.in_flight,
+            submitted=self.submitted,
+            completed=self.completed,
+            failed=self.failed,
+            rejected=self.rejected,
+            timed_out=self.timed_out,
+            cancelled=self.cancelled,
+        )
+
+
+compile_executor = CompileExecutor(
+    kind=settings.ROM_COMPILE_EXECUTOR,
+    workers=settings.ROM_COMPILE_WORKERS,
+    max_queue=settings.ROM_COMPILE_MAX_QUEUE,
+    timeout_seconds=settings.ROM_COMPILE_TIMEOUT_SECONDS,
+)
+
+
+def get_compile_executor() -> CompileExecutor:
+    return compile_executor
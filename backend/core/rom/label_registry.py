@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from api.games.models import Game
+    from core.rom.snapshot import GameSnapshot
 
 from api.games.assets.models import Asset
 from api.games.entities.models import Entity
@@ -16,7 +17,7 @@ class LabelRegistry:
         self._entity_labels: dict[uuid.UUID, str] = {}
         self._component_labels: dict[uuid.UUID, str] = {}
 
-    def add_game(self, game: "Game"):
+    def add_game(self, game: "Game | GameSnapshot"):
         """Add all labels for a game's scenes, assets, and entities."""
         self._add_scenes(game.scenes)
         self._add_assets(game.assets)
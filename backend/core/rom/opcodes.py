@@ -0,0 +1,180 @@
+"""
+The official 6502 instruction set as data: one entry per opcode with its addressing mode and cycle cost.
+
+Shared by everything that needs to know what an opcode does without assembling or running it.
+"""
+
+import enum
+from dataclasses import dataclass
+
+
+class AddressingMode(enum.Enum):
+    IMPLIED = "IMPLIED"
+    ACCUMULATOR = "ACCUMULATOR"
+    IMMEDIATE = "IMMEDIATE"
+    ZEROPAGE = "ZEROPAGE"
+    ZEROPAGE_X = "ZEROPAGE_X"
+    ZEROPAGE_Y = "ZEROPAGE_Y"
+    ABSOLUTE = "ABSOLUTE"
+    ABSOLUTE_X = "ABSOLUTE_X"
+    ABSOLUTE_Y = "ABSOLUTE_Y"
+    INDIRECT = "INDIRECT"
+    INDEXED_INDIRECT = "INDEXED_INDIRECT"  # (zp,X)
+    INDIRECT_INDEXED = "INDIRECT_INDEXED"  # (zp),Y
+    RELATIVE = "RELATIVE"
+
+    @property
+    def operand_size(self) -> int:
+        if self in (AddressingMode.IMPLIED, AddressingMode.ACCUMULATOR):
+            return 0
+        if self in _WORD_OPERAND_MODES:
+            return 2
+        return 1
+
+
+_WORD_OPERAND_MODES = (
+    AddressingMode.ABSOLUTE,
+    AddressingMode.ABSOLUTE_X,
+    AddressingMode.ABSOLUTE_Y,
+    AddressingMode.INDIRECT,
+)
+
+
+@dataclass(frozen=True)
+class Opcode:
+    """
+    One opcode of the instruction set.
+
+    cycles is the base cost. page_penalty marks reads that take one more cycle when indexing crosses a page;
+    branches instead cost one more cycle when taken and another when the target is on a different page.
+    """
+
+    opcode: int
+    mnemonic: str
+    mode: AddressingMode
+    cycles: int
+    page_penalty: bool = False
+
+    @property
+    def size(self) -> int:
+        return 1 + self.mode.operand_size
+
+
+_M = AddressingMode
+
+# ORA/AND/EOR/ADC/STA/LDA/CMP/SBC share one opcode layout: base opcode + addressing mode column
+_ALU_OPS = {"ORA": 0x00, "AND": 0x20, "EOR": 0x40, "ADC": 0x60, "STA": 0x80, "LDA": 0xA0, "CMP": 0xC0, "SBC": 0xE0}
+_ALU_MODES = [
+    (0x01, _M.INDEXED_INDIRECT, 6, False),
+    (0x05, _M.ZEROPAGE, 3, False),
+    (0x09, _M.IMMEDIATE, 2, False),
+    (0x0D, _M.ABSOLUTE, 4, False),
+    (0x11, _M.INDIRECT_INDEXED, 5, True),
+    (0x15, _M.ZEROPAGE_X, 4, False),
+    (0x19, _M.ABSOLUTE_Y, 4, True),
+    (0x1D, _M.ABSOLUTE_X, 4, True),
+]
+
+# ASL/ROL/LSR/ROR/DEC/INC (read-modify-write) likewise
+_RMW_OPS = {"ASL": 0x00, "ROL": 0x20, "LSR": 0x40, "ROR": 0x60, "DEC": 0xC0, "INC": 0xE0}
+_RMW_MODES = [
+    (0x06, _M.ZEROPAGE, 5),
+    (0x0A, _M.ACCUMULATOR, 2),
+    (0x0E, _M.ABSOLUTE, 6),
+    (0x16, _M.ZEROPAGE_X, 6),
+    (0x1E, _M.ABSOLUTE_X, 7),
+]
+
+_OTHER_OPS = [
+    # Loads and stores of X and Y
+    (0xA2, "LDX", _M.IMMEDIATE, 2, False),
+    (0xA6, "LDX", _M.ZEROPAGE, 3, False),
+    (0xB6, "LDX", _M.ZEROPAGE_Y, 4, False),
+    (0xAE, "LDX", _M.ABSOLUTE, 4, False),
+    (0xBE, "LDX", _M.ABSOLUTE_Y, 4, True),
+    (0xA0, "LDY", _M.IMMEDIATE, 2, False),
+    (0xA4, "LDY", _M.ZEROPAGE, 3, False),
+    (0xB4, "LDY", _M.ZEROPAGE_X, 4, False),
+    (0xAC, "LDY", _M.ABSOLUTE, 4, False),
+    (0xBC, "LDY", _M.ABSOLUTE_X, 4, True),
+    (0x86, "STX", _M.ZEROPAGE, 3, False),
+    (0x96, "STX", _M.ZEROPAGE_Y, 4, False),
+    (0x8E, "STX", _M.ABSOLUTE, 4, False),
+    (0x84, "STY", _M.ZEROPAGE, 3, False),
+    (0x94, "STY", _M.ZEROPAGE_X, 4, False),
+    (0x8C, "STY", _M.ABSOLUTE, 4, False),
+    # Compares of X and Y, BIT
+    (0xE0, "CPX", _M.IMMEDIATE, 2, False),
+    (0xE4, "CPX", _M.ZEROPAGE, 3, False),
+    (0xEC, "CPX", _M.ABSOLUTE, 4, False),
+    (0xC0, "CPY", _M.IMMEDIATE, 2, False),
+    (0xC4, "CPY", _M.ZEROPAGE, 3, False),
+    (0xCC, "CPY", _M.ABSOLUTE, 4, False),
+    (0x24, "BIT", _M.ZEROPAGE, 3, False),
+    (0x2C, "BIT", _M.ABSOLUTE, 4, False),
+    # Branches
+    (0x10, "BPL", _M.RELATIVE, 2, False),
+    (0x30, "BMI", _M.RELATIVE, 2, False),
+    (0x50, "BVC", _M.RELATIVE, 2, False),
+    (0x70, "BVS", _M.RELATIVE, 2, False),
+    (0x90, "BCC", _M.RELATIVE, 2, False),
+    (0xB0, "BCS", _M.RELATIVE, 2, False),
+    (0xD0, "BNE", _M.RELATIVE, 2, False),
+    (0xF0, "BEQ", _M.RELATIVE, 2, False),
+    # Jumps, calls and interrupts
+    (0x4C, "JMP", _M.ABSOLUTE, 3, False),
+    (0x6C, "JMP", _M.INDIRECT, 5, False),
+    (0x20, "JSR", _M.ABSOLUTE, 6, False),
+    (0x60, "RTS", _M.IMPLIED, 6, False),
+    (0x40, "RTI", _M.IMPLIED, 6, False),
+    (0x00, "BRK", _M.IMPLIED, 7, False),
+    # Stack
+    (0x48, "PHA", _M.IMPLIED, 3, False),
+    (0x08, "PHP", _M.IMPLIED, 3, False),
+    (0x68, "PLA", _M.IMPLIED, 4, False),
+    (0x28, "PLP", _M.IMPLIED, 4, False),
+    # Register transfers, increments and decrements
+    (0xAA, "TAX", _M.IMPLIED, 2, False),
+    (0xA8, "TAY", _M.IMPLIED, 2, False),
+    (0x8A, "TXA", _M.IMPLIED, 2, False),
+    (0x98, "TYA", _M.IMPLIED, 2, False),
+    (0x9A, "TXS", _M.IMPLIED, 2, False),
+    (0xBA, "TSX", _M.IMPLIED, 2, False),
+    (0xE8, "INX", _M.IMPLIED, 2, False),
+    (0xC8, "INY", _M.IMPLIED, 2, False),
+    (0xCA, "DEX", _M.IMPLIED, 2, False),
+    (0x88, "DEY", _M.IMPLIED, 2, False),
+    # Flags
+    (0x18, "CLC", _M.IMPLIED, 2, False),
+    (0x38, "SEC", _M.IMPLIED, 2, False),
+    (0x58, "CLI", _M.IMPLIED, 2, False),
+    (0x78, "SEI", _M.IMPLIED, 2, False),
+    (0xB8, "CLV", _M.IMPLIED, 2, False),
+    (0xD8, "CLD", _M.IMPLIED, 2, False),
+    (0xF8, "SED", _M.IMPLIED, 2, False),
+    (0xEA, "NOP", _M.IMPLIED, 2, False),
+]
+
+
+def _build_opcodes() -> dict[int, Opcode]:
+    opcodes: dict[int, Opcode] = {}
+    for mnemonic, base in _ALU_OPS.items():
+        for column, mode, cycles, page_penalty in _ALU_MODES:
+            if mnemonic == "STA":
+                if mode == _M.IMMEDIATE:
+                    continue
+                # Stores always take the extra cycle for indexing instead of only on a page crossing
+                cycles += page_penalty
+                page_penalty = False
+            opcodes[base + column] = Opcode(base + column, mnemonic, mode, cycles, page_penalty)
+    for mnemonic, base in _RMW_OPS.items():
+        for column, mode, cycles in _RMW_MODES:
+            if mode == _M.ACCUMULATOR and mnemonic in ("DEC", "INC"):
+                continue
+            opcodes[base + column] = Opcode(base + column, mnemonic, mode, cycles)
+    for opcode, mnemonic, mode, cycles, page_penalty in _OTHER_OPS:
+        opcodes[opcode] = Opcode(opcode, mnemonic, mode, cycles, page_penalty)
+    return opcodes
+
+
+OPCODES: dict[int, Opcode] = _build_opcodes()
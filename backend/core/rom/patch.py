@@ -0,0 +1,107 @@
+IPS_HEADER = b"PATCH"
+IPS_FOOTER = b"EOF"
+IPS_MAX_OFFSET = 0xFFFFFF
+IPS_MAX_RECORD_SIZE = 0xFFFF
+
+# A record costs 5 bytes of header, so unchanged gaps shorter than that are cheaper to copy than to skip
+_MERGE_GAP = 5
+# An RLE record is 8 bytes; a literal record of n bytes is 5 + n
+_MIN_RLE_SIZE = 4
+# Equal stretches are skipped a chunk at a time before falling back to comparing single bytes
+_SKIP_CHUNK = 64
+# An offset that spells "EOF" would be read as the end of the patch
+_EOF_OFFSET = int.from_bytes(IPS_FOOTER, "big")
+
+
+def _changed_runs(source: bytes, target: bytes) -> list[tuple[int, int]]:
+    """[start, end) ranges of target that differ from source, with small unchanged gaps merged in."""
+    runs: list[tuple[int, int]] = []
+    common = min(len(source), len(target))
+    i = 0
+    while i < common:
+        if source[i : i + _SKIP_CHUNK] == target[i : i + _SKIP_CHUNK]:
+            i += _SKIP_CHUNK
+            continue
+        if source[i] == target[i]:
+            i += 1
+            continue
+        start = end = i
+        while i < common and i - end <= _MERGE_GAP:
+            if source[i] != target[i]:
+                end = i + 1
+            i += 1
+        runs.append((start, end))
+        i = end
+
+    if len(target) > len(source):
+        if runs and runs[-1][1] >= common - _MERGE_GAP:
+            runs[-1] = (runs[-1][0], len(target))
+        else:
+            runs.append((common, len(target)))
+    return runs
+
+
+def ips_patch(source: bytes, target: bytes) -> bytes:
+    """
+    Encode the difference between two ROM images as an IPS patch.
+
+    - unchanged stretches are skipped, so the patch size tracks the number of changed bytes
+    - runs of a single repeated byte become RLE records
+    - a target shorter than the source is expressed with the common truncation extension
+    """
+    source, target = bytes(source), bytes(target)
+    if len(target) > IPS_MAX_OFFSET:
+        raise ValueError(f"IPS cannot address a {len(target)} byte image.")
+
+    patch = bytearray(IPS_HEADER)
+    for start, end in _changed_runs(source, target):
+        if start == _EOF_OFFSET:
+            start -= 1
+        while start < end:
+            size = min(end - start, IPS_MAX_RECORD_SIZE)
+            data = target[start : start + size]
+            patch += start.to_bytes(3, "big")
+            if size >= _MIN_RLE_SIZE and data.count(data[0]) == size:
+                patch += b"\x00\x00" + size.to_bytes(2, "big") + data[:1]
+            else:
+                patch += size.to_bytes(2, "big") + data
+            start += size
+    patch += IPS_FOOTER
+    if len(target) < len(source):
+        patch += len(target).to_bytes(3, "big")
+    return bytes(patch)
+
+
+def apply_ips_patch(source: bytes, patch: bytes) -> bytes:
+    """Apply an IPS patch (including the truncation extension) to a ROM image."""
+    if not patch.startswith(IPS_HEADER):
+        raise ValueError("Not an IPS patch.")
+
+    image = bytearray(source)
+    position = len(IPS_HEADER)
+    while (record := patch[position : position + 5])[:3] != IPS_FOOTER:
+        if len(record) < 5:
+            raise ValueError("Truncated IPS patch.")
+        offset = int.from_bytes(record[:3], "big")
+        size = int.from_bytes(record[3:], "big")
+        position += 5
+        if size == 0:
+            rle = patch[position : position + 3]
+            if len(rle) < 3:
+                raise ValueError("Truncated IPS patch.")
+            size = int.from_bytes(rle[:2], "big")
+            data = rle[2:] * size
+            position += 3
+        else:
+            data = patch[position : position + size]
+            if len(data) < size:
+                raise ValueError("Truncated IPS patch.")
+            position += size
+        if offset > len(image):
+            image.extend(bytes(offset - len(image)))
+        image[offset : offset + size] = data
+
+    truncate = patch[position + 3 : position + 6]
+    if len(truncate) == 3:
+        del image[int.from_bytes(truncate, "big") :]
+    return bytes(image)
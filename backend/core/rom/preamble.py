@@ -1,8 +1,9 @@
-from core.rom.asm import Asm6502
-from core.rom.code_block import CodeBlock, CodeBlockType, RenderedCodeBlock
+from core.rom.asm import Asm6502, LabelRef, hi, lo
+from core.rom.banks import bank_label
+from core.rom.code_block import AssembledCodeBlock, CodeBlockType
 
 
-class PreambleCodeBlock(CodeBlock):
+class PreambleCodeBlock(AssembledCodeBlock):
     """
     The built-in preamble code block that runs at the start of the ROM.
 
@@ -12,33 +13,32 @@ class PreambleCodeBlock(CodeBlock):
     3. Disable NMI by writing to PPU control register
     4. Initialize stack pointer to 0xFF
     5. Zero out all CPU registers (A, X, Y)
-    6. Load initial scene address into zero page
-    7. Call load_scene subroutine
-    8. Loop forever (main game loop will be in NMI handler)
+    6. Map in the initial scene's PRG bank if it may be banked (switch_scene_bank, UxROM)
+    7. Load initial scene address into zero page
+    8. Call unpack_data if the scene is packed (unpack_scene, see PackedData)
+    9. Call load_scene subroutine
+    10. Loop forever (main game loop will be in NMI handler)
     """
     label: str = "preamble"
     type: CodeBlockType = CodeBlockType.PREAMBLE
     main_scene_label: str
+    unpack_scene: bool = False
+    switch_scene_bank: bool = False
 
     @property
-    def size(self) -> int:
-        # Pre-calculate by building the code once
-        # This is called during layout, so we use dummy addresses
-        asm = self._build_code(
-            start_offset=0x8000,
-            names={
-                "zp__src1": 0x00,
-                self.main_scene_label: 0x8000,
-                "load_scene": 0x8000,
-            },
-        )
-        return len(asm)
+    def dependencies(self) -> list[str]:
+        dependencies = ["zp__src1", self.main_scene_label, "load_scene"]
+        if self.unpack_scene:
+            dependencies.append("unpack_data")
+        if self.switch_scene_bank:
+            dependencies.append("switch_bank")
+        return dependencies
 
     @property
-    def dependencies(self) -> list[str]:
-        return ["zp__src1", self.main_scene_label, "load_scene"]
+    def switched_dependencies(self) -> list[str]:
+        return [self.main_scene_label] if self.switch_scene_bank else []
 
-    def _build_code(self, start_offset: int, names: dict[str, int]) -> bytes:
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
         """Build the preamble assembly code."""
         asm = Asm6502()
 
@@ -65,21 +65,28 @@ class PreambleCodeBlock(CodeBlock):
         # A is already 0
 
         # === Load Initial Scene ===
+        # The scene, and all the data it points at, is in one PRG bank
+        if self.switch_scene_bank:
+            asm.lda_imm(lo(bank_label(self.main_scene_label)))
+            asm.jsr("switch_bank")
+
         # Load the address of the initial scene data into zero page variable zp__src1
-        scene_data_addr = names[self.main_scene_label]
-        zp_src_addr = names["zp__src1"]
+        zp_src_addr = LabelRef("zp__src1")
 
         # Load low byte of scene data address
-        asm.lda_imm(scene_data_addr & 0xFF)
+        asm.lda_imm(lo(self.main_scene_label))
         asm.sta_zp(zp_src_addr)
 
         # Load high byte of scene data address
-        asm.lda_imm((scene_data_addr >> 8) & 0xFF)
+        asm.lda_imm(hi(self.main_scene_label))
         asm.sta_zp(zp_src_addr + 1)
 
+        # Unpack the scene into RAM; unpack_data points zp__src1 at it
+        if self.unpack_scene:
+            asm.jsr("unpack_data")
+
         # Call the load_scene subroutine
-        load_scene_addr = names["load_scene"]
-        asm.jsr(load_scene_addr)
+        asm.jsr("load_scene")
 
         # === Draw test tile to screen ===
         # Draw tile 0 (our test pattern) at nametable position (0, 0)
@@ -114,11 +121,6 @@ class PreambleCodeBlock(CodeBlock):
         # === Main Loop ===
         # Infinite loop (actual game logic runs in NMI handler)
         # Jump to current address (infinite loop)
-        loop_addr = start_offset + len(asm)
-        asm.jmp_abs(loop_addr)
-
-        return asm.bytes()
+        asm.loop_forever()
 
-    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
-        code = self._build_code(start_offset, names)
-        return RenderedCodeBlock(code=code, exported_labels={})
+        return asm
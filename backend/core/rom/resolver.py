@@ -0,0 +1,64 @@
+from collections.abc import Iterator
+
+from core.rom.code_block import CodeBlock
+from core.rom.code_block_registry import CodeBlockRegistry
+
+
+class DependencyCycleError(ValueError):
+    """Raised when code blocks depend on each other in a cycle."""
+
+    def __init__(self, path: list[str]):
+        self.path = path
+        super().__init__(f"Dependency cycle: {' -> '.join(path)}")
+
+
+def _dependencies(code_block: CodeBlock, registry: CodeBlockRegistry) -> Iterator[CodeBlock]:
+    # Evaluated lazily, so optional dependencies are looked up only once the dependencies before them are resolved
+    for dependency_name in code_block.dependencies:
+        yield registry[dependency_name]
+    for dependency_name in code_block.optional_dependencies:
+        if dependency_name in registry:
+            yield registry[dependency_name]
+
+
+def resolve_dependencies(root: CodeBlock, registry: CodeBlockRegistry, resolved: set[str]) -> list[CodeBlock]:
+    """
+    Return root and its transitive dependencies that are not in resolved yet, dependencies first.
+
+    - the order is the depth-first postorder the dependencies are listed in, so ROM layouts stay stable
+    - labels in resolved are skipped without walking their dependencies again, and every newly returned label is
+      added to it; sharing one set across calls makes resolving a whole game linear in blocks plus edges
+    - required dependencies missing from the registry raise KeyError, optional ones are skipped
+    - a cycle raises DependencyCycleError with the full label path
+    """
+    if root.label in resolved:
+        return []
+
+    order: list[CodeBlock] = []
+    path: list[str] = [root.label]
+    on_path: set[str] = {root.label}
+    stack: list[tuple[CodeBlock, Iterator[CodeBlock]]] = [(root, _dependencies(root, registry))]
+
+    while stack:
+        code_block, dependencies = stack[-1]
+        try:
+            dependency = next(dependencies)
+        except KeyError as e:
+            raise KeyError(f"{e.args[0]} (required by {' -> '.join(path)})") from e
+        except StopIteration:
+            stack.pop()
+            path.pop()
+            on_path.discard(code_block.label)
+            resolved.add(code_block.label)
+            order.append(code_block)
+            continue
+
+        if dependency.label in on_path:
+            raise DependencyCycleError(path[path.index(dependency.label) :] + [dependency.label])
+        if dependency.label in resolved:
+            continue
+        path.append(dependency.label)
+        on_path.add(dependency.label)
+        stack.append((dependency, _dependencies(dependency, registry)))
+
+    return order
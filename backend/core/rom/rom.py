@@ -1,6 +1,74 @@
 import enum
-
-from core.rom.code_block import CodeBlock, CodeBlockType
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+
+from core.rom.banks import BANK_SIZE, SWITCHABLE_BANK_START, BankLayout, Mapper, bank_label, pack_banks
+from core.rom.code_block import CodeBlock, CodeBlockType, RenderedCodeBlock
+from core.rom.cycles import NMI_CYCLES, VBLANK_CYCLES, CycleAnalysisError, worst_case_cycles
+from core.rom.zero_page import ZERO_PAGE_SIZE, ZeroPageAllocation, allocate_zero_page
+
+# Bump whenever a change to the compiler can alter the bytes of a rendered ROM; it is part of every ROM cache key.
+COMPILER_VERSION = 12
+
+# A rendered iNES image: a read-only view of the buffer it was rendered into (or a bytes copy of one)
+type RomImage = memoryview | bytes
+
+# iNES image layout: 16 byte header, one 16KB PRG ROM bank mapped at $C000 (the last of several on UxROM), one
+# 8KB CHR ROM bank
+INES_HEADER_SIZE = 16
+PRG_ROM_SIZE = 0x4000
+CHR_ROM_SIZE = 0x2000
+# An 8x8 tile: two bitplanes of 8 bytes
+CHR_TILE_SIZE = 16
+PRG_ROM_START = 0xC000
+VECTORS_OFFSET = 0xFFFA
+_RTI_CYCLES = 6
+
+# See: https://www.nesdev.org/wiki/INES
+INES_HEADER = bytes(
+    [
+        0x4E,
+        0x45,
+        0x53,
+        0x1A,  # "NES" + MS-DOS EOF
+        0x01,  # 1x 16KB PRG ROM
+        0x01,  # 1x 8KB CHR ROM
+        0x00,  # Mapper 0, horizontal mirroring
+        0x00,  # Mapper 0 (continued)
+        0x00,
+        0x00,
+        0x00,
+        0x00,
+        0x00,
+        0x00,
+        0x00,
+        0x00,  # Padding
+    ]
+)
+
+# Test pattern for the first tile (4 quadrants): color 0 | color 1 on top, color 2 | color 3 below
+TEST_TILE = bytes(
+    [
+        # Low bit plane (bit 0 of color), rows 0-7
+        0b00001111,
+        0b00001111,
+        0b00001111,
+        0b00001111,
+        0b00001111,
+        0b00001111,
+        0b00001111,
+        0b00001111,
+        # High bit plane (bit 1 of color), rows 0-7
+        0b00000000,
+        0b00000000,
+        0b00000000,
+        0b00000000,
+        0b11111111,
+        0b11111111,
+        0b11111111,
+        0b11111111,
+    ]
+)
 
 
 class RomCodeArea(enum.Enum):
@@ -42,184 +110,452 @@ def _empty_code_blocks_factory() -> dict[RomCodeArea, dict[str, CodeBlock]]:
     }
 
 
+class _TrackedNames(Mapping[str, int]):
+    """A read-only view of the name table that records every label a code block looks up (None if absent)."""
+
+    def __init__(self, names: dict[str, int]):
+        self._names = names
+        self.reads: dict[str, int | None] = {}
+
+    def __getitem__(self, label: str) -> int:
+        value = self._names.get(label)
+        self.reads[label] = value
+        if value is None:
+            raise KeyError(label)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+def _same_inputs(a: CodeBlock, b: CodeBlock) -> bool:
+    # Compare fields only: pydantic's == also compares private attributes such as assembler caches
+    return a is b or (type(a) is type(b) and a.__dict__ == b.__dict__)
+
+
+@dataclass
+class RenderedBlockRecord:
+    block: CodeBlock
+    start_offset: int
+    reads: dict[str, int | None]
+    rendered: RenderedCodeBlock
+
+
+@dataclass
+class RomCycleReport:
+    """
+    Worst-case CPU cycles of one render, from static analysis of its linked code (see core.rom.cycles).
+
+    blocks holds the cost of running each assembled code block once, including the subroutines it calls, and
+    areas sums them per code area. nmi_cycles covers the whole NMI, from the interrupt to its RTI; vblank_cycles
+    counts from the interrupt until the last NMI_VBLANK block is done (they are placed before the NMI_POST_VBLANK
+    ones), which must fit in VBlank. Blocks that are not assembled code have no known cost: they are listed in
+    unanalyzed and count as 0.
+    """
+
+    blocks: dict[str, int] = field(default_factory=dict)
+    areas: dict[RomCodeArea, int] = field(default_factory=dict)
+    nmi_cycles: int = 0
+    vblank_cycles: int = 0
+    unanalyzed: list[str] = field(default_factory=list)
+
+    @property
+    def vblank_overrun(self) -> bool:
+        return self.vblank_cycles > VBLANK_CYCLES
+
+
+def chr_tile_label(label: str, tile: int) -> str:
+    """The name under which the CHR ROM index of tile number tile of a CHR block is exported."""
+    return f"{label}__tile{tile}"
+
+
+@dataclass
+class ChrLayout:
+    """
+    The CHR ROM of one render. Identical tiles are stored once, so a CHR block's tiles need not be contiguous.
+
+    tiles holds the unique tiles in CHR ROM order (the test tile first), and remaps the CHR ROM index of every tile
+    of each CHR block. The same indices are exported as names: the block's label for its first tile, and
+    chr_tile_label(label, i) for each tile. bytes_saved counts the bytes the duplicate tiles would have taken.
+
+    With CHR RAM there is no CHR ROM and tiles is empty: every block's tiles are contiguous from the tile allocated
+    to it (see allocate_chr_ram), and each scene uploads the blocks it uses when it is loaded.
+    """
+
+    tiles: list[bytes] = field(default_factory=list)
+    remaps: dict[str, tuple[int, ...]] = field(default_factory=dict)
+    bytes_saved: int = 0
+
+
+def allocate_chr_ram(code_blocks: Iterable[CodeBlock], tile_counts: dict[str, int]) -> dict[str, int]:
+    """
+    The first tile of each CHR block in CHR RAM, first fit in the order of tile_counts.
+
+    Only one scene's tiles are in CHR RAM at a time, so CHR blocks may share tiles unless a data block that no other
+    data points at (a scene) reaches both. Blocks that do not fit in pattern memory raise ValueError.
+    """
+    blocks = {block.label: block for block in code_blocks}
+    data = [label for label, block in blocks.items() if block.type == CodeBlockType.DATA]
+    referenced = {dependency for label in data for dependency in blocks[label].dependencies}
+    interferences: dict[str, set[str]] = {label: set() for label in tile_counts}
+    for root in (label for label in data if label not in referenced):
+        stack, seen, reached = [root], set(), set()
+        while stack:
+            label = stack.pop()
+            if label in seen or label not in blocks:
+                continue
+            seen.add(label)
+            if blocks[label].type == CodeBlockType.CHR:
+                reached.add(label)
+            elif blocks[label].type == CodeBlockType.DATA:
+                stack.extend(blocks[label].dependencies)
+        for label in reached & interferences.keys():
+            interferences[label] |= reached - {label}
+
+    bases: dict[str, int] = {}
+    max_tiles = CHR_ROM_SIZE // CHR_TILE_SIZE
+    for label, count in tile_counts.items():
+        base = 0
+        taken = interferences[label] & bases.keys()
+        for start, end in sorted((bases[other], bases[other] + tile_counts[other]) for other in taken):
+            if start >= base + count:
+                break
+            base = max(base, end)
+        if base + count > max_tiles:
+            raise ValueError(
+                f"CHR RAM overflow: '{label}' ends {base + count - max_tiles} tiles past pattern memory in a scene"
+            )
+        bases[label] = base
+    return bases
+
+
+@dataclass
+class RomLayout:
+    """
+    Where every code block of one render was placed, what it read from the name table and what it rendered to.
+
+    Passing the layout of a game's previous render to the next one lets unchanged blocks skip rendering: a block
+    is reused when its fields, start offset and every name it read are the same as last time. A size change only
+    shifts (and so re-renders) the blocks after it in the same area. Blocks are compared by value, so the inputs
+    of a rendered block must not be mutated in place afterwards.
+
+    cycles is the worst-case cycle report of the render, zero_page the allocation of its zero page variables and
+    chr the tiles of its CHR ROM. data_aliases maps each position-independent data block whose bytes were already
+    in PRG ROM (in the same bank) to the address it shares, and data_bytes_saved counts the bytes those copies
+    would have taken. banks is the packing of data into switchable PRG banks on UxROM, None on NROM.
+    """
+
+    records: dict[str, RenderedBlockRecord] = field(default_factory=dict)
+    blocks_reused: int = 0
+    blocks_rendered: int = 0
+    cycles: RomCycleReport | None = None
+    zero_page: ZeroPageAllocation | None = None
+    chr: ChrLayout | None = None
+    data_aliases: dict[str, int] = field(default_factory=dict)
+    data_bytes_saved: int = 0
+    banks: BankLayout | None = None
+
+
 class Rom:
-    def __init__(self, code_blocks: dict[RomCodeArea, dict[str, CodeBlock]] | None = None):
+    def __init__(
+        self,
+        code_blocks: dict[RomCodeArea, dict[str, CodeBlock]] | None = None,
+        mapper: Mapper = Mapper.NROM,
+        chr_ram: bool = False,
+    ):
         self.code_blocks: dict[RomCodeArea, dict[str, CodeBlock]] = (
             code_blocks if code_blocks is not None else _empty_code_blocks_factory()
         )
+        self.mapper = mapper
+        # Without CHR ROM, scenes upload their tiles to the board's 8KB of CHR RAM (see PackedChrData)
+        self.chr_ram = chr_ram
+        self.layout: RomLayout | None = None
+        self._previous_layout: RomLayout | None = None
 
     def add(self, code_block: CodeBlock) -> None:
         self.code_blocks[RomCodeArea.from_code_block_type(code_block.type)][code_block.label] = code_block
 
-    def render(self) -> bytes:
+    def _render_block(self, block: CodeBlock, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
+        """Render a block, or reuse its previous rendering if none of its inputs changed."""
+        previous = self._previous_layout.records.get(block.label) if self._previous_layout else None
+        if (
+            previous is not None
+            and previous.start_offset == start_offset
+            and _same_inputs(previous.block, block)
+            and all(names.get(label) == value for label, value in previous.reads.items())
+        ):
+            self.layout.records[block.label] = previous
+            self.layout.blocks_reused += 1
+            return previous.rendered
+
+        tracked = _TrackedNames(names)
+        rendered = block.render(start_offset=start_offset, names=tracked)
+        self.layout.records[block.label] = RenderedBlockRecord(block, start_offset, tracked.reads, rendered)
+        self.layout.blocks_rendered += 1
+        return rendered
+
+    def _analyze_cycles(self) -> RomCycleReport:
+        """Worst-case cycles of the RESET and NMI code of the current layout, subroutine calls included."""
+        report = RomCycleReport()
+        records = self.layout.records
+        # Empty blocks share their address with the next block; calls go to the one with code
+        by_address = {
+            record.start_offset: record
+            for record in records.values()
+            if record.rendered.object_code is not None and record.rendered.code
+        }
+        in_progress: set[str] = set()
+
+        def block_cycles(record: RenderedBlockRecord) -> int:
+            label = record.block.label
+            if label not in report.blocks:
+                if label in in_progress:
+                    raise CycleAnalysisError(f"'{label}' calls itself.")
+                in_progress.add(label)
+                rendered = record.rendered
+                report.blocks[label] = worst_case_cycles(
+                    rendered.object_code, rendered.code, record.start_offset, callee_cycles
+                )
+                in_progress.discard(label)
+            return report.blocks[label]
+
+        def callee_cycles(address: int) -> int:
+            if address not in by_address:
+                raise CycleAnalysisError(f"Call to ${address:04X} does not enter assembled code.")
+            return block_cycles(by_address[address])
+
+        for area in (RomCodeArea.RESET, RomCodeArea.NMI_VBLANK, RomCodeArea.NMI_POST_VBLANK):
+            report.areas[area] = 0
+            for label in self.code_blocks[area]:
+                record = records[label]
+                if record.rendered.object_code is None:
+                    report.unanalyzed.append(label)
+                else:
+                    report.areas[area] += block_cycles(record)
+
+        report.vblank_cycles = NMI_CYCLES + report.areas[RomCodeArea.NMI_VBLANK]
+        report.nmi_cycles = report.vblank_cycles + report.areas[RomCodeArea.NMI_POST_VBLANK] + _RTI_CYCLES
+        return report
+
+    def render(self, previous_layout: RomLayout | None = None) -> memoryview:
         """
         Renders the ROM by assembling all code blocks into a valid NES ROM.
 
         Algorithm:
-        1. Zero page allocation: Add all ZEROPAGE blocks, building name table
-        2. PRG ROM block: Add all PRG_ROM blocks in reverse order (leaf dependencies first)
-        3. NMI routine: Assemble NMI_POST_VBLANK then NMI_VBLANK, cache NMI offset
+        1. Zero page allocation: Place all ZEROPAGE blocks, temporaries that are never live together sharing bytes,
+           building name table
+        2. PRG ROM block: Add all PRG_ROM blocks in reverse order (leaf dependencies first); a position-independent
+           data block whose bytes are already in PRG ROM is aliased to them instead of stored again. On UxROM, the
+           data blocks that can be banked (see pack_banks) go to the switchable banks at $8000 instead, and every
+           PRG_ROM block exports the number of its bank (bank_label)
+        3. NMI routine: Assemble NMI_VBLANK then NMI_POST_VBLANK, cache NMI offset
         4. Reset routine: Add RESET blocks
-        5. Final assembly: Combine all sections with vector table and CHR ROM
+        5. Final assembly: Add the vector table, header and CHR ROM, and analyze the worst-case cycles of the code
+
+        With chr_ram, step 1.5 allocates each CHR block a tile range that no block used by the same scene overlaps
+        (see allocate_chr_ram) instead, and the image has no CHR ROM.
+
+        Every section is written in place into one preallocated iNES image, which is returned as a read-only
+        memoryview (no copies; it can be handed to a Response as is).
+
+        If previous_layout (the layout of an earlier render of the same game) is given, blocks whose inputs did
+        not change are reused instead of rendered. The layout of this render is left in self.layout.
         """
+        self.layout = RomLayout()
+        self._previous_layout = previous_layout
         names: dict[str, int] = {}
 
+        banked: dict[str, int] = {}
+        prg_size = PRG_ROM_SIZE
+        if self.mapper == Mapper.UXROM:
+            bank_layout = pack_banks(block for blocks in self.code_blocks.values() for block in blocks.values())
+            self.layout.banks = bank_layout
+            banked = bank_layout.bank_of
+            prg_size = bank_layout.bank_count * BANK_SIZE
+
+        # The iNES image size is known up front: render every section straight into one buffer
+        image = bytearray(INES_HEADER_SIZE + prg_size + (0 if self.chr_ram else CHR_ROM_SIZE))
+        view = memoryview(image)
+        # The bank mapped at $C000, where the code and vectors go
+        prg_rom = view[INES_HEADER_SIZE + prg_size - PRG_ROM_SIZE : INES_HEADER_SIZE + prg_size]
+        chr_rom = view[INES_HEADER_SIZE + prg_size :]
+
+        def emit_prg(address: int, code: bytes) -> None:
+            # Code past the vector table is dropped here and reported as an overflow once the layout is complete
+            start = address - PRG_ROM_START
+            end = start + len(code)
+            if end <= VECTORS_OFFSET - PRG_ROM_START:
+                prg_rom[start:end] = code
+            elif start < VECTORS_OFFSET - PRG_ROM_START:
+                prg_rom[start : VECTORS_OFFSET - PRG_ROM_START] = code[: VECTORS_OFFSET - PRG_ROM_START - start]
+
         # Step 1: Zero page allocation
-        zp_offset = 0x00
-        zp_code = bytearray()
+        allocation = allocate_zero_page(block for blocks in self.code_blocks.values() for block in blocks.values())
+        self.layout.zero_page = allocation
+
+        if allocation.size > ZERO_PAGE_SIZE:
+            raise ValueError(f"Zero page allocation exceeds 256 bytes: {allocation.size} bytes used")
 
         for block in self.code_blocks[RomCodeArea.ZEROPAGE].values():
-            rendered = block.render(start_offset=zp_offset, names=names)
-            zp_code.extend(rendered.code)
+            rendered = self._render_block(block, allocation.addresses[block.label], names)
             names.update(rendered.exported_labels)
-            zp_offset += block.size
-
-        if zp_offset > 256:
-            raise ValueError(f"Zero page allocation exceeds 256 bytes: {zp_offset} bytes used")
 
-        # Step 1.5: Pre-calculate CHR tile indices
-        # CHR blocks need to be processed first so entity data can reference the correct tile indices
-        chr_offset = 16  # Start after background tile (tile 0)
-        for block in self.code_blocks[RomCodeArea.CHR_ROM].values():
-            # Calculate and export the CHR tile index without rendering the data yet
-            chr_tile_index = chr_offset // 16
-            names[block.label] = chr_tile_index
-            chr_offset += block.size
+        # Step 1.5: CHR tile layout
+        # CHR blocks need to be processed first so entity data can reference the correct tile indices. Each
+        # distinct tile is stored once: a tile that is already in CHR ROM (background tile included) reuses its index
+        chr_layout = ChrLayout(tiles=[] if self.chr_ram else [TEST_TILE])
+        if self.chr_ram:
+            # Tiles are uploaded per scene instead, so a block's tiles stay contiguous and are not shared
+            tile_counts = {
+                block.label: -(-len(self._render_block(block, 0, names).code) // CHR_TILE_SIZE)
+                for block in self.code_blocks[RomCodeArea.CHR_ROM].values()
+            }
+            bases = allocate_chr_ram(
+                (block for blocks in self.code_blocks.values() for block in blocks.values()), tile_counts
+            )
+            for label, count in tile_counts.items():
+                chr_layout.remaps[label] = tuple(range(bases[label], bases[label] + count))
+                names.update({chr_tile_label(label, i): index for i, index in enumerate(chr_layout.remaps[label])})
+                names[label] = bases[label]
+        else:
+            tile_indices = {TEST_TILE: 0}
+            for block in self.code_blocks[RomCodeArea.CHR_ROM].values():
+                data = self._render_block(block, 0, names).code
+                remap = []
+                for tile_start in range(0, len(data), CHR_TILE_SIZE):
+                    tile = bytes(data[tile_start : tile_start + CHR_TILE_SIZE]).ljust(CHR_TILE_SIZE, b"\x00")
+                    index = tile_indices.get(tile)
+                    if index is None:
+                        index = tile_indices[tile] = len(chr_layout.tiles)
+                        chr_layout.tiles.append(tile)
+                    else:
+                        chr_layout.bytes_saved += CHR_TILE_SIZE
+                    names[chr_tile_label(block.label, len(remap))] = index
+                    remap.append(index)
+                chr_layout.remaps[block.label] = tuple(remap)
+                names[block.label] = remap[0] if remap else len(chr_layout.tiles)
+        self.layout.chr = chr_layout
+
+        chr_size = len(chr_layout.tiles) * CHR_TILE_SIZE
+        if chr_size > CHR_ROM_SIZE:
+            raise ValueError(f"CHR ROM overflow: tiles are {chr_size - CHR_ROM_SIZE} bytes too large")
+
+        def aliased(
+            block: CodeBlock, rendered: RenderedCodeBlock, offset: int, data_addresses: dict[bytes, int]
+        ) -> bool:
+            """Export the address of an identical data block placed before, if there is one, instead of a copy."""
+            if not (block.position_independent and rendered.code):
+                return False
+            address = data_addresses.setdefault(bytes(rendered.code), offset)
+            if address == offset:
+                return False
+            exported = rendered.exported_labels.items()
+            names.update({label: value - offset + address for label, value in exported})
+            self.layout.data_aliases[block.label] = address
+            self.layout.data_bytes_saved += len(rendered.code)
+            return True
 
         # Step 2: PRG ROM block
         # Start at beginning of 16KB PRG ROM ($C000 in second bank)
-        prg_rom_start = 0xC000
-
-        # Collect all PRG_ROM blocks
         # NOTE: Do NOT reverse - builder already handles dependency order
-        prg_blocks = list(self.code_blocks[RomCodeArea.PRG_ROM].values())
-
-        # Start PRG ROM at beginning of PRG ROM area
-        prg_offset = prg_rom_start
-        prg_code = bytearray()
-
-        for block in prg_blocks:
-            rendered = block.render(start_offset=prg_offset, names=names)
-            prg_code.extend(rendered.code)
+        prg_offset = PRG_ROM_START
+        # Bytes of the position-independent data blocks placed so far -> their address
+        data_addresses: dict[bytes, int] = {}
+
+        for block in self.code_blocks[RomCodeArea.PRG_ROM].values():
+            if block.label in banked:
+                continue
+            if prg_offset > VECTORS_OFFSET:
+                # Stop before addresses past $FFFF reach the blocks that point at them
+                raise ValueError(f"PRG ROM overflow: code is at least {prg_offset - VECTORS_OFFSET} bytes too large")
+            if self.layout.banks is not None:
+                names[bank_label(block.label)] = self.layout.banks.fixed_bank
+            rendered = self._render_block(block, prg_offset, names)
+            if aliased(block, rendered, prg_offset, data_addresses):
+                continue
+            emit_prg(prg_offset, rendered.code)
             names.update(rendered.exported_labels)
-            prg_offset += block.size
-
-        # Step 3: NMI routine - post vblank first, then vblank
-        nmi_code = bytearray()
+            prg_offset += len(rendered.code)
+
+        # Banked data only points at data in its own bank or in the fixed bank, which is placed by now
+        for bank, labels in enumerate(self.layout.banks.banks if self.layout.banks is not None else []):
+            bank_rom = view[INES_HEADER_SIZE + bank * BANK_SIZE : INES_HEADER_SIZE + (bank + 1) * BANK_SIZE]
+            bank_offset = SWITCHABLE_BANK_START
+            bank_data_addresses: dict[bytes, int] = {}
+            for label in labels:
+                block = self.code_blocks[RomCodeArea.PRG_ROM][label]
+                names[bank_label(label)] = bank
+                rendered = self._render_block(block, bank_offset, names)
+                if aliased(block, rendered, bank_offset, bank_data_addresses):
+                    continue
+                start = bank_offset - SWITCHABLE_BANK_START
+                if start + len(rendered.code) > BANK_SIZE:
+                    raise ValueError(f"PRG bank {bank} overflow: '{label}' renders larger than its size.")
+                bank_rom[start : start + len(rendered.code)] = rendered.code
+                names.update(rendered.exported_labels)
+                bank_offset += len(rendered.code)
+
+        # Step 3: NMI routine - vblank first, while the PPU can be written, then post vblank
         nmi_offset = prg_offset
         nmi_start_offset = nmi_offset
 
-        # Add post vblank blocks
-        for block in self.code_blocks[RomCodeArea.NMI_POST_VBLANK].values():
-            rendered = block.render(start_offset=nmi_offset, names=names)
-            nmi_code.extend(rendered.code)
-            names.update(rendered.exported_labels)
-            nmi_offset += block.size
-
         # Add vblank blocks
         for block in self.code_blocks[RomCodeArea.NMI_VBLANK].values():
-            rendered = block.render(start_offset=nmi_offset, names=names)
-            nmi_code.extend(rendered.code)
+            rendered = self._render_block(block, nmi_offset, names)
+            emit_prg(nmi_offset, rendered.code)
             names.update(rendered.exported_labels)
-            nmi_offset += block.size
+            nmi_offset += len(rendered.code)
+
+        # Add post vblank blocks
+        for block in self.code_blocks[RomCodeArea.NMI_POST_VBLANK].values():
+            rendered = self._render_block(block, nmi_offset, names)
+            emit_prg(nmi_offset, rendered.code)
+            names.update(rendered.exported_labels)
+            nmi_offset += len(rendered.code)
 
         # Add RTI to end NMI
-        nmi_code.append(0x40)  # RTI opcode
+        emit_prg(nmi_offset, b"\x40")  # RTI opcode
         nmi_offset += 1
 
         # Step 4: Reset routine
-        reset_code = bytearray()
         reset_offset = nmi_offset
         reset_start_offset = reset_offset
 
         for block in self.code_blocks[RomCodeArea.RESET].values():
-            rendered = block.render(start_offset=reset_offset, names=names)
-            reset_code.extend(rendered.code)
+            rendered = self._render_block(block, reset_offset, names)
+            emit_prg(reset_offset, rendered.code)
             names.update(rendered.exported_labels)
-            reset_offset += block.size
+            reset_offset += len(rendered.code)
 
         # Step 5: Final assembly
-        # Combine PRG ROM sections
-        full_prg = prg_code + nmi_code + reset_code
-
-        # Add vector table at end of PRG ROM ($FFFA-$FFFF)
-        # Pad to reach vector table location
-        vectors_offset = 0xFFFA
-        padding_needed = (vectors_offset - prg_rom_start) - len(full_prg)
+        # The gap up to the vector table ($FFFA-$FFFF) is already zero padding
+        if reset_offset > VECTORS_OFFSET:
+            raise ValueError(f"PRG ROM overflow: code is {reset_offset - VECTORS_OFFSET} bytes too large")
 
-        if padding_needed < 0:
-            raise ValueError(f"PRG ROM overflow: code is {-padding_needed} bytes too large")
+        self.layout.cycles = self._analyze_cycles()
 
-        full_prg.extend(b"\x00" * padding_needed)
-
-        # Add vectors: NMI, RESET, IRQ
-        # NMI vector
-        full_prg.extend(nmi_start_offset.to_bytes(2, "little"))
-        # RESET vector
-        full_prg.extend(reset_start_offset.to_bytes(2, "little"))
-        # IRQ vector (unused, point to RTI)
-        full_prg.extend(nmi_start_offset.to_bytes(2, "little"))
+        # Add vectors: NMI, RESET, IRQ (unused, point to RTI)
+        vectors = prg_rom[VECTORS_OFFSET - PRG_ROM_START :]
+        vectors[0:2] = nmi_start_offset.to_bytes(2, "little")
+        vectors[2:4] = reset_start_offset.to_bytes(2, "little")
+        vectors[4:6] = nmi_start_offset.to_bytes(2, "little")
 
         # NES ROM header (iNES format)
-        # See: https://www.nesdev.org/wiki/INES
-        header = bytearray(
-            [
-                0x4E,
-                0x45,
-                0x53,
-                0x1A,  # "NES" + MS-DOS EOF
-                0x01,  # 1x 16KB PRG ROM
-                0x01,  # 1x 8KB CHR ROM
-                0x00,  # Mapper 0, horizontal mirroring
-                0x00,  # Mapper 0 (continued)
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,  # Padding
-            ]
-        )
-
-        # CHR ROM (8KB of pattern tables)
-        # Build from CHR code blocks
-        chr_rom = bytearray(8192)
-
-        # Add test pattern for first tile (4 quadrants) at index 0
-        # Low bit plane (bit 0 of color)
-        chr_rom[0] = 0b00001111  # Row 0: color 0 left half, color 1 right half
-        chr_rom[1] = 0b00001111  # Row 1
-        chr_rom[2] = 0b00001111  # Row 2
-        chr_rom[3] = 0b00001111  # Row 3
-        chr_rom[4] = 0b00001111  # Row 4: color 2 left half, color 3 right half
-        chr_rom[5] = 0b00001111  # Row 5
-        chr_rom[6] = 0b00001111  # Row 6
-        chr_rom[7] = 0b00001111  # Row 7
-
-        # High bit plane (bit 1 of color)
-        chr_rom[8] = 0b00000000  # Row 0: color 0 left half, color 1 right half
-        chr_rom[9] = 0b00000000  # Row 1
-        chr_rom[10] = 0b00000000  # Row 2
-        chr_rom[11] = 0b00000000  # Row 3
-        chr_rom[12] = 0b11111111  # Row 4: color 2 left half, color 3 right half
-        chr_rom[13] = 0b11111111  # Row 5
-        chr_rom[14] = 0b11111111  # Row 6
-        chr_rom[15] = 0b11111111  # Row 7
-
-        # Render CHR data blocks (tile indices were pre-calculated in Step 1.5)
-        chr_offset = 16  # Start after background tile
-        for block in self.code_blocks[RomCodeArea.CHR_ROM].values():
-            rendered = block.render(start_offset=chr_offset, names=names)
-            chr_rom[chr_offset : chr_offset + len(rendered.code)] = rendered.code
-            # Labels were already exported in Step 1.5, so don't update names again
-            chr_offset += block.size
-
-        chr_rom = bytes(chr_rom)
-
-        # Final ROM: header + PRG ROM + CHR ROM
-        return bytes(header + full_prg + chr_rom)
+        view[:INES_HEADER_SIZE] = INES_HEADER
+        view[4] = prg_size // PRG_ROM_SIZE
+        view[5] = 0 if self.chr_ram else 1
+        view[6] = (self.mapper.ines_number & 0x0F) << 4
+        view[7] = self.mapper.ines_number & 0xF0
+
+        # CHR ROM (8KB of pattern tables): test pattern at index 0, then the unique tiles laid out in Step 1.5
+        for index, tile in enumerate(chr_layout.tiles):
+            chr_rom[index * CHR_TILE_SIZE : (index + 1) * CHR_TILE_SIZE] = tile
+
+        # Final ROM: header + PRG ROM + CHR ROM, handed out without copying
+        return view.toreadonly()
 
 
 def get_empty_rom() -> Rom:
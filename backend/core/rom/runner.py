@@ -0,0 +1,307 @@
+import time
+from dataclasses import dataclass, field
+
+from core.rom.cpu import Cpu6502
+from core.rom.cycles import CYCLES_PER_FRAME, OAM_DMA_CYCLES, VBLANK_CYCLES
+from core.rom.rom import INES_HEADER_SIZE, RomCodeArea, RomImage, RomLayout
+
+PPUCTRL_NMI = 0x80
+PPUCTRL_INCREMENT_32 = 0x04
+PPUSTATUS_VBLANK = 0x80
+
+# Code areas whose cycles are accounted separately; code elsewhere (subroutines) counts toward its caller's area
+_ACCOUNTED_AREAS = (RomCodeArea.RESET, RomCodeArea.NMI_POST_VBLANK, RomCodeArea.NMI_VBLANK)
+
+
+class PpuStub:
+    """
+    The CPU-visible side of the PPU: its eight registers and the memories they write, without rendering.
+
+    - PPUSTATUS reports and clears the VBlank flag and resets the address latch
+    - PPUADDR/PPUDATA write through to VRAM ($0000-$3FFF, palette RAM mirrored as on hardware)
+    - OAMADDR/OAMDATA and OAM DMA write to the 256 bytes of OAM
+    - enabling NMI during VBlank requests an NMI, as on hardware
+    """
+
+    def __init__(self):
+        self.ctrl = 0
+        self.mask = 0
+        self.status = 0
+        self.oam_address = 0
+        self.vram_address = 0
+        self.scroll = [0, 0]
+        self.vram = bytearray(0x4000)
+        self.oam = bytearray(256)
+        self.nmi_requested = False
+        self.writes = 0
+        self._latch = 0
+        self._read_buffer = 0
+
+    @property
+    def palette(self) -> bytes:
+        """The 32 bytes of palette RAM ($3F00-$3F1F), as read through the mirrors."""
+        return bytes(self.vram[self._vram_index(address)] for address in range(0x3F00, 0x3F20))
+
+    def start_vblank(self) -> None:
+        self.status |= PPUSTATUS_VBLANK
+        if self.ctrl & PPUCTRL_NMI:
+            self.nmi_requested = True
+
+    def end_vblank(self) -> None:
+        self.status &= ~PPUSTATUS_VBLANK & 0xFF
+
+    def _vram_index(self, address: int) -> int:
+        address &= 0x3FFF
+        if address >= 0x3F00:
+            address &= 0x3F1F
+            # The sprite palettes' backdrop entries mirror the background ones
+            if address & 0x03 == 0 and address & 0x10:
+                address &= ~0x10
+        return address
+
+    def read(self, register: int) -> int:
+        if register == 2:
+            value = self.status
+            self.status &= ~PPUSTATUS_VBLANK & 0xFF
+            self._latch = 0
+            return value
+        if register == 4:
+            return self.oam[self.oam_address]
+        if register == 7:
+            index = self._vram_index(self.vram_address)
+            if index >= 0x3F00:
+                value = self.vram[index]
+            else:
+                value, self._read_buffer = self._read_buffer, self.vram[index]
+            self._increment()
+            return value
+        return 0
+
+    def write(self, register: int, value: int) -> None:
+        self.writes += 1
+        if register == 0:
+            if value & PPUCTRL_NMI and not self.ctrl & PPUCTRL_NMI and self.status & PPUSTATUS_VBLANK:
+                self.nmi_requested = True
+            self.ctrl = value
+        elif register == 1:
+            self.mask = value
+        elif register == 3:
+            self.oam_address = value
+        elif register == 4:
+            self.oam[self.oam_address] = value
+            self.oam_address = (self.oam_address + 1) & 0xFF
+        elif register == 5:
+            self.scroll[self._latch] = value
+            self._latch ^= 1
+        elif register == 6:
+            if self._latch == 0:
+                self.vram_address = (value & 0x3F) << 8 | (self.vram_address & 0xFF)
+            else:
+                self.vram_address = (self.vram_address & 0xFF00) | value
+            self._latch ^= 1
+        elif register == 7:
+            self.vram[self._vram_index(self.vram_address)] = value
+            self._increment()
+
+    def _increment(self) -> None:
+        step = 32 if self.ctrl & PPUCTRL_INCREMENT_32 else 1
+        self.vram_address = (self.vram_address + step) & 0x3FFF
+
+
+class NesBus:
+    """
+    The NES CPU memory map for an NROM or UxROM cartridge.
+
+    $0000-$1FFF 2KB RAM (mirrored), $2000-$3FFF PPU registers (mirrored), $4014 OAM DMA,
+    $6000-$7FFF work RAM, $8000-$FFFF PRG ROM (a 16KB NROM image is mirrored). On UxROM (mapper 2)
+    $C000-$FFFF is the last bank and a write to $8000-$FFFF maps bank (value AND the ROM byte written
+    to, a bus conflict) at $8000-$BFFF. APU and controller registers read as 0 and ignore writes.
+    """
+
+    def __init__(self, prg_rom: bytes, ppu: PpuStub, mapper: int = 0):
+        banks, remainder = divmod(len(prg_rom), 0x4000)
+        if remainder or banks == 0 or (mapper == 0 and banks > 2) or mapper not in (0, 2):
+            raise ValueError(f"Unsupported PRG ROM size for mapper {mapper}: {len(prg_rom)} bytes.")
+        self.ram = bytearray(0x800)
+        self.work_ram = bytearray(0x2000)
+        self.prg_rom = bytes(prg_rom)
+        self.ppu = ppu
+        self.dma_cycles = 0
+        self.mapper = mapper
+        self.banks = banks
+        # Offsets in prg_rom of the banks mapped at $8000 and $C000
+        self.bank_offset = 0
+        self.fixed_offset = (banks - 1) * 0x4000
+
+    def switch_bank(self, bank: int) -> None:
+        """Map a bank at $8000-$BFFF, as a UxROM bank register write does."""
+        self.bank_offset = (bank % self.banks) * 0x4000
+
+    def read(self, address: int) -> int:
+        if address < 0x2000:
+            return self.ram[address & 0x7FF]
+        if address >= 0xC000:
+            return self.prg_rom[self.fixed_offset + (address & 0x3FFF)]
+        if address >= 0x8000:
+            return self.prg_rom[self.bank_offset + (address & 0x3FFF)]
+        if address < 0x4000:
+            return self.ppu.read(address & 7)
+        if address >= 0x6000:
+            return self.work_ram[address - 0x6000]
+        return 0
+
+    def write(self, address: int, value: int) -> None:
+        if address < 0x2000:
+            self.ram[address & 0x7FF] = value
+        elif address < 0x4000:
+            self.ppu.write(address & 7, value)
+        elif address == 0x4014:
+            page = value << 8
+            oam = self.ppu.oam
+            for i in range(256):
+                oam[(self.ppu.oam_address + i) & 0xFF] = self.read(page + i)
+            # The CPU is stalled while the DMA copies
+            self.dma_cycles += OAM_DMA_CYCLES
+        elif 0x6000 <= address < 0x8000:
+            self.work_ram[address - 0x6000] = value
+        elif address >= 0x8000 and self.mapper == 2:
+            self.switch_bank(value & self.read(address))
+
+
+def area_ranges(layout: RomLayout) -> list[tuple[int, int, RomCodeArea]]:
+    """[start, end) CPU address ranges of the accounted code areas, from the layout of a render."""
+    ranges = []
+    for record in layout.records.values():
+        area = RomCodeArea.from_code_block_type(record.block.type)
+        if area in _ACCOUNTED_AREAS and record.rendered.code:
+            ranges.append((record.start_offset, record.start_offset + len(record.rendered.code), area))
+    return sorted(ranges, key=lambda r: r[0])
+
+
+@dataclass
+class FrameStats:
+    """
+    CPU time spent during one frame, which starts when VBlank starts.
+
+    cycles_by_area attributes every executed cycle (including NMI entry and OAM DMA stalls) to the code area
+    whose code was running; subroutines count toward the area that called them. idle_cycles are the cycles the
+    CPU spent waiting in a jump-to-self loop. vblank_overrun is set when NMI_VBLANK code was still running after
+    VBlank ended, i.e. it touched the PPU while it was rendering.
+    """
+
+    cycles: int = 0
+    idle_cycles: int = 0
+    nmi_cycles: int = 0
+    dma_cycles: int = 0
+    cycles_by_area: dict[RomCodeArea | None, int] = field(default_factory=dict)
+    vblank_overrun: bool = False
+
+
+@dataclass
+class RunReport:
+    boot: FrameStats
+    frames: list[FrameStats]
+    instructions: int
+    seconds: float
+
+    def max_cycles(self, area: RomCodeArea) -> int:
+        """The most cycles any frame spent in an area."""
+        return max((frame.cycles_by_area.get(area, 0) for frame in self.frames), default=0)
+
+
+class HeadlessRunner:
+    """
+    Boots an iNES image on the built-in 6502 core with a stubbed PPU and runs it frame by frame.
+
+    Pass the layout of the render (Rom.layout) to get per-area cycle accounting; without it every cycle is
+    attributed to None. A CPU waiting in a jump-to-self loop is fast-forwarded to the next frame, so idle time
+    costs nothing to simulate.
+
+    Usage:
+        rom = builder.compile(snapshot)
+        report = HeadlessRunner(rom, layout=builder.rom.layout).run(frames=60)
+        report.max_cycles(RomCodeArea.NMI_VBLANK)
+    """
+
+    def __init__(self, rom: RomImage, layout: RomLayout | None = None):
+        rom = bytes(rom)
+        if rom[:4] != b"NES\x1a":
+            raise ValueError("Not an iNES image.")
+        mapper = (rom[6] >> 4) | (rom[7] & 0xF0)
+        if mapper not in (0, 2):
+            raise ValueError("Only mapper 0 (NROM) and mapper 2 (UxROM) images can be run.")
+        prg_size = rom[4] * 0x4000
+        self.ppu = PpuStub()
+        self.bus = NesBus(rom[INES_HEADER_SIZE : INES_HEADER_SIZE + prg_size], self.ppu, mapper=mapper)
+        self.cpu = Cpu6502(self.bus)
+
+        # Per-address area lookup: 0 means "inherit the caller's area"
+        self._areas: list[RomCodeArea | None] = [None, *_ACCOUNTED_AREAS]
+        self._area_index = bytearray(0x10000)
+        for start, end, area in area_ranges(layout) if layout is not None else []:
+            self._area_index[start:end] = bytes([self._areas.index(area)]) * (end - start)
+        self._area = 1 if layout is not None else 0
+        self._carry_cycles = 0
+        self._in_nmi = False
+
+    def run(self, frames: int) -> RunReport:
+        """Reset the CPU, run until the first VBlank, then run the given number of frames."""
+        start = time.perf_counter()
+        self.cpu.reset()
+        self._carry_cycles = 0
+        boot = self._run_until(CYCLES_PER_FRAME - VBLANK_CYCLES, vblank=False)
+        stats = [self.run_frame() for _ in range(frames)]
+        return RunReport(boot, stats, self.cpu.instructions, time.perf_counter() - start)
+
+    def run_frame(self) -> FrameStats:
+        """Run one frame, starting at the beginning of VBlank."""
+        self.ppu.start_vblank()
+        return self._run_until(CYCLES_PER_FRAME, vblank=True)
+
+    def _run_until(self, budget: int, vblank: bool) -> FrameStats:
+        cpu, ppu = self.cpu, self.ppu
+        area_index, areas = self._area_index, self._areas
+        vblank_area = areas.index(RomCodeArea.NMI_VBLANK)
+        by_area = [0] * len(areas)
+        stats = FrameStats()
+        area = self._area
+        cycle = start = self._carry_cycles
+
+        while cycle < budget:
+            if vblank and cycle >= VBLANK_CYCLES:
+                ppu.end_vblank()
+                vblank = False
+
+            if ppu.nmi_requested:
+                ppu.nmi_requested = False
+                self._in_nmi = True
+                cycles = cpu.nmi()
+                area = area_index[cpu.pc] or area
+                returned = False
+            else:
+                area = area_index[cpu.pc] or area
+                cycles = cpu.step()
+                if cpu.idle:
+                    # Waiting for an interrupt: skip ahead to the end of the frame
+                    stats.idle_cycles += budget - cycle - cycles
+                    cycle = budget - cycles
+                returned = cpu.opcode == 0x40
+
+            dma, self.bus.dma_cycles = self.bus.dma_cycles, 0
+            cycles += dma
+            stats.dma_cycles += dma
+            if self._in_nmi:
+                stats.nmi_cycles += cycles
+                self._in_nmi = not returned
+            if area == vblank_area and not vblank:
+                stats.vblank_overrun = True
+            by_area[area] += cycles
+            cycle += cycles
+
+        if vblank:
+            ppu.end_vblank()
+        self._area = area
+        self._carry_cycles = cycle - budget
+        stats.cycles = cycle - start
+        stats.cycles_by_area = {areas[i]: n for i, n in enumerate(by_area) if n}
+        return stats
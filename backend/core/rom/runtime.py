@@ -0,0 +1,126 @@
+import logging
+import time
+from itertools import combinations
+
+from config import settings
+from core.rom.asm import ObjectCode
+from core.rom.code_block import AssembledCodeBlock, CodeBlock
+from core.rom.data import BankTableData, TestTileCHRData
+from core.rom.entity_ram import EntityLayout
+from core.rom.subroutines import (
+    FlushVramQueueBlock,
+    LoadSceneSubroutine,
+    QueueVramWriteSubroutine,
+    RenderEntitiesSubroutine,
+    RenderSpritesBlock,
+    SwitchBankSubroutine,
+    UnpackDataSubroutine,
+    UpdateHandler,
+    UploadChrSubroutine,
+    VBlankHandler,
+)
+from core.rom.zero_page import (
+    ZeroPageEntitiesDirty,
+    ZeroPageEntityCount,
+    ZeroPageEntityRAM,
+    ZeroPageSource1,
+    ZeroPageSource2,
+    ZeroPageSpriteRAM,
+    ZeroPageUnpackCount,
+    ZeroPageUnpackInput,
+    ZeroPageVramQueueHead,
+    ZeroPageVramQueueTail,
+    ZeroPageVramRecordSize,
+    ZeroPageVramRecordsLeft,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RuntimeLibrary:
+    """
+    The built-in runtime shared by every game, assembled once per process.
+
+    - holds one instance of each built-in code block; every code block registry shares these instances
+    - assembles the object code for every combination of a block's optional dependencies up front, so
+      building a ROM only links (relocates) the runtime and never runs the assembler on it
+    - after construction the object code caches are only read, so the library is safe to share across threads
+    """
+
+    def __init__(self, code_blocks: dict[str, CodeBlock]):
+        start = time.perf_counter()
+        self.code_blocks = code_blocks
+        self.object_code: dict[tuple[str, frozenset[str]], ObjectCode] = {}
+        for label, block in code_blocks.items():
+            if isinstance(block, AssembledCodeBlock):
+                for optional in _subsets(block.optional_dependencies):
+                    self.object_code[(label, optional)] = block.object_code(optional)
+        self.sizes: dict[str, int] = {label: block.size for label, block in code_blocks.items()}
+        self.build_seconds = time.perf_counter() - start
+        logger.info(
+            f"Assembled runtime library: {len(code_blocks)} blocks, {len(self.object_code)} variants, "
+            f"{sum(self.sizes.values())} bytes in {self.build_seconds * 1000:.1f} ms"
+        )
+
+    def __contains__(self, label: str) -> bool:
+        return label in self.code_blocks
+
+    def __getitem__(self, label: str) -> CodeBlock:
+        return self.code_blocks[label]
+
+
+def _subsets(labels: list[str]) -> list[frozenset[str]]:
+    return [frozenset(subset) for n in range(len(labels) + 1) for subset in combinations(labels, n)]
+
+
+runtime_library = RuntimeLibrary(
+    {
+        # Zero page
+        "zp__src1": ZeroPageSource1(),
+        "zp__src2": ZeroPageSource2(),
+        "zp__entity_ram_page": ZeroPageEntityRAM(),
+        "zp__sprite_ram_page": ZeroPageSpriteRAM(),
+        "zp__entity_count": ZeroPageEntityCount(),
+        "zp__entities_dirty": ZeroPageEntitiesDirty(),
+        "zp__vram_queue_head": ZeroPageVramQueueHead(),
+        "zp__vram_queue_tail": ZeroPageVramQueueTail(),
+        "zp__vram_record_size": ZeroPageVramRecordSize(),
+        "zp__vram_records_left": ZeroPageVramRecordsLeft(),
+        "zp__unpack_count": ZeroPageUnpackCount(),
+        "zp__unpack_input": ZeroPageUnpackInput(),
+        # Subroutines
+        "load_scene": LoadSceneSubroutine(),
+        "render_entities": RenderEntitiesSubroutine(),
+        "queue_vram_write": QueueVramWriteSubroutine(),
+        "unpack_data": UnpackDataSubroutine(),
+        "switch_bank": SwitchBankSubroutine(),
+        # Data
+        "bank_table": BankTableData(),
+        "chr__test_tile": TestTileCHRData(),
+        # VBlank code blocks
+        "render_sprites": RenderSpritesBlock(),
+        "flush_vram_queue": FlushVramQueueBlock(budget_cycles=settings.ROM_VRAM_FLUSH_CYCLES),
+        # Handlers (always included)
+        "vblank_handler": VBlankHandler(),
+        "update_handler": UpdateHandler(),
+    }
+)
+
+
+def _option_blocks(chr_ram: bool, entity_layout: EntityLayout) -> dict[str, CodeBlock]:
+    blocks: dict[str, CodeBlock] = {"load_scene": LoadSceneSubroutine(chr_ram=chr_ram, entity_layout=entity_layout)}
+    if chr_ram:
+        blocks["upload_chr"] = UploadChrSubroutine()
+    if entity_layout != EntityLayout.ARRAY_OF_STRUCTS:
+        blocks["render_entities"] = RenderEntitiesSubroutine(entity_layout=entity_layout)
+    return blocks
+
+
+# The blocks that ROMs built with CHR RAM or another entity layout link instead of (or in addition to) the
+# runtime's, by (chr_ram, entity_layout), assembled once as well
+option_runtime_libraries: dict[tuple[bool, EntityLayout], RuntimeLibrary] = {
+    (chr_ram, entity_layout): RuntimeLibrary(_option_blocks(chr_ram, entity_layout))
+    for chr_ram in (False, True)
+    for entity_layout in EntityLayout
+    if chr_ram or entity_layout != EntityLayout.ARRAY_OF_STRUCTS
+}
@@ -0,0 +1,71 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+
+
+@dataclass
+class SingleFlightStats:
+    in_flight: int
+    executed: int
+    deduplicated: int
+
+
+class _Call:
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical async calls: while a call for a key is in flight, further calls for the same
+    key wait for it and receive the same result (or exception) instead of starting their own.
+
+    The call runs as its own task, so a waiter being cancelled (e.g. its client disconnected) does not affect the
+    others; the call itself is only cancelled once every waiter has gone.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.deduplicated = 0
+
+    async def do[T](self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Return (result, shared), where shared is True if the result came from another caller's call."""
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.executed += 1
+        else:
+            self.deduplicated += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task), shared
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> SingleFlightStats:
+        return SingleFlightStats(in_flight=len(self._calls), executed=self.executed, deduplicated=self.deduplicated)
+
+
+# Concurrent renders of the same (game_id, revision) share one compilation
+render_singleflight = SingleFlight()
+
+
+def get_render_singleflight() -> SingleFlight:
+    return render_singleflight
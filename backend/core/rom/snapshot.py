@@ -0,0 +1,108 @@
+import hashlib
+import json
+import uuid
+from enum import Enum
+from typing import TYPE_CHECKING, Any, Self
+
+from pydantic import BaseModel
+
+from core.schemas import AssetData, AssetType, ComponentData, GameData, NESEntity, NESScene
+
+if TYPE_CHECKING:
+    from api.games.models import Game
+
+
+class ComponentSnapshot(BaseModel):
+    id: uuid.UUID
+    name: str
+    component_data: ComponentData
+
+
+class EntitySnapshot(BaseModel):
+    id: uuid.UUID
+    name: str
+    entity_data: NESEntity
+    components: list[ComponentSnapshot] = []
+
+
+class SceneSnapshot(BaseModel):
+    id: uuid.UUID
+    name: str
+    scene_data: NESScene
+
+
+class AssetSnapshot(BaseModel):
+    id: uuid.UUID
+    name: str
+    type: AssetType
+    data: AssetData
+
+
+class GameSnapshot(BaseModel):
+    """
+    A detached, normalized copy of everything the ROM compiler reads from a game.
+
+    - mirrors the attribute names of the db models, so the label and code block registries accept either
+    - children are sorted by id, so two loads of an unchanged game produce identical snapshots
+    - the game name is deliberately excluded: renaming a game does not change its ROM
+    - the revision is carried along but excluded from the fingerprint: a no-op write does not change the ROM
+    """
+
+    id: uuid.UUID
+    revision: int = 0
+    game_data: GameData
+    scenes: list[SceneSnapshot] = []
+    assets: list[AssetSnapshot] = []
+    entities: list[EntitySnapshot] = []
+
+    @classmethod
+    def from_model(cls, game: "Game") -> Self:
+        return cls(
+            id=game.id,
+            revision=game.revision,
+            game_data=game.game_data,
+            scenes=sorted(
+                (SceneSnapshot(id=s.id, name=s.name, scene_data=s.scene_data) for s in game.scenes),
+                key=lambda s: s.id,
+            ),
+            assets=sorted(
+                (AssetSnapshot(id=a.id, name=a.name, type=a.type, data=a.data) for a in game.assets),
+                key=lambda a: a.id,
+            ),
+            entities=sorted(
+                (
+                    EntitySnapshot(
+                        id=e.id,
+                        name=e.name,
+                        entity_data=e.entity_data,
+                        components=sorted(
+                            (
+                                ComponentSnapshot(id=c.id, name=c.name, component_data=c.component_data)
+                                for c in e.components
+                            ),
+                            key=lambda c: c.id,
+                        ),
+                    )
+                    for e in game.entities
+                ),
+                key=lambda e: e.id,
+            ),
+        )
+
+    def fingerprint(self) -> str:
+        """Stable sha256 of the snapshot contents."""
+        # model_dump_json() cannot encode arbitrary CHR bytes, so canonicalize by hand
+        encoded = json.dumps(
+            self.model_dump(exclude={"revision"}), sort_keys=True, separators=(",", ":"), default=_json_default
+        )
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Cannot canonicalize {type(value).__name__} for fingerprinting.")
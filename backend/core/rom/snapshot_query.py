@@ -0,0 +1,76 @@
+import uuid
+from typing import Any
+
+from sqlalchemy import JSON, ColumnElement, Select, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from api.games.assets.models import Asset
+from api.games.components.models import Component
+from api.games.entities.models import Entity
+from api.games.models import Game
+from api.games.scenes.models import Scene
+from core.rom.snapshot import GameSnapshot
+from core.schemas import AssetType
+
+
+def _json_object(**fields: ColumnElement) -> ColumnElement:
+    # Keys are code constants, so inline them rather than binding untyped parameters
+    args: list[ColumnElement] = []
+    for key, value in fields.items():
+        args.extend((literal_column(f"'{key}'"), value))
+    return func.json_build_object(*args, type_=JSON)
+
+
+def _json_array(element: ColumnElement, order_by: ColumnElement, where: ColumnElement) -> ColumnElement:
+    """A correlated subquery aggregating element over matching rows, ordered by order_by ([] if none)."""
+    return (
+        select(func.coalesce(func.json_agg(aggregate_order_by(element, order_by)), func.json_build_array()))
+        .where(where)
+        .scalar_subquery()
+    )
+
+
+def game_snapshot_query(game_id: uuid.UUID) -> Select:
+    """
+    A single SELECT returning a game and all its children as one JSON document shaped like GameSnapshot.
+
+    Children are ordered by id in the database; Postgres orders uuids bytewise, which matches uuid.UUID ordering,
+    so the document is already normalized the way GameSnapshot.from_model() normalizes.
+    """
+    components = _json_array(
+        _json_object(id=Component.id, name=Component.name, component_data=Component.component_data),
+        order_by=Component.id,
+        where=Component.entity_id == Entity.id,
+    )
+    entities = _json_array(
+        _json_object(id=Entity.id, name=Entity.name, entity_data=Entity.entity_data, components=components),
+        order_by=Entity.id,
+        where=Entity.game_id == Game.id,
+    )
+    scenes = _json_array(
+        _json_object(id=Scene.id, name=Scene.name, scene_data=Scene.scene_data),
+        order_by=Scene.id,
+        where=Scene.game_id == Game.id,
+    )
+    assets = _json_array(
+        _json_object(id=Asset.id, name=Asset.name, type=Asset.type, data=Asset.data),
+        order_by=Asset.id,
+        where=Asset.game_id == Game.id,
+    )
+    document = _json_object(
+        id=Game.id,
+        revision=Game.revision,
+        game_data=Game.game_data,
+        scenes=scenes,
+        assets=assets,
+        entities=entities,
+    )
+    return select(document).where(Game.id == game_id)
+
+
+def decode_game_snapshot(document: dict[str, Any]) -> GameSnapshot:
+    """Validate a document produced by game_snapshot_query() straight into a GameSnapshot."""
+    for asset in document["assets"]:
+        # The asset type column is a native enum, which stores member names rather than values
+        asset["type"] = AssetType[asset["type"]]
+    return GameSnapshot.model_validate(document)
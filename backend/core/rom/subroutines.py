@@ -1,207 +1,165 @@
-from core.rom.asm import Asm6502
-from core.rom.code_block import CodeBlock, CodeBlockType, RenderedCodeBlock
+from core.rom.asm import Asm6502, LabelRef
+from core.rom.code_block import AssembledCodeBlock, CodeBlockType
+from core.rom.compression import MAX_UNPACKED_SIZE, UNPACK_BUFFER_PAGE, PackMethod
+from core.rom.entity_ram import ENTITY_RAM_PAGE, EntityField, EntityLayout
+from core.rom.rom import CHR_ROM_SIZE
 from core.schemas import ENTITY_SIZE_BYTES, MAX_N_SCENE_ENTITIES
 
+VRAM_QUEUE_PAGE = 0x04  # $0400-$04FF
+# Where load_scene stages its two palette records before queueing them ($0600-$0625)
+SCENE_PALETTE_RECORDS = 0x0600
+# One nametable row, or all 32 palette entries
+MAX_VRAM_RECORD_LENGTH = 32
 
-class LoadSceneSubroutine(CodeBlock):
+# Worst cases of flush_vram_queue, with every taken branch crossing a page: entering and leaving it with records
+# queued, and writing one record of MAX_VRAM_RECORD_LENGTH bytes
+_FLUSH_CYCLES = 36
+_FLUSH_RECORD_CYCLES = 26 + MAX_VRAM_RECORD_LENGTH * 16 + 12
+
+
+class LoadSceneSubroutine(AssembledCodeBlock):
     """
     The built-in load scene subroutine code block.
 
-    Loads a scene's palette data into PPU memory and entities into RAM:
-    1. Load background color (byte 0) into palette index 0
-    2. Load background palette data (12 bytes) if pointer is non-null
-    3. Load sprite palette data (12 bytes) if pointer is non-null
-    4. Load entity data into RAM page $0200-$02FF (null-terminated list)
-    5. Enable PPU rendering and NMI
+    Queues a scene's palette data for the PPU and loads its entities into RAM:
+    1. Empty the VRAM queue: writes queued for the previous scene are dropped
+    2. Queue the background color (byte 0) for palette index 0, with the background palette data (12 bytes)
+       if pointer is non-null (queue_vram_write; flush_vram_queue writes it in the next VBlank)
+    3. Queue the sprite palette data (12 bytes) if pointer is non-null
+    4. Load entity data into RAM page $0200-$02FF (null-terminated list) and their count into zp__entity_count,
+       and mark the entities dirty so the next frame rebuilds the sprites
+    5. Hide the sprite slots past the last entity (Y = $FF) in sprite RAM ($0300-$03FF)
+    6. With chr_ram, upload the scene's tiles to pattern memory (upload_chr); this leaves zp__src1 pointing into
+       the upload list, which can end past offset 255
+    7. Enable PPU rendering and NMI
 
     Scene data format (pointed to by zp__src1):
       Offset 0: Background color index (1 byte)
       Offset 1-2: Background palette data pointer (2 bytes, little-endian, 0 = null)
       Offset 3-4: Sprite palette data pointer (2 bytes, little-endian, 0 = null)
       Offset 5+: Entity address list (2 bytes each, null-terminated with 0x0000)
+      Then, with CHR RAM: packed tile upload list (see PackedChrData, 2 bytes each, null-terminated with 0x0000)
+
+    entity_layout selects how entities are laid out in RAM (see EntityLayout); render_entities must use the same.
+    chr_ram is set on ROMs with CHR RAM, whose scenes list their packed tiles.
     """
 
     label: str = "load_scene"
     type: CodeBlockType = CodeBlockType.SUBROUTINE
-
-    @property
-    def size(self) -> int:
-        # Pre-calculate by building the code once
-        asm = self._build_code(
-            start_offset=0x8000,
-            names={
-                "zp__src1": 0x00,
-                "zp__src2": 0x02,
-                "zp__entity_ram_page": 0x04,
-            },
-        )
-        return len(asm)
+    entity_layout: EntityLayout = EntityLayout.ARRAY_OF_STRUCTS
+    chr_ram: bool = False
 
     @property
     def dependencies(self) -> list[str]:
-        return ["zp__src1", "zp__src2", "zp__entity_ram_page"]
-
-    def _build_code(self, start_offset: int, names: dict[str, int]) -> bytes:
+        dependencies = [
+            "zp__src1",
+            "zp__src2",
+            "zp__entity_ram_page",
+            "zp__entity_count",
+            "zp__entities_dirty",
+            "zp__vram_queue_head",
+            "zp__vram_queue_tail",
+            "queue_vram_write",
+        ]
+        if self.chr_ram:
+            dependencies.append("upload_chr")
+        return dependencies
+
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
         """Build the load_scene subroutine assembly code."""
         asm = Asm6502()
 
-        zp_src1 = names["zp__src1"]
-        zp_src2 = names["zp__src2"]
+        zp_src1 = LabelRef("zp__src1")
+        zp_src2 = LabelRef("zp__src2")
 
-        PPU_ADDR = 0x2006
-        PPU_DATA = 0x2007
         PPU_CTRL = 0x2000
         PPU_MASK = 0x2001
 
-        # === Wait for PPU to be ready ===
-        # Read PPU status to clear address latch
-        asm.bit_abs(0x2002)  # PPUSTATUS
-
-        # === Set PPU address to palette RAM ($3F00) ===
+        # === Empty the VRAM queue ===
+        # Writes queued for the previous scene are dropped
+        asm.lda_imm(0)
+        asm.sta_zp(LabelRef("zp__vram_queue_head"))
+        asm.sta_zp(LabelRef("zp__vram_queue_tail"))
+
+        # === Queue the palettes ===
+        # Palette RAM can only be written while the PPU is not rendering, so the palettes are staged as records
+        # in RAM and queued; flush_vram_queue writes them during the next VBlank.
+        # NES palette layout: the backdrop color at $3F00, mirrored at $3F04, $3F08 and $3F0C (and $3F10-$3F1C
+        # for sprites), with 3 colors per palette in between. Our palette data has 12 bytes (3 colors × 4
+        # palettes), so the backdrop color is interleaved at positions 4, 8 and 12.
+        bg_record = SCENE_PALETTE_RECORDS
+        sprite_record = SCENE_PALETTE_RECORDS + 3 + 16
+
+        # Record headers: $3F00 and $3F10 (big-endian), sprites always 16 bytes
         asm.lda_imm(0x3F)
-        asm.sta_abs(PPU_ADDR)
+        asm.sta_abs(bg_record)
+        asm.sta_abs(sprite_record)
         asm.lda_imm(0x00)
-        asm.sta_abs(PPU_ADDR)
+        asm.sta_abs(bg_record + 1)
+        asm.lda_imm(0x10)
+        asm.sta_abs(sprite_record + 1)
+        asm.sta_abs(sprite_record + 2)
 
-        # === Load background color (byte 0 of scene data) ===
-        # Load Y=0 for indexed addressing
+        # Backdrop color (byte 0 of scene data) and its mirrors
         asm.ldy_imm(0)
-        # Load background color via (zp__src1),Y
         asm.lda_ind_y(zp_src1)
-        # Write to PPU_DATA (palette index 0)
-        asm.sta_abs(PPU_DATA)
+        for offset in (0, 4, 8, 12):
+            asm.sta_abs(bg_record + 3 + offset)
+            asm.sta_abs(sprite_record + 3 + offset)
 
-        # === Load background palette pointer (bytes 1-2) ===
+        # Background palette pointer (bytes 1-2); without one only the backdrop color is written
+        asm.lda_imm(1)
+        asm.sta_abs(bg_record + 2)
         asm.ldy_imm(1)
         asm.lda_ind_y(zp_src1)  # Low byte
         asm.sta_zp(zp_src2)
         asm.iny()
         asm.lda_ind_y(zp_src1)  # High byte
         asm.sta_zp(zp_src2 + 1)
+        asm.ora_imm(0)
+        asm.beq("queue_bg_palette")
+        self._stage_palettes(asm, bg_record)
+        asm.label("queue_bg_palette")
+        self._queue_record(asm, bg_record)
 
-        # Check if background palette pointer is null (both bytes == 0)
-        asm.ora_imm(0)  # Set Z flag if A == 0
-        skip_bg_offset = len(asm) + 2  # BNE takes 2 bytes
-        # We'll calculate the actual offset after writing the BG palette code
-        bg_palette_start = len(asm)
-
-        # Placeholder for BEQ (skip if null) - we'll fix this up
-        asm.beq(0)  # Will be patched
-        beq_fixup_pos = len(asm) - 1
-
-        # === Load 12 bytes of background palette data ===
-        # NES palette layout: 4 palettes × 4 bytes each = 16 bytes total
-        # $3F00 = universal backdrop color (already written)
-        # $3F01-$3F03 = palette 0, colors 1-3
-        # $3F04 = backdrop mirror (write backdrop color again)
-        # $3F05-$3F07 = palette 1, colors 1-3
-        # $3F08 = backdrop mirror (write backdrop color again)
-        # $3F09-$3F0B = palette 2, colors 1-3
-        # $3F0C = backdrop mirror (write backdrop color again)
-        # $3F0D-$3F0F = palette 3, colors 1-3
-        #
-        # Our palette data has 12 bytes (3 colors × 4 palettes), so we need to
-        # interleave the backdrop color at positions 4, 8, 12
-
-        # Store bg color in accumulator for reuse
-        asm.ldy_imm(0)
-        asm.lda_ind_y(zp_src1)  # Load backdrop color
-        asm.tax()  # Save backdrop color in X register
-
-        asm.ldy_imm(0)  # Index for palette data
-        # Load 4 palettes, 3 colors each, with backdrop mirrors
-        for palette_idx in range(4):
-            for _ in range(3):
-                asm.lda_ind_y(zp_src2)
-                asm.sta_abs(PPU_DATA)
-                asm.iny()
-            # Write backdrop mirror at $3F04, $3F08, $3F0C (but not after last palette)
-            if palette_idx < 3:
-                asm.txa()  # Load backdrop color from X
-                asm.sta_abs(PPU_DATA)
-
-        # Calculate skip offset for BEQ
-        # BEQ offset is relative to the PC of the instruction AFTER the BEQ
-        # beq_fixup_pos points to the offset byte, so PC after BEQ = beq_fixup_pos + 1
-        bg_palette_end = len(asm)
-        skip_bg_bytes = bg_palette_end - beq_fixup_pos - 1
-        # Fix up the BEQ instruction
-        asm._code[beq_fixup_pos] = skip_bg_bytes & 0xFF
-
-        # === Load sprite palette pointer (bytes 3-4) ===
+        # Sprite palette pointer (bytes 3-4); without one the sprite palettes are left as they are
         asm.ldy_imm(3)
         asm.lda_ind_y(zp_src1)  # Low byte
         asm.sta_zp(zp_src2)
         asm.iny()
         asm.lda_ind_y(zp_src1)  # High byte
         asm.sta_zp(zp_src2 + 1)
-
-        # Check if sprite palette pointer is null
         asm.ora_imm(0)
-        sprite_palette_start = len(asm)
-
-        # Placeholder for BEQ (skip if null)
-        asm.beq(0)  # Will be patched
-        beq_sprite_fixup_pos = len(asm) - 1
-
-        # === Load 12 bytes of sprite palette data ===
-        # Sprite palettes follow the same pattern at $3F10-$3F1F
-        # $3F10 = backdrop mirror (write backdrop color)
-        # $3F11-$3F13 = sprite palette 0, colors 1-3
-        # $3F14 = backdrop mirror (write backdrop color again)
-        # ... and so on
-        #
-        # Note: PPU address should be at $3F10 now if we wrote 15 bytes to BG palettes
-        # But to be safe, set it explicitly
-
-        # Set PPU address to sprite palette start ($3F10)
-        asm.lda_imm(0x3F)
-        asm.sta_abs(PPU_ADDR)
-        asm.lda_imm(0x10)
-        asm.sta_abs(PPU_ADDR)
-
-        # Write backdrop color first (mirrors $3F00)
-        asm.txa()  # Backdrop color still in X
-        asm.sta_abs(PPU_DATA)
-
-        asm.ldy_imm(0)  # Index for sprite palette data
-        # Load 4 sprite palettes, 3 colors each, with backdrop mirrors
-        for palette_idx in range(4):
-            for _ in range(3):
-                asm.lda_ind_y(zp_src2)
-                asm.sta_abs(PPU_DATA)
-                asm.iny()
-            # Write backdrop mirror at $3F14, $3F18, $3F1C (but not after last palette)
-            if palette_idx < 3:
-                asm.txa()  # Load backdrop color from X
-                asm.sta_abs(PPU_DATA)
+        asm.beq("skip_sprite_palette")
+        self._stage_palettes(asm, sprite_record)
+        self._queue_record(asm, sprite_record)
 
-        # Fix up sprite palette BEQ
-        # Same calculation as BG palette above
-        sprite_palette_end = len(asm)
-        skip_sprite_bytes = sprite_palette_end - beq_sprite_fixup_pos - 1
-        asm._code[beq_sprite_fixup_pos] = skip_sprite_bytes & 0xFF
+        asm.label("skip_sprite_palette")
 
         # === Load entity data into RAM ===
         # Entity list starts at offset 5 in scene data
         # Format: [addr_low, addr_high, addr_low, addr_high, ..., 0x00, 0x00]
         # Each entity's data is ENTITY_SIZE_BYTES bytes that we copy to $0200+
 
-        zp_entity_ram_page = names["zp__entity_ram_page"]
-        ENTITY_RAM_PAGE = 0x02  # $0200-$02FF
+        zp_entity_ram_page = LabelRef("zp__entity_ram_page")
+        zp_entity_count = LabelRef("zp__entity_count")
+        SPRITE_RAM_PAGE = 0x03  # $0300-$03FF
+        layout = self.entity_layout
 
-        # Initialize entity RAM page pointer
+        # Initialize entity RAM page pointer and entity count
         asm.lda_imm(ENTITY_RAM_PAGE)
         asm.sta_zp(zp_entity_ram_page)
+        asm.lda_imm(0)
+        asm.sta_zp(zp_entity_count)
 
         # Y = offset into scene data (starts at 5, after bg color + 2 palette ptrs)
         asm.ldy_imm(5)
 
-        # X = offset into entity RAM page (starts at 0)
+        # X = index into entity RAM (starts at 0): the entity's offset with structs, its number with arrays
         asm.ldx_imm(0)
 
-        # Loop through entity addresses
-        entity_loop_start = len(asm)
+        # Loop through entity addresses (one pass per entity plus one for the null terminator)
+        asm.label("entity_loop", max_iterations=MAX_N_SCENE_ENTITIES + 1)
 
         # Load entity address low byte
         asm.lda_ind_y(zp_src1)
@@ -216,8 +174,7 @@ class LoadSceneSubroutine(CodeBlock):
         # Check if null (both bytes must be zero)
         # ORA with low byte to check if either is non-zero
         asm.ora_zp(zp_src2)
-        asm.beq(0)  # Will be patched to skip to end
-        beq_entity_end_fixup_pos = len(asm) - 1
+        asm.beq("entities_done")
 
         asm.iny()
 
@@ -227,31 +184,92 @@ class LoadSceneSubroutine(CodeBlock):
 
         # Copy ENTITY_SIZE_BYTES bytes from entity data to RAM
         asm.ldy_imm(0)
-        for byte_offset in range(ENTITY_SIZE_BYTES):
-            asm.lda_ind_y(zp_src2)
-            asm.sta_abs_x(ENTITY_RAM_PAGE * 256)  # Store to $0200 + X
-            if byte_offset < ENTITY_SIZE_BYTES - 1:
-                asm.iny()
-                asm.inx()
+        if layout == EntityLayout.ARRAY_OF_STRUCTS:
+            for byte_offset in range(ENTITY_SIZE_BYTES):
+                asm.lda_ind_y(zp_src2)
+                asm.sta_abs_x(ENTITY_RAM_PAGE * 256)  # Store to $0200 + X
+                if byte_offset < ENTITY_SIZE_BYTES - 1:
+                    asm.iny()
+                    asm.inx()
+        else:
+            # Each field goes to its own array, at the entity's number
+            for field in EntityField:
+                asm.lda_ind_y(zp_src2)
+                asm.sta_abs_x(layout.address(field))
+                if field < ENTITY_SIZE_BYTES - 1:
+                    asm.iny()
 
         # Advance X to next entity slot
         asm.inx()
+        asm.inc_zp(zp_entity_count)
 
         # Restore Y (scene data offset) from stack
         asm.pla()
         asm.tay()
 
         # Loop back to process next entity
-        # Calculate relative offset for branch
-        entity_loop_end = len(asm)
-        branch_offset = entity_loop_start - entity_loop_end - 2  # -2 for the JMP instruction size
         # Use JMP instead of branch since the loop might be too large for a relative branch
-        asm.jmp_abs(start_offset + entity_loop_start)
-
-        # Fix up entity end BEQ
-        entity_end = len(asm)
-        skip_entity_bytes = entity_end - beq_entity_end_fixup_pos - 1
-        asm._code[beq_entity_end_fixup_pos] = skip_entity_bytes & 0xFF
+        asm.jmp_abs("entity_loop")
+
+        asm.label("entities_done")
+
+        # === Hide the unused sprite slots ===
+        # render_entities only rewrites the slots of live entities, so the others are hidden once here by
+        # moving them below the screen (Y = $FF). X is the offset of the first unused slot, as sprite and
+        # entity slots are both 4 bytes; with every slot used there is nothing to hide.
+        asm.lda_zp(zp_entity_count)
+        asm.cmp_imm(MAX_N_SCENE_ENTITIES)
+        asm.beq("hide_done")
+        if layout == EntityLayout.STRUCT_OF_ARRAYS:
+            # X is the entity count: turn it into the offset of its sprite slot
+            asm.txa()
+            asm.asl()
+            asm.asl()
+            asm.tax()
+        asm.lda_imm(0xFF)
+        asm.label("hide_loop", max_iterations=MAX_N_SCENE_ENTITIES)
+        asm.sta_abs_x(SPRITE_RAM_PAGE * 256)
+        for _ in range(ENTITY_SIZE_BYTES):
+            asm.inx()
+        asm.bne("hide_loop")
+        asm.label("hide_done")
+
+        # === Upload the scene's tiles to CHR RAM ===
+        # The upload list follows the entity list, whose terminator's high byte Y still points at. With a full
+        # entity list it ends past the 256 bytes Y reaches, so zp__src1 is moved to the list and advanced past
+        # each entry instead. At most one upload per entity's sprite set and the test tile, plus a pass for the
+        # null terminator
+        if self.chr_ram:
+            asm.iny()
+            asm.tya()
+            asm.clc()
+            asm.adc_zp(zp_src1)
+            asm.sta_zp(zp_src1)
+            asm.bcc("upload_loop")
+            asm.inc_zp(zp_src1 + 1)
+            asm.label("upload_loop", max_iterations=MAX_N_SCENE_ENTITIES + 2)
+            asm.ldy_imm(0)
+            asm.lda_ind_y(zp_src1)
+            asm.sta_zp(zp_src2)
+            asm.iny()
+            asm.lda_ind_y(zp_src1)
+            asm.sta_zp(zp_src2 + 1)
+            asm.ora_zp(zp_src2)
+            asm.beq("uploads_done")
+            asm.lda_imm(2)
+            asm.clc()
+            asm.adc_zp(zp_src1)
+            asm.sta_zp(zp_src1)
+            asm.bcc("upload_next")
+            asm.inc_zp(zp_src1 + 1)
+            asm.label("upload_next")
+            asm.jsr("upload_chr")
+            asm.jmp_abs("upload_loop")
+            asm.label("uploads_done")
+
+        # Entity RAM changed: have the next frame rebuild the sprites
+        asm.lda_imm(1)
+        asm.sta_zp(LabelRef("zp__entities_dirty"))
 
         # === Enable PPU and NMI ===
         # PPUCTRL: Enable NMI, background pattern table at $0000, sprites at $1000
@@ -265,19 +283,39 @@ class LoadSceneSubroutine(CodeBlock):
         # === Return from subroutine ===
         asm.rts()
 
-        return asm.bytes()
+        return asm
 
-    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
-        code = self._build_code(start_offset, names)
-        return RenderedCodeBlock(code=code, exported_labels={self.label: start_offset})
+    @staticmethod
+    def _stage_palettes(asm: Asm6502, record: int) -> None:
+        """Copy the 4 palettes zp__src2 points at into a 16-byte palette record, between the backdrop mirrors."""
+        asm.lda_imm(16)
+        asm.sta_abs(record + 2)
+        asm.ldy_imm(0)
+        for palette_idx in range(4):
+            for color in range(3):
+                asm.lda_ind_y(LabelRef("zp__src2"))
+                asm.sta_abs(record + 3 + 4 * palette_idx + 1 + color)
+                asm.iny()
 
+    @staticmethod
+    def _queue_record(asm: Asm6502, record: int) -> None:
+        """Queue a staged record. The queue was just emptied, so there is room for it."""
+        asm.lda_imm(record & 0xFF)
+        asm.sta_zp(LabelRef("zp__src2"))
+        asm.lda_imm(record >> 8)
+        asm.sta_zp(LabelRef("zp__src2") + 1)
+        asm.jsr("queue_vram_write")
 
-class RenderEntitiesSubroutine(CodeBlock):
+
+class RenderEntitiesSubroutine(AssembledCodeBlock):
     """
     The built-in render_entities subroutine code block.
 
     Converts entity data from RAM ($0200-$02FF) to sprite data in a dedicated sprite RAM page ($0300-$03FF).
 
+    Only the zp__entity_count live entities are converted; load_scene has already hidden the other sprite slots.
+    Clears zp__entities_dirty, as the sprite page is up to date afterwards.
+
     For each entity (4 bytes: x, y, spriteset_idx, palette_idx):
     - Copy X position to sprite X
     - Copy Y position to sprite Y
@@ -289,33 +327,24 @@ class RenderEntitiesSubroutine(CodeBlock):
     - Byte 1: Tile index
     - Byte 2: Attributes (bits 0-1: palette, bit 5: priority, bits 6-7: flip)
     - Byte 3: X position
+
+    entity_layout must match the one load_scene stored the entities with.
     """
 
     label: str = "render_entities"
     type: CodeBlockType = CodeBlockType.SUBROUTINE
-
-    @property
-    def size(self) -> int:
-        # Pre-calculate by building the code once
-        asm = self._build_code(
-            start_offset=0x8000,
-            names={
-                "zp__entity_ram_page": 0x00,
-                "zp__sprite_ram_page": 0x01,
-            },
-        )
-        return len(asm)
+    entity_layout: EntityLayout = EntityLayout.ARRAY_OF_STRUCTS
 
     @property
     def dependencies(self) -> list[str]:
-        return ["zp__entity_ram_page", "zp__sprite_ram_page"]
+        return ["zp__entity_ram_page", "zp__sprite_ram_page", "zp__entity_count", "zp__entities_dirty"]
 
-    def _build_code(self, start_offset: int, names: dict[str, int]) -> bytes:
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
         """Build the render_entities subroutine assembly code."""
         asm = Asm6502()
 
-        zp_entity_ram_page = names["zp__entity_ram_page"]
-        zp_sprite_ram_page = names["zp__sprite_ram_page"]
+        zp_sprite_ram_page = LabelRef("zp__sprite_ram_page")
+        zp_entity_count = LabelRef("zp__entity_count")
 
         SPRITE_RAM_PAGE = 0x03  # $0300-$03FF
 
@@ -323,73 +352,323 @@ class RenderEntitiesSubroutine(CodeBlock):
         asm.lda_imm(SPRITE_RAM_PAGE)
         asm.sta_zp(zp_sprite_ram_page)
 
-        # X = offset into entity RAM (source)
-        # Y = offset into sprite RAM (destination)
+        # The sprite page is about to match entity RAM
+        asm.lda_imm(0)
+        asm.sta_zp(LabelRef("zp__entities_dirty"))
+
+        if self.entity_layout == EntityLayout.STRUCT_OF_ARRAYS:
+            self._convert_arrays(asm)
+            return asm
+
+        # Y = live entities left to convert
+        asm.ldy_zp(zp_entity_count)
+        asm.beq("done")
+
+        # X = offset into both entity RAM (source) and sprite RAM (destination): entities and sprites are
+        # both 4 bytes, so one index serves both pages
         asm.ldx_imm(0)
-        asm.ldy_imm(0)
 
-        # Loop through all MAX_N_SCENE_ENTITIES entities
-        entity_loop_start = len(asm)
+        asm.label("entity_loop", max_iterations=MAX_N_SCENE_ENTITIES)
 
         # Load entity data from $0200 + X
         # Entity format: x(0), y(1), spriteset_idx(2), palette_idx(3)
 
-        # Load Y position (entity byte 1)
+        # Load Y position (entity byte 1) into sprite byte 0
         asm.lda_abs_x(0x0200 + 1)
-        # Store to sprite byte 0 (Y position)
-        asm.sta_abs_y(SPRITE_RAM_PAGE * 256)
-        asm.iny()
+        asm.sta_abs_x(SPRITE_RAM_PAGE * 256)
 
-        # Load spriteset index (entity byte 2)
+        # Load spriteset index (entity byte 2) into sprite byte 1 (tile index)
         asm.lda_abs_x(0x0200 + 2)
-        # Store to sprite byte 1 (tile index)
-        asm.sta_abs_y(SPRITE_RAM_PAGE * 256)
-        asm.iny()
+        asm.sta_abs_x(SPRITE_RAM_PAGE * 256 + 1)
 
-        # Load palette index (entity byte 3)
+        # Load palette index (entity byte 3) into sprite byte 2 (attributes = palette index, no flip, foreground)
         asm.lda_abs_x(0x0200 + 3)
-        # Store to sprite byte 2 (attributes = palette index, no flip, foreground)
-        asm.sta_abs_y(SPRITE_RAM_PAGE * 256)
-        asm.iny()
+        asm.sta_abs_x(SPRITE_RAM_PAGE * 256 + 2)
 
-        # Load X position (entity byte 0)
+        # Load X position (entity byte 0) into sprite byte 3
         asm.lda_abs_x(0x0200)
-        # Store to sprite byte 3 (X position)
-        asm.sta_abs_y(SPRITE_RAM_PAGE * 256)
-        asm.iny()
+        asm.sta_abs_x(SPRITE_RAM_PAGE * 256 + 3)
 
         # Advance to next entity (4 bytes)
-        asm.txa()
+        for _ in range(ENTITY_SIZE_BYTES):
+            asm.inx()
+
+        asm.dey()
+        asm.bne("entity_loop")
+
+        # Return from subroutine
+        asm.label("done")
+        asm.rts()
+
+        return asm
+
+    def _convert_arrays(self, asm: Asm6502) -> None:
+        """Convert entities stored as one array per field: X indexes the arrays, Y the sprite page."""
+        zp_entity_count = LabelRef("zp__entity_count")
+        layout = EntityLayout.STRUCT_OF_ARRAYS
+
+        SPRITE_RAM_PAGE = 0x03  # $0300-$03FF
+
+        asm.lda_zp(zp_entity_count)
+        asm.beq("done")
+
+        # X = entity number, Y = offset of its sprite
+        asm.ldx_imm(0)
+        asm.ldy_imm(0)
+
+        asm.label("entity_loop", max_iterations=MAX_N_SCENE_ENTITIES)
+
+        # Sprite bytes in OAM order: Y position, tile index, attributes (palette index), X position
+        sprite_fields = (EntityField.Y, EntityField.SPRITESET, EntityField.PALETTE, EntityField.X)
+        for sprite_byte, field in enumerate(sprite_fields):
+            asm.lda_abs_x(layout.address(field))
+            asm.sta_abs_y(SPRITE_RAM_PAGE * 256 + sprite_byte)
+
+        # Advance to the next sprite (4 bytes) and entity (1 byte)
+        for _ in range(ENTITY_SIZE_BYTES):
+            asm.iny()
+        asm.inx()
+
+        asm.cpx_zp(zp_entity_count)
+        asm.bne("entity_loop")
+
+        asm.label("done")
+        asm.rts()
+
+
+class UploadChrSubroutine(AssembledCodeBlock):
+    """
+    The upload_chr subroutine code block, for ROMs with CHR RAM (see LoadSceneSubroutine.chr_ram).
+
+    Writes the packed tiles pointed to by zp__src2 (see PackedChrData: a PPU address, high byte first, then an rle
+    stream) to pattern memory through PPUDATA, so rendering must be off. The stream may be longer than 256 bytes:
+    before each token Y is added to zp__src2 and reset, and a token with its bytes (at most 128) never moves Y past
+    $FF. X counts the bytes of a run. Clobbers A, X and Y.
+    """
+
+    label: str = "upload_chr"
+    type: CodeBlockType = CodeBlockType.SUBROUTINE
+
+    @property
+    def dependencies(self) -> list[str]:
+        return ["zp__src2"]
+
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
+        """Build the upload_chr subroutine assembly code."""
+        asm = Asm6502()
+
+        zp_src2 = LabelRef("zp__src2")
+        PPU_ADDR = 0x2006
+        PPU_DATA = 0x2007
+
+        # PPU address of the first tile, high byte first
+        asm.bit_abs(0x2002)  # PPUSTATUS: reset the address latch
+        asm.ldy_imm(0)
+        asm.lda_ind_y(zp_src2)
+        asm.sta_abs(PPU_ADDR)
+        asm.iny()
+        asm.lda_ind_y(zp_src2)
+        asm.sta_abs(PPU_ADDR)
+        asm.iny()
+
+        # Every token but the last writes at least one byte of pattern memory
+        asm.label("token", max_iterations=CHR_ROM_SIZE + 1)
+        asm.tya()
         asm.clc()
-        asm.adc_imm(ENTITY_SIZE_BYTES)
+        asm.adc_zp(zp_src2)
+        asm.sta_zp(zp_src2)
+        asm.bcc("token_read")
+        asm.inc_zp(zp_src2 + 1)
+        asm.label("token_read")
+        asm.ldy_imm(0)
+        asm.lda_ind_y(zp_src2)
+        asm.beq("done")
+        asm.bmi("run")
+
+        # Literal run: the next (token) bytes
         asm.tax()
+        asm.iny()
+        asm.label("literal", max_iterations=127)
+        asm.lda_ind_y(zp_src2)
+        asm.sta_abs(PPU_DATA)
+        asm.iny()
+        asm.dex()
+        asm.bne("literal")
+        asm.jmp_abs("token")
 
-        # Check if Y has reached 256 (wrapped to 0)
-        # Since we write 4 bytes per entity, after 64 entities Y = 256 = 0
-        # BNE branches if Z flag is clear (Y != 0)
-        asm.cpy_imm(0)
-        asm.bne(0)  # Will be patched
-        bne_fixup_pos = len(asm) - 1
-
-        # Calculate branch offset (backwards)
-        entity_loop_end = len(asm)
-        # BNE offset is relative to PC after the BNE instruction
-        branch_offset = entity_loop_start - entity_loop_end
-        # Convert to signed byte
-        branch_offset_byte = branch_offset & 0xFF
-        asm._code[bne_fixup_pos] = branch_offset_byte
+        # Run: the next byte, (token - 126) times
+        asm.label("run")
+        asm.and_imm(0x7F)
+        asm.clc()
+        asm.adc_imm(2)
+        asm.tax()
+        asm.iny()
+        asm.lda_ind_y(zp_src2)
+        asm.iny()
+        asm.label("fill", max_iterations=129)
+        asm.sta_abs(PPU_DATA)
+        asm.dex()
+        asm.bne("fill")
+        asm.jmp_abs("token")
 
-        # Return from subroutine
+        asm.label("done")
         asm.rts()
 
-        return asm.bytes()
+        return asm
 
-    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
-        code = self._build_code(start_offset, names)
-        return RenderedCodeBlock(code=code, exported_labels={self.label: start_offset})
 
+class UnpackDataSubroutine(AssembledCodeBlock):
+    """
+    The built-in unpack_data subroutine code block.
 
-class RenderSpritesBlock(CodeBlock):
+    Unpacks the packed stream (see core.rom.compression) pointed to by zp__src1 into RAM at $0500-$05FF, then
+    points zp__src1 at the unpacked data, so that a call to unpack_data can precede any subroutine that reads its
+    input through zp__src1. X counts the bytes written, Y the bytes read, so the stream may be at most 256 bytes
+    long (as pack() guarantees); an lz match copies through Y, so Y is kept in zp__unpack_input meanwhile. Tokens
+    are tested before Y moves on, as INY would overwrite their flags.
+    """
+
+    label: str = "unpack_data"
+    type: CodeBlockType = CodeBlockType.SUBROUTINE
+
+    @property
+    def dependencies(self) -> list[str]:
+        return ["zp__src1", "zp__unpack_count", "zp__unpack_input"]
+
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
+        """Build the unpack_data subroutine assembly code."""
+        asm = Asm6502()
+
+        zp_src1 = LabelRef("zp__src1")
+        zp_count = LabelRef("zp__unpack_count")
+        zp_input = LabelRef("zp__unpack_input")
+        buffer = UNPACK_BUFFER_PAGE * 256
+        # Every token but the last writes at least one byte
+        max_tokens = MAX_UNPACKED_SIZE + 1
+
+        asm.ldx_imm(0)
+        asm.ldy_imm(0)
+        asm.lda_ind_y(zp_src1)
+        asm.iny()
+        asm.cmp_imm(PackMethod.RLE)
+        asm.beq("rle_token")
+        asm.bcs("lz_token")
+
+        # Stored: a length byte, then the bytes
+        asm.lda_ind_y(zp_src1)
+        asm.beq("done")
+        asm.sta_zp(zp_count)
+        asm.iny()
+        asm.label("stored_loop", max_iterations=MAX_UNPACKED_SIZE)
+        asm.lda_ind_y(zp_src1)
+        asm.sta_abs_x(buffer)
+        asm.iny()
+        asm.inx()
+        asm.dec_zp(zp_count)
+        asm.bne("stored_loop")
+        asm.jmp_abs("done")
+
+        # RLE: literal runs, and runs of one byte repeated (token - 126) times
+        asm.label("rle_token", max_iterations=max_tokens)
+        asm.lda_ind_y(zp_src1)
+        asm.beq("done")
+        asm.bmi("rle_run")
+        asm.iny()
+        asm.sta_zp(zp_count)
+        asm.label("rle_literal", max_iterations=127)
+        asm.lda_ind_y(zp_src1)
+        asm.sta_abs_x(buffer)
+        asm.iny()
+        asm.inx()
+        asm.dec_zp(zp_count)
+        asm.bne("rle_literal")
+        asm.jmp_abs("rle_token")
+        asm.label("rle_run")
+        asm.iny()
+        asm.and_imm(0x7F)
+        asm.clc()
+        asm.adc_imm(2)
+        asm.sta_zp(zp_count)
+        asm.lda_ind_y(zp_src1)
+        asm.iny()
+        asm.label("rle_fill", max_iterations=129)
+        asm.sta_abs_x(buffer)
+        asm.inx()
+        asm.dec_zp(zp_count)
+        asm.bne("rle_fill")
+        asm.jmp_abs("rle_token")
+
+        # LZ: literal runs, and copies of (token - 125) bytes from an offset in the unpacked data
+        asm.label("lz_token", max_iterations=max_tokens)
+        asm.lda_ind_y(zp_src1)
+        asm.beq("done")
+        asm.bmi("lz_match")
+        asm.iny()
+        asm.sta_zp(zp_count)
+        asm.label("lz_literal", max_iterations=127)
+        asm.lda_ind_y(zp_src1)
+        asm.sta_abs_x(buffer)
+        asm.iny()
+        asm.inx()
+        asm.dec_zp(zp_count)
+        asm.bne("lz_literal")
+        asm.jmp_abs("lz_token")
+        asm.label("lz_match")
+        asm.iny()
+        asm.and_imm(0x7F)
+        asm.clc()
+        asm.adc_imm(3)
+        asm.sta_zp(zp_count)
+        asm.lda_ind_y(zp_src1)
+        asm.iny()
+        asm.sty_zp(zp_input)
+        asm.tay()
+        # Copying byte by byte lets a match overlap the bytes it writes
+        asm.label("lz_copy", max_iterations=130)
+        asm.lda_abs_y(buffer)
+        asm.sta_abs_x(buffer)
+        asm.iny()
+        asm.inx()
+        asm.dec_zp(zp_count)
+        asm.bne("lz_copy")
+        asm.ldy_zp(zp_input)
+        asm.jmp_abs("lz_token")
+
+        asm.label("done")
+        asm.lda_imm(0x00)
+        asm.sta_zp(zp_src1)
+        asm.lda_imm(UNPACK_BUFFER_PAGE)
+        asm.sta_zp(zp_src1 + 1)
+        asm.rts()
+
+        return asm
+
+
+class SwitchBankSubroutine(AssembledCodeBlock):
+    """
+    The built-in switch_bank subroutine code block (UxROM only).
+
+    Maps the PRG bank in A at $8000-$BFFF. The ROM also drives the data bus during the write, so it writes to the
+    entry of bank_table that holds the same value.
+    """
+
+    label: str = "switch_bank"
+    type: CodeBlockType = CodeBlockType.SUBROUTINE
+
+    @property
+    def dependencies(self) -> list[str]:
+        return ["bank_table"]
+
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
+        """Build the switch_bank subroutine assembly code."""
+        asm = Asm6502()
+        asm.tay()
+        asm.sta_abs_y(LabelRef("bank_table"))
+        asm.rts()
+        return asm
+
+
+class RenderSpritesBlock(AssembledCodeBlock):
     """
     The built-in render_sprites code block (runs during VBlank).
 
@@ -402,24 +681,15 @@ class RenderSpritesBlock(CodeBlock):
     label: str = "render_sprites"
     type: CodeBlockType = CodeBlockType.VBLANK
 
-    @property
-    def size(self) -> int:
-        # Pre-calculate by building the code once
-        asm = self._build_code(
-            start_offset=0x8000,
-            names={"zp__sprite_ram_page": 0x00},
-        )
-        return len(asm)
-
     @property
     def dependencies(self) -> list[str]:
         return ["zp__sprite_ram_page"]
 
-    def _build_code(self, start_offset: int, names: dict[str, int]) -> bytes:
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
         """Build the render_sprites VBlank code."""
         asm = Asm6502()
 
-        zp_sprite_ram_page = names["zp__sprite_ram_page"]
+        zp_sprite_ram_page = LabelRef("zp__sprite_ram_page")
 
         OAMDMA = 0x4014  # OAM DMA register
 
@@ -428,14 +698,175 @@ class RenderSpritesBlock(CodeBlock):
         asm.lda_zp(zp_sprite_ram_page)
         asm.sta_abs(OAMDMA)
 
-        return asm.bytes()
+        return asm
+
+
+class QueueVramWriteSubroutine(AssembledCodeBlock):
+    """
+    The built-in queue_vram_write subroutine code block.
+
+    Appends a VRAM write to the VRAM queue, a ring buffer in RAM ($0400-$04FF) that flush_vram_queue writes to
+    the PPU during VBlank. Any code can queue writes while rendering is on; they reach VRAM over the next frames.
+
+    Record format (pointed to by zp__src2, and as stored in the queue):
+      Offset 0-1: PPU address (2 bytes, big-endian, as written to PPUADDR)
+      Offset 2: Length (1 byte, 1 to MAX_VRAM_RECORD_LENGTH)
+      Offset 3+: Bytes to write
+
+    Returns with carry clear once the record is queued, and with carry set if it was not: the queue has no room
+    for it (retry in a later frame) or its length is out of range. The head is only advanced after the record is
+    copied, so an NMI never flushes a partial record.
+    """
+
+    label: str = "queue_vram_write"
+    type: CodeBlockType = CodeBlockType.SUBROUTINE
+
+    @property
+    def dependencies(self) -> list[str]:
+        return ["zp__src2", "zp__vram_queue_head", "zp__vram_queue_tail", "zp__vram_record_size", "flush_vram_queue"]
+
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
+        """Build the queue_vram_write subroutine assembly code."""
+        asm = Asm6502()
+
+        zp_src2 = LabelRef("zp__src2")
+        zp_head = LabelRef("zp__vram_queue_head")
+        zp_record_size = LabelRef("zp__vram_record_size")
+
+        # Record size = length + 3 header bytes
+        asm.ldy_imm(2)
+        asm.lda_ind_y(zp_src2)
+        asm.beq("rejected")
+        asm.cmp_imm(MAX_VRAM_RECORD_LENGTH + 1)
+        asm.bcs("rejected")
+        asm.adc_imm(3)  # Carry is clear
+        asm.sta_zp(zp_record_size)
+
+        # Free bytes = tail - head - 1 (one byte stays unused, so that a full queue is not empty)
+        asm.lda_zp(LabelRef("zp__vram_queue_tail"))
+        asm.clc()
+        asm.sbc_zp(zp_head)
+        asm.cmp_zp(zp_record_size)
+        asm.bcc("rejected")
+
+        # Copy the record to $0400 + head; X wraps around the page
+        asm.ldx_zp(zp_head)
+        asm.ldy_imm(0)
+        asm.label("copy_loop", max_iterations=MAX_VRAM_RECORD_LENGTH + 3)
+        asm.lda_ind_y(zp_src2)
+        asm.sta_abs_x(VRAM_QUEUE_PAGE * 256)
+        asm.inx()
+        asm.iny()
+        asm.cpy_zp(zp_record_size)
+        asm.bne("copy_loop")
+
+        # Publish the record
+        asm.stx_zp(zp_head)
+        asm.clc()
+        asm.rts()
+
+        asm.label("rejected")
+        asm.sec()
+        asm.rts()
 
-    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
-        code = self._build_code(start_offset, names)
-        return RenderedCodeBlock(code=code, exported_labels={self.label: start_offset})
+        return asm
 
 
-class VBlankHandler(CodeBlock):
+class FlushVramQueueBlock(AssembledCodeBlock):
+    """
+    The built-in flush_vram_queue code block (runs during VBlank).
+
+    Writes the records queue_vram_write queued to the PPU, oldest first, at most max_records per VBlank: the
+    most records of MAX_VRAM_RECORD_LENGTH bytes that fit in budget_cycles. Longer queues drain over several
+    frames. Writing PPUADDR overwrites the scroll position, so after writing it restores scroll (0, 0) and the
+    nametable select of PPUCTRL.
+    """
+
+    label: str = "flush_vram_queue"
+    type: CodeBlockType = CodeBlockType.VBLANK
+    budget_cycles: int = 1200
+
+    @property
+    def dependencies(self) -> list[str]:
+        return ["zp__vram_queue_head", "zp__vram_queue_tail", "zp__vram_records_left"]
+
+    @property
+    def max_records(self) -> int:
+        """The number of records written per VBlank."""
+        max_records = (self.budget_cycles - _FLUSH_CYCLES) // _FLUSH_RECORD_CYCLES
+        if max_records < 1:
+            raise ValueError(
+                f"A VRAM flush budget of {self.budget_cycles} cycles is too small for one record; "
+                f"it needs {_FLUSH_CYCLES + _FLUSH_RECORD_CYCLES}."
+            )
+        return min(max_records, 255)
+
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
+        """Build the flush_vram_queue VBlank code."""
+        asm = Asm6502()
+
+        zp_head = LabelRef("zp__vram_queue_head")
+        zp_records_left = LabelRef("zp__vram_records_left")
+        VRAM_QUEUE = VRAM_QUEUE_PAGE * 256
+
+        PPU_CTRL = 0x2000
+        PPU_STATUS = 0x2002
+        PPU_SCROLL = 0x2005
+        PPU_ADDR = 0x2006
+        PPU_DATA = 0x2007
+
+        # X = offset of the oldest record; nothing to do if the queue is empty
+        asm.ldx_zp(LabelRef("zp__vram_queue_tail"))
+        asm.cpx_zp(zp_head)
+        asm.beq("done")
+
+        # Reset the PPUADDR latch
+        asm.bit_abs(PPU_STATUS)
+
+        asm.lda_imm(self.max_records)
+        asm.sta_zp(zp_records_left)
+
+        asm.label("record_loop", max_iterations=self.max_records)
+
+        # PPU address (high byte first), then Y = length
+        asm.lda_abs_x(VRAM_QUEUE)
+        asm.sta_abs(PPU_ADDR)
+        asm.inx()
+        asm.lda_abs_x(VRAM_QUEUE)
+        asm.sta_abs(PPU_ADDR)
+        asm.inx()
+        asm.ldy_abs_x(VRAM_QUEUE)
+        asm.inx()
+
+        asm.label("copy_loop", max_iterations=MAX_VRAM_RECORD_LENGTH)
+        asm.lda_abs_x(VRAM_QUEUE)
+        asm.sta_abs(PPU_DATA)
+        asm.inx()
+        asm.dey()
+        asm.bne("copy_loop")
+
+        # Stop when the queue is empty or this VBlank's records are written
+        asm.cpx_zp(zp_head)
+        asm.beq("flushed")
+        asm.dec_zp(zp_records_left)
+        asm.bne("record_loop")
+
+        asm.label("flushed")
+        asm.stx_zp(LabelRef("zp__vram_queue_tail"))
+
+        # Restore the scroll position and nametable select (PPUCTRL as load_scene sets it)
+        asm.lda_imm(0)
+        asm.sta_abs(PPU_SCROLL)
+        asm.sta_abs(PPU_SCROLL)
+        asm.lda_imm(0x80)
+        asm.sta_abs(PPU_CTRL)
+
+        asm.label("done")
+
+        return asm
+
+
+class VBlankHandler(AssembledCodeBlock):
     """
     The VBlank handler code block that runs during vertical blanking.
 
@@ -446,15 +877,6 @@ class VBlankHandler(CodeBlock):
     label: str = "vblank_handler"
     type: CodeBlockType = CodeBlockType.VBLANK
 
-    @property
-    def size(self) -> int:
-        # Pre-calculate by building the code once with worst case (all subroutines present)
-        asm = self._build_code(
-            start_offset=0x8000,
-            names={"render_sprites": 0x9000},
-        )
-        return len(asm)
-
     @property
     def dependencies(self) -> list[str]:
         return []
@@ -463,45 +885,34 @@ class VBlankHandler(CodeBlock):
     def optional_dependencies(self) -> list[str]:
         return ["render_sprites"]
 
-    def _build_code(self, start_offset: int, names: dict[str, int]) -> bytes:
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
         """Build the VBlank handler code."""
         asm = Asm6502()
 
         # Call render_sprites if it exists
-        if "render_sprites" in names:
+        if "render_sprites" in optional:
             # render_sprites is a code block (not a subroutine), so we just need to
             # execute its code inline. However, since it's in the VBLANK area,
             # the ROM builder will handle placing all VBLANK blocks together.
             # For now, we don't need to call it - it will be assembled inline.
             pass
 
-        return asm.bytes()
-
-    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
-        code = self._build_code(start_offset, names)
-        return RenderedCodeBlock(code=code, exported_labels={self.label: start_offset})
+        return asm
 
 
-class UpdateHandler(CodeBlock):
+class UpdateHandler(AssembledCodeBlock):
     """
     The Update handler code block that runs every frame after VBlank.
 
-    Conditionally calls render_entities if it exists in the ROM.
+    Conditionally calls render_entities if it exists in the ROM, and then only in frames where zp__entities_dirty
+    is set: when no entity changed, the sprite page from an earlier frame is still current and render_sprites
+    keeps copying it to OAM.
     This is always included in the ROM, but only calls subroutines that are present.
     """
 
     label: str = "update_handler"
     type: CodeBlockType = CodeBlockType.UPDATE
 
-    @property
-    def size(self) -> int:
-        # Pre-calculate by building the code once with worst case (all subroutines present)
-        asm = self._build_code(
-            start_offset=0x8000,
-            names={"render_entities": 0x9000},
-        )
-        return len(asm)
-
     @property
     def dependencies(self) -> list[str]:
         return []
@@ -510,16 +921,16 @@ class UpdateHandler(CodeBlock):
     def optional_dependencies(self) -> list[str]:
         return ["render_entities"]
 
-    def _build_code(self, start_offset: int, names: dict[str, int]) -> bytes:
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
         """Build the Update handler code."""
         asm = Asm6502()
 
-        # Call render_entities if it exists
-        if "render_entities" in names:
-            asm.jsr(names["render_entities"])
-
-        return asm.bytes()
+        # Call render_entities if it exists and an entity changed
+        # (zp__entities_dirty is a dependency of render_entities, so it is allocated whenever this is emitted)
+        if "render_entities" in optional:
+            asm.lda_zp(LabelRef("zp__entities_dirty"))
+            asm.beq("entities_clean")
+            asm.jsr("render_entities")
+            asm.label("entities_clean")
 
-    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
-        code = self._build_code(start_offset, names)
-        return RenderedCodeBlock(code=code, exported_labels={self.label: start_offset})
+        return asm
@@ -1,13 +1,22 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
 from core.rom.code_block import CodeBlock, CodeBlockType, RenderedCodeBlock
 
+ZERO_PAGE_SIZE = 256
+
 
 class ZeroPageVariable(CodeBlock):
     """
     The built-in zero page variable code block.
 
     - allocates a zero page variable for use by the ROM
+    - a temporary only holds a value while the code blocks that depend on it run, so it may share its bytes with
+      other temporaries that are never live at the same time (see allocate_zero_page). Code that sets a temporary
+      for a subroutine it calls must depend on it too.
     """
     type: CodeBlockType = CodeBlockType.ZEROPAGE
+    temporary: bool = False
 
     @property
     def dependencies(self) -> list[str]:
@@ -33,6 +42,7 @@ class ZeroPageSource1(ZeroPageWord):
     A generic source vector for indirect loading via the zero page.
     """
     label: str = "zp__src1"
+    temporary: bool = True
 
 
 class ZeroPageSource2(ZeroPageWord):
@@ -40,6 +50,7 @@ class ZeroPageSource2(ZeroPageWord):
     A generic source vector for indirect loading via the zero page.
     """
     label: str = "zp__src2"
+    temporary: bool = True
 
 
 class ZeroPageByte(ZeroPageVariable):
@@ -66,3 +77,179 @@ class ZeroPageSpriteRAM(ZeroPageByte):
     This is the high byte of the address used for DMA transfer to PPU OAM.
     """
     label: str = "zp__sprite_ram_page"
+
+
+class ZeroPageEntityCount(ZeroPageByte):
+    """
+    The number of entities load_scene copied into entity RAM; render_entities only processes that many.
+    """
+    label: str = "zp__entity_count"
+
+
+class ZeroPageEntitiesDirty(ZeroPageByte):
+    """
+    Non-zero when entity RAM changed since render_entities last rebuilt the sprite page.
+    Code that writes entity RAM sets it; render_entities clears it.
+    """
+    label: str = "zp__entities_dirty"
+
+
+class ZeroPageVramQueueHead(ZeroPageByte):
+    """
+    Offset in the VRAM queue page ($0400-$04FF) where queue_vram_write appends the next record.
+    """
+    label: str = "zp__vram_queue_head"
+
+
+class ZeroPageVramQueueTail(ZeroPageByte):
+    """
+    Offset in the VRAM queue page of the oldest record flush_vram_queue has not written yet.
+    The queue is empty when tail == head.
+    """
+    label: str = "zp__vram_queue_tail"
+
+
+class ZeroPageVramRecordSize(ZeroPageByte):
+    """
+    Scratch for queue_vram_write: the size of the record being queued, header included.
+    """
+    label: str = "zp__vram_record_size"
+    temporary: bool = True
+
+
+class ZeroPageVramRecordsLeft(ZeroPageByte):
+    """
+    Scratch for flush_vram_queue: how many more records it may write this VBlank.
+    """
+    label: str = "zp__vram_records_left"
+    temporary: bool = True
+
+
+class ZeroPageUnpackCount(ZeroPageByte):
+    """
+    Scratch for unpack_data: bytes left in the current token.
+    """
+    label: str = "zp__unpack_count"
+    temporary: bool = True
+
+
+class ZeroPageUnpackInput(ZeroPageByte):
+    """
+    Scratch for unpack_data: the read offset in the packed stream while an lz match copies.
+    """
+    label: str = "zp__unpack_input"
+    temporary: bool = True
+
+
+# Code that runs from these block types, and every subroutine it calls, runs in that context. NMI code can interrupt
+# reset code, so temporaries used in different contexts are live at the same time.
+_CONTEXTS = {
+    CodeBlockType.PREAMBLE: "reset",
+    CodeBlockType.UPDATE: "nmi",
+    CodeBlockType.VBLANK: "nmi",
+}
+
+
+@dataclass
+class ZeroPageAllocation:
+    """
+    Where the zero page variables of one render live.
+
+    interference holds, for each variable, the variables that can be live at the same time and so must not share
+    bytes with it. Variables that are not temporaries interfere with every other variable.
+    """
+
+    addresses: dict[str, int] = field(default_factory=dict)
+    sizes: dict[str, int] = field(default_factory=dict)
+    interference: dict[str, set[str]] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        """The number of zero page bytes used."""
+        return max((self.addresses[label] + self.sizes[label] for label in self.addresses), default=0)
+
+    def overlap(self, a: str, b: str) -> bool:
+        """Whether the bytes of two variables overlap."""
+        a_start, b_start = self.addresses[a], self.addresses[b]
+        return a_start < b_start + self.sizes[b] and b_start < a_start + self.sizes[a]
+
+    def conflicts(self) -> list[tuple[str, str]]:
+        """Pairs of interfering variables whose bytes overlap."""
+        return [
+            (a, b) for a in self.addresses for b in sorted(self.interference[a]) if a < b and self.overlap(a, b)
+        ]
+
+
+def allocate_zero_page(code_blocks: Iterable[CodeBlock]) -> ZeroPageAllocation:
+    """
+    Allocate the zero page variables among code_blocks (all the blocks of a ROM).
+
+    A temporary is live while any block that depends on it runs, including the subroutines that block calls
+    (its subroutine dependencies, transitively). Two temporaries interfere when a block using one is, or calls,
+    a block using the other, or when they are used in different contexts (reset code and the NMI). The variables
+    are then placed in order, each at the lowest address where it overlaps none of the variables it interferes
+    with: a greedy coloring of the interference graph in which the colors are byte ranges.
+    """
+    blocks = {block.label: block for block in code_blocks}
+    variables = [block for block in blocks.values() if block.type == CodeBlockType.ZEROPAGE]
+
+    def subroutine_calls(block: CodeBlock) -> list[str]:
+        return [
+            label
+            for label in block.dependencies + block.optional_dependencies
+            if label in blocks and blocks[label].type == CodeBlockType.SUBROUTINE
+        ]
+
+    # Every block a block runs while it is active: itself and the subroutines it calls (dependencies are acyclic)
+    active: dict[str, set[str]] = {}
+
+    def runs(label: str) -> set[str]:
+        if label not in active:
+            active[label] = {label}.union(*(runs(callee) for callee in subroutine_calls(blocks[label])))
+        return active[label]
+
+    contexts: dict[str, set[str]] = {}
+    for block in blocks.values():
+        if block.type in _CONTEXTS:
+            for label in runs(block.label):
+                contexts.setdefault(label, set()).add(_CONTEXTS[block.type])
+
+    # For each variable, the blocks that use it, the blocks running while it is live and the contexts it is used in
+    users: dict[str, set[str]] = {variable.label: set() for variable in variables}
+    live_in: dict[str, set[str]] = {variable.label: set() for variable in variables}
+    used_in: dict[str, set[str]] = {variable.label: set() for variable in variables}
+    for block in blocks.values():
+        if block.type == CodeBlockType.ZEROPAGE:
+            continue
+        for label in block.dependencies + block.optional_dependencies:
+            if label in users:
+                users[label].add(block.label)
+                live_in[label] |= runs(block.label)
+                # A block no reset or NMI code calls could run anywhere
+                used_in[label] |= contexts.get(block.label, set(_CONTEXTS.values()))
+
+    def temporary(variable: CodeBlock) -> bool:
+        return getattr(variable, "temporary", False) and bool(users[variable.label])
+
+    def interfere(a: str, b: str) -> bool:
+        nested = bool(users[a] & live_in[b]) or bool(users[b] & live_in[a])
+        return nested or len(used_in[a] | used_in[b]) > 1
+
+    allocation = ZeroPageAllocation()
+    for variable in variables:
+        allocation.interference[variable.label] = {
+            other.label
+            for other in variables
+            if other is not variable
+            and not (temporary(variable) and temporary(other) and not interfere(variable.label, other.label))
+        }
+
+    for variable in variables:
+        label = variable.label
+        allocation.sizes[label] = variable.size
+        allocation.addresses[label] = 0
+        placed = [other for other in allocation.interference[label] if other in allocation.addresses]
+        while clashes := [other for other in placed if allocation.overlap(label, other)]:
+            allocation.addresses[label] = max(allocation.addresses[other] + allocation.sizes[other] for other in clashes)
+
+    return allocation
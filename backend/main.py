@@ -1,5 +1,6 @@
 import logging
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,7 +11,10 @@ from api.games.entities.routers import router as entity_router
 from api.games.routers import router as game_router
 from api.games.scenes.routers import router as scene_router
 from api.resources.routers import router as resource_router
+from api.rom.routers import router as rom_router
 from config import settings
+from core.compression import CompressionMiddleware
+from core.rom.executor import compile_executor
 
 # Configure logging
 log_level = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -36,14 +40,31 @@ v1_app.include_router(asset_router, prefix="/games/{game_id}/assets", tags=["ass
 v1_app.include_router(component_router, prefix="/games/{game_id}/components", tags=["components"])
 v1_app.include_router(scene_router, prefix="/games/{game_id}/scenes", tags=["scenes"])
 v1_app.include_router(entity_router, prefix="/games/{game_id}/entities", tags=["entities"])
+v1_app.include_router(rom_router, prefix="/rom", tags=["rom"])
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    compile_executor.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Compress JSON and ROM responses
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
 
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[f"{settings.FRONTEND_URL}"],
     allow_methods=["*"],
+    expose_headers=["ETag", "X-Rom-Base", "X-Rom-Cache"],
 )
 
 app.mount("/api/v1", v1_app)
@@ -1,8 +1,27 @@
+import uuid
 from collections.abc import Callable
 
 from py65.devices.mpu6502 import MPU
 from py65.memory import ObservableMemory
 
+from core.rom.builder import RomBuilder
+from core.rom.cache import RomLayoutCache
+from core.rom.code_block_registry import CodeBlockRegistry
+from core.rom.label_registry import LabelRegistry
+from core.rom.rom import Rom, RomLayout
+from core.rom.snapshot import AssetSnapshot, EntitySnapshot, GameSnapshot, SceneSnapshot
+from core.schemas import (
+    AssetType,
+    NESColor,
+    NESEntity,
+    NESGameData,
+    NESPalette,
+    NESPaletteAssetData,
+    NESScene,
+    NESSpriteSetAssetData,
+    SpriteSetType,
+)
+
 
 class MemoryObserver:
     """
@@ -140,3 +159,78 @@ def run_subroutine(
 
     # Run until we return
     return run_until(cpu, lambda: cpu.pc == return_address, max_cycles)
+
+
+def make_game_snapshot(n_entities: int = 1, scene_names: tuple[str, ...] = ("main",)) -> GameSnapshot:
+    """
+    Build a small but complete game snapshot: one palette, one sprite set, and
+    n_entities entities shared by every scene.
+    """
+    palette = AssetSnapshot(
+        id=uuid.uuid4(),
+        name="pal",
+        type=AssetType.PALETTE,
+        data=NESPaletteAssetData(
+            palettes=[
+                NESPalette(colors=(NESColor(index=i), NESColor(index=i + 1), NESColor(index=i + 2))) for i in range(4)
+            ]
+        ),
+    )
+    sprite_set = AssetSnapshot(
+        id=uuid.uuid4(),
+        name="face",
+        type=AssetType.SPRITE_SET,
+        data=NESSpriteSetAssetData(sprite_set_type=SpriteSetType.STATIC, chr_data=bytes(range(16))),
+    )
+    entities = [
+        EntitySnapshot(
+            id=uuid.uuid4(),
+            name=f"entity_{i}",
+            entity_data=NESEntity(x=8 * i, y=16 + i, spriteset=sprite_set.id, palette_index=i % 4),
+        )
+        for i in range(n_entities)
+    ]
+    scenes = [
+        SceneSnapshot(
+            id=uuid.uuid4(),
+            name=name,
+            scene_data=NESScene(
+                background_color=NESColor(index=0x0F),
+                background_palettes=palette.id,
+                sprite_palettes=palette.id,
+                entities=[entity.id for entity in entities],
+            ),
+        )
+        for name in scene_names
+    ]
+    return GameSnapshot(
+        id=uuid.uuid4(), game_data=NESGameData(), scenes=scenes, assets=[palette, sprite_set], entities=entities
+    )
+
+
+def compile_snapshot(
+    snapshot: GameSnapshot,
+    initial_scene_name: str = "main",
+    layout_cache: RomLayoutCache | None = None,
+    scene_id: uuid.UUID | None = None,
+) -> bytes:
+    """Compile a snapshot with a fresh builder, without a database."""
+    label_registry = LabelRegistry()
+    code_block_registry = CodeBlockRegistry(label_registry=label_registry)
+    builder = RomBuilder(
+        db=None,
+        rom=Rom(),
+        label_registry=label_registry,
+        code_block_registry=code_block_registry,
+        layout_cache=layout_cache,
+    )
+    return builder.compile(snapshot, initial_scene_name=initial_scene_name, scene_id=scene_id)
+
+
+def compile_with_layout(snapshot: GameSnapshot, scene_id: uuid.UUID | None = None) -> tuple[bytes, RomLayout]:
+    """Compile a snapshot with a fresh builder and return the ROM with the layout it was rendered with."""
+    label_registry = LabelRegistry()
+    code_block_registry = CodeBlockRegistry(label_registry=label_registry)
+    builder = RomBuilder(db=None, rom=Rom(), label_registry=label_registry, code_block_registry=code_block_registry)
+    rom = builder.compile(snapshot, scene_id=scene_id)
+    return rom, builder.rom.layout
@@ -0,0 +1,130 @@
+import pytest
+
+from core.rom.asm import Asm6502, LabelRef, Relocation, RelocationType, hi, lo
+from core.rom.subroutines import LoadSceneSubroutine
+
+
+class TestRelocatableAssembly:
+    """Tests for symbolic operands and the relocation table."""
+
+    def test_literal_operands_need_no_relocations(self):
+        """Verify that purely literal code assembles to final bytes."""
+        obj = Asm6502().lda_imm(0x12).sta_abs(0x2007).assemble()
+
+        assert obj.code == b"\xa9\x12\x8d\x07\x20"
+        assert obj.relocations == ()
+        assert obj.link(0xC000, {}) == obj.code
+
+    def test_external_references_become_relocations(self):
+        """Verify that references to unknown labels are left as relocations."""
+        asm = Asm6502()
+        asm.jsr("load_scene")
+        asm.lda_ind_y("zp__src1")
+        asm.sta_zp(LabelRef("zp__src2") + 1)
+        asm.lda_imm(lo("scene__main"))
+        asm.lda_imm(hi("scene__main"))
+        obj = asm.assemble()
+
+        assert obj.relocations == (
+            Relocation(1, RelocationType.ABSOLUTE, "load_scene", 0),
+            Relocation(4, RelocationType.ZEROPAGE, "zp__src1", 0),
+            Relocation(6, RelocationType.ZEROPAGE, "zp__src2", 1),
+            Relocation(8, RelocationType.LOW, "scene__main", 0),
+            Relocation(10, RelocationType.HIGH, "scene__main", 0),
+        )
+        assert obj.external_labels == {"load_scene", "zp__src1", "zp__src2", "scene__main"}
+
+    def test_link_patches_relocations(self):
+        """Verify that linking writes the resolved addresses into the placeholders."""
+        asm = Asm6502()
+        asm.jsr("load_scene")
+        asm.sta_zp(LabelRef("zp__src2") + 1)
+        asm.lda_imm(hi("scene__main"))
+        obj = asm.assemble()
+
+        code = obj.link(0xC000, {"load_scene": 0xC123, "zp__src2": 0x02, "scene__main": 0xD000})
+
+        assert code == b"\x20\x23\xc1\x85\x03\xa9\xd0"
+
+    def test_local_labels_resolve_relative_to_start_offset(self):
+        """Verify that absolute references to local labels follow the block's placement."""
+        asm = Asm6502()
+        asm.nop()
+        asm.label("loop")
+        asm.jmp_abs("loop")
+        obj = asm.assemble()
+
+        assert obj.link(0xC000, {}) == b"\xea\x4c\x01\xc0"
+        assert obj.link(0xD000, {}) == b"\xea\x4c\x01\xd0"
+
+    def test_branches_resolve_at_assembly_time(self):
+        """Verify that branches to local labels are encoded without relocations."""
+        asm = Asm6502()
+        asm.label("top")
+        asm.dex()
+        asm.bne("top")
+        asm.beq("end")
+        asm.nop()
+        asm.label("end")
+        obj = asm.assemble()
+
+        assert obj.code == b"\xca\xd0\xfd\xf0\x01\xea"
+        assert obj.relocations == ()
+
+    def test_out_of_range_branch_raises(self):
+        """Verify that a branch farther than 127 bytes is rejected."""
+        asm = Asm6502()
+        asm.beq("far")
+        for _ in range(128):
+            asm.nop()
+        asm.label("far")
+
+        with pytest.raises(ValueError, match="out of range"):
+            asm.assemble()
+
+    def test_zero_page_relocation_must_fit_in_zero_page(self):
+        """Verify that linking a zero page operand to a non-zero-page address fails."""
+        obj = Asm6502().lda_zp("zp__src1").assemble()
+
+        with pytest.raises(ValueError, match="not a zero page address"):
+            obj.link(0xC000, {"zp__src1": 0x0200})
+
+    def test_link_raises_key_error_for_missing_label(self):
+        """Verify that unresolved labels surface as KeyError, like a missing dependency."""
+        obj = Asm6502().jsr("missing").assemble()
+
+        with pytest.raises(KeyError):
+            obj.link(0xC000, {})
+
+
+class TestAssembledCodeBlock:
+    """Tests for code blocks that assemble once and link many times."""
+
+    def test_size_and_render_share_one_assembly(self, monkeypatch):
+        """Verify that size and repeated renders do not re-run the assembler."""
+        block = LoadSceneSubroutine()
+        calls = []
+        original = LoadSceneSubroutine._build_code
+
+        def counting_build_code(self, optional):
+            calls.append(optional)
+            return original(self, optional)
+
+        monkeypatch.setattr(LoadSceneSubroutine, "_build_code", counting_build_code)
+        names = {
+            "zp__src1": 0x10,
+            "zp__src2": 0x12,
+            "zp__entity_ram_page": 0x14,
+            "zp__entity_count": 0x15,
+            "zp__entities_dirty": 0x16,
+            "zp__vram_queue_head": 0x17,
+            "zp__vram_queue_tail": 0x18,
+            "queue_vram_write": 0x8800,
+        }
+
+        size = block.size
+        first = block.render(start_offset=0xC000, names=names)
+        second = block.render(start_offset=0xD000, names=names)
+
+        assert len(calls) == 1
+        assert len(first.code) == len(second.code) == size
@@ -0,0 +1,206 @@
+import uuid
+
+import pytest
+
+from core.rom.banks import BANK_SIZE, MAX_UXROM_BANKS, Mapper, bank_label, pack_banks
+from core.rom.builder import RomBuilder
+from core.rom.code_block import CodeBlock, CodeBlockType, RenderedCodeBlock
+from core.rom.code_block_registry import CodeBlockRegistry
+from core.rom.label_registry import LabelRegistry
+from core.rom.rom import Rom
+from core.rom.runner import HeadlessRunner, NesBus, PpuStub
+from core.rom.snapshot import EntitySnapshot, GameSnapshot, SceneSnapshot
+from core.schemas import NESColor, NESEntity, NESScene
+from tests.rom.helpers import make_game_snapshot
+
+
+class _Block(CodeBlock):
+    """A block of a given size and dependencies."""
+
+    block_size: int = 1
+    depends_on: list[str] = []
+    switched: list[str] = []
+
+    @property
+    def size(self) -> int:
+        return self.block_size
+
+    @property
+    def dependencies(self) -> list[str]:
+        return self.depends_on
+
+    @property
+    def switched_dependencies(self) -> list[str]:
+        return self.switched
+
+    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
+        return RenderedCodeBlock(code=bytes(self.block_size), exported_labels={self.label: start_offset})
+
+
+def data(label: str, size: int = 1, depends_on: list[str] | None = None) -> _Block:
+    return _Block(label=label, type=CodeBlockType.DATA, block_size=size, depends_on=depends_on or [])
+
+
+def code(label: str, depends_on: list[str], switched: list[str] | None = None) -> _Block:
+    return _Block(label=label, type=CodeBlockType.SUBROUTINE, depends_on=depends_on, switched=switched or [])
+
+
+def make_large_game(n_scenes: int, n_entities: int = 64) -> GameSnapshot:
+    """A game whose scenes each have their own n_entities entities, sharing one palette and sprite set."""
+    snapshot = make_game_snapshot(n_entities=0, scene_names=())
+    palette, sprite_set = snapshot.assets
+    for n in range(n_scenes):
+        entities = [
+            EntitySnapshot(
+                id=uuid.uuid4(),
+                name=f"entity_{n}_{i}",
+                entity_data=NESEntity(x=i, y=n, spriteset=sprite_set.id, palette_index=i % 4),
+            )
+            for i in range(n_entities)
+        ]
+        snapshot.entities.extend(entities)
+        snapshot.scenes.append(
+            SceneSnapshot(
+                id=uuid.uuid4(),
+                name=f"scene_{n}",
+                scene_data=NESScene(
+                    background_color=NESColor(index=0x0F),
+                    background_palettes=palette.id,
+                    sprite_palettes=palette.id,
+                    entities=[entity.id for entity in entities],
+                ),
+            )
+        )
+    return snapshot
+
+
+def compile_for(snapshot: GameSnapshot, mapper: Mapper, initial_scene_name: str = "main") -> tuple[bytes, Rom]:
+    """Compile a snapshot for a mapper; returns the ROM image and the rendered Rom."""
+    label_registry = LabelRegistry()
+    builder = RomBuilder(
+        db=None,
+        rom=Rom(mapper=mapper),
+        label_registry=label_registry,
+        code_block_registry=CodeBlockRegistry(label_registry=label_registry),
+    )
+    return builder.compile(snapshot, initial_scene_name=initial_scene_name), builder.rom
+
+
+class TestPackBanks:
+    """Tests for packing data blocks into switchable PRG banks."""
+
+    def test_scene_and_its_data_share_a_bank(self):
+        """Verify that a scene is banked with the data only it points at, and data code reads stays fixed."""
+        layout = pack_banks(
+            [
+                data("table"),
+                data("palette"),
+                data("entity"),
+                data("scene", depends_on=["palette", "entity"]),
+                code("reader", depends_on=["table"]),
+            ]
+        )
+
+        assert layout.banks == [["palette", "entity", "scene"]]
+        assert "table" not in layout.bank_of
+
+    def test_data_shared_by_scenes_stays_fixed(self):
+        """Verify that data reached from more than one scene goes to the fixed bank, where every bank sees it."""
+        layout = pack_banks(
+            [
+                data("shared"),
+                data("a", depends_on=["shared"]),
+                data("b", depends_on=["shared"]),
+            ]
+        )
+
+        assert layout.bank_of == {"a": 0, "b": 0}
+
+    def test_switched_dependencies_may_be_banked(self):
+        """Verify that data read by code only after switching banks is banked, but plain dependencies are not."""
+        blocks = [data("scene", depends_on=["entity"]), data("entity")]
+
+        switched = pack_banks([*blocks, code("loader", depends_on=["scene"], switched=["scene"])])
+        direct = pack_banks([*blocks, code("loader", depends_on=["scene"])])
+
+        assert switched.bank_of == {"scene": 0, "entity": 0}
+        assert direct.bank_of == {}
+
+    def test_first_fit_by_decreasing_size(self):
+        """Verify that the largest groups are placed first and smaller ones fill the gaps."""
+        layout = pack_banks(
+            [
+                data("small", size=BANK_SIZE // 4),
+                data("large", size=BANK_SIZE // 2 + 1),
+                data("medium", size=BANK_SIZE // 2),
+                data("filler", size=BANK_SIZE // 4),
+            ]
+        )
+
+        assert layout.bank_of == {"large": 0, "medium": 1, "small": 0, "filler": 1}
+        assert layout.bank_count == 4
+        assert layout.fixed_bank == 3
+
+    def test_group_larger_than_a_bank_raises(self):
+        """Verify that a scene whose data cannot fit one bank is refused."""
+        with pytest.raises(ValueError, match="1 bytes larger than a PRG bank"):
+            pack_banks([data("entity", size=BANK_SIZE), data("scene", depends_on=["entity"])])
+
+    def test_too_many_banks_raises(self):
+        """Verify that data needing more banks than the mapper has overflows PRG ROM."""
+        blocks = [data(f"scene_{i}", size=BANK_SIZE) for i in range(MAX_UXROM_BANKS)]
+
+        with pytest.raises(ValueError, match="more than 15 switchable banks"):
+            pack_banks(blocks)
+
+
+class TestUxromRom:
+    """Tests for rendering and running UxROM images."""
+
+    def test_nrom_header_is_unchanged(self):
+        """Verify that an NROM image keeps one PRG bank and mapper 0."""
+        rom, _ = compile_for(make_game_snapshot(n_entities=1), Mapper.NROM)
+
+        assert (rom[4], rom[6], rom[7]) == (1, 0x00, 0x00)
+
+    def test_header_and_bank_names(self):
+        """Verify the iNES header of a UxROM image and that every PRG block exports its bank."""
+        rom, result = compile_for(make_game_snapshot(n_entities=1), Mapper.UXROM)
+        layout = result.layout
+
+        assert (rom[4], rom[6], rom[7]) == (layout.banks.bank_count, 0x20, 0x00)
+        assert 0x8000 <= layout.records["scene__main"].start_offset < 0xC000
+        preamble = layout.records["preamble"].rendered
+        # LDA #bank, JSR switch_bank right after the CPU setup
+        bank = layout.banks.bank_of["scene__main"]
+        assert bytes(preamble.code).find(bytes([0xA9, bank, 0x20])) > 0
+        assert bank_label("scene__main") in layout.records["preamble"].reads
+
+    def test_game_larger_than_nrom_boots_from_a_switchable_bank(self):
+        """Verify that a game too large for NROM builds on UxROM and loads its initial scene from a switchable bank."""
+        snapshot = make_large_game(n_scenes=60)
+
+        with pytest.raises(ValueError, match="PRG ROM overflow"):
+            compile_for(snapshot, Mapper.NROM, initial_scene_name="scene_59")
+
+        rom, result = compile_for(snapshot, Mapper.UXROM, initial_scene_name="scene_59")
+        runner = HeadlessRunner(rom, layout=result.layout)
+        # The sprite DMA runs before render_entities: the first frame's sprites reach OAM in the second
+        runner.run(frames=2)
+
+        assert len(result.layout.banks.banks) == 2
+        assert runner.bus.bank_offset == result.layout.banks.bank_of["scene__scene_59"] * BANK_SIZE
+        y, tile, attributes, x = runner.ppu.oam[4:8]
+        assert (x, y, tile, attributes) == (1, 59, 1, 1)
+
+    def test_bank_writes_have_bus_conflicts(self):
+        """Verify that the runner maps the bank written ANDed with the ROM byte under the write."""
+        prg_rom = bytearray(4 * BANK_SIZE)
+        prg_rom[3 * BANK_SIZE : 3 * BANK_SIZE + 4] = bytes(range(4))
+        prg_rom[1 * BANK_SIZE] = 0xAB
+        bus = NesBus(bytes(prg_rom), PpuStub(), mapper=2)
+
+        bus.write(0xC001, 0x03)  # ROM byte 1: bank 3 & 1 = 1
+        assert bus.read(0x8000) == 0xAB
+        bus.write(0xC002, 0x02)
+        assert bus.bank_offset == 2 * BANK_SIZE
@@ -7,6 +7,7 @@ from core.rom.code_block import CodeBlock, CodeBlockType, RenderedCodeBlock
 from core.rom.code_block_registry import CodeBlockRegistry, DEFAULT_REGISTRY
 from core.rom.label_registry import LabelRegistry
 from core.rom.preamble import PreambleCodeBlock
+from core.rom.resolver import DependencyCycleError
 from core.rom.rom import Rom, RomCodeArea
 from core.rom.subroutines import LoadSceneSubroutine
 
@@ -255,3 +256,67 @@ class TestRomBuilder:
 
         # Depth-first order: C, A, D, E, B, root
         assert rom.add_order == ["C", "A", "D", "E", "B", "root"]
+
+    def test_diamond_dependencies_are_walked_once(self):
+        """Verify that a dependency shared by several blocks is resolved and added only once."""
+        builder, rom, code_block_registry = create_test_builder()
+
+        shared = MockCodeBlock("shared", dependencies=["zp__src1"])
+        left = MockCodeBlock("left", dependencies=["shared"])
+        right = MockCodeBlock("right", dependencies=["shared"])
+        code_block_registry.add_code_block(shared)
+        code_block_registry.add_code_block(left)
+        code_block_registry.add_code_block(right)
+
+        builder._add(rom, MockCodeBlock("root", dependencies=["left", "right"]))
+        builder._add(rom, MockCodeBlock("other_root", dependencies=["shared"]))
+
+        assert rom.add_order == ["zp__src1", "shared", "left", "right", "root", "other_root"]
+        assert all(count == 1 for count in rom.add_count.values())
+
+    def test_raises_on_dependency_cycle_with_label_path(self):
+        """Verify that a dependency cycle is reported with the full label path instead of recursing forever."""
+        builder, rom, code_block_registry = create_test_builder()
+
+        code_block_registry.add_code_block(MockCodeBlock("A", dependencies=["B"]))
+        code_block_registry.add_code_block(MockCodeBlock("B", dependencies=["C"]))
+        code_block_registry.add_code_block(MockCodeBlock("C", dependencies=["A"]))
+
+        with pytest.raises(DependencyCycleError) as exc_info:
+            builder._add(rom, MockCodeBlock("root", dependencies=["A"]))
+
+        assert exc_info.value.path == ["A", "B", "C", "A"]
+        assert "A -> B -> C -> A" in str(exc_info.value)
+        assert rom.add_order == []
+
+    def test_raises_on_self_dependency(self):
+        """Verify that a block depending on itself is reported as a cycle."""
+        builder, rom, code_block_registry = create_test_builder()
+
+        block = MockCodeBlock("loop", dependencies=["loop"])
+        code_block_registry.add_code_block(block)
+
+        with pytest.raises(DependencyCycleError, match="loop -> loop"):
+            builder._add(rom, block)
+
+    def test_unknown_dependency_error_includes_path(self):
+        """Verify that a missing dependency names the chain of blocks that required it."""
+        builder, rom, code_block_registry = create_test_builder()
+
+        code_block_registry.add_code_block(MockCodeBlock("middle", dependencies=["unknown_dep"]))
+
+        with pytest.raises(KeyError, match="required by top -> middle"):
+            builder._add(rom, MockCodeBlock("top", dependencies=["middle"]))
+
+    def test_deep_dependency_chain_does_not_recurse(self):
+        """Verify that long dependency chains resolve without hitting the recursion limit."""
+        builder, rom, code_block_registry = create_test_builder()
+
+        depth = 5000
+        code_block_registry.add_code_block(MockCodeBlock("chain_0"))
+        for i in range(1, depth):
+            code_block_registry.add_code_block(MockCodeBlock(f"chain_{i}", dependencies=[f"chain_{i - 1}"]))
+
+        builder._add(rom, code_block_registry[f"chain_{depth - 1}"])
+
+        assert rom.add_order == [f"chain_{i}" for i in range(depth)]
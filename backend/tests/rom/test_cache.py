@@ -0,0 +1,194 @@
+import uuid
+
+from config import settings
+from core.etag import etag_matches, quote_etag, unquote_etag
+from core.rom.cache import RomCache, RomHistory
+from core.rom.snapshot import GameSnapshot
+from core.schemas import NESEntity
+from tests.rom.helpers import compile_snapshot, make_game_snapshot
+
+
+class TestGameSnapshotFingerprint:
+    """Tests for the normalized game snapshot hash."""
+
+    def test_fingerprint_is_stable_across_child_order(self):
+        """Verify that the order children were loaded in does not affect the fingerprint."""
+        snapshot = make_game_snapshot(n_entities=3)
+        shuffled = snapshot.model_copy(update={"entities": list(reversed(snapshot.entities))})
+
+        assert GameSnapshot.from_model(shuffled).fingerprint() == GameSnapshot.from_model(snapshot).fingerprint()
+
+    def test_fingerprint_changes_when_an_entity_moves(self):
+        """Verify that editing any entity produces a different fingerprint."""
+        snapshot = make_game_snapshot(n_entities=2)
+        before = snapshot.fingerprint()
+
+        snapshot.entities[1].entity_data = NESEntity(x=200, y=100, spriteset=snapshot.entities[1].entity_data.spriteset)
+
+        assert snapshot.fingerprint() != before
+
+    def test_fingerprint_ignores_revision(self):
+        """Verify that a revision bump without a content change keeps the fingerprint (and so the cached ROM)."""
+        snapshot = make_game_snapshot()
+        bumped = snapshot.model_copy(update={"revision": snapshot.revision + 1})
+
+        assert bumped.fingerprint() == snapshot.fingerprint()
+
+    def test_fingerprint_handles_non_utf8_chr_data(self):
+        """Verify that arbitrary CHR bytes can be hashed."""
+        snapshot = make_game_snapshot()
+        snapshot.assets[1].data.chr_data = bytes([0xFF] * 16)
+
+        assert len(snapshot.fingerprint()) == 64
+
+
+class TestRomCache:
+    """Tests for the content-addressed ROM cache."""
+
+    def test_miss_then_hit(self):
+        """Verify that the first lookup builds and the second is served from the cache."""
+        cache = RomCache(max_entries=4, max_bytes=1024)
+        builds = []
+
+        def build():
+            builds.append(1)
+            return b"rom"
+
+        assert cache.get_or_build("k", build) == (b"rom", False)
+        assert cache.get_or_build("k", build) == (b"rom", True)
+        assert len(builds) == 1
+        assert cache.stats().hits == 1
+        assert cache.stats().misses == 1
+
+    def test_evicts_least_recently_used_entry(self):
+        """Verify that exceeding max_entries evicts the least recently used ROM."""
+        cache = RomCache(max_entries=2, max_bytes=1024)
+        cache.put("a", b"a")
+        cache.put("b", b"b")
+        cache.get("a")
+        cache.put("c", b"c")
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+        assert cache.stats().evictions == 1
+
+    def test_evicts_to_stay_within_max_bytes(self):
+        """Verify that the cache never holds more than max_bytes of ROM data."""
+        cache = RomCache(max_entries=10, max_bytes=10)
+        cache.put("a", b"x" * 6)
+        cache.put("b", b"x" * 6)
+
+        assert "a" not in cache
+        assert cache.stats().size_bytes == 6
+
+    def test_does_not_store_oversized_roms(self):
+        """Verify that a ROM larger than the whole cache is not stored."""
+        cache = RomCache(max_entries=10, max_bytes=10)
+        cache.put("a", b"x" * 11)
+
+        assert len(cache) == 0
+
+    def test_key_depends_on_initial_scene(self):
+        """Verify that the same game built from different entry scenes gets different keys."""
+        snapshot = make_game_snapshot(scene_names=("main", "title"))
+
+        assert RomCache.key_for(snapshot, "main") != RomCache.key_for(snapshot, "title")
+
+    def test_key_depends_on_build_options(self, monkeypatch):
+        """Verify that changing any ROM setting that changes the build also changes the key."""
+        snapshot = make_game_snapshot()
+        keys = {RomCache.key_for(snapshot, "main")}
+
+        for name, value in [
+            ("ROM_MAPPER", "uxrom"),
+            ("ROM_CHR_RAM", True),
+            ("ROM_ENTITY_LAYOUT", "struct_of_arrays"),
+            ("ROM_SCENE_COMPRESSION", True),
+            ("ROM_VRAM_FLUSH_CYCLES", 2000),
+        ]:
+            monkeypatch.setattr(settings, name, value)
+            keys.add(RomCache.key_for(snapshot, "main"))
+
+        assert len(keys) == 6
+
+    def test_remembers_key_per_revision(self):
+        """Verify that a game revision maps back to the key it produced, per initial scene."""
+        cache = RomCache(max_entries=4, max_bytes=1024)
+        snapshot = make_game_snapshot()
+        key = RomCache.key_for(snapshot, "main")
+
+        cache.remember_revision(snapshot.id, 3, "main", key)
+
+        assert cache.key_for_revision(snapshot.id, 3, "main") == key
+        assert cache.key_for_revision(snapshot.id, 4, "main") is None
+        assert cache.key_for_revision(snapshot.id, 3, "title") is None
+
+    def test_forgets_revisions_built_with_other_options(self, monkeypatch):
+        """Verify that a revision's key is not reused once the ROM settings change."""
+        cache = RomCache(max_entries=4, max_bytes=1024)
+        snapshot = make_game_snapshot()
+        cache.remember_revision(snapshot.id, 3, "main", RomCache.key_for(snapshot, "main"))
+
+        monkeypatch.setattr(settings, "ROM_CHR_RAM", True)
+
+        assert cache.key_for_revision(snapshot.id, 3, "main") is None
+
+    def test_cached_rom_matches_fresh_compile(self):
+        """Verify that a snapshot compiles deterministically, so a cached ROM is interchangeable with a fresh one."""
+        snapshot = make_game_snapshot(n_entities=3)
+
+        assert compile_snapshot(snapshot) == compile_snapshot(snapshot)
+
+
+class TestEtagMatches:
+    """Tests for If-None-Match evaluation."""
+
+    def test_matches_exact_tag(self):
+        assert etag_matches(quote_etag("abc"), quote_etag("abc"))
+
+    def test_matches_tag_in_list_and_weak_tag(self):
+        assert etag_matches('"x", W/"abc"', quote_etag("abc"))
+
+    def test_matches_wildcard(self):
+        assert etag_matches("*", quote_etag("abc"))
+
+    def test_does_not_match_other_tag_or_missing_header(self):
+        assert not etag_matches('"x"', quote_etag("abc"))
+        assert not etag_matches(None, quote_etag("abc"))
+
+    def test_unquote_etag_recovers_the_tag(self):
+        assert unquote_etag('"abc"') == "abc"
+        assert unquote_etag('W/"abc-gzip"') == "abc"
+        assert unquote_etag("abc") == "abc"
+
+
+class TestRomHistory:
+    """Tests for the per-game history of recent builds."""
+
+    def test_keeps_the_last_builds_of_each_game(self):
+        """Verify that older builds of a game are displaced only by newer builds of the same game."""
+        history = RomHistory(max_per_game=2, max_games=4)
+        game, other = uuid.uuid4(), uuid.uuid4()
+
+        history.add(game, "a", b"1")
+        history.add(other, "x", b"9")
+        history.add(game, "b", b"2")
+        history.add(game, "c", b"3")
+
+        assert history.get(game, "a") is None
+        assert history.get(game, "b") == b"2"
+        assert history.get(game, "c") == b"3"
+        assert history.get(other, "x") == b"9"
+        assert history.stats().entries == 3
+
+    def test_evicts_least_recently_built_game(self):
+        """Verify that the history is bounded by the number of games."""
+        history = RomHistory(max_per_game=2, max_games=1)
+        game, other = uuid.uuid4(), uuid.uuid4()
+
+        history.add(game, "a", b"1")
+        history.add(other, "x", b"9")
+
+        assert history.get(game, "a") is None
+        assert history.stats().games == 1
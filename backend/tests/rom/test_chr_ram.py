@@ -0,0 +1,244 @@
+import uuid
+
+import pytest
+
+from core.rom.banks import Mapper
+from core.rom.builder import RomBuilder
+from core.rom.code_block import CodeBlockType
+from core.rom.code_block_registry import CodeBlockRegistry
+from core.rom.compression import PackedChrData, PackMethod, chr_upload_label, unpack
+from core.rom.data import SpriteSetCHRData
+from core.rom.label_registry import LabelRegistry
+from core.rom.rom import CHR_ROM_SIZE, CHR_TILE_SIZE, TEST_TILE, Rom, allocate_chr_ram
+from core.rom.runner import HeadlessRunner
+from core.rom.runtime import runtime_library
+from core.rom.snapshot import AssetSnapshot, EntitySnapshot, GameSnapshot, SceneSnapshot
+from core.schemas import (
+    MAX_N_SCENE_ENTITIES,
+    AssetType,
+    NESColor,
+    NESEntity,
+    NESScene,
+    NESSpriteSetAssetData,
+    SpriteSetType,
+)
+from tests.rom.helpers import make_game_snapshot
+from tests.rom.test_banks import data
+
+
+def chr_block(label: str, size: int = CHR_TILE_SIZE) -> SpriteSetCHRData:
+    sprite_set = NESSpriteSetAssetData(sprite_set_type=SpriteSetType.STATIC, chr_data=bytes(size))
+    return SpriteSetCHRData(label=label, type=CodeBlockType.CHR, sprite_set_data=sprite_set)
+
+
+def make_sprite_set_game(n_scenes: int, n_tiles: int) -> GameSnapshot:
+    """A game whose scenes each have one entity with its own sprite set of n_tiles distinct tiles."""
+    # Distinct tiles that still pack: a tile is its scene and number, then a run
+    snapshot = make_game_snapshot(n_entities=0, scene_names=())
+    palette = snapshot.assets[0]
+    snapshot.assets = [palette]
+    for n in range(n_scenes):
+        chr_data = b"".join(bytes([n, tile]) + bytes([tile]) * (CHR_TILE_SIZE - 2) for tile in range(n_tiles))
+        sprite_set = AssetSnapshot(
+            id=uuid.uuid4(),
+            name=f"sprites_{n}",
+            type=AssetType.SPRITE_SET,
+            data=NESSpriteSetAssetData(sprite_set_type=SpriteSetType.STATIC, chr_data=chr_data),
+        )
+        entity = EntitySnapshot(
+            id=uuid.uuid4(), name=f"entity_{n}", entity_data=NESEntity(x=n, y=n, spriteset=sprite_set.id)
+        )
+        snapshot.assets.append(sprite_set)
+        snapshot.entities.append(entity)
+        snapshot.scenes.append(
+            SceneSnapshot(
+                id=uuid.uuid4(),
+                name=f"scene_{n}",
+                scene_data=NESScene(
+                    background_color=NESColor(index=0x0F),
+                    background_palettes=palette.id,
+                    sprite_palettes=palette.id,
+                    entities=[entity.id],
+                ),
+            )
+        )
+    return snapshot
+
+
+def make_full_scene_game() -> GameSnapshot:
+    """A game whose main scene has every entity slot filled, each entity with its own one-tile sprite set."""
+    snapshot = make_game_snapshot(n_entities=MAX_N_SCENE_ENTITIES)
+    snapshot.assets = snapshot.assets[:1]
+    for n, entity in enumerate(snapshot.entities):
+        sprite_set = AssetSnapshot(
+            id=uuid.uuid4(),
+            name=f"sprites_{n}",
+            type=AssetType.SPRITE_SET,
+            data=NESSpriteSetAssetData(sprite_set_type=SpriteSetType.STATIC, chr_data=bytes([n + 1]) * CHR_TILE_SIZE),
+        )
+        snapshot.assets.append(sprite_set)
+        entity.entity_data.spriteset = sprite_set.id
+    return snapshot
+
+
+def compile_chr_ram(
+    snapshot: GameSnapshot, initial_scene_name: str = "main", chr_ram: bool = True, mapper: Mapper = Mapper.NROM
+) -> tuple[bytes, RomBuilder]:
+    """Compile a snapshot for CHR RAM; returns the ROM and the builder."""
+    label_registry = LabelRegistry()
+    builder = RomBuilder(
+        db=None,
+        rom=Rom(mapper=mapper, chr_ram=chr_ram),
+        label_registry=label_registry,
+        code_block_registry=CodeBlockRegistry(label_registry=label_registry),
+    )
+    return builder.compile(snapshot, initial_scene_name=initial_scene_name), builder
+
+
+class TestAllocateChrRam:
+    """Tests for laying out CHR blocks in CHR RAM."""
+
+    def test_blocks_of_one_scene_do_not_overlap(self):
+        """Verify that CHR blocks a scene reaches, directly or through its entities, get disjoint tiles."""
+        blocks = [
+            chr_block("a"),
+            chr_block("b"),
+            data("entity", depends_on=["b"]),
+            data("scene", depends_on=["a", "entity"]),
+        ]
+
+        assert allocate_chr_ram(blocks, {"a": 3, "b": 2}) == {"a": 0, "b": 3}
+
+    def test_blocks_of_different_scenes_share_tiles(self):
+        """Verify that CHR blocks never in CHR RAM together reuse the same tiles, around the ones they share."""
+        blocks = [
+            chr_block("shared"),
+            chr_block("a"),
+            chr_block("b"),
+            data("scene_a", depends_on=["shared", "a"]),
+            data("scene_b", depends_on=["shared", "b"]),
+        ]
+
+        assert allocate_chr_ram(blocks, {"shared": 1, "a": 4, "b": 2}) == {"shared": 0, "a": 1, "b": 1}
+
+    def test_first_fit_fills_gaps(self):
+        """Verify that a block goes into the first gap between the blocks it shares a scene with that fits it."""
+        blocks = [
+            chr_block("a"),
+            chr_block("b"),
+            chr_block("c"),
+            data("scene_a", depends_on=["a"]),
+            data("scene_b", depends_on=["b", "c"]),
+            data("scene_c", depends_on=["a", "c"]),
+        ]
+
+        # c may not overlap a (tiles 0-1) or b (tiles 0-4)
+        assert allocate_chr_ram(blocks, {"a": 2, "b": 5, "c": 1}) == {"a": 0, "b": 0, "c": 5}
+
+    def test_scene_larger_than_pattern_memory_raises(self):
+        """Verify that the tiles one scene uses must fit in the 512 tiles of CHR RAM."""
+        blocks = [chr_block("a"), chr_block("b"), data("scene", depends_on=["a", "b"])]
+
+        with pytest.raises(ValueError, match="CHR RAM overflow: 'b' ends 1 tiles past"):
+            allocate_chr_ram(blocks, {"a": 500, "b": 13})
+
+
+class TestPackedChrData:
+    """Tests for the packed CHR upload blocks."""
+
+    def test_renders_the_ppu_address_and_an_rle_stream(self):
+        """Verify that an upload is the PPU address of the block's first tile, then its tiles rle packed."""
+        block = PackedChrData.wrap(runtime_library["chr__test_tile"])
+
+        rendered = block.render(0xC000, {"chr__test_tile": 0x21})
+
+        assert block.label == chr_upload_label("chr__test_tile")
+        assert block.dependencies == ["chr__test_tile", "upload_chr"]
+        assert rendered.code[:2] == bytes([0x02, 0x10])
+        assert unpack(bytes([PackMethod.RLE]) + rendered.code[2:]) == TEST_TILE
+        assert len(rendered.code) <= block.size
+
+    def test_refuses_blocks_that_are_not_chr(self):
+        """Verify that only CHR blocks can be uploaded."""
+        with pytest.raises(ValueError, match="is not CHR data"):
+            PackedChrData.wrap(data("scene"))
+
+
+class TestChrRamRom:
+    """Tests for building and running ROMs with CHR RAM."""
+
+    def test_header_and_image_have_no_chr_rom(self):
+        """Verify that a CHR RAM image declares no CHR ROM banks and ends after PRG ROM."""
+        rom, _ = compile_chr_ram(make_game_snapshot(n_entities=1))
+
+        assert (rom[4], rom[5]) == (1, 0)
+        assert len(rom) == 16 + 0x4000
+
+    def test_load_scene_uploads_the_scene_tiles(self):
+        """Verify that booting writes the test tile and the scene's sprite set to pattern memory and OAM uses them."""
+        snapshot = make_game_snapshot(n_entities=2)
+        rom, builder = compile_chr_ram(snapshot)
+        layout = builder.rom.layout
+
+        runner = HeadlessRunner(rom, layout=layout)
+        runner.run(frames=2)
+
+        sprite_label = builder.label_registry.get_asset_label(snapshot.assets[1].id)
+        assert layout.chr.remaps == {"chr__test_tile": (0,), sprite_label: (1,)}
+        assert bytes(runner.ppu.vram[:32]) == TEST_TILE + snapshot.assets[1].data.chr_data
+        assert runner.ppu.oam[1] == 1
+
+    def test_uploads_streams_longer_than_a_page(self):
+        """Verify that a sprite set whose packed stream is longer than 256 bytes uploads completely."""
+        snapshot = make_sprite_set_game(n_scenes=1, n_tiles=100)
+        rom, builder = compile_chr_ram(snapshot, initial_scene_name="scene_0")
+
+        runner = HeadlessRunner(rom, layout=builder.rom.layout)
+        runner.run(frames=0)
+
+        chr_data = snapshot.assets[1].data.chr_data
+        sprite_label = builder.label_registry.get_asset_label(snapshot.assets[1].id)
+        upload = builder.rom.layout.records[chr_upload_label(sprite_label)]
+        assert len(upload.rendered.code) > 256
+        assert bytes(runner.ppu.vram[CHR_TILE_SIZE : CHR_TILE_SIZE + len(chr_data)]) == chr_data
+
+    def test_upload_list_past_a_page(self):
+        """Verify that a scene whose upload list ends past offset 255 of the scene data uploads every sprite set."""
+        snapshot = make_full_scene_game()
+        rom, builder = compile_chr_ram(snapshot)
+        layout = builder.rom.layout
+
+        runner = HeadlessRunner(rom, layout=layout)
+        runner.run(frames=2)
+
+        scene_label = builder.label_registry.get_scene_label(snapshot.scenes[0].id)
+        assert layout.records[scene_label].block.size > 256
+        for n, sprite_set in enumerate(snapshot.assets[1:]):
+            (tile,) = layout.chr.remaps[builder.label_registry.get_asset_label(sprite_set.id)]
+            assert bytes(runner.ppu.vram[tile * CHR_TILE_SIZE : (tile + 1) * CHR_TILE_SIZE]) == sprite_set.data.chr_data
+            assert runner.ppu.oam[4 * n + 1] == tile
+
+    def test_sprite_sets_outgrow_chr_rom(self):
+        """Verify that a game with more tiles than CHR ROM holds builds with CHR RAM, each scene reusing the tiles."""
+        snapshot = make_sprite_set_game(n_scenes=3, n_tiles=200)
+
+        with pytest.raises(ValueError, match="CHR ROM overflow"):
+            compile_chr_ram(snapshot, initial_scene_name="scene_2", chr_ram=False)
+
+        rom, builder = compile_chr_ram(snapshot, initial_scene_name="scene_2", mapper=Mapper.UXROM)
+        runner = HeadlessRunner(rom, layout=builder.rom.layout)
+        # Uploading 200 tiles takes longer than a frame: the first NMI comes after that
+        runner.run(frames=3)
+
+        chr_data = snapshot.assets[3].data.chr_data
+        assert sum(len(remap) for remap in builder.rom.layout.chr.remaps.values()) * CHR_TILE_SIZE > CHR_ROM_SIZE
+        assert bytes(runner.ppu.vram[CHR_TILE_SIZE : CHR_TILE_SIZE + len(chr_data)]) == chr_data
+        assert runner.ppu.oam[1] == 1
+
+    def test_stays_off_by_default(self):
+        """Verify that without CHR RAM neither upload_chr nor any upload is linked and CHR ROM is written."""
+        rom, builder = compile_chr_ram(make_game_snapshot(n_entities=1), chr_ram=False)
+
+        assert "upload_chr" not in builder.rom.layout.records
+        assert "chr__test_tile" not in builder.rom.layout.records
+        assert rom[5] == 1
@@ -0,0 +1,236 @@
+import logging
+
+import pytest
+
+from core.rom.builder import RomBuilder
+from core.rom.code_block import CodeBlockType
+from core.rom.code_block_registry import CodeBlockRegistry
+from core.rom.compression import (
+    MAX_UNPACKED_SIZE,
+    PackedData,
+    PackMethod,
+    lz_compress,
+    pack,
+    rle_compress,
+    unpack,
+)
+from core.rom.data import AddressData, SceneData
+from core.rom.label_registry import LabelRegistry
+from core.rom.rom import CHR_TILE_SIZE, Rom
+from core.rom.runner import HeadlessRunner
+from core.rom.subroutines import LoadSceneSubroutine, UnpackDataSubroutine
+from core.schemas import NESColor
+from tests.rom.helpers import create_test_cpu, make_game_snapshot, run_subroutine
+from tests.rom.test_chr_ram import make_full_scene_game
+
+STREAM = 0x9000
+BUFFER = 0x0500
+
+UNPACK_NAMES = {"zp__src1": 0x10, "zp__unpack_count": 0x12, "zp__unpack_input": 0x13}
+
+SAMPLES = {
+    "empty": b"",
+    "single": b"\x2a",
+    "run": b"\x0f" * 200,
+    "repeated_pattern": b"\x01\x02\x03\x04" * 40,
+    "mixed": bytes(range(40)) + b"\x00" * 30 + bytes(range(40)) + b"\xc0\x10" * 20,
+    "incompressible": bytes((i * 73 + 11) & 0xFF for i in range(200)),
+}
+
+
+def run_unpack(stream: bytes):
+    """Run unpack_data on a stream; returns the memory."""
+    code = UnpackDataSubroutine().render(start_offset=0x8000, names=UNPACK_NAMES)
+    cpu, memory = create_test_cpu(code.code, code_address=0x8000)
+    memory.write(STREAM, list(stream))
+    memory[0x10], memory[0x11] = STREAM & 0xFF, STREAM >> 8
+
+    run_subroutine(cpu, memory, subroutine_address=0x8000, max_cycles=100000)
+
+    return memory
+
+
+def compile_packed(snapshot, chr_ram: bool = False) -> tuple[bytes, RomBuilder]:
+    """Compile a snapshot with scene compression on; returns the ROM and the builder."""
+    label_registry = LabelRegistry()
+    builder = RomBuilder(
+        db=None,
+        rom=Rom(chr_ram=chr_ram),
+        label_registry=label_registry,
+        code_block_registry=CodeBlockRegistry(label_registry=label_registry),
+        scene_compression=True,
+    )
+    return builder.compile(snapshot), builder
+
+
+class TestPackFormats:
+    """Tests for the RLE and LZ encoders and the packed stream format."""
+
+    @pytest.mark.parametrize("name", SAMPLES)
+    def test_every_method_round_trips(self, name):
+        """Verify that stored, RLE and LZ streams all unpack to the original data."""
+        data = SAMPLES[name]
+
+        assert unpack(bytes([PackMethod.STORED, len(data)]) + data) == data
+        assert unpack(bytes([PackMethod.RLE]) + rle_compress(data)) == data
+        assert unpack(bytes([PackMethod.LZ]) + lz_compress(data)) == data
+        assert unpack(pack(data)) == data
+
+    def test_rle_runs_and_literals(self):
+        """Verify the RLE tokens: short runs stay literal, a run of 3 or more is one token and its byte."""
+        assert rle_compress(b"\x01\x02\x02\x05\x05\x05\x05") == bytes([3, 1, 2, 2, 0x82, 5, 0])
+
+    def test_lz_match_may_overlap_its_output(self):
+        """Verify that an LZ match can copy bytes it is still writing, so it also encodes runs."""
+        assert lz_compress(b"\x07" * 10) == bytes([1, 7, 0x80 | (9 - 3), 0, 0])
+
+    def test_pack_keeps_the_smallest_stream(self):
+        """Verify that each sample is packed with the method that gives the fewest bytes."""
+        assert pack(SAMPLES["run"])[0] == PackMethod.RLE
+        assert pack(SAMPLES["repeated_pattern"])[0] == PackMethod.LZ
+        assert pack(SAMPLES["incompressible"])[0] == PackMethod.STORED
+        assert len(pack(SAMPLES["incompressible"])) == 200 + 2
+
+    def test_rejects_data_larger_than_the_buffer(self):
+        """Verify that data that would not fit in the unpack buffer is refused."""
+        with pytest.raises(ValueError, match="at most 254 bytes"):
+            pack(bytes(MAX_UNPACKED_SIZE + 1))
+
+    def test_packed_block_refuses_data_larger_than_the_buffer(self):
+        """Verify that rendering a packed block whose data would not fit in the unpack buffer raises."""
+        scene = SceneData(
+            label="scene",
+            type=CodeBlockType.DATA,
+            background_color=NESColor(index=0x0F),
+            background_palette=None,
+            sprite_palette=None,
+            entity_labels=[f"entity_{i}" for i in range(125)],
+        )
+        block = PackedData.wrap(scene)
+
+        assert not PackedData.fits(scene)
+        with pytest.raises(ValueError, match="'scene' is 257 bytes; packed data unpacks to at most 254 bytes"):
+            block.render(start_offset=0x8000, names={})
+
+    def test_refuses_blocks_that_depend_on_their_address(self):
+        """Verify that only position-independent data blocks can be packed."""
+        with pytest.raises(ValueError, match="cannot be packed"):
+            PackedData.wrap(LoadSceneSubroutine())
+
+    def test_packed_block_keeps_the_label_and_dependencies(self):
+        """Verify that a packed block exports the wrapped block's label and also depends on unpack_data."""
+        inner = AddressData(label="ptr", type=CodeBlockType.DATA, referenced_value_name="target")
+        block = PackedData.wrap(inner)
+
+        rendered = block.render(0xC010, {"target": 0x1234})
+
+        assert block.dependencies == ["target", "unpack_data"]
+        assert rendered.exported_labels == {"ptr": 0xC010}
+        assert unpack(rendered.code) == bytes([0x34, 0x12])
+
+
+class TestUnpackData:
+    """Tests for the unpack_data subroutine."""
+
+    @pytest.mark.parametrize("name", SAMPLES)
+    @pytest.mark.parametrize("method", list(PackMethod))
+    def test_matches_the_reference_decoder(self, name, method):
+        """Verify that the 6502 decoder writes the same bytes as unpack() for every method."""
+        data = SAMPLES[name]
+        encoders = {
+            PackMethod.STORED: lambda: bytes([len(data)]) + data,
+            PackMethod.RLE: lambda: rle_compress(data),
+            PackMethod.LZ: lambda: lz_compress(data),
+        }
+
+        memory = run_unpack(bytes([method]) + encoders[method]())
+
+        assert memory[BUFFER : BUFFER + len(data)] == list(data)
+
+    def test_unpacks_the_largest_stored_stream(self):
+        """Verify that data of MAX_UNPACKED_SIZE bytes that does not compress, a 256-byte stream, unpacks."""
+        data = bytes((i * 73 + 11) & 0xFF for i in range(MAX_UNPACKED_SIZE))
+        stream = pack(data)
+
+        memory = run_unpack(stream)
+
+        assert len(stream) == 256
+        assert memory[BUFFER : BUFFER + len(data)] == list(data)
+
+    def test_points_src1_at_the_unpacked_data(self):
+        """Verify that zp__src1 is left pointing at the unpack buffer, for the subroutine called next."""
+        memory = run_unpack(pack(SAMPLES["mixed"]))
+
+        assert (memory[0x10], memory[0x11]) == (BUFFER & 0xFF, BUFFER >> 8)
+
+
+class TestPackedScenes:
+    """Tests for building ROMs with packed scenes."""
+
+    def test_unpacked_scene_boots_like_the_stored_one(self):
+        """Verify that with scene compression the initial scene's palettes and entities load as without it."""
+        snapshot = make_game_snapshot(n_entities=3)
+        rom, builder = compile_packed(snapshot)
+
+        runner = HeadlessRunner(rom, layout=builder.rom.layout)
+        runner.run(frames=2)
+
+        expected = bytes([0x0F, 0, 1, 2, 0x0F, 1, 2, 3, 0x0F, 2, 3, 4, 0x0F, 3, 4, 5])
+        assert runner.ppu.palette == expected * 2
+        for i, entity in enumerate(snapshot.entities):
+            y, _, attributes, x = runner.ppu.oam[4 * i : 4 * i + 4]
+            assert (x, y, attributes) == (entity.entity_data.x, entity.entity_data.y, entity.entity_data.palette_index)
+
+    def test_reports_sizes_and_cycles_per_scene(self, caplog):
+        """Verify the per-scene report: the method picked, raw and packed sizes and the measured unpack cycles."""
+        snapshot = make_game_snapshot(n_entities=64, scene_names=("main", "other"))
+        # Identical entities share one copy in ROM, so the scene repeats one entity pointer
+        for entity in snapshot.entities:
+            entity.entity_data = snapshot.entities[0].entity_data
+
+        with caplog.at_level(logging.INFO, logger="core.rom.builder"):
+            _, builder = compile_packed(snapshot)
+
+        reports = builder.compression_report
+        assert len(reports) == 2
+        for report in reports:
+            assert report.method == PackMethod.LZ
+            assert report.raw_size == 5 + 64 * 2 + 2
+            assert report.packed_size < 20
+            # Every unpacked byte takes a 20-odd cycle pass of a copy loop
+            assert 20 * report.raw_size < report.unpack_cycles < 25 * report.raw_size
+        assert "packed with lz: 135 ->" in caplog.text
+
+    def test_stores_scenes_too_large_to_unpack(self):
+        """Verify that a scene larger than the unpack buffer is stored as is, and boots with every sprite set."""
+        snapshot = make_full_scene_game()
+        rom, builder = compile_packed(snapshot, chr_ram=True)
+        layout = builder.rom.layout
+
+        runner = HeadlessRunner(rom, layout=layout)
+        runner.run(frames=2)
+
+        scene = layout.records[builder.label_registry.get_scene_label(snapshot.scenes[0].id)].block
+        assert isinstance(scene, SceneData)
+        assert scene.size > MAX_UNPACKED_SIZE
+        assert "unpack_data" not in layout.records
+        assert builder.compression_report == []
+        for n, sprite_set in enumerate(snapshot.assets[1:]):
+            (tile,) = layout.chr.remaps[builder.label_registry.get_asset_label(sprite_set.id)]
+            assert bytes(runner.ppu.vram[tile * CHR_TILE_SIZE : (tile + 1) * CHR_TILE_SIZE]) == sprite_set.data.chr_data
+            assert runner.ppu.oam[4 * n + 1] == tile
+
+    def test_stays_off_by_default(self):
+        """Verify that without scene compression neither the scene is packed nor unpack_data linked."""
+        label_registry = LabelRegistry()
+        builder = RomBuilder(
+            db=None,
+            rom=Rom(),
+            label_registry=label_registry,
+            code_block_registry=CodeBlockRegistry(label_registry=label_registry),
+        )
+
+        builder.compile(make_game_snapshot(n_entities=3))
+
+        assert "unpack_data" not in builder.rom.layout.records
+        assert builder.compression_report == []
@@ -0,0 +1,197 @@
+import logging
+
+import pytest
+
+from core.rom.asm import Asm6502
+from core.rom.builder import RomBuilder
+from core.rom.code_block_registry import CodeBlockRegistry
+from core.rom.cycles import VBLANK_CYCLES, CycleAnalysisError, VBlankOverrunError, worst_case_cycles
+from core.rom.label_registry import LabelRegistry
+from core.rom.rom import Rom, RomCodeArea
+from core.rom.runner import HeadlessRunner
+from core.rom.subroutines import FlushVramQueueBlock
+from tests.rom.helpers import compile_with_layout, make_game_snapshot
+from tests.rom.test_vram_queue import QueuePaletteUpdate
+
+
+def analyze(asm: Asm6502, address: int = 0x8000, callees: dict[int, int] | None = None) -> int:
+    object_code = asm.assemble()
+    return worst_case_cycles(object_code, object_code.link(address, {}), address, lambda target: callees[target])
+
+
+def counted_loop(iterations: int) -> Asm6502:
+    asm = Asm6502()
+    asm.ldx_imm(iterations)
+    asm.label("loop", max_iterations=iterations)
+    asm.dex()
+    asm.bne("loop")
+    asm.rts()
+    return asm
+
+
+class TestWorstCaseCycles:
+    """Tests for the static cycle analysis of assembled code."""
+
+    def test_records_instructions(self):
+        """Verify that the assembler records every instruction with its opcode table entry."""
+        object_code = Asm6502().lda_imm(0x01).sta_abs(0x0200).rts().assemble()
+
+        assert [(i.offset, i.opcode.mnemonic, i.opcode.cycles) for i in object_code.instructions] == [
+            (0, "LDA", 2),
+            (2, "STA", 4),
+            (5, "RTS", 6),
+        ]
+
+    def test_straight_line_code(self):
+        """Verify that straight-line code costs the sum of its instructions."""
+        assert analyze(Asm6502().lda_imm(0x01).sta_zp(0x10).rts()) == 2 + 3 + 6
+
+    def test_forward_branch_takes_costlier_side(self):
+        """Verify that a forward branch counts the more expensive of its two paths."""
+        asm = Asm6502()
+        asm.beq("skip")
+        asm.nop().nop().nop()
+        asm.label("skip")
+        asm.rts()
+
+        assert analyze(asm) == 2 + 3 * 2 + 6
+
+    def test_counted_loop(self):
+        """Verify that a loop costs its bound in passes, the last one falling through the branch."""
+        # LDX, 9 passes of DEX + taken BNE, DEX + BNE not taken, RTS
+        assert analyze(counted_loop(10)) == 2 + 9 * (2 + 3) + (2 + 2) + 6
+
+    def test_branch_across_page_costs_one_more(self):
+        """Verify that a taken branch to another page costs 4 cycles, from the linked address."""
+        # BNE at $80FF jumps back from $8101 to $80FE
+        assert analyze(counted_loop(10), address=0x80FC) == 2 + 9 * (2 + 4) + (2 + 2) + 6
+
+    def test_nested_loops(self):
+        """Verify that an inner loop's cost is multiplied by the outer loop's bound."""
+        asm = Asm6502()
+        asm.ldy_imm(3)
+        asm.label("outer", max_iterations=3)
+        asm.ldx_imm(4)
+        asm.label("inner", max_iterations=4)
+        asm.dex()
+        asm.bne("inner")
+        asm.dey()
+        asm.bne("outer")
+        asm.rts()
+
+        inner = 3 * (2 + 3) + (2 + 2)
+        outer = 2 * (2 + inner + 2 + 3) + (2 + inner + 2 + 2)
+        assert analyze(asm) == 2 + outer + 6
+
+    def test_loop_left_from_the_middle(self):
+        """Verify a loop that exits through a forward branch and loops back with JMP."""
+        asm = Asm6502()
+        asm.ldy_imm(0)
+        asm.label("loop", max_iterations=3)
+        asm.lda_ind_y(0x10)
+        asm.beq("done")
+        asm.iny()
+        asm.jmp_abs("loop")
+        asm.label("done")
+        asm.rts()
+
+        # LDA (zp),Y may cross a page (6), BEQ, INY, JMP; the last pass leaves through the taken BEQ
+        assert analyze(asm) == 2 + 2 * (6 + 2 + 2 + 3) + (6 + 3) + 6
+
+    def test_loop_without_bound_raises(self):
+        """Verify that a loop without an iteration bound cannot be analyzed."""
+        asm = Asm6502()
+        asm.label("loop")
+        asm.dex()
+        asm.bne("loop")
+
+        with pytest.raises(CycleAnalysisError, match="no iteration bound"):
+            analyze(asm)
+
+    def test_calls_add_the_callee(self):
+        """Verify that JSR costs its own cycles plus the callee's worst case."""
+        assert analyze(Asm6502().jsr(0x9000).rts(), callees={0x9000: 20}) == 6 + 20 + 6
+
+    def test_oam_dma_stalls_the_cpu(self):
+        """Verify that a write to OAMDMA adds the worst-case DMA stall."""
+        assert analyze(Asm6502().lda_imm(0x02).sta_abs(0x4014)) == 2 + 4 + 514
+
+    def test_idle_loop_ends_the_code(self):
+        """Verify that a jump to itself ends the analysis instead of counting as an unbounded loop."""
+        assert analyze(Asm6502().lda_imm(0x00).loop_forever()) == 2 + 3
+
+    def test_page_aligned_index_base_does_not_cross(self):
+        """Verify that LDA abs,X only pays the page-crossing cycle when its base is not page-aligned."""
+        assert analyze(Asm6502().lda_abs_x(0x0200)) == 4
+        assert analyze(Asm6502().lda_abs_x(0x0201)) == 5
+
+
+class TestRomCycleReport:
+    """Tests for the per-area cycle report of a render and the VBlank budget check."""
+
+    def test_report_bounds_the_simulated_frame(self):
+        """Verify that the static worst case of every area is at least what the runner measures."""
+        rom, layout = compile_with_layout(make_game_snapshot(n_entities=64))
+        report = layout.cycles
+
+        run = HeadlessRunner(rom, layout=layout).run(frames=2)
+
+        frame = run.frames[-1]
+        assert report.unanalyzed == []
+        assert report.nmi_cycles >= frame.nmi_cycles
+        assert report.areas[RomCodeArea.NMI_POST_VBLANK] >= frame.cycles_by_area[RomCodeArea.NMI_POST_VBLANK]
+        # The runner counts the NMI's closing RTI toward the last area
+        assert report.areas[RomCodeArea.NMI_VBLANK] + 6 >= frame.cycles_by_area[RomCodeArea.NMI_VBLANK]
+        assert report.areas[RomCodeArea.RESET] >= run.boot.cycles_by_area[RomCodeArea.RESET]
+
+    def test_uses_loop_bounds_of_the_runtime(self):
+        """Verify that render_entities is bounded by its 64-iteration loop."""
+        _, layout = compile_with_layout(make_game_snapshot(n_entities=1))
+        report = layout.cycles
+
+        assert 64 * 50 < report.blocks["render_entities"] < 64 * 70
+        # LDA zp__entities_dirty, BEQ not taken, JSR
+        assert report.blocks["update_handler"] == 3 + 2 + 6 + report.blocks["render_entities"]
+
+    def _builder(self, vblank_check: str, flush_cycles: int | None = None) -> RomBuilder:
+        """A builder; with flush_cycles, the update handler queues VRAM writes that VBlank flushes in that budget."""
+        label_registry = LabelRegistry()
+        code_block_registry = CodeBlockRegistry(label_registry=label_registry)
+        if flush_cycles is not None:
+            code_block_registry.add_code_block(QueuePaletteUpdate())
+            code_block_registry.add_code_block(FlushVramQueueBlock(budget_cycles=flush_cycles))
+        return RomBuilder(
+            db=None,
+            rom=Rom(),
+            label_registry=label_registry,
+            code_block_registry=code_block_registry,
+            vblank_check=vblank_check,
+        )
+
+    def test_default_build_fits_vblank(self, caplog):
+        """Verify that the sprite DMA runs before the update handlers, so a scene with entities fits in VBlank."""
+        with caplog.at_level(logging.WARNING, logger="core.rom.builder"):
+            builder = self._builder("error")
+            builder.compile(make_game_snapshot(n_entities=64))
+
+        report = builder.rom.layout.cycles
+        assert not report.vblank_overrun
+        assert report.nmi_cycles > VBLANK_CYCLES
+        assert caplog.text == ""
+
+    def test_vblank_overrun_fails_or_warns(self, caplog):
+        """Verify that NMI work that can run past VBlank fails the build or logs a warning, as configured."""
+        snapshot = make_game_snapshot(n_entities=1)
+
+        # The sprite DMA and a 2400-cycle VRAM flush budget do not both fit in VBlank
+        with pytest.raises(VBlankOverrunError, match="VBlank lasts 2273 cycles"):
+            self._builder("error", flush_cycles=2400).compile(snapshot)
+
+        with caplog.at_level(logging.WARNING, logger="core.rom.builder"):
+            self._builder("warn", flush_cycles=2400).compile(snapshot)
+        assert "VBlank lasts 2273 cycles" in caplog.text
+
+        caplog.clear()
+        with caplog.at_level(logging.WARNING, logger="core.rom.builder"):
+            self._builder("off", flush_cycles=2400).compile(snapshot)
+        assert caplog.text == ""
@@ -0,0 +1,155 @@
+from config import settings
+from core.rom.builder import RomBuilder
+from core.rom.code_block_registry import CodeBlockRegistry
+from core.rom.entity_ram import EntityField, EntityLayout
+from core.rom.executor import compile_game
+from core.rom.label_registry import LabelRegistry
+from core.rom.rom import Rom, RomCodeArea
+from core.rom.runner import HeadlessRunner
+from core.rom.subroutines import LoadSceneSubroutine, QueueVramWriteSubroutine, RenderEntitiesSubroutine
+from core.schemas import MAX_N_SCENE_ENTITIES
+from tests.rom.helpers import create_test_cpu, make_game_snapshot, run_subroutine
+
+SOA = EntityLayout.STRUCT_OF_ARRAYS
+
+LOAD_SCENE_NAMES = {
+    "zp__src1": 0x10,
+    "zp__src2": 0x12,
+    "zp__entity_ram_page": 0x14,
+    "zp__entity_count": 0x15,
+    "zp__entities_dirty": 0x16,
+    "zp__vram_queue_head": 0x17,
+    "zp__vram_queue_tail": 0x18,
+    "zp__vram_record_size": 0x19,
+    "queue_vram_write": 0x8800,
+}
+RENDER_ENTITIES_NAMES = {
+    "zp__entity_ram_page": 0x10,
+    "zp__sprite_ram_page": 0x11,
+    "zp__entity_count": 0x12,
+    "zp__entities_dirty": 0x13,
+}
+
+
+def compile_with_entity_layout(n_entities: int, entity_layout: EntityLayout) -> tuple[bytes, Rom]:
+    label_registry = LabelRegistry()
+    code_block_registry = CodeBlockRegistry(label_registry=label_registry)
+    builder = RomBuilder(
+        db=None,
+        rom=Rom(),
+        label_registry=label_registry,
+        code_block_registry=code_block_registry,
+        entity_layout=entity_layout,
+    )
+    return builder.compile(make_game_snapshot(n_entities=n_entities)), builder.rom
+
+
+class TestEntityLayout:
+    """Tests for the addresses of entity fields in RAM."""
+
+    def test_field_addresses(self):
+        """Verify that structs interleave the fields and arrays give each field its own 64 bytes."""
+        aos = EntityLayout.ARRAY_OF_STRUCTS
+        assert [aos.address(field) for field in EntityField] == [0x0200, 0x0201, 0x0202, 0x0203]
+        assert [SOA.address(field) for field in EntityField] == [0x0200, 0x0240, 0x0280, 0x02C0]
+        assert (aos.stride, SOA.stride) == (4, 1)
+
+
+class TestStructOfArrays:
+    """Tests for load_scene and render_entities with one array per entity field."""
+
+    def test_load_scene_fills_field_arrays(self):
+        """Verify that load_scene stores each field in its array and still hides the unused sprite slots."""
+        code = LoadSceneSubroutine(entity_layout=SOA).render(start_offset=0x8000, names=LOAD_SCENE_NAMES)
+        cpu, memory = create_test_cpu(code.code, code_address=0x8000)
+        queue = QueueVramWriteSubroutine().render(start_offset=0x8800, names=LOAD_SCENE_NAMES)
+        memory.write(0x8800, list(queue.code))
+        memory.write(0xA000, [100, 150, 1, 2])
+        memory.write(0xA100, [50, 75, 3, 1])
+        memory.write(0x9000, [0x0F, 0x00, 0x00, 0x00, 0x00, 0x00, 0xA0, 0x00, 0xA1, 0x00, 0x00])
+        memory[0x10] = 0x00
+        memory[0x11] = 0x90
+
+        run_subroutine(cpu, memory, subroutine_address=0x8000)
+
+        for field, values in zip(EntityField, [(100, 50), (150, 75), (1, 3), (2, 1)], strict=True):
+            address = SOA.address(field)
+            assert (memory[address], memory[address + 1]) == values, field
+        assert memory[0x15] == 2
+        assert [memory[0x0300 + i * 4] for i in range(4)] == [0x00, 0x00, 0xFF, 0xFF]
+        assert memory[0x03FC] == 0xFF
+        assert memory[0x16] == 1
+
+    def test_render_entities_reads_field_arrays(self):
+        """Verify that render_entities builds every live sprite from the field arrays."""
+        code = RenderEntitiesSubroutine(entity_layout=SOA).render(start_offset=0x8000, names=RENDER_ENTITIES_NAMES)
+        cpu, memory = create_test_cpu(code.code, code_address=0x8000)
+        for i in range(MAX_N_SCENE_ENTITIES):
+            memory[SOA.address(EntityField.X) + i] = i
+            memory[SOA.address(EntityField.Y) + i] = i + 1
+            memory[SOA.address(EntityField.SPRITESET) + i] = i + 2
+            memory[SOA.address(EntityField.PALETTE) + i] = i % 4
+        memory[0x12] = MAX_N_SCENE_ENTITIES
+
+        run_subroutine(cpu, memory, subroutine_address=0x8000)
+
+        for i in range(MAX_N_SCENE_ENTITIES):
+            assert memory[0x0300 + i * 4 : 0x0304 + i * 4] == [i + 1, i + 2, i % 4, i], i
+
+    def test_render_entities_stops_at_entity_count(self):
+        """Verify that only the live entities are converted, and none at all without entities."""
+        code = RenderEntitiesSubroutine(entity_layout=SOA).render(start_offset=0x8000, names=RENDER_ENTITIES_NAMES)
+        for count, expected in [(2, [10, 11, 0xFF, 0xFF]), (0, [0xFF] * 4)]:
+            cpu, memory = create_test_cpu(code.code, code_address=0x8000)
+            for i in range(MAX_N_SCENE_ENTITIES):
+                memory[SOA.address(EntityField.Y) + i] = 10 + i
+            for address in range(0x0300, 0x0400):
+                memory[address] = 0xFF
+            memory[0x12] = count
+
+            run_subroutine(cpu, memory, subroutine_address=0x8000)
+
+            assert [memory[0x0300 + i * 4] for i in range(4)] == expected
+
+    def test_rom_renders_the_same_sprites(self):
+        """Verify that a ROM built with field arrays puts the same sprites in OAM as the default layout."""
+        oams = []
+        for entity_layout in EntityLayout:
+            rom, built = compile_with_entity_layout(5, entity_layout)
+            runner = HeadlessRunner(rom, layout=built.layout)
+            runner.run(frames=2)
+            oams.append(bytes(runner.ppu.oam))
+            assert built.layout.cycles.unanalyzed == []
+
+        assert oams[0] == oams[1]
+        assert oams[0][:4] != b"\xff" * 4
+
+    def test_setting_builds_and_runs_a_game_with_field_arrays(self, monkeypatch):
+        """Verify that with ROM_ENTITY_LAYOUT set, a full game (CHR ROM or RAM) keeps its entities in field arrays."""
+        snapshot = make_game_snapshot(n_entities=3)
+        monkeypatch.setattr(settings, "ROM_ENTITY_LAYOUT", "struct_of_arrays")
+
+        for chr_ram in (False, True):
+            monkeypatch.setattr(settings, "ROM_CHR_RAM", chr_ram)
+            runner = HeadlessRunner(compile_game(snapshot))
+            runner.run(frames=2)
+
+            ram = runner.bus.ram
+            assert bytes(ram[SOA.address(EntityField.X) : SOA.address(EntityField.X) + 3]) == bytes([0, 8, 16])
+            assert bytes(ram[SOA.address(EntityField.Y) : SOA.address(EntityField.Y) + 3]) == bytes([16, 17, 18])
+            # OAM entries are (Y, tile, attributes, X)
+            assert [runner.ppu.oam[4 * i + 3] for i in range(3)] == [0, 8, 16]
+
+    def test_render_entities_cycles_per_entity(self):
+        """Verify the measured cost of converting one more entity with each layout."""
+        costs = {}
+        for entity_layout in EntityLayout:
+            measured = []
+            for n_entities in (1, 2):
+                rom, built = compile_with_entity_layout(n_entities, entity_layout)
+                report = HeadlessRunner(rom, layout=built.layout).run(frames=1)
+                measured.append(report.frames[0].cycles_by_area[RomCodeArea.NMI_POST_VBLANK])
+            costs[entity_layout] = measured[1] - measured[0]
+
+        # 4 x (LDA abs,X + STA abs,X/Y), the index increments and the loop test
+        assert costs == {EntityLayout.ARRAY_OF_STRUCTS: 36 + 8 + 2 + 3, SOA: 36 + 8 + 2 + 3 + 3}
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core.rom import executor as executor_module
+from core.rom.executor import CompileExecutor, CompileQueueFullError, CompileTimeoutError, compile_game
+from tests.rom.helpers import compile_snapshot, make_game_snapshot
+
+
+async def wait_in_flight(executor: CompileExecutor, in_flight: int) -> None:
+    """Wait until the worker threads have reported enough builds done (their release is queued on the loop)."""
+    for _ in range(200):
+        if executor.in_flight == in_flight:
+            return
+        await asyncio.sleep(0.01)
+
+
+class TestCompileExecutor:
+    """Tests for running ROM compilation off the event loop."""
+
+    async def test_compiles_in_worker_thread(self):
+        """Verify that the executor returns the same bytes as an inline compile."""
+        executor = CompileExecutor(kind="thread", workers=1, max_queue=0, timeout_seconds=5)
+        snapshot = make_game_snapshot(n_entities=2)
+
+        try:
+            rom = await executor.compile(snapshot)
+        finally:
+            executor.shutdown()
+
+        assert rom == compile_snapshot(snapshot)
+        assert executor.stats().completed == 1
+
+    async def test_rejects_builds_beyond_queue_depth(self, monkeypatch):
+        """Verify that submissions beyond workers + max_queue fail fast."""
+        release = threading.Event()
+        monkeypatch.setattr(executor_module, "compile_game", lambda *args: release.wait(5) and b"rom")
+        executor = CompileExecutor(kind="thread", workers=1, max_queue=1, timeout_seconds=5)
+        snapshot = make_game_snapshot()
+
+        try:
+            running = [asyncio.create_task(executor.compile(snapshot)) for _ in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(CompileQueueFullError):
+                await executor.compile(snapshot)
+            release.set()
+            assert await asyncio.gather(*running) == [b"rom", b"rom"]
+        finally:
+            release.set()
+            executor.shutdown()
+
+        assert executor.stats().rejected == 1
+        assert executor.stats().in_flight == 0
+
+    async def test_times_out_slow_builds(self, monkeypatch):
+        """Verify that a build exceeding the timeout raises, and holds its slot until the worker is done with it."""
+        release = threading.Event()
+        monkeypatch.setattr(executor_module, "compile_game", lambda *args: release.wait(5) and b"rom")
+        executor = CompileExecutor(kind="thread", workers=1, max_queue=0, timeout_seconds=0.05)
+
+        try:
+            with pytest.raises(CompileTimeoutError):
+                await executor.compile(make_game_snapshot())
+            # The abandoned build still occupies the only worker
+            with pytest.raises(CompileQueueFullError):
+                await executor.compile(make_game_snapshot())
+            release.set()
+            await wait_in_flight(executor, 0)
+        finally:
+            release.set()
+            executor.shutdown()
+
+        assert executor.stats().timed_out == 1
+        assert executor.stats().in_flight == 0
+
+    async def test_timeout_excludes_time_in_queue(self, monkeypatch):
+        """Verify that a build waiting for a busy worker only starts its timeout once it runs."""
+        release = threading.Event()
+        calls = []
+
+        def slow_then_fast(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                release.wait(5)
+            else:
+                time.sleep(0.1)
+            return b"rom"
+
+        monkeypatch.setattr(executor_module, "compile_game", slow_then_fast)
+        executor = CompileExecutor(kind="thread", workers=1, max_queue=1, timeout_seconds=0.2)
+
+        try:
+            first = asyncio.create_task(executor.compile(make_game_snapshot()))
+            second = asyncio.create_task(executor.compile(make_game_snapshot()))
+            # Keep the worker busy for most of the timeout: both builds fit in it, but the second would not if its
+            # time in the queue counted
+            await asyncio.sleep(0.15)
+            release.set()
+            assert await asyncio.gather(first, second) == [b"rom", b"rom"]
+        finally:
+            release.set()
+            executor.shutdown()
+
+        assert executor.stats().timed_out == 0
+
+    async def test_cancellation_releases_slot(self, monkeypatch):
+        """Verify that cancelling the waiting coroutine (e.g. on client disconnect) frees its queue slot."""
+        release = threading.Event()
+        monkeypatch.setattr(executor_module, "compile_game", lambda *args: release.wait(5) and b"rom")
+        executor = CompileExecutor(kind="thread", workers=1, max_queue=0, timeout_seconds=5)
+
+        try:
+            task = asyncio.create_task(executor.compile(make_game_snapshot()))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            release.set()
+            await wait_in_flight(executor, 0)
+        finally:
+            release.set()
+            executor.shutdown()
+
+        assert executor.stats().cancelled == 1
+        assert executor.stats().in_flight == 0
+
+    def test_compile_game_errors_propagate(self):
+        """Verify that compile errors surface unchanged, so the router can map them to 400s."""
+        with pytest.raises(ValueError):
+            compile_game(make_game_snapshot(), initial_scene_name="missing")
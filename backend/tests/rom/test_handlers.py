@@ -53,16 +53,13 @@ class TestUpdateHandler:
         assert len(rendered.code) == 0
 
     def test_update_handler_renders_with_render_entities(self):
-        """Verify that UpdateHandler emits JSR when render_entities is available."""
+        """Verify that UpdateHandler emits a JSR gated on the entities dirty flag when render_entities is available."""
         handler = UpdateHandler()
-        # Render with render_entities in names
-        rendered = handler.render(start_offset=0x8000, names={"render_entities": 0x9000})
+        # Render with render_entities (and the dirty flag it depends on) in names
+        rendered = handler.render(start_offset=0x8000, names={"render_entities": 0x9000, "zp__entities_dirty": 0x16})
         assert isinstance(rendered.code, bytes)
-        # Should contain JSR instruction (0x20) + 2-byte address
-        assert len(rendered.code) == 3
-        assert rendered.code[0] == 0x20  # JSR opcode
-        assert rendered.code[1] == 0x00  # Low byte of 0x9000
-        assert rendered.code[2] == 0x90  # High byte of 0x9000
+        # LDA zp__entities_dirty; BEQ past the call; JSR render_entities
+        assert rendered.code == bytes([0xA5, 0x16, 0xF0, 0x03, 0x20, 0x00, 0x90])
 
 
 class TestOptionalDependencies:
@@ -0,0 +1,74 @@
+from core.rom.cache import RomLayoutCache
+from core.schemas import NESEntity
+from tests.rom.helpers import compile_snapshot, make_game_snapshot
+
+
+class TestIncrementalRender:
+    """Tests for reusing the previous layout of a game when it is rebuilt."""
+
+    def test_unchanged_game_reuses_every_block(self):
+        """Verify that rebuilding an unchanged game renders no blocks at all."""
+        layouts = RomLayoutCache(max_games=4)
+        snapshot = make_game_snapshot(n_entities=3)
+
+        first = compile_snapshot(snapshot, layout_cache=layouts)
+        second = compile_snapshot(snapshot, layout_cache=layouts)
+
+        layout = layouts.get(snapshot.id)
+        assert second == first
+        assert layout.blocks_rendered == 0
+        assert layout.blocks_reused == len(layout.records)
+
+    def test_moving_an_entity_only_rerenders_that_entity(self):
+        """Verify that a same-size edit re-renders just the edited block and matches a full build."""
+        layouts = RomLayoutCache(max_games=4)
+        snapshot = make_game_snapshot(n_entities=3)
+        compile_snapshot(snapshot, layout_cache=layouts)
+
+        entity = snapshot.entities[1]
+        entity.entity_data = NESEntity(x=200, y=100, spriteset=entity.entity_data.spriteset)
+        incremental = compile_snapshot(snapshot, layout_cache=layouts)
+
+        assert incremental == compile_snapshot(snapshot)
+        assert layouts.get(snapshot.id).blocks_rendered == 1
+
+    def test_size_change_matches_full_build(self):
+        """Verify that adding an entity (which grows the scene data and shifts later blocks) stays correct."""
+        layouts = RomLayoutCache(max_games=4)
+        snapshot = make_game_snapshot(n_entities=2)
+        compile_snapshot(snapshot, layout_cache=layouts)
+
+        grown = make_game_snapshot(n_entities=3)
+        grown = grown.model_copy(update={"id": snapshot.id})
+        incremental = compile_snapshot(grown, layout_cache=layouts)
+
+        assert incremental == compile_snapshot(grown)
+
+    def test_changed_chr_data_is_rerendered(self):
+        """Verify that editing a sprite set's tiles is picked up by an incremental build."""
+        layouts = RomLayoutCache(max_games=4)
+        snapshot = make_game_snapshot()
+        compile_snapshot(snapshot, layout_cache=layouts)
+
+        # Each request loads a fresh snapshot, so edit a copy rather than the objects the last layout refers to
+        snapshot = snapshot.model_copy(deep=True)
+        snapshot.assets[1].data.chr_data = bytes([0xAA] * 16)
+        incremental = compile_snapshot(snapshot, layout_cache=layouts)
+
+        assert incremental == compile_snapshot(snapshot)
+
+
+class TestRomLayoutCache:
+    """Tests for the per-game layout LRU."""
+
+    def test_evicts_least_recently_used_game(self):
+        """Verify that only the most recently built max_games layouts are kept."""
+        layouts = RomLayoutCache(max_games=1)
+        first = make_game_snapshot()
+        second = make_game_snapshot()
+
+        compile_snapshot(first, layout_cache=layouts)
+        compile_snapshot(second, layout_cache=layouts)
+
+        assert layouts.get(first.id) is None
+        assert layouts.get(second.id) is not None
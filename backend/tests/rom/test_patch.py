@@ -0,0 +1,83 @@
+import pytest
+
+from core.rom.patch import IPS_FOOTER, IPS_HEADER, apply_ips_patch, ips_patch
+from core.schemas import NESEntity
+from tests.rom.helpers import compile_snapshot, make_game_snapshot
+
+
+class TestIpsPatch:
+    """Tests for encoding and applying IPS patches."""
+
+    def test_identical_images_give_an_empty_patch(self):
+        """Verify that an unchanged image produces just the header and footer."""
+        rom = bytes(range(256)) * 4
+
+        assert ips_patch(rom, rom) == IPS_HEADER + IPS_FOOTER
+
+    def test_single_byte_change(self):
+        """Verify the exact record written for one changed byte."""
+        source = bytes(100)
+        target = bytearray(source)
+        target[0x42] = 0x99
+
+        patch = ips_patch(source, bytes(target))
+
+        assert patch == IPS_HEADER + b"\x00\x00\x42\x00\x01\x99" + IPS_FOOTER
+        assert apply_ips_patch(source, patch) == target
+
+    def test_nearby_changes_share_a_record(self):
+        """Verify that changes separated by a small gap are merged into one record."""
+        source = bytes(100)
+        target = bytearray(source)
+        target[10] = 1
+        target[13] = 2
+
+        patch = ips_patch(source, bytes(target))
+
+        assert patch == IPS_HEADER + b"\x00\x00\x0a\x00\x04\x01\x00\x00\x02" + IPS_FOOTER
+
+    def test_repeated_bytes_become_an_rle_record(self):
+        """Verify that a run of one repeated byte is encoded as a run length."""
+        source = bytes(100)
+        target = source[:20] + b"\xff" * 50 + source[70:]
+
+        patch = ips_patch(source, target)
+
+        assert patch == IPS_HEADER + b"\x00\x00\x14\x00\x00\x00\x32\xff" + IPS_FOOTER
+        assert apply_ips_patch(source, patch) == target
+
+    def test_round_trips_growing_and_shrinking_images(self):
+        """Verify that images of a different length are reproduced exactly."""
+        source = bytes(range(200))
+        longer = source + b"tail"
+        shorter = source[:150]
+
+        assert apply_ips_patch(source, ips_patch(source, longer)) == longer
+        assert apply_ips_patch(source, ips_patch(source, shorter)) == shorter
+
+    def test_splits_records_longer_than_the_size_field(self):
+        """Verify that changes larger than 64 KiB are split into several records."""
+        source = bytes(0x12000)
+        target = bytes(i % 251 + 1 for i in range(0x12000))
+
+        assert apply_ips_patch(source, ips_patch(source, target)) == target
+
+    def test_rejects_malformed_patches(self):
+        """Verify that foreign or truncated patches raise ValueError."""
+        with pytest.raises(ValueError, match="Not an IPS patch"):
+            apply_ips_patch(b"", b"BPS1")
+        with pytest.raises(ValueError, match="Truncated"):
+            apply_ips_patch(bytes(10), IPS_HEADER + b"\x00\x00\x01\x00\x05\x01")
+
+    def test_entity_edit_patch_is_small(self):
+        """Verify that moving an entity yields a patch orders of magnitude smaller than the ROM."""
+        snapshot = make_game_snapshot(n_entities=3)
+        before = compile_snapshot(snapshot)
+        entity = snapshot.entities[1]
+        entity.entity_data = NESEntity(x=200, y=100, spriteset=entity.entity_data.spriteset)
+        after = compile_snapshot(snapshot)
+
+        patch = ips_patch(before, after)
+
+        assert len(patch) < 32
+        assert apply_ips_patch(before, patch) == after
@@ -0,0 +1,91 @@
+import pytest
+
+from core.rom.builder import RomBuilder
+from core.rom.cache import RomCache, RomLayoutCache
+from core.rom.code_block_registry import CodeBlockRegistry
+from core.rom.label_registry import LabelRegistry
+from core.rom.rom import Rom
+from core.rom.snapshot import GameSnapshot
+from tests.rom.helpers import compile_snapshot, make_game_snapshot
+
+
+def make_two_scene_snapshot() -> GameSnapshot:
+    """A game whose "main" scene shows the first entity and whose "level" scene shows the second."""
+    snapshot = make_game_snapshot(n_entities=2, scene_names=("main", "level"))
+    main, level = snapshot.scenes
+    main.scene_data.entities = [snapshot.entities[0].id]
+    level.scene_data.entities = [snapshot.entities[1].id]
+    return snapshot
+
+
+def compile_with_builder(snapshot: GameSnapshot, **kwargs) -> RomBuilder:
+    label_registry = LabelRegistry()
+    builder = RomBuilder(
+        db=None,
+        rom=Rom(),
+        label_registry=label_registry,
+        code_block_registry=CodeBlockRegistry(label_registry=label_registry),
+    )
+    builder.compile(snapshot, **kwargs)
+    return builder
+
+
+def linked_labels(builder: RomBuilder) -> set[str]:
+    return {label for blocks in builder.rom.code_blocks.values() for label in blocks}
+
+
+class TestScenePreview:
+    """Tests for building a single scene's dependency closure."""
+
+    def test_links_only_the_previewed_scene(self):
+        """Verify that a preview build links the previewed scene and what it reaches, and nothing else."""
+        snapshot = make_two_scene_snapshot()
+        main, level = snapshot.scenes
+
+        builder = compile_with_builder(snapshot, scene_id=level.id)
+
+        labels = linked_labels(builder)
+        registry = builder.label_registry
+        assert registry.get_scene_label(level.id) in labels
+        assert registry.get_entity_label(snapshot.entities[1].id) in labels
+        assert registry.get_scene_label(main.id) not in labels
+        assert registry.get_entity_label(snapshot.entities[0].id) not in labels
+
+    def test_previewed_scene_is_the_entry_point(self):
+        """Verify that the preamble starts in the previewed scene, even when it is not named "main"."""
+        snapshot = make_two_scene_snapshot()
+        level = snapshot.scenes[1]
+
+        builder = compile_with_builder(snapshot, scene_id=level.id)
+
+        preamble = builder.code_block_registry["preamble"]
+        assert preamble.main_scene_label == builder.label_registry.get_scene_label(level.id)
+
+    def test_preview_is_smaller_than_full_build_layout(self):
+        """Verify that a preview places fewer blocks than the full game build."""
+        snapshot = make_two_scene_snapshot()
+
+        full = compile_with_builder(snapshot)
+        preview = compile_with_builder(snapshot, scene_id=snapshot.scenes[0].id)
+
+        assert len(preview.rom.layout.records) < len(full.rom.layout.records)
+
+    def test_unknown_scene_raises(self):
+        """Verify that previewing a scene that is not in the game fails with a ValueError."""
+        snapshot = make_two_scene_snapshot()
+
+        with pytest.raises(ValueError, match="no scene with ID"):
+            compile_snapshot(snapshot, scene_id=snapshot.entities[0].id)
+
+    def test_preview_has_its_own_cache_key_and_layout(self):
+        """Verify that preview and full builds of one game do not share ROM cache keys or layouts."""
+        snapshot = make_two_scene_snapshot()
+        level = snapshot.scenes[1]
+        layouts = RomLayoutCache(max_games=4)
+
+        compile_snapshot(snapshot, layout_cache=layouts)
+        compile_snapshot(snapshot, layout_cache=layouts, scene_id=level.id)
+
+        assert RomCache.key_for(snapshot, "main") != RomCache.key_for(snapshot, "main", scene_id=level.id)
+        assert layouts.get(snapshot.id) is not layouts.get(snapshot.id, level.id)
+        assert layouts.get(snapshot.id, level.id).blocks_reused == 0
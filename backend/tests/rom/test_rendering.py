@@ -15,7 +15,7 @@ class TestRenderEntitiesSubroutine:
         subroutine = RenderEntitiesSubroutine()
         code = subroutine.render(
             start_offset=0x8000,
-            names={"zp__entity_ram_page": 0x10, "zp__sprite_ram_page": 0x11}
+            names={"zp__entity_ram_page": 0x10, "zp__sprite_ram_page": 0x11, "zp__entity_count": 0x12, "zp__entities_dirty": 0x13}
         )
 
         cpu, memory = create_test_cpu(code.code, code_address=0x8000)
@@ -25,6 +25,7 @@ class TestRenderEntitiesSubroutine:
         memory[0x0201] = 80   # Y position
         memory[0x0202] = 5    # Spriteset CHR index
         memory[0x0203] = 2    # Palette index
+        memory[0x12] = 1      # zp__entity_count
 
         # Run the subroutine
         run_subroutine(cpu, memory, subroutine_address=0x8000)
@@ -44,7 +45,7 @@ class TestRenderEntitiesSubroutine:
         subroutine = RenderEntitiesSubroutine()
         code = subroutine.render(
             start_offset=0x8000,
-            names={"zp__entity_ram_page": 0x10, "zp__sprite_ram_page": 0x11}
+            names={"zp__entity_ram_page": 0x10, "zp__sprite_ram_page": 0x11, "zp__entity_count": 0x12, "zp__entities_dirty": 0x13}
         )
 
         cpu, memory = create_test_cpu(code.code, code_address=0x8000)
@@ -62,6 +63,7 @@ class TestRenderEntitiesSubroutine:
             memory[base + 1] = y
             memory[base + 2] = tile
             memory[base + 3] = pal
+        memory[0x12] = len(entities)  # zp__entity_count
 
         # Run the subroutine
         run_subroutine(cpu, memory, subroutine_address=0x8000)
@@ -79,7 +81,7 @@ class TestRenderEntitiesSubroutine:
         subroutine = RenderEntitiesSubroutine()
         code = subroutine.render(
             start_offset=0x8000,
-            names={"zp__entity_ram_page": 0x10, "zp__sprite_ram_page": 0x11}
+            names={"zp__entity_ram_page": 0x10, "zp__sprite_ram_page": 0x11, "zp__entity_count": 0x12, "zp__entities_dirty": 0x13}
         )
 
         cpu, memory = create_test_cpu(code.code, code_address=0x8000)
@@ -91,6 +93,7 @@ class TestRenderEntitiesSubroutine:
             memory[base + 1] = (i + 1) & 0xFF  # Y = entity index + 1
             memory[base + 2] = (i + 2) & 0xFF  # Tile = entity index + 2
             memory[base + 3] = i % 4          # Palette = entity index mod 4
+        memory[0x12] = MAX_N_SCENE_ENTITIES  # zp__entity_count
 
         # Run the subroutine
         run_subroutine(cpu, memory, subroutine_address=0x8000)
@@ -108,12 +111,64 @@ class TestRenderEntitiesSubroutine:
             assert memory[sprite_base + 2] == expected_pal, f"Sprite {i} attr mismatch"
             assert memory[sprite_base + 3] == expected_x, f"Sprite {i} X mismatch"
 
+    def test_stops_at_entity_count(self):
+        """Verify that only the zp__entity_count live entities are converted, leaving the other slots alone."""
+        subroutine = RenderEntitiesSubroutine()
+        code = subroutine.render(
+            start_offset=0x8000,
+            names={"zp__entity_ram_page": 0x10, "zp__sprite_ram_page": 0x11, "zp__entity_count": 0x12, "zp__entities_dirty": 0x13}
+        )
+
+        cpu, memory = create_test_cpu(code.code, code_address=0x8000)
+
+        for i in range(MAX_N_SCENE_ENTITIES):
+            memory[0x0200 + i * ENTITY_SIZE_BYTES + 1] = 10 + i  # Y position
+        for address in range(0x0300, 0x0400):
+            memory[address] = 0xFF  # Hidden slots, as load_scene leaves them
+        memory[0x12] = 2
+
+        run_subroutine(cpu, memory, subroutine_address=0x8000)
+
+        assert [memory[0x0300 + i * 4] for i in range(4)] == [10, 11, 0xFF, 0xFF]
+
+    def test_no_entities_returns_immediately(self):
+        """Verify that with no live entities the sprite page is not touched."""
+        subroutine = RenderEntitiesSubroutine()
+        code = subroutine.render(
+            start_offset=0x8000,
+            names={"zp__entity_ram_page": 0x10, "zp__sprite_ram_page": 0x11, "zp__entity_count": 0x12, "zp__entities_dirty": 0x13}
+        )
+
+        cpu, memory = create_test_cpu(code.code, code_address=0x8000)
+        memory[0x0201] = 80
+        memory[0x12] = 0
+
+        run_subroutine(cpu, memory, subroutine_address=0x8000)
+
+        assert memory[0x0300] == 0
+
+    def test_clears_entities_dirty_flag(self):
+        """Verify that rebuilding the sprite page clears zp__entities_dirty."""
+        subroutine = RenderEntitiesSubroutine()
+        code = subroutine.render(
+            start_offset=0x8000,
+            names={"zp__entity_ram_page": 0x10, "zp__sprite_ram_page": 0x11, "zp__entity_count": 0x12, "zp__entities_dirty": 0x13}
+        )
+
+        cpu, memory = create_test_cpu(code.code, code_address=0x8000)
+        memory[0x12] = 1
+        memory[0x13] = 1
+
+        run_subroutine(cpu, memory, subroutine_address=0x8000)
+
+        assert memory[0x13] == 0
+
     def test_returns_via_rts(self):
         """Verify that the subroutine properly returns via RTS."""
         subroutine = RenderEntitiesSubroutine()
         code = subroutine.render(
             start_offset=0x8000,
-            names={"zp__entity_ram_page": 0x10, "zp__sprite_ram_page": 0x11}
+            names={"zp__entity_ram_page": 0x10, "zp__sprite_ram_page": 0x11, "zp__entity_count": 0x12, "zp__entities_dirty": 0x13}
         )
 
         cpu, memory = create_test_cpu(code.code, code_address=0x8000)
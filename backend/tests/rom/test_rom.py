@@ -1,7 +1,11 @@
+from typing import ClassVar
+
 import pytest
 
 from core.rom.code_block import CodeBlock, CodeBlockType, RenderedCodeBlock
-from core.rom.rom import Rom
+from core.rom.rom import Rom, chr_tile_label
+from core.rom.runner import HeadlessRunner
+from tests.rom.helpers import compile_with_layout, make_game_snapshot
 
 
 class _MockCodeBlock(CodeBlock):
@@ -184,8 +188,8 @@ class TestRomRender:
         reset_routine = rendered[reset_rom_offset : reset_rom_offset + 5]
         assert reset_routine == b"\x78" * 5
 
-    def test_nmi_post_vblank_comes_before_vblank(self):
-        """Verify NMI_POST_VBLANK blocks are placed before NMI_VBLANK blocks."""
+    def test_nmi_vblank_comes_before_post_vblank(self):
+        """Verify NMI_VBLANK blocks are placed before NMI_POST_VBLANK blocks, so they run while VBlank lasts."""
         rom = Rom()
 
         # Add post vblank block
@@ -205,9 +209,9 @@ class TestRomRender:
         nmi_address = int.from_bytes(nmi_vector_bytes, "little")
         nmi_rom_offset = prg_start + (nmi_address - 0xC000)
 
-        # NMI should be: post_vblank (3 bytes) + vblank (3 bytes) + RTI (1 byte)
+        # NMI should be: vblank (3 bytes) + post_vblank (3 bytes) + RTI (1 byte)
         nmi_routine = rendered[nmi_rom_offset : nmi_rom_offset + 7]
-        assert nmi_routine == b"\xaa\xaa\xaa\xbb\xbb\xbb\x40"
+        assert nmi_routine == b"\xbb\xbb\xbb\xaa\xaa\xaa\x40"
 
     def test_prg_overflow_raises_error(self):
         """Verify error if PRG ROM exceeds 16KB."""
@@ -221,6 +225,59 @@ class TestRomRender:
         with pytest.raises(ValueError, match="PRG ROM overflow"):
             rom.render()
 
+    def test_chr_overflow_raises_error(self):
+        """Verify error if the distinct CHR tiles exceed the 8KB CHR ROM."""
+        tiles = b"".join(i.to_bytes(2, "little") + b"\x01" * 14 for i in range(512))
+        rom = Rom()
+        rom.add(MockCodeBlock("tiles", CodeBlockType.CHR, size=8192, code=tiles))
+
+        with pytest.raises(ValueError, match="CHR ROM overflow: tiles are 16 bytes too large"):
+            rom.render()
+
+    def test_duplicate_chr_tiles_are_stored_once(self):
+        """Verify that identical tiles share one CHR index, within a block and across blocks."""
+        tile_a, tile_b, tile_c = b"\xaa" * 16, b"\xbb" * 16, b"\xcc" * 16
+        rom = Rom()
+        rom.add(MockCodeBlock("first", CodeBlockType.CHR, size=48, code=tile_a + tile_b + tile_a))
+        rom.add(MockCodeBlock("second", CodeBlockType.CHR, size=32, code=tile_b + tile_c))
+        # 8KB of blank tiles would overflow CHR ROM if each tile were stored
+        rom.add(MockCodeBlock("blank", CodeBlockType.CHR, size=8192))
+
+        rendered = rom.render()
+
+        chr_layout = rom.layout.chr
+        assert chr_layout.remaps == {"first": (1, 2, 1), "second": (2, 3), "blank": (4,) * 512}
+        assert chr_layout.bytes_saved == 16 * (1 + 1 + 511)
+        chr_rom = rendered[16 + 16 * 1024 :]
+        assert chr_rom[16:80] == tile_a + tile_b + tile_c + b"\x00" * 16
+
+    def test_exports_deduplicated_tile_indices(self):
+        """Verify that a CHR block's label names its first tile's index and each tile has its own name."""
+
+        class TileIndices(_MockCodeBlock):
+            def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
+                code = bytes([names["second"], names[chr_tile_label("second", 0)], names[chr_tile_label("second", 1)]])
+                return RenderedCodeBlock(code=code, exported_labels={self.label: start_offset})
+
+        rom = Rom()
+        rom.add(MockCodeBlock("first", CodeBlockType.CHR, size=16, code=b"\xaa" * 16))
+        rom.add(MockCodeBlock("second", CodeBlockType.CHR, size=32, code=b"\xbb" * 16 + b"\xaa" * 16))
+        rom.add(TileIndices(label="indices", type=CodeBlockType.DATA, mock_size=3, mock_code=b""))
+
+        rendered = rom.render()
+
+        prg_start = 16
+        assert rendered[prg_start : prg_start + 3] == bytes([2, 2, 1])
+
+    def test_renders_into_one_read_only_buffer(self):
+        """Verify the ROM is returned as a read-only view of a single fixed-size image."""
+        rendered = Rom().render()
+
+        assert isinstance(rendered, memoryview)
+        assert rendered.readonly
+        assert rendered.nbytes == 16 + 16 * 1024 + 8 * 1024
+        assert rendered.obj is not None and len(rendered.obj) == rendered.nbytes
+
     def test_chr_rom_is_blank_8kb(self):
         """Verify CHR ROM is blank 8KB pattern table."""
         rom = Rom()
@@ -281,3 +338,65 @@ class TestRomRender:
         # Rendering should succeed (names are tracked internally)
         rendered = rom.render()
         assert len(rendered) > 0
+
+
+class _DataBlock(_MockCodeBlock):
+    position_independent: ClassVar[bool] = True
+
+
+class _PointerBlock(_MockCodeBlock):
+    """Renders the addresses of the blocks it points to."""
+
+    targets: list[str]
+
+    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
+        code = b"".join(names[target].to_bytes(2, "little") for target in self.targets)
+        return RenderedCodeBlock(code=code, exported_labels={self.label: start_offset})
+
+
+class TestDataDeduplication:
+    """Tests for aliasing identical data blocks in PRG ROM."""
+
+    def test_identical_data_is_stored_once(self):
+        """Verify that a position-independent data block with bytes already in PRG ROM exports their address."""
+        rom = Rom()
+        rom.add(_DataBlock(label="first", type=CodeBlockType.DATA, mock_size=3, mock_code=b"\x01\x02\x03"))
+        rom.add(_DataBlock(label="other", type=CodeBlockType.DATA, mock_size=2, mock_code=b"\x04\x05"))
+        rom.add(_DataBlock(label="copy", type=CodeBlockType.DATA, mock_size=3, mock_code=b"\x01\x02\x03"))
+        rom.add(
+            _PointerBlock(
+                label="pointers", type=CodeBlockType.DATA, mock_size=6, mock_code=b"", targets=["first", "other", "copy"]
+            )
+        )
+
+        rendered = rom.render()
+
+        prg = rendered[16 : 16 + 16 * 1024]
+        # first at $C000, other at $C003, the pointers right after them
+        assert prg[:5] == b"\x01\x02\x03\x04\x05"
+        assert prg[5:11] == bytes([0x00, 0xC0, 0x03, 0xC0, 0x00, 0xC0])
+        assert rom.layout.data_aliases == {"copy": 0xC000}
+        assert rom.layout.data_bytes_saved == 3
+
+    def test_position_dependent_blocks_are_not_aliased(self):
+        """Verify that blocks not marked position-independent keep their own copy."""
+        rom = Rom()
+        rom.add(MockCodeBlock("first", CodeBlockType.DATA, size=2, code=b"\x01\x02"))
+        rom.add(MockCodeBlock("second", CodeBlockType.DATA, size=2, code=b"\x01\x02"))
+
+        rendered = rom.render()
+
+        assert rendered[16:20] == b"\x01\x02\x01\x02"
+        assert rom.layout.data_aliases == {}
+
+    def test_identical_entities_share_a_record(self):
+        """Verify that entities rendering to the same record share it, and the scene lists its address for both."""
+        snapshot = make_game_snapshot(n_entities=3)
+        snapshot.entities[2].entity_data = snapshot.entities[0].entity_data
+
+        rom, layout = compile_with_layout(snapshot)
+        runner = HeadlessRunner(rom, layout=layout)
+        runner.run(frames=2)
+
+        assert layout.data_bytes_saved == 4
+        assert runner.ppu.oam[8:12] == runner.ppu.oam[0:4]
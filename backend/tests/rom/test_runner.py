@@ -0,0 +1,205 @@
+import pytest
+
+from core.rom.asm import Asm6502
+from core.rom.cpu import Cpu6502, UnknownOpcodeError
+from core.rom.opcodes import OPCODES
+from core.rom.rom import RomCodeArea
+from core.rom.runner import CYCLES_PER_FRAME, OAM_DMA_CYCLES, HeadlessRunner
+from tests.rom.helpers import compile_with_layout, make_game_snapshot
+
+
+class FlatBus:
+    """64KB of plain RAM."""
+
+    def __init__(self):
+        self.memory = bytearray(0x10000)
+
+    def read(self, address: int) -> int:
+        return self.memory[address]
+
+    def write(self, address: int, value: int) -> None:
+        self.memory[address] = value
+
+
+def load_cpu(asm: Asm6502, address: int = 0x8000) -> Cpu6502:
+    bus = FlatBus()
+    code = asm.assemble().link(address, {})
+    bus.memory[address : address + len(code)] = code
+    cpu = Cpu6502(bus)
+    cpu.pc = address
+    return cpu
+
+
+def run(cpu: Cpu6502, instructions: int) -> int:
+    return sum(cpu.step() for _ in range(instructions))
+
+
+class TestCpu6502:
+    """Tests for the table-dispatched 6502 core."""
+
+    def test_instruction_set_is_complete(self):
+        """Verify that all 151 official opcodes are in the dispatch table."""
+        assert len(OPCODES) == 151
+
+    def test_load_store_and_flags(self):
+        """Verify that loads set Z/N and stores write memory."""
+        cpu = load_cpu(Asm6502().lda_imm(0x80).sta_zp(0x10).ldx_imm(0x00))
+
+        cycles = run(cpu, 3)
+
+        assert cpu.bus.memory[0x10] == 0x80
+        assert (cpu.n, cpu.z) == (0, 1)
+        assert cycles == 2 + 3 + 2
+
+    def test_adc_sets_carry_and_overflow(self):
+        """Verify binary addition flags: 0x7F + 0x01 overflows, 0xFF + 0x01 carries."""
+        cpu = load_cpu(Asm6502().clc().lda_imm(0x7F).adc_imm(0x01))
+        run(cpu, 3)
+        assert (cpu.a, cpu.v, cpu.c, cpu.n) == (0x80, 1, 0, 1)
+
+        cpu = load_cpu(Asm6502().clc().lda_imm(0xFF).adc_imm(0x01))
+        run(cpu, 3)
+        assert (cpu.a, cpu.v, cpu.c, cpu.z) == (0x00, 0, 1, 1)
+
+    def test_indexed_read_pays_for_page_crossing(self):
+        """Verify that LDA abs,X costs one more cycle when the index crosses a page, and STA abs,X always costs 5."""
+        cpu = load_cpu(Asm6502().ldx_imm(0x01).lda_abs_x(0x02FF).lda_abs_x(0x0200).sta_abs_x(0x0200))
+
+        run(cpu, 1)
+
+        assert [cpu.step(), cpu.step(), cpu.step()] == [5, 4, 5]
+
+    def test_branch_costs(self):
+        """Verify that branches cost 2 cycles not taken, 3 taken, and 4 taken across a page."""
+        asm = Asm6502()
+        asm.ldx_imm(0x01)
+        asm.beq("end")  # not taken
+        asm.bne("next")  # taken, same page
+        asm.label("next")
+        asm.label("end")
+        cpu = load_cpu(asm)
+        run(cpu, 1)
+        assert [cpu.step(), cpu.step()] == [2, 3]
+
+        cpu = load_cpu(Asm6502().ldx_imm(0x01).bne(0x10), address=0x80F0)
+        run(cpu, 1)
+        assert cpu.step() == 4
+        assert cpu.pc == 0x8104
+
+    def test_jsr_and_rts(self):
+        """Verify that a subroutine call returns to the instruction after the JSR."""
+        asm = Asm6502()
+        asm.jsr("sub")
+        asm.ldx_imm(0x42)
+        asm.label("sub")
+        asm.lda_imm(0x17)
+        asm.rts()
+        cpu = load_cpu(asm)
+
+        cycles = run(cpu, 4)
+
+        assert (cpu.a, cpu.x, cpu.sp) == (0x17, 0x42, 0xFD)
+        assert cycles == 6 + 2 + 6 + 2
+
+    def test_nmi_and_rti_restore_state(self):
+        """Verify that an NMI jumps through $FFFA and RTI restores PC and flags."""
+        cpu = load_cpu(Asm6502().sec().loop_forever())
+        handler = Asm6502().clc().rti().assemble().link(0x9000, {})
+        cpu.bus.memory[0x9000 : 0x9000 + len(handler)] = handler
+        cpu.bus.memory[0xFFFA:0xFFFC] = (0x9000).to_bytes(2, "little")
+
+        run(cpu, 2)
+        assert cpu.idle
+        assert cpu.nmi() == 7
+        run(cpu, 2)
+
+        assert (cpu.pc, cpu.c, cpu.sp) == (0x8001, 1, 0xFD)
+
+    def test_unknown_opcode_raises(self):
+        """Verify that an unofficial opcode stops execution."""
+        cpu = load_cpu(Asm6502())
+        cpu.bus.memory[0x8000] = 0x02
+
+        with pytest.raises(UnknownOpcodeError, match=r"\$02 at \$8000"):
+            cpu.step()
+
+
+class TestHeadlessRunner:
+    """Tests for booting built ROMs on the headless runner."""
+
+    def test_boot_queues_scene_palettes_for_the_first_vblank(self):
+        """Verify that the scene's palettes reach the PPU in the first VBlank, after rendering was turned on."""
+        rom, layout = compile_with_layout(make_game_snapshot(n_entities=1))
+        runner = HeadlessRunner(rom, layout=layout)
+
+        runner.run(frames=0)
+
+        assert runner.ppu.mask == 0x1E
+        assert runner.ppu.palette == bytes(32)
+
+        runner.run(frames=1)
+
+        # Backdrop 0x0F, then palettes (i, i+1, i+2) for i in 0..3, for background and sprites alike
+        expected = bytes([0x0F, 0, 1, 2, 0x0F, 1, 2, 3, 0x0F, 2, 3, 4, 0x0F, 3, 4, 5])
+        assert runner.ppu.palette == expected * 2
+
+    def test_frames_render_entities_into_oam(self):
+        """Verify that after a frame the NMI has copied every entity into OAM via DMA."""
+        snapshot = make_game_snapshot(n_entities=3)
+        rom, layout = compile_with_layout(snapshot)
+        runner = HeadlessRunner(rom, layout=layout)
+
+        report = runner.run(frames=2)
+
+        for i, entity in enumerate(snapshot.entities):
+            y, tile, attributes, x = runner.ppu.oam[4 * i : 4 * i + 4]
+            assert (x, y, attributes) == (entity.entity_data.x, entity.entity_data.y, entity.entity_data.palette_index)
+            assert tile == 1
+        assert report.frames[-1].dma_cycles == OAM_DMA_CYCLES
+
+    def test_accounts_cycles_per_area(self):
+        """Verify that every frame's cycles are attributed to the NMI areas, idle time or the reset loop."""
+        rom, layout = compile_with_layout(make_game_snapshot(n_entities=3))
+
+        report = HeadlessRunner(rom, layout=layout).run(frames=3)
+
+        frame = report.frames[-1]
+        assert frame.cycles == CYCLES_PER_FRAME
+        assert frame.cycles == frame.idle_cycles + sum(frame.cycles_by_area.values())
+        nmi_areas = (RomCodeArea.NMI_POST_VBLANK, RomCodeArea.NMI_VBLANK)
+        assert frame.nmi_cycles == sum(frame.cycles_by_area[area] for area in nmi_areas)
+        assert report.max_cycles(RomCodeArea.NMI_VBLANK) >= OAM_DMA_CYCLES
+        assert report.boot.cycles_by_area.keys() == {RomCodeArea.RESET}
+
+    def test_static_scene_skips_sprite_rebuild(self):
+        """Verify that once the sprites are built, frames without entity changes only DMA the existing page."""
+        snapshot = make_game_snapshot(n_entities=3)
+        rom, layout = compile_with_layout(snapshot)
+        runner = HeadlessRunner(rom, layout=layout)
+
+        report = runner.run(frames=3)
+
+        first, last = report.frames[0], report.frames[-1]
+        assert first.cycles_by_area[RomCodeArea.NMI_POST_VBLANK] > 100
+        # LDA zp__entities_dirty, taken BEQ, and the NMI's closing RTI
+        assert last.cycles_by_area[RomCodeArea.NMI_POST_VBLANK] == 3 + 3 + 6
+        assert last.dma_cycles == OAM_DMA_CYCLES
+        y, _, _, x = runner.ppu.oam[0:4]
+        assert (x, y) == (snapshot.entities[0].entity_data.x, snapshot.entities[0].entity_data.y)
+
+    def test_without_layout_cycles_are_unattributed(self):
+        """Verify that the runner works without a layout, attributing all cycles to None."""
+        rom, _ = compile_with_layout(make_game_snapshot(n_entities=1))
+
+        report = HeadlessRunner(rom).run(frames=1)
+
+        assert report.frames[0].cycles_by_area.keys() == {None}
+
+    def test_rejects_other_mappers(self):
+        """Verify that images for mappers other than NROM are refused."""
+        rom, _ = compile_with_layout(make_game_snapshot(n_entities=1))
+        image = bytearray(rom)
+        image[6] = 0x10
+
+        with pytest.raises(ValueError, match="mapper 0"):
+            HeadlessRunner(image)
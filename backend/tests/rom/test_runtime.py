@@ -0,0 +1,34 @@
+from core.rom.code_block import AssembledCodeBlock
+from core.rom.code_block_registry import CodeBlockRegistry
+from core.rom.label_registry import LabelRegistry
+from core.rom.runtime import runtime_library
+from tests.rom.helpers import compile_snapshot, make_game_snapshot
+
+
+class TestRuntimeLibrary:
+    """Tests for the process-wide prelinked runtime library."""
+
+    def test_every_optional_variant_is_assembled(self):
+        """Verify that each built-in block is assembled for every combination of its optional dependencies."""
+        for label, block in runtime_library.code_blocks.items():
+            if isinstance(block, AssembledCodeBlock):
+                n_variants = sum(1 for key in runtime_library.object_code if key[0] == label)
+                assert n_variants == 2 ** len(block.optional_dependencies)
+
+    def test_registries_share_runtime_instances(self):
+        """Verify that a fresh code block registry reuses the already-assembled runtime blocks."""
+        registry = CodeBlockRegistry(label_registry=LabelRegistry())
+
+        for label, block in runtime_library.code_blocks.items():
+            assert registry[label] is block
+
+    def test_build_does_not_reassemble_runtime(self, monkeypatch):
+        """Verify that compiling a game only links the runtime and never runs the assembler on it."""
+        reassembled = []
+        for block in runtime_library.code_blocks.values():
+            if isinstance(block, AssembledCodeBlock):
+                monkeypatch.setattr(type(block), "_build_code", lambda self, optional: reassembled.append(self.label))
+
+        compile_snapshot(make_game_snapshot(n_entities=2))
+
+        assert reassembled == []
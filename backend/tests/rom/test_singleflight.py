@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from core.rom.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Tests for coalescing concurrent identical calls."""
+
+    async def test_concurrent_calls_share_one_execution(self):
+        """Verify that concurrent calls for one key run the function once and all get its result."""
+        flights = SingleFlight()
+        calls = []
+
+        async def build():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return b"rom"
+
+        results = await asyncio.gather(*(flights.do("k", build) for _ in range(3)))
+
+        assert len(calls) == 1
+        assert sorted(results) == [(b"rom", False), (b"rom", True), (b"rom", True)]
+        assert flights.stats().deduplicated == 2
+        assert len(flights) == 0
+
+    async def test_different_keys_do_not_share(self):
+        """Verify that calls for different keys run independently."""
+        flights = SingleFlight()
+
+        async def build():
+            await asyncio.sleep(0)
+            return b"rom"
+
+        await asyncio.gather(flights.do("a", build), flights.do("b", build))
+
+        assert flights.stats().executed == 2
+        assert flights.stats().deduplicated == 0
+
+    async def test_sequential_calls_do_not_share(self):
+        """Verify that a finished call is forgotten, so the next call runs again."""
+        flights = SingleFlight()
+
+        async def build():
+            return b"rom"
+
+        await flights.do("k", build)
+        _, shared = await flights.do("k", build)
+
+        assert not shared
+        assert flights.stats().executed == 2
+
+    async def test_exception_is_shared(self):
+        """Verify that every waiter sees the failure of the shared call."""
+        flights = SingleFlight()
+
+        async def build():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(flights.do("k", build), flights.do("k", build), return_exceptions=True)
+
+        assert all(isinstance(result, ValueError) for result in results)
+
+    async def test_cancelling_one_waiter_does_not_cancel_the_call(self):
+        """Verify that a waiter going away leaves the call running for the remaining waiters."""
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def build():
+            await release.wait()
+            return b"rom"
+
+        first = asyncio.create_task(flights.do("k", build))
+        second = asyncio.create_task(flights.do("k", build))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        release.set()
+
+        assert await second == (b"rom", True)
+
+    async def test_cancelling_last_waiter_cancels_the_call(self):
+        """Verify that the call is cancelled once nobody is waiting for it."""
+        flights = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def build():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.create_task(flights.do("k", build))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+
+        assert cancelled.is_set()
+        assert len(flights) == 0
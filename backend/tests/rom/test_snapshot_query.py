@@ -0,0 +1,36 @@
+import uuid
+
+from sqlalchemy.dialects import postgresql
+
+from core.rom.snapshot import GameSnapshot
+from core.rom.snapshot_query import decode_game_snapshot, game_snapshot_query
+from tests.rom.helpers import make_game_snapshot
+
+
+def _as_document(snapshot: GameSnapshot) -> dict:
+    """Shape a snapshot like the JSON document Postgres returns for game_snapshot_query()."""
+    document = snapshot.model_dump(mode="json")
+    for asset in document["assets"]:
+        asset["type"] = asset["type"].upper()  # native enum columns hold member names
+    return document
+
+
+class TestGameSnapshotQuery:
+    """Tests for the single-round-trip snapshot loader."""
+
+    def test_is_a_single_statement_aggregating_every_relationship(self):
+        """Verify that the whole graph is fetched by one SELECT with correlated json_agg subqueries."""
+        sql = str(game_snapshot_query(uuid.uuid4()).compile(dialect=postgresql.dialect()))
+
+        assert sql.count("json_agg") == 4
+        for table in ("games", "scenes", "assets", "entities", "components"):
+            assert f"FROM {table}" in sql
+
+    def test_decodes_document_into_snapshot(self):
+        """Verify that a decoded document equals the snapshot it was built from, including its fingerprint."""
+        snapshot = GameSnapshot.from_model(make_game_snapshot(n_entities=3))
+
+        decoded = decode_game_snapshot(_as_document(snapshot))
+
+        assert decoded == snapshot
+        assert decoded.fingerprint() == snapshot.fingerprint()
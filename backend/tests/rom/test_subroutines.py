@@ -1,4 +1,4 @@
-from core.rom.subroutines import LoadSceneSubroutine
+from core.rom.subroutines import FlushVramQueueBlock, LoadSceneSubroutine, QueueVramWriteSubroutine
 from core.schemas import ENTITY_SIZE_BYTES
 from tests.rom.helpers import (
     MemoryObserver,
@@ -6,19 +6,48 @@ from tests.rom.helpers import (
     run_subroutine,
 )
 
+LOAD_SCENE_NAMES = {
+    "zp__src1": 0x10,
+    "zp__src2": 0x12,
+    "zp__entity_ram_page": 0x14,
+    "zp__entity_count": 0x15,
+    "zp__entities_dirty": 0x16,
+    "zp__vram_queue_head": 0x17,
+    "zp__vram_queue_tail": 0x18,
+    "zp__vram_record_size": 0x19,
+    "zp__vram_records_left": 0x1A,
+    "queue_vram_write": 0x8800,
+}
+FLUSH_ADDRESS = 0x8C00
+
+
+def create_load_scene_cpu(observers=None):
+    """Create a test CPU with load_scene at $8000 and the VRAM queue blocks its palette writes go through."""
+    code = LoadSceneSubroutine().render(start_offset=0x8000, names=LOAD_SCENE_NAMES)
+    cpu, memory = create_test_cpu(code.code, code_address=0x8000, observers=observers)
+    queue = QueueVramWriteSubroutine().render(start_offset=0x8800, names=LOAD_SCENE_NAMES)
+    memory.write(0x8800, list(queue.code))
+    # flush_vram_queue is inline NMI code, so give it an RTS to be callable here
+    flush = FlushVramQueueBlock().render(start_offset=FLUSH_ADDRESS, names=LOAD_SCENE_NAMES)
+    memory.write(FLUSH_ADDRESS, list(flush.code) + [0x60])
+    return cpu, memory
+
+
+def run_load_scene(cpu, memory) -> int:
+    """Run load_scene, then flush the writes it queued as the next VBlank would; returns load_scene's cycles."""
+    cycles = run_subroutine(cpu, memory, subroutine_address=0x8000)
+    run_subroutine(cpu, memory, subroutine_address=FLUSH_ADDRESS)
+    return cycles
+
 
 class TestLoadSceneSubroutine:
     """Tests for the load_scene subroutine."""
 
     def test_loads_background_color_to_palette_index_0(self):
         """Verify that background color (byte 0) is written to palette index 0."""
-        # Create the subroutine
-        subroutine = LoadSceneSubroutine()
-        code = subroutine.render(start_offset=0x8000, names={"zp__src1": 0x10, "zp__src2": 0x12, "zp__entity_ram_page": 0x14})
-
         # Set up PPU register observer
         ppu_observer = MemoryObserver()
-        cpu, memory = create_test_cpu(code.code, code_address=0x8000, observers={range(0x2000, 0x2008): ppu_observer})
+        cpu, memory = create_load_scene_cpu(observers={range(0x2000, 0x2008): ppu_observer})
 
         # Create scene data at 0x9000
         scene_data = [
@@ -37,7 +66,7 @@ class TestLoadSceneSubroutine:
         memory[0x11] = 0x90  # High byte of 0x9000
 
         # Run the subroutine
-        run_subroutine(cpu, memory, subroutine_address=0x8000)
+        run_load_scene(cpu, memory)
 
         # Verify PPU writes
         writes = ppu_observer.get_writes()
@@ -56,11 +85,8 @@ class TestLoadSceneSubroutine:
 
     def test_loads_background_palette_when_pointer_is_not_null(self):
         """Verify that 12 bytes of BG palette data are loaded when pointer is non-null."""
-        subroutine = LoadSceneSubroutine()
-        code = subroutine.render(start_offset=0x8000, names={"zp__src1": 0x10, "zp__src2": 0x12, "zp__entity_ram_page": 0x14})
-
         ppu_observer = MemoryObserver()
-        cpu, memory = create_test_cpu(code.code, code_address=0x8000, observers={range(0x2000, 0x2008): ppu_observer})
+        cpu, memory = create_load_scene_cpu(observers={range(0x2000, 0x2008): ppu_observer})
 
         # Create BG palette data at 0x9100
         bg_palette = [0x01, 0x02, 0x03, 0x04, 0x05, 0x06, 0x07, 0x08, 0x09, 0x0A, 0x0B, 0x0C]
@@ -82,7 +108,7 @@ class TestLoadSceneSubroutine:
         memory[0x10] = 0x00
         memory[0x11] = 0x90
 
-        run_subroutine(cpu, memory, subroutine_address=0x8000)
+        run_load_scene(cpu, memory)
 
         # Verify BG palette was written to PPU_DATA
         ppu_data_writes = ppu_observer.get_writes_to(0x2007)
@@ -94,11 +120,8 @@ class TestLoadSceneSubroutine:
 
     def test_skips_background_palette_when_pointer_is_null(self):
         """Verify that BG palette is skipped when pointer is 0x0000."""
-        subroutine = LoadSceneSubroutine()
-        code = subroutine.render(start_offset=0x8000, names={"zp__src1": 0x10, "zp__src2": 0x12, "zp__entity_ram_page": 0x14})
-
         ppu_observer = MemoryObserver()
-        cpu, memory = create_test_cpu(code.code, code_address=0x8000, observers={range(0x2000, 0x2008): ppu_observer})
+        cpu, memory = create_load_scene_cpu(observers={range(0x2000, 0x2008): ppu_observer})
 
         # Scene data with null BG palette pointer
         scene_data = [
@@ -115,7 +138,7 @@ class TestLoadSceneSubroutine:
         memory[0x10] = 0x00
         memory[0x11] = 0x90
 
-        run_subroutine(cpu, memory, subroutine_address=0x8000)
+        run_load_scene(cpu, memory)
 
         # With null pointers, should only write: bg_color
         ppu_data_writes = ppu_observer.get_writes_to(0x2007)
@@ -126,11 +149,8 @@ class TestLoadSceneSubroutine:
 
     def test_loads_sprite_palette_when_pointer_is_not_null(self):
         """Verify that 12 bytes of sprite palette data are loaded when pointer is non-null."""
-        subroutine = LoadSceneSubroutine()
-        code = subroutine.render(start_offset=0x8000, names={"zp__src1": 0x10, "zp__src2": 0x12, "zp__entity_ram_page": 0x14})
-
         ppu_observer = MemoryObserver()
-        cpu, memory = create_test_cpu(code.code, code_address=0x8000, observers={range(0x2000, 0x2008): ppu_observer})
+        cpu, memory = create_load_scene_cpu(observers={range(0x2000, 0x2008): ppu_observer})
 
         # Create sprite palette data at 0x9200
         sprite_palette = [0x11, 0x12, 0x13, 0x14, 0x15, 0x16, 0x17, 0x18, 0x19, 0x1A, 0x1B, 0x1C]
@@ -151,7 +171,7 @@ class TestLoadSceneSubroutine:
         memory[0x10] = 0x00
         memory[0x11] = 0x90
 
-        run_subroutine(cpu, memory, subroutine_address=0x8000)
+        run_load_scene(cpu, memory)
 
         ppu_data_writes = ppu_observer.get_writes_to(0x2007)
 
@@ -161,11 +181,8 @@ class TestLoadSceneSubroutine:
 
     def test_loads_both_palettes_when_both_pointers_are_not_null(self):
         """Verify both BG and sprite palettes are loaded when both pointers are non-null."""
-        subroutine = LoadSceneSubroutine()
-        code = subroutine.render(start_offset=0x8000, names={"zp__src1": 0x10, "zp__src2": 0x12, "zp__entity_ram_page": 0x14})
-
         ppu_observer = MemoryObserver()
-        cpu, memory = create_test_cpu(code.code, code_address=0x8000, observers={range(0x2000, 0x2008): ppu_observer})
+        cpu, memory = create_load_scene_cpu(observers={range(0x2000, 0x2008): ppu_observer})
 
         # Create both palettes
         bg_palette = [0x01, 0x02, 0x03, 0x04, 0x05, 0x06, 0x07, 0x08, 0x09, 0x0A, 0x0B, 0x0C]
@@ -188,7 +205,7 @@ class TestLoadSceneSubroutine:
         memory[0x10] = 0x00
         memory[0x11] = 0x90
 
-        run_subroutine(cpu, memory, subroutine_address=0x8000)
+        run_load_scene(cpu, memory)
 
         ppu_data_writes = ppu_observer.get_writes_to(0x2007)
 
@@ -201,11 +218,8 @@ class TestLoadSceneSubroutine:
 
     def test_enables_ppu_and_nmi_at_end(self):
         """Verify that PPU and NMI are enabled at the end of the subroutine."""
-        subroutine = LoadSceneSubroutine()
-        code = subroutine.render(start_offset=0x8000, names={"zp__src1": 0x10, "zp__src2": 0x12, "zp__entity_ram_page": 0x14})
-
         ppu_observer = MemoryObserver()
-        cpu, memory = create_test_cpu(code.code, code_address=0x8000, observers={range(0x2000, 0x2008): ppu_observer})
+        cpu, memory = create_load_scene_cpu(observers={range(0x2000, 0x2008): ppu_observer})
 
         # Minimal scene data
         scene_data = [0x0F, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]  # Added entity list null terminator
@@ -214,7 +228,7 @@ class TestLoadSceneSubroutine:
         memory[0x10] = 0x00
         memory[0x11] = 0x90
 
-        run_subroutine(cpu, memory, subroutine_address=0x8000)
+        run_load_scene(cpu, memory)
 
         # Check PPUCTRL (0x2000) - should have 0x80 written (NMI enabled)
         ppuctrl_writes = ppu_observer.get_writes_to(0x2000)
@@ -226,10 +240,7 @@ class TestLoadSceneSubroutine:
 
     def test_returns_via_rts(self):
         """Verify that the subroutine properly returns via RTS."""
-        subroutine = LoadSceneSubroutine()
-        code = subroutine.render(start_offset=0x8000, names={"zp__src1": 0x10, "zp__src2": 0x12, "zp__entity_ram_page": 0x14})
-
-        cpu, memory = create_test_cpu(code.code, code_address=0x8000)
+        cpu, memory = create_load_scene_cpu()
 
         # Minimal scene data
         scene_data = [0x0F, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]  # Added entity list null terminator
@@ -240,7 +251,7 @@ class TestLoadSceneSubroutine:
 
         # run_subroutine will fail if RTS doesn't work properly
         # (it expects to return to 0xFFFF)
-        cycles = run_subroutine(cpu, memory, subroutine_address=0x8000)
+        cycles = run_load_scene(cpu, memory)
 
         # If we got here, RTS worked correctly
         assert cpu.pc == 0xFFFF
@@ -261,11 +272,8 @@ class TestLoadSceneSubroutine:
         This test simulates the real scenario where a scene has a background_palettes
         component reference (like "Classic Mario Set").
         """
-        subroutine = LoadSceneSubroutine()
-        code = subroutine.render(start_offset=0x8000, names={"zp__src1": 0x10, "zp__src2": 0x12, "zp__entity_ram_page": 0x14})
-
         ppu_observer = MemoryObserver()
-        cpu, memory = create_test_cpu(code.code, code_address=0x8000, observers={range(0x2000, 0x2008): ppu_observer})
+        cpu, memory = create_load_scene_cpu(observers={range(0x2000, 0x2008): ppu_observer})
 
         # Create the "Classic Mario Set" palette data (4 sub-palettes × 3 colors = 12 bytes)
         classic_mario_palette = [
@@ -293,7 +301,7 @@ class TestLoadSceneSubroutine:
         memory[0x11] = 0x90  # High byte of 0x9000
 
         # Run the subroutine
-        run_subroutine(cpu, memory, subroutine_address=0x8000)
+        run_load_scene(cpu, memory)
 
         # Get all writes in chronological order
         all_writes = ppu_observer.get_writes()
@@ -334,13 +342,7 @@ class TestLoadSceneSubroutine:
 
     def test_loads_entity_data_into_ram(self):
         """Verify that entity data is loaded into RAM page $0200."""
-        subroutine = LoadSceneSubroutine()
-        code = subroutine.render(
-            start_offset=0x8000,
-            names={"zp__src1": 0x10, "zp__src2": 0x12, "zp__entity_ram_page": 0x14}
-        )
-
-        cpu, memory = create_test_cpu(code.code, code_address=0x8000)
+        cpu, memory = create_load_scene_cpu()
 
         # Create entity data at different addresses
         # Entity 1: x=100, y=150, spriteset_idx=1, palette_idx=2
@@ -368,7 +370,7 @@ class TestLoadSceneSubroutine:
         memory[0x11] = 0x90
 
         # Run the subroutine
-        run_subroutine(cpu, memory, subroutine_address=0x8000)
+        run_load_scene(cpu, memory)
 
         # Verify entity data was copied to RAM page $0200
         # Entity 1 should be at $0200-$0203
@@ -386,15 +388,16 @@ class TestLoadSceneSubroutine:
         # Verify zp__entity_ram_page was set to 0x02
         assert memory[0x14] == 0x02, f"Entity RAM page: expected 0x02, got {memory[0x14]:02X}"
 
+        # Verify the entity count and that the sprite slots past the two entities are hidden
+        assert memory[0x15] == 2, f"Entity count: expected 2, got {memory[0x15]}"
+        assert [memory[0x0300 + i * 4] for i in range(4)] == [0x00, 0x00, 0xFF, 0xFF]
+        assert memory[0x03FC] == 0xFF
+        # Verify the entities were marked dirty for the next frame
+        assert memory[0x16] == 1
+
     def test_handles_empty_entity_list(self):
         """Verify that empty entity list (immediate null terminator) works correctly."""
-        subroutine = LoadSceneSubroutine()
-        code = subroutine.render(
-            start_offset=0x8000,
-            names={"zp__src1": 0x10, "zp__src2": 0x12, "zp__entity_ram_page": 0x14}
-        )
-
-        cpu, memory = create_test_cpu(code.code, code_address=0x8000)
+        cpu, memory = create_load_scene_cpu()
 
         # Scene data with empty entity list
         scene_data = [
@@ -407,12 +410,20 @@ class TestLoadSceneSubroutine:
 
         memory[0x10] = 0x00
         memory[0x11] = 0x90
+        # Writes still queued for a previous scene
+        memory[0x17] = 0x20
+        memory[0x18] = 0x08
 
         # Run the subroutine - should not crash
-        run_subroutine(cpu, memory, subroutine_address=0x8000)
+        run_load_scene(cpu, memory)
 
         # Verify zp__entity_ram_page was still set
         assert memory[0x14] == 0x02
+        assert memory[0x15] == 0
+        assert all(memory[0x0300 + i * 4] == 0xFF for i in range(64))
+        # Verify the VRAM queue was emptied before the backdrop record was queued and flushed
+        assert memory[0x17] == memory[0x18] == 4
+        assert memory[0x0400:0x0404] == [0x3F, 0x00, 1, 0x0F]
 
         # Entity RAM should be zero (no entities loaded)
         # Just check a few bytes to confirm nothing was written
@@ -0,0 +1,192 @@
+import pytest
+
+from core.rom.asm import Asm6502, LabelRef
+from core.rom.builder import RomBuilder
+from core.rom.code_block import AssembledCodeBlock, CodeBlockType
+from core.rom.code_block_registry import CodeBlockRegistry
+from core.rom.cycles import worst_case_cycles
+from core.rom.label_registry import LabelRegistry
+from core.rom.rom import Rom
+from core.rom.runner import HeadlessRunner
+from core.rom.subroutines import (
+    MAX_VRAM_RECORD_LENGTH,
+    FlushVramQueueBlock,
+    QueueVramWriteSubroutine,
+)
+from tests.rom.helpers import MemoryObserver, create_test_cpu, make_game_snapshot, run_subroutine, run_until
+
+QUEUE = 0x0400
+RECORD = 0x9000
+
+QUEUE_NAMES = {
+    "zp__src2": 0x10,
+    "zp__vram_queue_head": 0x12,
+    "zp__vram_queue_tail": 0x13,
+    "zp__vram_record_size": 0x14,
+}
+FLUSH_NAMES = {"zp__vram_queue_head": 0x12, "zp__vram_queue_tail": 0x13, "zp__vram_records_left": 0x15}
+
+
+def queue_record(record: list[int], head: int = 0, tail: int = 0):
+    """Run queue_vram_write on a record; returns the memory and the carry it returned with."""
+    code = QueueVramWriteSubroutine().render(start_offset=0x8000, names=QUEUE_NAMES)
+    cpu, memory = create_test_cpu(code.code, code_address=0x8000)
+    memory.write(RECORD, record)
+    memory[0x10], memory[0x11] = RECORD & 0xFF, RECORD >> 8
+    memory[0x12], memory[0x13] = head, tail
+
+    run_subroutine(cpu, memory, subroutine_address=0x8000)
+
+    return memory, cpu.p & 0x01
+
+
+def flush_queue(queue: list[int], budget_cycles: int = 1200):
+    """Run flush_vram_queue on a queue filled from offset 0; returns the memory and the PPU register writes."""
+    code = FlushVramQueueBlock(budget_cycles=budget_cycles).render(start_offset=0x8000, names=FLUSH_NAMES)
+    ppu = MemoryObserver()
+    cpu, memory = create_test_cpu(code.code, code_address=0x8000, observers={range(0x2000, 0x2008): ppu})
+    memory.write(QUEUE, queue)
+    memory[0x12], memory[0x13] = len(queue), 0
+
+    run_until(cpu, lambda: cpu.pc == 0x8000 + len(code.code))
+
+    return memory, ppu.get_writes()
+
+
+class TestQueueVramWrite:
+    """Tests for the queue_vram_write subroutine."""
+
+    def test_appends_record_and_advances_head(self):
+        """Verify that a record is copied to the queue page and published by moving the head past it."""
+        memory, carry = queue_record([0x3F, 0x01, 3, 0x21, 0x22, 0x23], head=0x10, tail=0x10)
+
+        assert carry == 0
+        assert [memory[QUEUE + 0x10 + i] for i in range(6)] == [0x3F, 0x01, 3, 0x21, 0x22, 0x23]
+        assert memory[0x12] == 0x16
+
+    def test_wraps_around_the_queue_page(self):
+        """Verify that a record crossing the end of the page continues at its start."""
+        memory, carry = queue_record([0x20, 0x00, 2, 0xAA, 0xBB], head=0xFE, tail=0x80)
+
+        assert carry == 0
+        assert [memory[QUEUE + 0xFE], memory[QUEUE + 0xFF]] == [0x20, 0x00]
+        assert [memory[QUEUE + i] for i in range(3)] == [2, 0xAA, 0xBB]
+        assert memory[0x12] == 0x03
+
+    def test_rejects_record_that_does_not_fit(self):
+        """Verify that with too little room the record is not queued and carry is set."""
+        # 5 bytes free: tail - head - 1
+        memory, carry = queue_record([0x20, 0x00, 3, 1, 2, 3], head=0x10, tail=0x16)
+
+        assert carry == 1
+        assert memory[0x12] == 0x10
+        assert memory[QUEUE + 0x10] == 0
+
+    @pytest.mark.parametrize("length", [0, MAX_VRAM_RECORD_LENGTH + 1])
+    def test_rejects_length_out_of_range(self, length: int):
+        """Verify that empty records and records longer than MAX_VRAM_RECORD_LENGTH are rejected."""
+        memory, carry = queue_record([0x20, 0x00, length] + [1] * length)
+
+        assert carry == 1
+        assert memory[0x12] == 0
+
+
+class TestFlushVramQueue:
+    """Tests for the flush_vram_queue VBlank code block."""
+
+    def test_writes_records_and_restores_scroll(self):
+        """Verify that queued records are written through PPUADDR/PPUDATA, then scroll and PPUCTRL are reset."""
+        memory, writes = flush_queue([0x3F, 0x01, 2, 0x21, 0x22, 0x20, 0x40, 1, 0x05])
+
+        assert writes == [
+            (0x2006, 0x3F),
+            (0x2006, 0x01),
+            (0x2007, 0x21),
+            (0x2007, 0x22),
+            (0x2006, 0x20),
+            (0x2006, 0x40),
+            (0x2007, 0x05),
+            (0x2005, 0x00),
+            (0x2005, 0x00),
+            (0x2000, 0x80),
+        ]
+        assert memory[0x13] == memory[0x12]
+
+    def test_empty_queue_touches_nothing(self):
+        """Verify that an empty queue does not write the PPU, so scroll is left alone."""
+        _, writes = flush_queue([])
+
+        assert writes == []
+
+    def test_writes_at_most_max_records(self):
+        """Verify that a long queue drains over several VBlanks, max_records at a time."""
+        queue = [0x20, 0x00, 1, 0x01] * 5
+
+        memory, writes = flush_queue(queue, budget_cycles=1200)
+
+        assert FlushVramQueueBlock(budget_cycles=1200).max_records == 2
+        assert [value for address, value in writes if address == 0x2007] == [0x01, 0x01]
+        assert memory[0x13] == 8
+
+    def test_worst_case_fits_the_budget(self):
+        """Verify that the static worst case of the block stays within its cycle budget."""
+        for budget_cycles in (586, 1200, 2000):
+            block = FlushVramQueueBlock(budget_cycles=budget_cycles)
+            for address in (0x8000, 0x80F0):
+                rendered = block.render(start_offset=address, names=FLUSH_NAMES)
+                assert worst_case_cycles(rendered.object_code, rendered.code, address, None) <= budget_cycles
+
+    def test_budget_too_small_raises(self):
+        """Verify that a budget that cannot fit one full record is refused when the block is rendered."""
+        block = FlushVramQueueBlock(budget_cycles=585)
+
+        with pytest.raises(ValueError, match="too small for one record"):
+            block.render(start_offset=0x8000, names=FLUSH_NAMES)
+
+
+class QueuePaletteUpdate(AssembledCodeBlock):
+    """An update handler that queues a write of sprite palette 0 every frame."""
+
+    label: str = "update_handler"
+    type: CodeBlockType = CodeBlockType.UPDATE
+
+    @property
+    def dependencies(self) -> list[str]:
+        return ["zp__src2", "queue_vram_write"]
+
+    def _build_code(self, optional: frozenset[str]) -> Asm6502:
+        asm = Asm6502()
+        for i, value in enumerate([0x3F, 0x11, 3, 0x21, 0x22, 0x23]):
+            asm.lda_imm(value)
+            asm.sta_abs(0x0600 + i)
+        asm.lda_imm(0x00)
+        asm.sta_zp(LabelRef("zp__src2"))
+        asm.lda_imm(0x06)
+        asm.sta_zp(LabelRef("zp__src2") + 1)
+        asm.jsr("queue_vram_write")
+        return asm
+
+
+def compile_with_update_handler() -> tuple[bytes, Rom]:
+    """Build a ROM whose update handler is QueuePaletteUpdate."""
+    label_registry = LabelRegistry()
+    code_block_registry = CodeBlockRegistry(label_registry=label_registry)
+    code_block_registry.add_code_block(QueuePaletteUpdate())
+    builder = RomBuilder(db=None, rom=Rom(), label_registry=label_registry, code_block_registry=code_block_registry)
+    return builder.compile(make_game_snapshot(n_entities=1)), builder.rom
+
+
+class TestVramQueueRom:
+    """Tests for queued VRAM writes in a built ROM."""
+
+    def test_palette_changes_while_rendering(self):
+        """Verify that a palette queued in the update handler reaches palette RAM during VBlank."""
+        rom, built = compile_with_update_handler()
+        runner = HeadlessRunner(rom, layout=built.layout)
+
+        report = runner.run(frames=3)
+
+        assert runner.ppu.palette[0x11:0x14] == bytes([0x21, 0x22, 0x23])
+        assert runner.ppu.mask != 0
+        assert runner.ppu.scroll == [0, 0]
+        assert not any(frame.vblank_overrun for frame in report.frames)
@@ -0,0 +1,112 @@
+from core.rom.code_block import CodeBlock, CodeBlockType, RenderedCodeBlock
+from core.rom.zero_page import ZeroPageByte, ZeroPageWord, allocate_zero_page
+from tests.rom.helpers import compile_with_layout, make_game_snapshot
+from tests.rom.test_vram_queue import compile_with_update_handler
+
+
+class Block(CodeBlock):
+    """A code block that only declares dependencies."""
+
+    uses: list[str] = []
+
+    @property
+    def size(self) -> int:
+        return 0
+
+    @property
+    def dependencies(self) -> list[str]:
+        return self.uses
+
+    def render(self, start_offset: int, names: dict[str, int]) -> RenderedCodeBlock:
+        return RenderedCodeBlock(code=b"", exported_labels={self.label: start_offset})
+
+
+def temporary(label: str) -> ZeroPageByte:
+    return ZeroPageByte(label=label, temporary=True)
+
+
+class TestAllocateZeroPage:
+    """Tests for the liveness-aware zero page allocator."""
+
+    def test_sibling_subroutines_share_temporaries(self):
+        """Verify that temporaries of two subroutines called one after the other get the same address."""
+        allocation = allocate_zero_page(
+            [
+                temporary("zp__a"),
+                temporary("zp__b"),
+                Block(label="sub_a", type=CodeBlockType.SUBROUTINE, uses=["zp__a"]),
+                Block(label="sub_b", type=CodeBlockType.SUBROUTINE, uses=["zp__b"]),
+                Block(label="update", type=CodeBlockType.UPDATE, uses=["sub_a", "sub_b"]),
+            ]
+        )
+
+        assert allocation.addresses == {"zp__a": 0, "zp__b": 0}
+        assert allocation.conflicts() == []
+        assert allocation.size == 1
+
+    def test_caller_and_callee_temporaries_do_not_share(self):
+        """Verify that a temporary live across a call interferes with the temporaries of the callee's callees."""
+        allocation = allocate_zero_page(
+            [
+                temporary("zp__a"),
+                temporary("zp__b"),
+                Block(label="leaf", type=CodeBlockType.SUBROUTINE, uses=["zp__b"]),
+                Block(label="middle", type=CodeBlockType.SUBROUTINE, uses=["leaf"]),
+                Block(label="update", type=CodeBlockType.UPDATE, uses=["zp__a", "middle"]),
+            ]
+        )
+
+        assert allocation.interference == {"zp__a": {"zp__b"}, "zp__b": {"zp__a"}}
+        assert allocation.addresses == {"zp__a": 0, "zp__b": 1}
+
+    def test_reset_and_nmi_temporaries_do_not_share(self):
+        """Verify that the NMI's temporaries cannot share bytes with those of the reset code it interrupts."""
+        allocation = allocate_zero_page(
+            [
+                temporary("zp__a"),
+                temporary("zp__b"),
+                Block(label="preamble", type=CodeBlockType.PREAMBLE, uses=["zp__a"]),
+                Block(label="vblank", type=CodeBlockType.VBLANK, uses=["zp__b"]),
+            ]
+        )
+
+        assert allocation.addresses == {"zp__a": 0, "zp__b": 1}
+
+    def test_persistent_variables_get_their_own_bytes(self):
+        """Verify that variables that are not temporaries overlap nothing, and words take two bytes."""
+        allocation = allocate_zero_page(
+            [
+                temporary("zp__a"),
+                ZeroPageByte(label="zp__state"),
+                ZeroPageWord(label="zp__pointer", temporary=True),
+                Block(label="sub_a", type=CodeBlockType.SUBROUTINE, uses=["zp__a"]),
+                Block(label="sub_b", type=CodeBlockType.SUBROUTINE, uses=["zp__pointer", "zp__state"]),
+                Block(label="update", type=CodeBlockType.UPDATE, uses=["sub_a", "sub_b"]),
+            ]
+        )
+
+        assert allocation.addresses == {"zp__a": 0, "zp__state": 1, "zp__pointer": 2}
+        assert allocation.interference["zp__state"] == {"zp__a", "zp__pointer"}
+        assert allocation.size == 4
+
+
+class TestRomZeroPage:
+    """Tests for the zero page allocation of built ROMs."""
+
+    def test_runtime_allocation_has_no_conflicts(self):
+        """Verify that the exported allocation of a ROM gives every variable bytes no interfering variable uses."""
+        _, layout = compile_with_layout(make_game_snapshot(n_entities=3))
+        allocation = layout.zero_page
+
+        assert allocation.conflicts() == []
+        assert "zp__src2" in allocation.interference["zp__src1"]
+        assert allocation.size == sum(allocation.sizes.values())
+
+    def test_vram_queue_scratch_bytes_are_kept_apart(self):
+        """Verify that queue_vram_write, which load_scene calls from reset code, gets scratch apart from the NMI's."""
+        _, built = compile_with_update_handler()
+        allocation = built.layout.zero_page
+
+        assert allocation.conflicts() == []
+        assert "zp__vram_records_left" in allocation.interference["zp__vram_record_size"]
+        assert allocation.addresses["zp__vram_record_size"] != allocation.addresses["zp__vram_records_left"]
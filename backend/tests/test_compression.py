@@ -0,0 +1,132 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from fastapi.testclient import TestClient
+
+from core.compression import CompressionMiddleware, negotiate_encoding
+from core.etag import etag_matches, quote_etag
+
+ROM = b"NES\x1a" + bytes(24 * 1024)
+
+
+def _client(minimum_size: int = 1024) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=minimum_size)
+
+    @app.get("/rom")
+    async def rom():
+        return Response(content=ROM, media_type="application/octet-stream", headers={"ETag": quote_etag("abc")})
+
+    @app.get("/rom/cached")
+    async def rom_cached(request: Request):
+        etag = quote_etag("abc")
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=ROM, media_type="application/octet-stream", headers={"ETag": etag})
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/html")
+    async def html():
+        return Response(content="<p>" * 1000, media_type="text/html")
+
+    return TestClient(app)
+
+
+class TestNegotiateEncoding:
+    """Tests for Accept-Encoding negotiation."""
+
+    def test_prefers_brotli_when_available(self):
+        assert negotiate_encoding("gzip, deflate, br", ("br", "gzip")) == "br"
+
+    def test_honors_q_values(self):
+        assert negotiate_encoding("br;q=0.5, gzip", ("br", "gzip")) == "gzip"
+        assert negotiate_encoding("gzip;q=0", ("br", "gzip")) is None
+
+    def test_wildcard_and_missing_header(self):
+        assert negotiate_encoding("*", ("gzip",)) == "gzip"
+        assert negotiate_encoding("", ("br", "gzip")) is None
+
+
+class TestCompressionMiddleware:
+    """Tests for negotiated response compression."""
+
+    def test_gzips_rom_download(self):
+        """Verify that a large octet-stream response is gzipped and gets its own ETag."""
+        response = _client().get("/rom", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) < len(ROM) // 10
+        assert response.headers["etag"] == '"abc-gzip"'
+        assert "accept-encoding" in response.headers["vary"].lower()
+        assert response.content == ROM  # the client transparently decodes
+
+    def test_gzip_output_is_deterministic(self):
+        """Verify that identical bodies compress to identical bytes, as a strong ETag requires."""
+        client = _client()
+
+        first = client.get("/rom", headers={"Accept-Encoding": "gzip"})
+        second = client.get("/rom", headers={"Accept-Encoding": "gzip"})
+
+        assert first.headers["content-length"] == second.headers["content-length"]
+
+    def test_brotli_rom_download(self):
+        """Verify that br is used when the client prefers it."""
+        pytest.importorskip("brotli")
+        response = _client().get("/rom", headers={"Accept-Encoding": "br"})
+
+        assert response.headers["content-encoding"] == "br"
+        assert response.headers["etag"] == '"abc-br"'
+
+    def test_skips_small_responses(self):
+        """Verify that bodies under the threshold are sent as-is."""
+        response = _client().get("/small", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in response.headers
+        assert response.json() == {"ok": True}
+
+    def test_threshold_is_configurable(self):
+        """Verify that lowering the threshold compresses small JSON too."""
+        response = _client(minimum_size=1).get("/small", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+
+    def test_skips_other_media_types(self):
+        """Verify that only the configured media types are compressed."""
+        response = _client().get("/html", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in response.headers
+
+    def test_identity_when_not_accepted(self):
+        """Verify that nothing is compressed for clients that do not ask for it."""
+        response = _client().get("/rom", headers={"Accept-Encoding": "identity"})
+
+        assert "content-encoding" not in response.headers
+        assert response.headers["etag"] == '"abc"'
+
+    def test_not_modified_repeats_the_compressed_etag(self):
+        """Verify that a 304 for a client holding the gzipped ROM carries the gzip ETag it revalidated."""
+        response = _client().get("/rom/cached", headers={"Accept-Encoding": "gzip", "If-None-Match": '"abc-gzip"'})
+
+        assert response.status_code == 304
+        assert response.headers["etag"] == '"abc-gzip"'
+
+    def test_not_modified_keeps_the_identity_etag(self):
+        """Verify that a 304 for a client holding the identity representation keeps the plain ETag."""
+        response = _client().get("/rom/cached", headers={"Accept-Encoding": "gzip", "If-None-Match": '"abc"'})
+
+        assert response.status_code == 304
+        assert response.headers["etag"] == '"abc"'
+
+
+class TestEncodedEtags:
+    """Tests for matching ETags of compressed representations."""
+
+    def test_compressed_tag_matches_identity_tag(self):
+        assert etag_matches('"abc-gzip"', quote_etag("abc"))
+        assert etag_matches('W/"abc-br"', quote_etag("abc"))
+
+    def test_compressed_tag_does_not_match_other_tag(self):
+        assert not etag_matches('"abd-gzip"', quote_etag("abc"))
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import styles from './GameDetail.module.css';
 import { GamesService } from '../client/services/GamesService';
@@ -7,6 +7,7 @@ import { OpenAPI } from '../client/core/OpenAPI';
 import Chat from '../components/Chat';
 import RomPlayer from '../components/RomPlayer';
 import AssetDisplay from '../components/AssetDisplay';
+import { applyIpsPatch } from '../utils/ips';
 
 function GameDetail() {
   const { id } = useParams<{ id: string }>();
@@ -15,6 +16,8 @@ function GameDetail() {
   const [error, setError] = useState<string | null>(null);
   const [romData, setRomData] = useState<Uint8Array | null>(null);
   const [romLoading, setRomLoading] = useState(false);
+  // The ROM currently loaded and its ETag, so rebuilds can be fetched as a patch against it
+  const currentRom = useRef<{ gameId: string; etag: string; bytes: Uint8Array } | null>(null);
 
   const fetchGame = async () => {
     if (!id) return;
@@ -29,12 +32,42 @@ function GameDetail() {
     }
   };
 
+  // Fetch the rebuilt ROM as an IPS patch against the current one.
+  // Returns null if there is nothing to patch against or the server no longer has the base ROM.
+  const patchRom = async (gameId: string): Promise<Uint8Array | null> => {
+    const current = currentRom.current;
+    if (!current || current.gameId !== gameId) return null;
+
+    const response = await fetch(
+      `${OpenAPI.BASE}/games/${gameId}/render/patch?base=${encodeURIComponent(current.etag)}`,
+      { method: 'POST' },
+    );
+    if (response.status === 304) {
+      return current.bytes;
+    }
+    if (!response.ok) {
+      return null;
+    }
+
+    const patch = new Uint8Array(await response.arrayBuffer());
+    const romBytes = applyIpsPatch(current.bytes, patch);
+    currentRom.current = { gameId, etag: response.headers.get('ETag') ?? '', bytes: romBytes };
+    return romBytes;
+  };
+
   const renderRom = async () => {
     if (!id) return;
 
     try {
       setRomLoading(true);
 
+      const patchedRom = await patchRom(id);
+      if (patchedRom) {
+        setRomData(patchedRom);
+        setRomLoading(false);
+        return;
+      }
+
       // Call the render endpoint directly with fetch (can't use generated client for binary data)
       // The generated client's getResponseBody() always converts to JSON/text, which corrupts binary data
       // We use OpenAPI.BASE (which includes /api/v1) to respect port configuration
@@ -58,6 +91,8 @@ function GameDetail() {
         throw new Error('Invalid NES ROM format');
       }
 
+      const etag = response.headers.get('ETag');
+      currentRom.current = etag ? { gameId: id, etag, bytes: romBytes } : null;
       setRomData(romBytes);
       setRomLoading(false);
     } catch (err: any) {
@@ -0,0 +1,66 @@
+const IPS_HEADER = 'PATCH';
+const IPS_FOOTER = 'EOF';
+
+function readAscii(bytes: Uint8Array, start: number, length: number): string {
+  return String.fromCharCode(...bytes.slice(start, start + length));
+}
+
+function readUint(bytes: Uint8Array, start: number, length: number): number {
+  let value = 0;
+  for (let i = 0; i < length; i++) {
+    value = value * 256 + bytes[start + i];
+  }
+  return value;
+}
+
+/**
+ * Apply an IPS patch (as served by /games/{id}/render/patch) to a ROM image.
+ * Returns a new array; the source is left untouched.
+ */
+export function applyIpsPatch(source: Uint8Array, patch: Uint8Array): Uint8Array {
+  if (readAscii(patch, 0, IPS_HEADER.length) !== IPS_HEADER) {
+    throw new Error('Not an IPS patch');
+  }
+
+  let image = Uint8Array.from(source);
+  let position = IPS_HEADER.length;
+
+  while (readAscii(patch, position, IPS_FOOTER.length) !== IPS_FOOTER) {
+    if (position + 5 > patch.length) {
+      throw new Error('Truncated IPS patch');
+    }
+    const offset = readUint(patch, position, 3);
+    let size = readUint(patch, position + 3, 2);
+    position += 5;
+
+    let data: Uint8Array;
+    if (size === 0) {
+      if (position + 3 > patch.length) {
+        throw new Error('Truncated IPS patch');
+      }
+      size = readUint(patch, position, 2);
+      data = new Uint8Array(size).fill(patch[position + 2]);
+      position += 3;
+    } else {
+      if (position + size > patch.length) {
+        throw new Error('Truncated IPS patch');
+      }
+      data = patch.slice(position, position + size);
+      position += size;
+    }
+
+    if (offset + size > image.length) {
+      const grown = new Uint8Array(offset + size);
+      grown.set(image);
+      image = grown;
+    }
+    image.set(data, offset);
+  }
+
+  // Optional truncation extension: the final image length follows the footer
+  position += IPS_FOOTER.length;
+  if (position + 3 <= patch.length) {
+    image = image.slice(0, readUint(patch, position, 3));
+  }
+  return image;
+}